@@ -50,6 +50,7 @@ import base64
 import contextlib
 import collections
 import errno
+import itertools
 import logging
 import os
 import os.path
@@ -103,6 +104,18 @@ _X509_CERT_FILE = "cert"
 _IES_STATUS_FILE = "status"
 _IES_PID_FILE = "pid"
 _IES_CA_FILE = "ca"
+_IES_CHECKPOINT_FILE = "checkpoint"
+_IES_BASE_CHUNK_MAP_FILE = "basemap"
+
+#: How often to re-read status files while waiting for a change (seconds)
+_IES_WAIT_INTERVAL = 0.25
+
+#: Upper bound for waiting on import/export status changes (seconds)
+_IES_MAX_WAIT = 60.0
+
+_WIPE_STATUS_FILE = "status"
+_WIPE_PID_FILE = "pid"
+_WIPE_LOG_FILE = "log"
 
 #: Valid LVS output line regex
 _LVSLINE_REGEX = re.compile(r"^ *([^|]+)\|([^|]+)\|([0-9.]+)\|([^|]{6,})\|?$")
@@ -1178,7 +1191,68 @@ def VerifyMasterIP(my_name, test_config):
   return netutils.TcpPing(master_ip, port, source=source)
 
 
-def VerifyNode(what, cluster_name, all_hvparams):
+def _RunNodeVerifyCheck(fn):
+  """Runs a single node verify check.
+
+  @type fn: callable
+  @param fn: Check function, filling in the dictionary passed to it
+  @rtype: dict
+  @return: The check's part of the node verify result
+
+  """
+  result = {}
+  fn(result)
+  return result
+
+
+def _FingerprintVerifyFiles(
+    files, _cache_file=pathutils.NODE_VERIFY_FINGERPRINT_CACHE):
+  """Computes the fingerprints of the files checked by node verify.
+
+  Fingerprints are cached across calls in L{_cache_file}, so that only
+  files modified since the last verification are read again.
+
+  @type files: list of string
+  @param files: virtual paths of the files to fingerprint
+  @rtype: dict
+  @return: a dictionary mapping the virtual paths of existing files to their
+      fingerprints
+
+  """
+  try:
+    cache = serializer.LoadJson(utils.ReadFile(_cache_file))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read fingerprint cache %s: %s", _cache_file, err)
+    cache = {}
+  except Exception, err: # pylint: disable=W0703
+    logging.warning("Invalid fingerprint cache %s: %s", _cache_file, err)
+    cache = {}
+
+  files = map(vcluster.LocalizeVirtualPath, files)
+
+  # Only keep entries for the files being verified
+  if not isinstance(cache, dict):
+    cache = {}
+  old_cache = dict((filename, cache[filename])
+                   for filename in files if filename in cache)
+  new_cache = old_cache.copy()
+
+  fingerprints = utils.FingerprintFiles(files, cache=new_cache)
+
+  if new_cache != old_cache or len(cache) != len(old_cache):
+    try:
+      utils.WriteFile(_cache_file, data=serializer.DumpJson(new_cache),
+                      mode=0600)
+    except EnvironmentError, err:
+      logging.warning("Can't write fingerprint cache %s: %s", _cache_file, err)
+
+  return dict((vcluster.MakeVirtualPath(key), value)
+              for (key, value) in fingerprints.items())
+
+
+def VerifyNode(what, cluster_name, all_hvparams,
+               _run_parallel_fn=utils.RunParallel):
   """Verify the status of the local node.
 
   Based on the input L{what} parameter, various checks are done on the
@@ -1195,6 +1269,11 @@ def VerifyNode(what, cluster_name, all_hvparams):
   connectivity to the given nodes via both primary IP and, if
   applicable, secondary IPs.
 
+  The checks are run concurrently, each of them limited to
+  L{constants.NODE_VERIFY_CHECK_TIMEOUT} seconds. The results of checks
+  which fail or time out are left out; the outcome and duration of every
+  check is returned under the I{check-stats} key.
+
   @type what: C{dict}
   @param what: a dictionary of things to check:
       - filelist: list of files for which to compute checksums
@@ -1211,182 +1290,254 @@ def VerifyNode(what, cluster_name, all_hvparams):
       values representing the result of the checks
 
   """
-  result = {}
   my_name = netutils.Hostname.GetSysName()
   vm_capable = my_name not in what.get(constants.NV_NONVMNODES, [])
 
-  _VerifyHypervisors(what, vm_capable, result, all_hvparams)
-  _VerifyHvparams(what, vm_capable, result)
+  # The checks are independent from each other and run concurrently; each of
+  # them fills in its own part of the result
+  checks = []
+
+  def _Check(fn):
+    checks.append((fn.__name__.lstrip("_"), _RunNodeVerifyCheck, [fn]))
+    return fn
+
+  @_Check
+  def _Hypervisors(result):
+    _VerifyHypervisors(what, vm_capable, result, all_hvparams)
+    _VerifyHvparams(what, vm_capable, result)
 
   if constants.NV_FILELIST in what:
-    fingerprints = utils.FingerprintFiles(map(vcluster.LocalizeVirtualPath,
-                                              what[constants.NV_FILELIST]))
-    result[constants.NV_FILELIST] = \
-      dict((vcluster.MakeVirtualPath(key), value)
-           for (key, value) in fingerprints.items())
+    @_Check
+    def _FileList(result):
+      result[constants.NV_FILELIST] = \
+        _FingerprintVerifyFiles(what[constants.NV_FILELIST])
+
+  if constants.NV_FILE_DIGEST in what:
+    @_Check
+    def _FileDigest(result):
+      result[constants.NV_FILE_DIGEST] = utils.AggregateFingerprint(
+        _FingerprintVerifyFiles(what[constants.NV_FILE_DIGEST]))
 
   if constants.NV_CLIENT_CERT in what:
-    result[constants.NV_CLIENT_CERT] = _VerifyClientCertificate()
+    @_Check
+    def _ClientCert(result):
+      result[constants.NV_CLIENT_CERT] = _VerifyClientCertificate()
 
   if constants.NV_SSH_SETUP in what:
-    node_status_list, key_type = what[constants.NV_SSH_SETUP]
-    result[constants.NV_SSH_SETUP] = \
-      _VerifySshSetup(node_status_list, my_name, key_type)
-    if constants.NV_SSH_CLUTTER in what:
-      result[constants.NV_SSH_CLUTTER] = \
-        _VerifySshClutter(what[constants.NV_SSH_SETUP], my_name)
+    @_Check
+    def _SshSetup(result):
+      node_status_list, key_type = what[constants.NV_SSH_SETUP]
+      result[constants.NV_SSH_SETUP] = \
+        _VerifySshSetup(node_status_list, my_name, key_type)
+      if constants.NV_SSH_CLUTTER in what:
+        result[constants.NV_SSH_CLUTTER] = \
+          _VerifySshClutter(what[constants.NV_SSH_SETUP], my_name)
 
   if constants.NV_NODELIST in what:
-    (nodes, bynode, mcs) = what[constants.NV_NODELIST]
+    @_Check
+    def _NodeList(result):
+      (nodes, bynode, mcs) = what[constants.NV_NODELIST]
 
-    # Add nodes from other groups (different for each node)
-    try:
-      nodes.extend(bynode[my_name])
-    except KeyError:
-      pass
-
-    # Use a random order
-    random.shuffle(nodes)
-
-    # Try to contact all nodes
-    val = {}
-    ssh_port_map = ssconf.SimpleStore().GetSshPortMap()
-    for node in nodes:
-      # We only test if master candidates can communicate to other nodes.
-      # We cannot test if normal nodes cannot communicate with other nodes,
-      # because the administrator might have installed additional SSH keys,
-      # over which Ganeti has no power.
-      if my_name in mcs:
-        success, message = _GetSshRunner(cluster_name). \
-                              VerifyNodeHostname(node, ssh_port_map[node])
-        if not success:
-          val[node] = message
-
-    result[constants.NV_NODELIST] = val
+      # Add nodes from other groups (different for each node)
+      try:
+        nodes.extend(bynode[my_name])
+      except KeyError:
+        pass
+
+      # Use a random order
+      random.shuffle(nodes)
+
+      # Try to contact all nodes
+      val = {}
+      ssh_port_map = ssconf.SimpleStore().GetSshPortMap()
+      for node in nodes:
+        # We only test if master candidates can communicate to other nodes.
+        # We cannot test if normal nodes cannot communicate with other nodes,
+        # because the administrator might have installed additional SSH keys,
+        # over which Ganeti has no power.
+        if my_name in mcs:
+          success, message = _GetSshRunner(cluster_name). \
+                                VerifyNodeHostname(node, ssh_port_map[node])
+          if not success:
+            val[node] = message
+
+      result[constants.NV_NODELIST] = val
 
   if constants.NV_NODENETTEST in what:
-    result[constants.NV_NODENETTEST] = VerifyNodeNetTest(
-        my_name, what[constants.NV_NODENETTEST])
+    @_Check
+    def _NodeNetTest(result):
+      result[constants.NV_NODENETTEST] = VerifyNodeNetTest(
+          my_name, what[constants.NV_NODENETTEST])
 
   if constants.NV_MASTERIP in what:
-    result[constants.NV_MASTERIP] = VerifyMasterIP(
-        my_name, what[constants.NV_MASTERIP])
+    @_Check
+    def _MasterIp(result):
+      result[constants.NV_MASTERIP] = VerifyMasterIP(
+          my_name, what[constants.NV_MASTERIP])
 
   if constants.NV_USERSCRIPTS in what:
-    result[constants.NV_USERSCRIPTS] = \
-      [script for script in what[constants.NV_USERSCRIPTS]
-       if not utils.IsExecutable(script)]
+    @_Check
+    def _UserScripts(result):
+      result[constants.NV_USERSCRIPTS] = \
+        [script for script in what[constants.NV_USERSCRIPTS]
+         if not utils.IsExecutable(script)]
 
   if constants.NV_OOB_PATHS in what:
-    result[constants.NV_OOB_PATHS] = tmp = []
-    for path in what[constants.NV_OOB_PATHS]:
-      try:
-        st = os.stat(path)
-      except OSError, err:
-        tmp.append("error stating out of band helper: %s" % err)
-      else:
-        if stat.S_ISREG(st.st_mode):
-          if stat.S_IMODE(st.st_mode) & stat.S_IXUSR:
-            tmp.append(None)
-          else:
-            tmp.append("out of band helper %s is not executable" % path)
+    @_Check
+    def _OobPaths(result):
+      result[constants.NV_OOB_PATHS] = tmp = []
+      for path in what[constants.NV_OOB_PATHS]:
+        try:
+          st = os.stat(path)
+        except OSError, err:
+          tmp.append("error stating out of band helper: %s" % err)
         else:
-          tmp.append("out of band helper %s is not a file" % path)
+          if stat.S_ISREG(st.st_mode):
+            if stat.S_IMODE(st.st_mode) & stat.S_IXUSR:
+              tmp.append(None)
+            else:
+              tmp.append("out of band helper %s is not executable" % path)
+          else:
+            tmp.append("out of band helper %s is not a file" % path)
 
   if constants.NV_LVLIST in what and vm_capable:
-    try:
-      val = GetVolumeList(utils.ListVolumeGroups().keys())
-    except RPCFail, err:
-      val = str(err)
-    result[constants.NV_LVLIST] = val
+    @_Check
+    def _LvList(result):
+      try:
+        val = GetVolumeList(utils.ListVolumeGroups().keys())
+      except RPCFail, err:
+        val = str(err)
+      result[constants.NV_LVLIST] = val
 
-  _VerifyInstanceList(what, vm_capable, result, all_hvparams)
+  @_Check
+  def _InstanceList(result):
+    _VerifyInstanceList(what, vm_capable, result, all_hvparams)
 
   if constants.NV_VGLIST in what and vm_capable:
-    result[constants.NV_VGLIST] = utils.ListVolumeGroups()
+    @_Check
+    def _VgList(result):
+      result[constants.NV_VGLIST] = utils.ListVolumeGroups()
 
   if constants.NV_PVLIST in what and vm_capable:
-    check_exclusive_pvs = constants.NV_EXCLUSIVEPVS in what
-    val = bdev.LogicalVolume.GetPVInfo(what[constants.NV_PVLIST],
-                                       filter_allocatable=False,
-                                       include_lvs=check_exclusive_pvs)
-    if check_exclusive_pvs:
-      result[constants.NV_EXCLUSIVEPVS] = _CheckExclusivePvs(val)
-      for pvi in val:
-        # Avoid sending useless data on the wire
-        pvi.lv_list = []
-    result[constants.NV_PVLIST] = map(objects.LvmPvInfo.ToDict, val)
-
-  if constants.NV_VERSION in what:
-    result[constants.NV_VERSION] = (constants.PROTOCOL_VERSION,
-                                    constants.RELEASE_VERSION)
-
-  _VerifyNodeInfo(what, vm_capable, result, all_hvparams)
+    @_Check
+    def _PvList(result):
+      check_exclusive_pvs = constants.NV_EXCLUSIVEPVS in what
+      val = bdev.LogicalVolume.GetPVInfo(what[constants.NV_PVLIST],
+                                         filter_allocatable=False,
+                                         include_lvs=check_exclusive_pvs)
+      if check_exclusive_pvs:
+        result[constants.NV_EXCLUSIVEPVS] = _CheckExclusivePvs(val)
+        for pvi in val:
+          # Avoid sending useless data on the wire
+          pvi.lv_list = []
+      result[constants.NV_PVLIST] = map(objects.LvmPvInfo.ToDict, val)
+
+  @_Check
+  def _NodeInfo(result):
+    _VerifyNodeInfo(what, vm_capable, result, all_hvparams)
 
   if constants.NV_DRBDVERSION in what and vm_capable:
-    try:
-      drbd_version = DRBD8.GetProcInfo().GetVersionString()
-    except errors.BlockDeviceError, err:
-      logging.warning("Can't get DRBD version", exc_info=True)
-      drbd_version = str(err)
-    result[constants.NV_DRBDVERSION] = drbd_version
+    @_Check
+    def _DrbdVersion(result):
+      try:
+        drbd_version = DRBD8.GetProcInfo().GetVersionString()
+      except errors.BlockDeviceError, err:
+        logging.warning("Can't get DRBD version", exc_info=True)
+        drbd_version = str(err)
+      result[constants.NV_DRBDVERSION] = drbd_version
 
   if constants.NV_DRBDLIST in what and vm_capable:
-    try:
-      used_minors = drbd.DRBD8.GetUsedDevs()
-    except errors.BlockDeviceError, err:
-      logging.warning("Can't get used minors list", exc_info=True)
-      used_minors = str(err)
-    result[constants.NV_DRBDLIST] = used_minors
+    @_Check
+    def _DrbdList(result):
+      try:
+        used_minors = drbd.DRBD8.GetUsedDevs()
+      except errors.BlockDeviceError, err:
+        logging.warning("Can't get used minors list", exc_info=True)
+        used_minors = str(err)
+      result[constants.NV_DRBDLIST] = used_minors
 
   if constants.NV_DRBDHELPER in what and vm_capable:
-    status = True
-    try:
-      payload = drbd.DRBD8.GetUsermodeHelper()
-    except errors.BlockDeviceError, err:
-      logging.error("Can't get DRBD usermode helper: %s", str(err))
-      status = False
-      payload = str(err)
-    result[constants.NV_DRBDHELPER] = (status, payload)
+    @_Check
+    def _DrbdHelper(result):
+      status = True
+      try:
+        payload = drbd.DRBD8.GetUsermodeHelper()
+      except errors.BlockDeviceError, err:
+        logging.error("Can't get DRBD usermode helper: %s", str(err))
+        status = False
+        payload = str(err)
+      result[constants.NV_DRBDHELPER] = (status, payload)
 
   if constants.NV_NODESETUP in what:
-    result[constants.NV_NODESETUP] = tmpr = []
-    if not os.path.isdir("/sys/block") or not os.path.isdir("/sys/class/net"):
-      tmpr.append("The sysfs filesytem doesn't seem to be mounted"
-                  " under /sys, missing required directories /sys/block"
-                  " and /sys/class/net")
-    if (not os.path.isdir("/proc/sys") or
-        not os.path.isfile("/proc/sysrq-trigger")):
-      tmpr.append("The procfs filesystem doesn't seem to be mounted"
-                  " under /proc, missing required directory /proc/sys and"
-                  " the file /proc/sysrq-trigger")
-
-  if constants.NV_TIME in what:
-    result[constants.NV_TIME] = utils.SplitTime(time.time())
+    @_Check
+    def _NodeSetup(result):
+      result[constants.NV_NODESETUP] = tmpr = []
+      if (not os.path.isdir("/sys/block") or
+          not os.path.isdir("/sys/class/net")):
+        tmpr.append("The sysfs filesytem doesn't seem to be mounted"
+                    " under /sys, missing required directories /sys/block"
+                    " and /sys/class/net")
+      if (not os.path.isdir("/proc/sys") or
+          not os.path.isfile("/proc/sysrq-trigger")):
+        tmpr.append("The procfs filesystem doesn't seem to be mounted"
+                    " under /proc, missing required directory /proc/sys and"
+                    " the file /proc/sysrq-trigger")
 
   if constants.NV_OSLIST in what and vm_capable:
-    result[constants.NV_OSLIST] = DiagnoseOS()
+    @_Check
+    def _OsList(result):
+      result[constants.NV_OSLIST] = DiagnoseOS()
 
   if constants.NV_BRIDGES in what and vm_capable:
-    result[constants.NV_BRIDGES] = [bridge
-                                    for bridge in what[constants.NV_BRIDGES]
-                                    if not utils.BridgeExists(bridge)]
+    @_Check
+    def _Bridges(result):
+      result[constants.NV_BRIDGES] = [bridge
+                                      for bridge in what[constants.NV_BRIDGES]
+                                      if not utils.BridgeExists(bridge)]
 
   if what.get(constants.NV_ACCEPTED_STORAGE_PATHS) == my_name:
-    result[constants.NV_ACCEPTED_STORAGE_PATHS] = \
-        filestorage.ComputeWrongFileStoragePaths()
+    @_Check
+    def _AcceptedStoragePaths(result):
+      result[constants.NV_ACCEPTED_STORAGE_PATHS] = \
+          filestorage.ComputeWrongFileStoragePaths()
 
   if what.get(constants.NV_FILE_STORAGE_PATH):
-    pathresult = filestorage.CheckFileStoragePath(
-        what[constants.NV_FILE_STORAGE_PATH])
-    if pathresult:
-      result[constants.NV_FILE_STORAGE_PATH] = pathresult
+    @_Check
+    def _FileStoragePath(result):
+      pathresult = filestorage.CheckFileStoragePath(
+          what[constants.NV_FILE_STORAGE_PATH])
+      if pathresult:
+        result[constants.NV_FILE_STORAGE_PATH] = pathresult
 
   if what.get(constants.NV_SHARED_FILE_STORAGE_PATH):
-    pathresult = filestorage.CheckFileStoragePath(
-        what[constants.NV_SHARED_FILE_STORAGE_PATH])
-    if pathresult:
-      result[constants.NV_SHARED_FILE_STORAGE_PATH] = pathresult
+    @_Check
+    def _SharedFileStoragePath(result):
+      pathresult = filestorage.CheckFileStoragePath(
+          what[constants.NV_SHARED_FILE_STORAGE_PATH])
+      if pathresult:
+        result[constants.NV_SHARED_FILE_STORAGE_PATH] = pathresult
+
+  check_results = _run_parallel_fn(checks, constants.NODE_VERIFY_MAX_WORKERS,
+                                   timeout=constants.NODE_VERIFY_CHECK_TIMEOUT)
+
+  result = {}
+  check_stats = {}
+
+  for (name, (status, value, duration)) in check_results.items():
+    check_stats[name] = (status, duration)
+    if status == utils.TASK_SUCCESS:
+      result.update(value)
+    elif status == utils.TASK_FAILED:
+      logging.error("Node verify check '%s' failed: %s", name, value)
+
+  result[constants.NV_CHECK_STATS] = check_stats
+
+  if constants.NV_VERSION in what:
+    result[constants.NV_VERSION] = (constants.PROTOCOL_VERSION,
+                                    constants.RELEASE_VERSION)
+
+  if constants.NV_TIME in what:
+    result[constants.NV_TIME] = utils.SplitTime(time.time())
 
   return result
 
@@ -1460,6 +1611,43 @@ def _InitSshUpdateData(data, noded_cert_file, ssconf_store):
   data[constants.SSHS_CLUSTER_NAME] = cluster_name
 
 
+def _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, ssh_port_map, updates,
+                         ssh_update_debug=False, ssh_update_verbose=False):
+  """Runs C{ssh_update} on many nodes concurrently.
+
+  Every node is retried up to L{constants.SSHS_MAX_RETRIES} times, each
+  attempt is limited to L{constants.SSHS_TIMEOUT} seconds. Nodes often share
+  the same payload, so it should be prepared once by the caller.
+
+  @type ssh_port_map: dict of str to int
+  @param ssh_port_map: mapping of node names to their SSH port
+  @type updates: list of tuples; (string, dict)
+  @param updates: Node names and the data passed to C{ssh_update} on them
+  @rtype: list of tuples; (string, L{errors.SshUpdateError})
+  @return: The nodes which couldn't be updated and the last error for each of
+    them, in the order of C{updates}
+
+  """
+  def _Update(node, data):
+    logging.debug("Updating SSH key files of node '%s'.", node)
+    backoff = 5  # seconds
+    utils.RetryByNumberOfTimes(
+        constants.SSHS_MAX_RETRIES, backoff, errors.SshUpdateError,
+        run_cmd_fn, cluster_name, node, pathutils.SSH_UPDATE,
+        ssh_port_map.get(node), data,
+        debug=ssh_update_debug, verbose=ssh_update_verbose,
+        use_cluster_key=False, ask_key=False, strict_host_check=False,
+        timeout=constants.SSHS_TIMEOUT)
+
+  results = utils.RunParallel([(idx, _Update, [node, data])
+                               for (idx, (node, data)) in enumerate(updates)],
+                              max_workers=constants.SSHS_MAX_PARALLEL)
+
+  return [(node, results[idx][1])
+          for (idx, (node, _)) in enumerate(updates)
+          if results[idx][0] != utils.TASK_SUCCESS]
+
+
 def AddNodeSshKey(node_uuid, node_name,
                   potential_master_candidates,
                   to_authorized_keys=False,
@@ -1555,14 +1743,17 @@ def AddNodeSshKeyBulk(node_list,
   if not ssconf_store:
     ssconf_store = ssconf.SimpleStore()
 
+  key_store = ssh.PubKeyStore(key_file=pub_key_file,
+                              error_fn=errors.SshUpdateError)
+
   for node_info in node_list:
     # replacement not necessary for keys that are not supposed to be in the
     # list of public keys
     if not node_info.to_public_keys:
       continue
     # Check and fix sanity of key file
-    keys_by_name = ssh.QueryPubKeyFile([node_info.name], key_file=pub_key_file)
-    keys_by_uuid = ssh.QueryPubKeyFile([node_info.uuid], key_file=pub_key_file)
+    keys_by_name = key_store.Query([node_info.name])
+    keys_by_uuid = key_store.Query([node_info.uuid])
 
     if (not keys_by_name or node_info.name not in keys_by_name) \
         and (not keys_by_uuid or node_info.uuid not in keys_by_uuid):
@@ -1574,13 +1765,12 @@ def AddNodeSshKeyBulk(node_list,
       if node_info.name in keys_by_name:
         # Replace the name by UUID in the file as the name should only be used
         # temporarily
-        ssh.ReplaceNameByUuid(node_info.uuid, node_info.name,
-                              error_fn=errors.SshUpdateError,
-                              key_file=pub_key_file)
+        key_store.ReplaceNameByUuid(node_info.uuid, node_info.name)
+
+  key_store.Save()
 
   # Retrieve updated map of UUIDs to keys
-  keys_by_uuid = ssh.QueryPubKeyFile(
-      [node_info.uuid for node_info in node_list], key_file=pub_key_file)
+  keys_by_uuid = key_store.Query([node_info.uuid for node_info in node_list])
 
   # Update the master node's key files
   (auth_key_file, _) = \
@@ -1596,44 +1786,41 @@ def AddNodeSshKeyBulk(node_list,
   ssh_port_map = ssconf_store.GetSshPortMap()
 
   # Update the target nodes themselves
-  for node_info in node_list:
-    logging.debug("Updating SSH key files of target node '%s'.", node_info.name)
-    if node_info.get_public_keys:
-      node_data = {}
-      _InitSshUpdateData(node_data, noded_cert_file, ssconf_store)
-      all_keys = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
-      node_data[constants.SSHS_SSH_PUBLIC_KEYS] = \
-        (constants.SSHS_OVERRIDE, all_keys)
+  target_nodes = [node_info for node_info in node_list
+                  if node_info.get_public_keys]
+  if target_nodes:
+    node_data = base_data.copy()
+    all_keys = key_store.Query(None)
+    node_data[constants.SSHS_SSH_PUBLIC_KEYS] = \
+      (constants.SSHS_OVERRIDE, all_keys)
+
+    failed = _RunSshUpdateOnNodes(
+      run_cmd_fn, cluster_name, ssh_port_map,
+      [(node_info.name, node_data) for node_info in target_nodes],
+      ssh_update_debug=ssh_update_debug,
+      ssh_update_verbose=ssh_update_verbose)
 
-      try:
-        backoff = 5  # seconds
-        utils.RetryByNumberOfTimes(
-            constants.SSHS_MAX_RETRIES, backoff,
-            errors.SshUpdateError,
-            run_cmd_fn, cluster_name, node_info.name, pathutils.SSH_UPDATE,
-            ssh_port_map.get(node_info.name), node_data,
-            debug=ssh_update_debug, verbose=ssh_update_verbose,
-            use_cluster_key=False, ask_key=False, strict_host_check=False)
-      except errors.SshUpdateError as e:
-        # Clean up the master's public key file if adding key fails
-        if node_info.to_public_keys:
-          ssh.RemovePublicKey(node_info.uuid)
-        raise e
+    if failed:
+      # Clean up the master's public key file if adding keys fails
+      failed_nodes = frozenset(node for (node, _) in failed)
+      for node_info in target_nodes:
+        if node_info.name in failed_nodes and node_info.to_public_keys:
+          key_store.Remove(node_info.uuid)
+      key_store.Save()
+      raise failed[0][1]
 
   # Update all nodes except master and the target nodes
-  keys_by_uuid_auth = ssh.QueryPubKeyFile(
+  keys_by_uuid_auth = key_store.Query(
       [node_info.uuid for node_info in node_list
-       if node_info.to_authorized_keys],
-      key_file=pub_key_file)
+       if node_info.to_authorized_keys])
   if to_authorized_keys:
     base_data[constants.SSHS_SSH_AUTHORIZED_KEYS] = \
       (constants.SSHS_ADD, keys_by_uuid_auth)
 
   pot_mc_data = base_data.copy()
-  keys_by_uuid_pub = ssh.QueryPubKeyFile(
+  keys_by_uuid_pub = key_store.Query(
       [node_info.uuid for node_info in node_list
-       if node_info.to_public_keys],
-      key_file=pub_key_file)
+       if node_info.to_public_keys])
   if to_public_keys:
     pot_mc_data[constants.SSHS_SSH_PUBLIC_KEYS] = \
       (constants.SSHS_REPLACE_OR_ADD, keys_by_uuid_pub)
@@ -1642,7 +1829,7 @@ def AddNodeSshKeyBulk(node_list,
   master_node = ssconf_store.GetMasterNode()
   online_nodes = ssconf_store.GetOnlineNodeList()
 
-  node_errors = []
+  updates = []
   for node in all_nodes:
     if node == master_node:
       logging.debug("Skipping master node '%s'.", master_node)
@@ -1651,33 +1838,24 @@ def AddNodeSshKeyBulk(node_list,
       logging.debug("Skipping offline node '%s'.", node)
       continue
     if node in potential_master_candidates:
-      logging.debug("Updating SSH key files of node '%s'.", node)
-      try:
-        backoff = 5  # seconds
-        utils.RetryByNumberOfTimes(
-            constants.SSHS_MAX_RETRIES, backoff, errors.SshUpdateError,
-            run_cmd_fn, cluster_name, node, pathutils.SSH_UPDATE,
-            ssh_port_map.get(node), pot_mc_data,
-            debug=ssh_update_debug, verbose=ssh_update_verbose,
-            use_cluster_key=False, ask_key=False, strict_host_check=False)
-      except errors.SshUpdateError as last_exception:
-        error_msg = ("When adding the key of node '%s', updating SSH key"
-                     " files of node '%s' failed after %s retries."
-                     " Not trying again. Last error was: %s." %
-                     (node, node_info.name, constants.SSHS_MAX_RETRIES,
-                      last_exception))
-        node_errors.append((node, error_msg))
-        # We only log the error and don't throw an exception, because
-        # one unreachable node shall not abort the entire procedure.
-        logging.error(error_msg)
+      updates.append((node, pot_mc_data))
+    elif to_authorized_keys:
+      updates.append((node, base_data))
 
-    else:
-      if to_authorized_keys:
-        run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                   ssh_port_map.get(node), base_data,
-                   debug=ssh_update_debug, verbose=ssh_update_verbose,
-                   use_cluster_key=False, ask_key=False,
-                   strict_host_check=False)
+  node_errors = []
+  for (node, last_exception) in \
+      _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, ssh_port_map, updates,
+                           ssh_update_debug=ssh_update_debug,
+                           ssh_update_verbose=ssh_update_verbose):
+    error_msg = ("When adding the keys of node(s) %s, updating SSH key"
+                 " files of node '%s' failed after %s retries."
+                 " Not trying again. Last error was: %s." %
+                 (utils.CommaJoin(node_info.name for node_info in node_list),
+                  node, constants.SSHS_MAX_RETRIES, last_exception))
+    node_errors.append((node, error_msg))
+    # We only log the error and don't throw an exception, because
+    # one unreachable node shall not abort the entire procedure.
+    logging.error(error_msg)
 
   return node_errors
 
@@ -1829,6 +2007,7 @@ def RemoveNodeSshKeyBulk(node_list,
 
   master_node = ssconf_store.GetMasterNode()
   ssh_port_map = ssconf_store.GetSshPortMap()
+  key_store = ssh.PubKeyStore(key_file=pub_key_file)
 
   all_keys_to_remove = {}
   if from_authorized_keys or from_public_keys:
@@ -1841,7 +2020,7 @@ def RemoveNodeSshKeyBulk(node_list,
       if keys_to_remove:
         keys = keys_to_remove
       else:
-        keys = ssh.QueryPubKeyFile([node_info.uuid], key_file=pub_key_file)
+        keys = key_store.Query([node_info.uuid])
         if (not keys or node_info.uuid not in keys) and not readd:
           raise errors.SshUpdateError("Node '%s' not found in the list of"
                                       " public SSH keys. It seems someone"
@@ -1852,8 +2031,7 @@ def RemoveNodeSshKeyBulk(node_list,
         # SSH communication
         master_keys = None
         if master_uuid:
-          master_keys = ssh.QueryPubKeyFile([master_uuid],
-                                            key_file=pub_key_file)
+          master_keys = key_store.Query([master_uuid])
 
           # Remove any master keys from the list of keys to remove from the node
           keys[node_info.uuid] = list(
@@ -1902,6 +2080,7 @@ def RemoveNodeSshKeyBulk(node_list,
       all_nodes_to_remove = [node_info.name for node_info in node_list]
       logging.debug("Removing keys of nodes '%s' from all nodes but itself and"
                     " master.", ", ".join(all_nodes_to_remove))
+      updates = []
       for node in all_nodes:
         if node == master_node:
           logging.debug("Skipping master node '%s'.", master_node)
@@ -1912,45 +2091,38 @@ def RemoveNodeSshKeyBulk(node_list,
         if node in all_nodes_to_remove:
           logging.debug("Skipping node whose key is removed itself '%s'.", node)
           continue
-        ssh_port = ssh_port_map.get(node)
-        if not ssh_port:
+        if not ssh_port_map.get(node):
           raise errors.OpExecError("No SSH port information available for"
                                    " node '%s', map: %s." %
                                    (node, ssh_port_map))
-        error_msg_final = ("When removing the key of node '%s', updating the"
-                           " SSH key files of node '%s' failed. Last error"
-                           " was: %s.")
 
         if node in potential_master_candidates or from_authorized_keys:
-          if node in potential_master_candidates:
-            node_desc = "potential master candidate"
-          else:
-            node_desc = "normal"
-          logging.debug("Updating key setup of %s node %s.", node_desc, node)
-          try:
-            backoff = 5  # seconds
-            utils.RetryByNumberOfTimes(
-                constants.SSHS_MAX_RETRIES, backoff, errors.SshUpdateError,
-                run_cmd_fn, cluster_name, node, pathutils.SSH_UPDATE,
-                ssh_port, pot_mc_data,
-                debug=ssh_update_debug, verbose=ssh_update_verbose,
-                use_cluster_key=False, ask_key=False, strict_host_check=False)
-          except errors.SshUpdateError as last_exception:
-            error_msg = error_msg_final % (
-                node_info.name, node, last_exception)
-            result_msgs.append((node, error_msg))
-            logging.error(error_msg)
+          updates.append((node, pot_mc_data))
+
+      for (node, last_exception) in \
+          _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, ssh_port_map, updates,
+                               ssh_update_debug=ssh_update_debug,
+                               ssh_update_verbose=ssh_update_verbose):
+        error_msg = ("When removing the keys of node(s) %s, updating the SSH"
+                     " key files of node '%s' failed. Last error was: %s." %
+                     (utils.CommaJoin(all_nodes_to_remove), node,
+                      last_exception))
+        result_msgs.append((node, error_msg))
+        logging.error(error_msg)
+
+  target_base_data = {}
+  _InitSshUpdateData(target_base_data, noded_cert_file, ssconf_store)
+  cluster_name = target_base_data[constants.SSHS_CLUSTER_NAME]
+  target_updates = []
 
   for node_info in node_list:
     if node_info.clear_authorized_keys or node_info.from_public_keys or \
         node_info.clear_public_keys:
-      data = {}
-      _InitSshUpdateData(data, noded_cert_file, ssconf_store)
-      cluster_name = data[constants.SSHS_CLUSTER_NAME]
-      ssh_port = ssh_port_map.get(node_info.name)
-      if not ssh_port:
+      data = target_base_data.copy()
+      if not ssh_port_map.get(node_info.name):
         raise errors.OpExecError("No SSH port information available for"
-                                 " node '%s', which is leaving the cluster.")
+                                 " node '%s', which is leaving the cluster." %
+                                 node_info.name)
 
       if node_info.clear_authorized_keys:
         # The 'authorized_keys' file is not solely managed by Ganeti. Therefore,
@@ -1958,8 +2130,7 @@ def RemoveNodeSshKeyBulk(node_list,
         # that were not added by Ganeti.
         other_master_candidate_uuids = [uuid for uuid in master_candidate_uuids
                                         if uuid != node_info.uuid]
-        candidate_keys = ssh.QueryPubKeyFile(other_master_candidate_uuids,
-                                             key_file=pub_key_file)
+        candidate_keys = key_store.Query(other_master_candidate_uuids)
         data[constants.SSHS_SSH_AUTHORIZED_KEYS] = \
           (constants.SSHS_REMOVE, candidate_keys)
 
@@ -1974,32 +2145,28 @@ def RemoveNodeSshKeyBulk(node_list,
           data[constants.SSHS_SSH_PUBLIC_KEYS] = \
             (constants.SSHS_REMOVE, all_keys_to_remove)
 
-      # If we have no changes to any keyfile, just return
+      # Skip nodes without changes to any keyfile
       if not (constants.SSHS_SSH_PUBLIC_KEYS in data or
               constants.SSHS_SSH_AUTHORIZED_KEYS in data):
-        return
+        continue
 
-      logging.debug("Updating SSH key setup of target node '%s'.",
-                    node_info.name)
-      try:
-        backoff = 5  # seconds
-        utils.RetryByNumberOfTimes(
-            constants.SSHS_MAX_RETRIES, backoff,
-            errors.SshUpdateError,
-            run_cmd_fn, cluster_name, node_info.name, pathutils.SSH_UPDATE,
-            ssh_port, data,
-            debug=ssh_update_debug, verbose=ssh_update_verbose,
-            use_cluster_key=False, ask_key=False, strict_host_check=False)
-      except errors.SshUpdateError as last_exception:
-        result_msgs.append(
-            (node_info.name,
-             ("Removing SSH keys from node '%s' failed."
-              " This can happen when the node is already unreachable."
-              " Error: %s" % (node_info.name, last_exception))))
+      target_updates.append((node_info.name, data))
+
+  for (node, last_exception) in \
+      _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, ssh_port_map,
+                           target_updates,
+                           ssh_update_debug=ssh_update_debug,
+                           ssh_update_verbose=ssh_update_verbose):
+    result_msgs.append(
+        (node,
+         ("Removing SSH keys from node '%s' failed."
+          " This can happen when the node is already unreachable."
+          " Error: %s" % (node, last_exception))))
 
   if all_keys_to_remove and from_public_keys:
     for node_uuid in nodes_remove_from_public_keys:
-      ssh.RemovePublicKey(node_uuid, key_file=pub_key_file)
+      key_store.Remove(node_uuid)
+    key_store.Save()
 
   return result_msgs
 
@@ -2211,9 +2378,7 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
     if node_errors:
       all_node_errors = all_node_errors + node_errors
 
-  for (node_uuid, node_name, master_candidate, potential_master_candidate) \
-      in node_list:
-
+  def _RenewNodeKey(node_uuid, node_name):
     logging.debug("Generating new SSH key for node '%s'.", node_name)
     _GenerateNodeSshKey(node_name, ssh_port_map, new_key_type, new_key_bits,
                         ssconf_store=ssconf_store,
@@ -2224,18 +2389,34 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
 
     try:
       logging.debug("Fetching newly created SSH key from node '%s'.", node_name)
-      pub_key = ssh.ReadRemoteSshPubKey(new_pub_keyfile,
-                                        node_name, cluster_name,
-                                        ssh_port_map[node_name],
-                                        False, # ask_key
-                                        False) # key_check
+      return ssh.ReadRemoteSshPubKey(new_pub_keyfile,
+                                     node_name, cluster_name,
+                                     ssh_port_map[node_name],
+                                     False, # ask_key
+                                     False) # key_check
     except:
       raise errors.SshUpdateError("Could not fetch key of node %s"
                                   " (UUID %s)" % (node_name, node_uuid))
 
+  # Keys are generated and fetched concurrently, the key files on the master
+  # are updated afterwards
+  new_keys = utils.RunParallel([(node_uuid, _RenewNodeKey,
+                                 [node_uuid, node_name])
+                                for (node_uuid, node_name, _, _) in node_list],
+                               max_workers=constants.SSHS_MAX_PARALLEL)
+
+  key_store = ssh.PubKeyStore(key_file=ganeti_pub_keys_file)
+
+  for (node_uuid, node_name, master_candidate,
+       potential_master_candidate) in node_list:
+    (status, pub_key, _) = new_keys[node_uuid]
+    if status != utils.TASK_SUCCESS:
+      key_store.Save()
+      raise pub_key
+
     if potential_master_candidate:
-      ssh.RemovePublicKey(node_uuid, key_file=ganeti_pub_keys_file)
-      ssh.AddPublicKey(node_uuid, pub_key, key_file=ganeti_pub_keys_file)
+      key_store.Remove(node_uuid)
+      key_store.Add(node_uuid, pub_key)
 
     node_info = SshAddNodeInfo(name=node_name,
                                uuid=node_uuid,
@@ -2244,6 +2425,8 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
                                get_public_keys=True)
     node_keys_to_add.append(node_info)
 
+  key_store.Save()
+
   node_errors = AddNodeSshKeyBulk(
       node_keys_to_add, potential_master_candidates,
       pub_key_file=ganeti_pub_keys_file, ssconf_store=ssconf_store,
@@ -2275,9 +2458,11 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
       [new_key_type], suffix=constants.SSHS_MASTER_SUFFIX)
 
   # Replace master key in the master nodes' public key file
-  ssh.RemovePublicKey(master_node_uuid, key_file=ganeti_pub_keys_file)
+  key_store = ssh.PubKeyStore(key_file=ganeti_pub_keys_file)
+  key_store.Remove(master_node_uuid)
   for pub_key in new_master_keys:
-    ssh.AddPublicKey(master_node_uuid, pub_key, key_file=ganeti_pub_keys_file)
+    key_store.Add(master_node_uuid, pub_key)
+  key_store.Save()
 
   # Add new master key to all node's public and authorized keys
   logging.debug("Add new master key to all nodes.")
@@ -3505,6 +3690,133 @@ def BlockdevWipe(disk, offset, size):
   _DumpDevice("/dev/zero", rdev.dev_path, offset, size, True)
 
 
+def StartBlockdevWipe(disks, offsets):
+  """Starts wiping block devices in the background.
+
+  The devices are wiped concurrently by the C{wipe-disks} tool, whose progress
+  can be retrieved using L{GetBlockdevWipeStatus}.
+
+  @type disks: list of L{objects.Disk}
+  @param disks: the disk objects we want to wipe
+  @type offsets: list of int
+  @param offsets: Offset in MiB from which to wipe each disk
+  @rtype: string
+  @return: Name of the wipe job
+
+  """
+  if len(disks) != len(offsets):
+    _Fail("Number of disks and offsets differ")
+
+  args = []
+
+  for (disk, offset) in zip(disks, offsets):
+    try:
+      rdev = _RecursiveFindBD(disk)
+    except errors.BlockDeviceError:
+      rdev = None
+
+    if not rdev:
+      _Fail("Cannot wipe device %s: device not found", disk.iv_name)
+    if offset < 0:
+      _Fail("Negative offset")
+    if offset > rdev.size:
+      _Fail("Wipe offset is bigger than device size")
+
+    args.append("%s:%d:%d:%s" % (rdev.dev_path, offset * 1024 * 1024,
+                                 (rdev.size - offset) * 1024 * 1024,
+                                 ",".join(rdev.GetWipeMethods())))
+
+  status_dir = tempfile.mkdtemp(dir=pathutils.WIPE_DIR,
+                                prefix="wipe-%s-" %
+                                utils.TimestampForFilename())
+  try:
+    cmd = [
+      pathutils.WIPE_DISKS,
+      "--status-file=%s" % utils.PathJoin(status_dir, _WIPE_STATUS_FILE),
+      ] + args
+
+    utils.StartDaemon(cmd, pidfile=utils.PathJoin(status_dir, _WIPE_PID_FILE),
+                      output=utils.PathJoin(status_dir, _WIPE_LOG_FILE))
+
+    return os.path.basename(status_dir)
+
+  except Exception:
+    shutil.rmtree(status_dir, ignore_errors=True)
+    raise
+
+
+def _ReadBlockdevWipeStatus(status_dir):
+  """Reads the status file of a wipe job.
+
+  @type status_dir: string
+  @param status_dir: Status directory of the wipe job
+  @rtype: dict or None
+  @return: Parsed status, C{None} if none has been written yet
+
+  """
+  try:
+    data = utils.ReadFile(utils.PathJoin(status_dir, _WIPE_STATUS_FILE))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      raise
+    return None
+
+  if not data:
+    return None
+
+  return serializer.LoadJson(data)
+
+
+def GetBlockdevWipeStatus(name):
+  """Returns the status of a wipe job.
+
+  @type name: string
+  @param name: Name of the wipe job, as returned by L{StartBlockdevWipe}
+  @rtype: dict or None
+  @return: Progress of every device, see L{ganeti.tools.wipe_disks}; C{None}
+    if no status has been written yet
+
+  """
+  status_dir = utils.PathJoin(pathutils.WIPE_DIR, name)
+
+  if not os.path.isdir(status_dir):
+    _Fail("Unknown wipe job '%s'", name)
+
+  status = _ReadBlockdevWipeStatus(status_dir)
+  if status and status["finished"]:
+    return status
+
+  if not utils.ReadLockedPidFile(utils.PathJoin(status_dir, _WIPE_PID_FILE)):
+    # The job may have written its final status after it was read above
+    status = _ReadBlockdevWipeStatus(status_dir)
+    if status is None:
+      _Fail("Wipe job '%s' exited without reporting its status", name)
+    if not status["finished"]:
+      _Fail("Wipe job '%s' exited before finishing", name)
+
+  return status
+
+
+def CleanupBlockdevWipe(name):
+  """Cleans up after a wipe job.
+
+  If the job is still running it's killed. Afterwards its status directory is
+  removed.
+
+  """
+  logging.info("Cleaning up wipe job %s", name)
+
+  status_dir = utils.PathJoin(pathutils.WIPE_DIR, name)
+
+  pid = utils.ReadLockedPidFile(utils.PathJoin(status_dir, _WIPE_PID_FILE))
+
+  if pid:
+    logging.info("Wipe job %s is still running with PID %s", name, pid)
+    utils.KillProcess(pid, waitpid=False)
+
+  shutil.rmtree(status_dir, ignore_errors=True)
+
+
 def BlockdevImage(disk, image, size):
   """Images a block device either by dumping a local file or
   downloading a URL.
@@ -4516,6 +4828,155 @@ def BlockdevSetInfo(disk, info):
     _Fail("Failed to set information on block device: %s", err, exc=True)
 
 
+def _GetUniqueExportImageName(name, taken):
+  """Returns a name for a base image not conflicting with other files.
+
+  @type name: string
+  @param name: Current file name of the image
+  @type taken: set
+  @param taken: File names already in use
+  @rtype: string
+
+  """
+  for idx in itertools.count(1):
+    candidate = "%s.base%d" % (name, idx)
+    if not (candidate in taken or
+            candidate + constants.EXPORT_CHUNK_MAP_SUFFIX in taken):
+      return candidate
+
+
+def _GetExportBaseImages(snap_disks, destdir, finaldestdir):
+  """Determines the base images of incremental disk images in a new export.
+
+  Disk images written with a chunk map only contain the chunks changed since
+  the image of the previous export, which becomes their base image. The base
+  image and its own chain of base images are taken over from the previous
+  export into the new one. Images whose name is already used in the new
+  export, e.g. because disk images are named after the disk, are renamed.
+
+  Nothing is modified, see L{_LinkExportBaseImages}.
+
+  @type snap_disks: list of L{objects.Disk}
+  @param snap_disks: Exported disks
+  @type destdir: string
+  @param destdir: Directory of the new export
+  @type finaldestdir: string
+  @param finaldestdir: Directory of the previous export
+  @rtype: tuple; (list of lists, list of tuples, list of tuples)
+  @return: File names of the base images for every disk, newest first; files
+    to be linked from the previous export as (source, destination); chunk
+    maps to be written as (path, chunk map)
+
+  """
+  old_config = objects.SerializableConfigParser()
+  old_config.read(utils.PathJoin(finaldestdir, constants.EXPORT_CONF_FILE))
+
+  chains = [[] for _ in snap_disks]
+  incremental = []
+
+  for idx, disk in enumerate(snap_disks):
+    if not disk:
+      continue
+
+    map_file = utils.PathJoin(destdir,
+                              disk.uuid + constants.EXPORT_CHUNK_MAP_SUFFIX)
+    if not os.path.exists(map_file):
+      continue
+
+    cmap = serializer.LoadJson(utils.ReadFile(map_file))
+    if not cmap["unchanged"]:
+      # All chunks were transferred
+      continue
+
+    dump_option = "disk%d_dump" % idx
+    chain_option = "disk%d_chain" % idx
+
+    if not (old_config.has_section(constants.INISECT_INS) and
+            old_config.has_option(constants.INISECT_INS, dump_option)):
+      _Fail("Base image for incremental disk %s not found", idx)
+
+    old_chain = [old_config.get(constants.INISECT_INS, dump_option)]
+    if old_config.has_option(constants.INISECT_INS, chain_option):
+      old_chain.extend(old_config.get(constants.INISECT_INS,
+                                      chain_option).split())
+
+    for name in old_chain:
+      src = utils.PathJoin(finaldestdir, name)
+      if not os.path.isfile(src):
+        _Fail("Base image '%s' for incremental disk %s not found", src, idx)
+
+    incremental.append((idx, map_file, cmap, old_chain))
+
+  # Images of the new export and base images keeping their name
+  existing = frozenset(os.listdir(destdir))
+  taken = set(existing)
+  for (_, _, _, old_chain) in incremental:
+    for name in old_chain:
+      taken.add(name)
+      taken.add(name + constants.EXPORT_CHUNK_MAP_SUFFIX)
+
+  links = []
+  chunk_maps = []
+
+  for (idx, map_file, cmap, old_chain) in incremental:
+    chain = chains[idx]
+
+    for name in old_chain:
+      if (name in existing or
+          name + constants.EXPORT_CHUNK_MAP_SUFFIX in existing):
+        new_name = _GetUniqueExportImageName(name, taken)
+        taken.add(new_name)
+        taken.add(new_name + constants.EXPORT_CHUNK_MAP_SUFFIX)
+      else:
+        new_name = name
+      chain.append(new_name)
+
+    # The newest image refers to the first base image, every base image with
+    # a chunk map to the next one
+    cmap["base"] = chain[0]
+    chunk_maps.append((map_file, cmap))
+
+    for (pos, (name, new_name)) in enumerate(zip(old_chain, chain)):
+      src = utils.PathJoin(finaldestdir, name)
+      links.append((src, utils.PathJoin(destdir, new_name)))
+
+      src_map = src + constants.EXPORT_CHUNK_MAP_SUFFIX
+      if not os.path.exists(src_map):
+        continue
+
+      dest_map = utils.PathJoin(destdir,
+                                new_name + constants.EXPORT_CHUNK_MAP_SUFFIX)
+
+      if pos + 1 < len(chain) and chain[pos + 1] != old_chain[pos + 1]:
+        base_cmap = serializer.LoadJson(utils.ReadFile(src_map))
+        base_cmap["base"] = chain[pos + 1]
+        chunk_maps.append((dest_map, base_cmap))
+      else:
+        links.append((src_map, dest_map))
+
+  return (chains, links, chunk_maps)
+
+
+def _LinkExportBaseImages(links, chunk_maps):
+  """Adds the base images of incremental disk images to a new export.
+
+  The images are hard-linked, so the previous export stays complete until it
+  is replaced by the new one.
+
+  @type links: list of tuples; (string, string)
+  @param links: Files to be linked, as returned by L{_GetExportBaseImages}
+  @type chunk_maps: list of tuples; (string, dict)
+  @param chunk_maps: Chunk maps to be written, as returned by
+    L{_GetExportBaseImages}
+
+  """
+  for (src, dest) in links:
+    os.link(src, dest)
+
+  for (map_file, cmap) in chunk_maps:
+    utils.WriteFile(map_file, data=serializer.DumpJson(cmap), mode=0600)
+
+
 def FinalizeExport(instance, snap_disks):
   """Write out the export configuration information.
 
@@ -4533,6 +4994,9 @@ def FinalizeExport(instance, snap_disks):
   finaldestdir = utils.PathJoin(pathutils.EXPORT_DIR, instance.name)
   disk_template = utils.GetDiskTemplate(snap_disks)
 
+  (chains, links, chunk_maps) = \
+    _GetExportBaseImages(snap_disks, destdir, finaldestdir)
+
   config = objects.SerializableConfigParser()
 
   config.add_section(constants.INISECT_EXP)
@@ -4541,6 +5005,7 @@ def FinalizeExport(instance, snap_disks):
   config.set(constants.INISECT_EXP, "source", instance.primary_node)
   config.set(constants.INISECT_EXP, "os", instance.os)
   config.set(constants.INISECT_EXP, "compression", "none")
+  config.set(constants.INISECT_EXP, "incremental", str(bool(any(chains))))
 
   config.add_section(constants.INISECT_INS)
   config.set(constants.INISECT_INS, "name", instance.name)
@@ -4585,6 +5050,14 @@ def FinalizeExport(instance, snap_disks):
                  ("%d" % disk.size))
       config.set(constants.INISECT_INS, "disk%d_name" % disk_count,
                  "%s" % disk.name)
+      config.set(constants.INISECT_INS, "disk%d_chain" % disk_count,
+                 " ".join(chains[disk_count]))
+      # Images with a chunk map contain raw disk data even if the instance has
+      # an OS, see L{ganeti.masterd.instance.ExportInstanceHelper.LocalExport}
+      raw = (not instance.os or
+             os.path.exists(utils.PathJoin(destdir, disk.uuid +
+                                           constants.EXPORT_CHUNK_MAP_SUFFIX)))
+      config.set(constants.INISECT_INS, "disk%d_raw" % disk_count, str(raw))
 
   config.set(constants.INISECT_INS, "disk_count", "%d" % disk_total)
 
@@ -4609,6 +5082,9 @@ def FinalizeExport(instance, snap_disks):
 
   utils.WriteFile(utils.PathJoin(destdir, constants.EXPORT_CONF_FILE),
                   data=config.Dumps())
+  # The previous export isn't modified before it's replaced, in case
+  # finalizing the new one fails
+  _LinkExportBaseImages(links, chunk_maps)
   shutil.rmtree(finaldestdir, ignore_errors=True)
   shutil.move(destdir, finaldestdir)
 
@@ -4636,6 +5112,31 @@ def ExportInfo(dest):
   return config.Dumps()
 
 
+def GetExportChunkMap(export, image):
+  """Returns the chunk map of a disk image in an export.
+
+  @type export: string
+  @param export: Name of the export
+  @type image: string
+  @param image: File name of the disk image
+  @rtype: dict or None
+  @return: Chunk map as written by L{ganeti.tools.sparse_copy}, C{None} if the
+    image doesn't have one
+
+  """
+  path = utils.PathJoin(pathutils.EXPORT_DIR, export,
+                        image + constants.EXPORT_CHUNK_MAP_SUFFIX)
+
+  try:
+    data = utils.ReadFile(path)
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      raise
+    return None
+
+  return serializer.LoadJson(data)
+
+
 def ListExports():
   """Return a list of exports currently available on this machine.
 
@@ -5182,7 +5683,9 @@ def RemoveX509Certificate(name, cryptodir=pathutils.CRYPTO_KEYS_DIR):
           cert_dir, err)
 
 
-def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
+def _GetImportExportIoCommand(instance, mode, ieio, ieargs, sparse=False,
+                              checkpoint_file=None, resume_digest=None,
+                              chunk_size=None, base_chunk_map_file=None):
   """Returns the command for the requested input/output.
 
   @type instance: L{objects.Instance}
@@ -5190,6 +5693,21 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
   @param mode: Import/export mode
   @param ieio: Input/output type
   @param ieargs: Input/output arguments
+  @type sparse: bool
+  @param sparse: Whether to transfer files and raw disks as sparse stream,
+    see L{ganeti.tools.sparse_copy}
+  @type checkpoint_file: string or None
+  @param checkpoint_file: File in which sparse raw disk imports record
+    verified checkpoints
+  @type resume_digest: string or None
+  @param resume_digest: Digest of the checkpoint a sparse raw disk transfer
+    is resumed from
+  @type chunk_size: int or None
+  @param chunk_size: Chunk size in bytes for recording chunk digests when
+    exporting a raw disk to a file, see L{ganeti.tools.sparse_copy}
+  @type base_chunk_map_file: string or None
+  @param base_chunk_map_file: Chunk map of the previous export of a raw disk,
+    unchanged chunks are not transferred
 
   """
   assert mode in (constants.IEM_IMPORT, constants.IEM_EXPORT)
@@ -5217,11 +5735,33 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
 
     quoted_filename = utils.ShellQuote(filename)
 
-    if mode == constants.IEM_IMPORT:
+    # Incremental images only contain the chunks changed since their base
+    # image, the rest has to be read from the chain of base images
+    incremental = (mode == constants.IEM_EXPORT and
+                   os.path.exists(filename +
+                                  constants.EXPORT_CHUNK_MAP_SUFFIX))
+
+    if sparse and mode == constants.IEM_IMPORT:
+      import_cmd = [pathutils.SPARSE_COPY, constants.IEM_IMPORT, "--truncate",
+                    filename]
+      if chunk_size:
+        import_cmd.append("--chunk-map")
+      suffix = "| %s" % utils.ShellQuoteArgs(import_cmd)
+    elif incremental:
+      export_cmd = [pathutils.SPARSE_COPY, constants.IEM_EXPORT, "--chain",
+                    filename]
+      if not sparse:
+        export_cmd.append("--raw")
+      prefix = "%s |" % utils.ShellQuoteArgs(export_cmd)
+    elif sparse and mode == constants.IEM_EXPORT:
+      prefix = "%s |" % utils.ShellQuoteArgs([pathutils.SPARSE_COPY,
+                                              constants.IEM_EXPORT, filename])
+    elif mode == constants.IEM_IMPORT:
       suffix = "> %s" % quoted_filename
     elif mode == constants.IEM_EXPORT:
       suffix = "< %s" % quoted_filename
 
+    if mode == constants.IEM_EXPORT:
       # Retrieve file size
       try:
         st = os.stat(filename)
@@ -5231,10 +5771,55 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
         exp_size = utils.BytesToMebibyte(st.st_size)
 
   elif ieio == constants.IEIO_RAW_DISK:
-    (disk, ) = ieargs
+    disk = ieargs[0]
     real_disk = _OpenRealBD(disk)
 
-    if mode == constants.IEM_IMPORT:
+    if len(ieargs) > 1:
+      # Only a byte range of the device is transferred by this stream
+      (offset, size) = ieargs[1]
+
+      if (offset < 0 or size <= 0 or offset + size > disk.size):
+        _Fail("Invalid segment (offset %s, size %s) for disk of size %s",
+              offset, size, disk.size)
+    else:
+      (offset, size) = (0, disk.size)
+
+    if sparse:
+      checkpoint_args = []
+      if resume_digest:
+        checkpoint_args.append("--resume-digest=%s" % resume_digest)
+
+      if mode == constants.IEM_IMPORT:
+        if checkpoint_file:
+          checkpoint_args.append("--checkpoint-file=%s" % checkpoint_file)
+        suffix = "| %s" % \
+          utils.ShellQuoteArgs(real_disk.SparseImport(offset, size) +
+                               checkpoint_args)
+
+      elif mode == constants.IEM_EXPORT:
+        checkpoint_args.append("--checkpoint-size=%s" %
+                               (constants.DISK_TRANSFER_CHECKPOINT_SIZE *
+                                constants.DD_BLOCK_SIZE))
+        if chunk_size:
+          checkpoint_args.append("--chunk-size=%s" % chunk_size)
+        if base_chunk_map_file:
+          checkpoint_args.append("--base-chunk-map=%s" % base_chunk_map_file)
+        prefix = "%s |" % \
+          utils.ShellQuoteArgs(real_disk.SparseExport(offset, size) +
+                               checkpoint_args)
+        exp_size = size
+
+    elif len(ieargs) > 1:
+      if mode == constants.IEM_IMPORT:
+        suffix = "| %s" % \
+          utils.ShellQuoteArgs(real_disk.ImportSegment(offset, size))
+
+      elif mode == constants.IEM_EXPORT:
+        prefix = "%s |" % \
+          utils.ShellQuoteArgs(real_disk.ExportSegment(offset, size))
+        exp_size = size
+
+    elif mode == constants.IEM_IMPORT:
       suffix = "| %s" % utils.ShellQuoteArgs(real_disk.Import())
 
     elif mode == constants.IEM_EXPORT:
@@ -5345,9 +5930,6 @@ def StartImportExportDaemon(mode, opts, host, port, instance, component,
   if (opts.key_name is None) ^ (opts.ca_pem is None):
     _Fail("Cluster certificate can only be used for both key and CA")
 
-  (cmd_env, cmd_prefix, cmd_suffix, exp_size) = \
-    _GetImportExportIoCommand(instance, mode, ieio, ieioargs)
-
   if opts.key_name is None:
     # Use server.pem
     key_path = pathutils.NODED_CERT_FILE
@@ -5367,6 +5949,24 @@ def StartImportExportDaemon(mode, opts, host, port, instance, component,
     status_file = utils.PathJoin(status_dir, _IES_STATUS_FILE)
     pid_file = utils.PathJoin(status_dir, _IES_PID_FILE)
     ca_file = utils.PathJoin(status_dir, _IES_CA_FILE)
+    checkpoint_file = utils.PathJoin(status_dir, _IES_CHECKPOINT_FILE)
+
+    if opts.base_chunk_map:
+      base_chunk_map_file = utils.PathJoin(status_dir,
+                                           _IES_BASE_CHUNK_MAP_FILE)
+      utils.WriteFile(base_chunk_map_file,
+                      data=serializer.DumpJson(opts.base_chunk_map),
+                      mode=0400)
+    else:
+      base_chunk_map_file = None
+
+    (cmd_env, cmd_prefix, cmd_suffix, exp_size) = \
+      _GetImportExportIoCommand(instance, mode, ieio, ieioargs,
+                                sparse=bool(opts.sparse),
+                                checkpoint_file=checkpoint_file,
+                                resume_digest=opts.resume_digest,
+                                chunk_size=opts.chunk_size,
+                                base_chunk_map_file=base_chunk_map_file)
 
     if opts.ca_pem is None:
       # Use server.pem
@@ -5411,6 +6011,9 @@ def StartImportExportDaemon(mode, opts, host, port, instance, component,
     if cmd_suffix:
       cmd.append("--cmd-suffix=%s" % cmd_suffix)
 
+    if mode == constants.IEM_IMPORT and opts.sparse:
+      cmd.append("--checkpoint-file=%s" % checkpoint_file)
+
     if mode == constants.IEM_EXPORT:
       # Retry connection a few times when connecting to remote peer
       cmd.append("--connect-retries=%s" % constants.RIE_CONNECT_RETRIES)
@@ -5467,6 +6070,43 @@ def GetImportExportStatus(names):
   return result
 
 
+def WaitImportExportStatus(daemons, timeout, _status_fn=GetImportExportStatus,
+                           _time_fn=time.time, _sleep_fn=time.sleep):
+  """Waits for the status of import/export daemons to change.
+
+  Returns as soon as the status of at least one daemon differs from what the
+  caller has seen already, or when the timeout is reached. This allows the
+  master to react to daemon state changes without polling at a fixed
+  interval.
+
+  @type daemons: list of tuples; (string, number or None)
+  @param daemons: Daemon names and the modification time of the status last
+    seen by the caller (C{None} if no status has been seen yet)
+  @type timeout: number
+  @param timeout: Maximum number of seconds to wait
+  @rtype: List of dicts
+  @return: See L{GetImportExportStatus}
+
+  """
+  names = [name for (name, _) in daemons]
+  known = [mtime for (_, mtime) in daemons]
+
+  deadline = _time_fn() + max(0, min(timeout, _IES_MAX_WAIT))
+
+  while True:
+    result = _status_fn(names)
+
+    current = [status.get("mtime") if status else None for status in result]
+    if current != known:
+      return result
+
+    remaining = deadline - _time_fn()
+    if remaining <= 0:
+      return result
+
+    _sleep_fn(min(_IES_WAIT_INTERVAL, remaining))
+
+
 def AbortImportExport(name):
   """Sends SIGTERM to a running import/export daemon.
 
@@ -5959,19 +6599,65 @@ class HooksRunner(object):
   on the master side.
 
   """
-  def __init__(self, hooks_base_dir=None):
+  def __init__(self, hooks_base_dir=None, parallel_file=None):
     """Constructor for hooks runner.
 
     @type hooks_base_dir: str or None
     @param hooks_base_dir: if not None, this overrides the
         L{pathutils.HOOKS_BASE_DIR} (useful for unittests)
+    @type parallel_file: str or None
+    @param parallel_file: if not None, this overrides the
+        L{pathutils.HOOKS_PARALLEL_FILE} (useful for unittests)
 
     """
     if hooks_base_dir is None:
       hooks_base_dir = pathutils.HOOKS_BASE_DIR
+    if parallel_file is None:
+      parallel_file = pathutils.HOOKS_PARALLEL_FILE
     # yeah, _BASE_DIR is not valid for attributes, we use it like a
     # constant
     self._BASE_DIR = hooks_base_dir # pylint: disable=C0103
+    self._parallel_file = parallel_file
+
+  def _ReadParallelConfig(self):
+    """Reads the settings for running hooks concurrently.
+
+    @rtype: tuple
+    @return: (maximum number of concurrently run scripts, script timeout in
+        seconds or None)
+
+    """
+    settings = {
+      "max-workers": 1,
+      "timeout": None,
+      }
+
+    try:
+      data = utils.ReadFile(self._parallel_file)
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        logging.warning("Can't read %s: %s", self._parallel_file, err)
+      data = ""
+
+    for line in data.splitlines():
+      line = line.strip()
+      if not line or line.startswith("#"):
+        continue
+      (key, _, value) = line.partition("=")
+      key = key.strip()
+      try:
+        if key not in settings:
+          raise ValueError("unknown setting '%s'" % key)
+        value = int(value)
+        if value < 1:
+          raise ValueError("value must be positive")
+      except ValueError, err:
+        logging.warning("Ignoring invalid line '%s' in %s: %s", line,
+                        self._parallel_file, err)
+      else:
+        settings[key] = value
+
+    return (settings["max-workers"], settings["timeout"])
 
   def RunLocalHooks(self, node_list, hpath, phase, env):
     """Check that the hooks will be run only locally and then run them.
@@ -5998,11 +6684,12 @@ class HooksRunner(object):
     @type env: dict
     @param env: dictionary with the environment for the hook
     @rtype: list
-    @return: list of 3-element tuples:
+    @return: list of 4-element tuples:
       - script path
       - script result, either L{constants.HKR_SUCCESS} or
         L{constants.HKR_FAIL}
       - output of the script
+      - run time of the script in seconds
 
     @raise errors.ProgrammerError: for invalid input
         parameters
@@ -6025,7 +6712,11 @@ class HooksRunner(object):
       # warning at every operation
       return results
 
-    runparts_results = utils.RunParts(dir_name, env=env, reset_env=True)
+    (max_workers, timeout) = self._ReadParallelConfig()
+    durations = {}
+    runparts_results = utils.RunParts(dir_name, env=env, reset_env=True,
+                                      max_workers=max_workers,
+                                      timeout=timeout, durations=durations)
 
     for (relname, relstatus, runresult) in runparts_results:
       if relstatus == constants.RUNPARTS_SKIP:
@@ -6039,8 +6730,12 @@ class HooksRunner(object):
           rrval = constants.HKR_FAIL
         else:
           rrval = constants.HKR_SUCCESS
-        output = utils.SafeEncode(runresult.output.strip())
-      results.append(("%s/%s" % (subdir, relname), rrval, output))
+        output = runresult.output.strip()
+        if runresult.failed_by_timeout:
+          output = "\n".join(filter(None, [output, runresult.fail_reason]))
+        output = utils.SafeEncode(output)
+      results.append(("%s/%s" % (subdir, relname), rrval, output,
+                      durations.get(relname, 0.0)))
 
     return results
 
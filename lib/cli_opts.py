@@ -142,6 +142,7 @@ __all__ = [
   "IPOLICY_VCPU_RATIO",
   "IPOLICY_MEMORY_RATIO",
   "LONG_SLEEP_OPT",
+  "INCREMENTAL_EXPORT_OPT",
   "MAC_PREFIX_OPT",
   "MAINT_BALANCE_OPT",
   "MAINT_BALANCE_THRESHOLD_OPT",
@@ -1683,6 +1684,11 @@ LONG_SLEEP_OPT = cli_option(
     "--long-sleep", default=False, dest="long_sleep",
     help="Allow long shutdowns when backing up instances", action="store_true")
 
+INCREMENTAL_EXPORT_OPT = cli_option(
+    "--incremental", default=False, dest="incremental",
+    help="Only transfer disk data changed since the previous export",
+    action="store_true")
+
 INPUT_OPT = cli_option("--input", dest="input", default=None,
                        help=("input to be passed as stdin"
                              " to the repair command"),
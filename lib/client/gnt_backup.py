@@ -110,7 +110,8 @@ def ExportInstance(opts, args):
     zero_free_space=opts.zero_free_space,
     zeroing_timeout_fixed=opts.zeroing_timeout_fixed,
     zeroing_timeout_per_mib=opts.zeroing_timeout_per_mib,
-    long_sleep=opts.long_sleep
+    long_sleep=opts.long_sleep,
+    incremental=opts.incremental
   )
 
   SubmitOrSend(op, opts)
@@ -170,7 +171,8 @@ commands = {
     [FORCE_OPT, SINGLE_NODE_OPT, TRANSPORT_COMPRESSION_OPT, NOSHUTDOWN_OPT,
      SHUTDOWN_TIMEOUT_OPT, REMOVE_INSTANCE_OPT, IGNORE_REMOVE_FAILURES_OPT,
      DRY_RUN_OPT, PRIORITY_OPT, ZERO_FREE_SPACE_OPT, ZEROING_TIMEOUT_FIXED_OPT,
-     ZEROING_TIMEOUT_PER_MIB_OPT, LONG_SLEEP_OPT] + SUBMIT_OPTS,
+     ZEROING_TIMEOUT_PER_MIB_OPT, LONG_SLEEP_OPT,
+     INCREMENTAL_EXPORT_OPT] + SUBMIT_OPTS,
     "-n <target_node> [opts...] <name>",
     "Exports an instance to an image"),
   "import": (
@@ -132,6 +132,10 @@ class LUBackupExport(LogicalUnit):
       raise errors.OpPrereqError("Unless the instance is shut down, zeroing "
                                  "cannot be used.")
 
+    if self.op.incremental and self.op.mode != constants.EXPORT_MODE_LOCAL:
+      raise errors.OpPrereqError("Incremental exports are only supported for"
+                                 " local exports", errors.ECODE_INVAL)
+
   def ExpandNames(self):
     self._ExpandAndLockInstance()
 
@@ -468,7 +472,8 @@ class LUBackupExport(LogicalUnit):
           self.StartInstance(feedback_fn, src_node_uuid)
         if self.op.mode == constants.EXPORT_MODE_LOCAL:
           (fin_resu, dresults) = helper.LocalExport(self.dst_node,
-                                                    self.op.compress)
+                                                    self.op.compress,
+                                                    self.op.incremental)
         elif self.op.mode == constants.EXPORT_MODE_REMOTE:
           connect_timeout = constants.RIE_CONNECT_TIMEOUT
           timeouts = masterd.instance.ImportExportTimeouts(connect_timeout)
@@ -639,6 +639,30 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
                   "Node time diverges by at least %s from master node time",
                   ntime_diff)
 
+  def _VerifyNodeCheckStats(self, ninfo, nresult):
+    """Check the outcome and duration of the node-side verify checks.
+
+    @type ninfo: L{objects.Node}
+    @param ninfo: the node to check
+    @param nresult: the remote results for the node
+
+    """
+    check_stats = nresult.get(constants.NV_CHECK_STATS, {})
+    for name, (status, duration) in sorted(check_stats.items()):
+      if status == utils.TASK_TIMEOUT:
+        self._ErrorIf(True, constants.CV_ENODERPC, ninfo.name,
+                      "verify check '%s' timed out after %.1fs, its results"
+                      " are missing", name, duration)
+      elif status == utils.TASK_FAILED:
+        self._ErrorIf(True, constants.CV_ENODERPC, ninfo.name,
+                      "verify check '%s' failed after %.1fs, see the node"
+                      " daemon log for details", name, duration)
+      else:
+        self._ErrorIf(duration > constants.NODE_VERIFY_SLOW_CHECK,
+                      constants.CV_ENODERPC, ninfo.name,
+                      "verify check '%s' took %.1fs", name, duration,
+                      code=self.ETYPE_WARNING)
+
   def _UpdateVerifyNodeLVM(self, ninfo, nresult, vg_name, nimg):
     """Check the node LVM results and update info for cross-node checks.
 
@@ -1147,6 +1171,50 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
           self._ErrorIf(result,
                         constants.CV_ENODESSH, None, error_msg)
 
+  def _FetchFileFingerprints(self, all_nvinfo, files):
+    """Fetches per-file checksums from nodes which returned a digest.
+
+    Nodes reporting the same aggregate fingerprint have the same files with
+    the same checksums, so the checksums are only fetched from one node of
+    each such group and copied to the results of the others.
+
+    @param all_nvinfo: RPC results, updated in place
+    @type files: list of string
+    @param files: the virtual paths of the files to verify
+
+    """
+    nodes_by_digest = {}
+    for (node_uuid, nresult) in all_nvinfo.items():
+      if nresult.fail_msg or not nresult.payload:
+        continue
+      digest = nresult.payload.get(constants.NV_FILE_DIGEST, None)
+      if digest is not None:
+        nodes_by_digest.setdefault(digest, []).append(node_uuid)
+
+    while nodes_by_digest:
+      chosen = dict((digest, node_uuids.pop(0))
+                    for (digest, node_uuids) in nodes_by_digest.items())
+      fileinfo = self.rpc.call_node_verify(chosen.values(),
+                                           {constants.NV_FILELIST: files},
+                                           self.cfg.GetClusterName(),
+                                           self.cfg.GetClusterInfo().hvparams)
+
+      for (digest, node_uuid) in chosen.items():
+        nresult = fileinfo[node_uuid]
+        if nresult.fail_msg or not nresult.payload:
+          fingerprints = None
+        else:
+          fingerprints = nresult.payload.get(constants.NV_FILELIST, None)
+
+        if not isinstance(fingerprints, dict):
+          # Try another node with the same digest, if any
+          if not nodes_by_digest[digest]:
+            del nodes_by_digest[digest]
+          continue
+
+        for other_uuid in [node_uuid] + nodes_by_digest.pop(digest):
+          all_nvinfo[other_uuid].payload[constants.NV_FILELIST] = fingerprints
+
   def _VerifyFiles(self, nodes, master_node_uuid, all_nvinfo,
                    (files_all, files_opt, files_mc, files_vm)):
     """Verifies file checksums collected from all nodes.
@@ -1942,7 +2010,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
     node_nettest_params = (online_nodes, online_master_candidates)
 
     node_verify_param = {
-      constants.NV_FILELIST:
+      constants.NV_FILE_DIGEST:
         [vcluster.MakeVirtualPath(f)
          for f in utils.UniqueSequence(filename
                                        for files in filemap
@@ -2126,7 +2194,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
             additional_node_uuids.append(node_uuid)
             vf_node_info.append(self.all_node_info[node_uuid])
             break
-        key = constants.NV_FILELIST
+        key = constants.NV_FILE_DIGEST
 
         feedback_fn("* Gathering information about the master node")
         vf_nvinfo.update(self.rpc.call_node_verify(
@@ -2136,6 +2204,10 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
         vf_nvinfo = all_nvinfo
         vf_node_info = self.my_node_info.values()
 
+      feedback_fn("* Gathering file checksums")
+      self._FetchFileFingerprints(vf_nvinfo,
+                                  node_verify_param[constants.NV_FILE_DIGEST])
+
     all_drbd_map = self.cfg.ComputeDRBDMap()
 
     feedback_fn("* Gathering disk information (%s nodes)" %
@@ -2186,6 +2258,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
 
       nimg.call_ok = self._VerifyNode(node_i, nresult)
       self._VerifyNodeTime(node_i, nresult, nvinfo_starttime, nvinfo_endtime)
+      self._VerifyNodeCheckStats(node_i, nresult)
       self._VerifyNodeNetwork(node_i, nresult)
       self._VerifyNodeUserScripts(node_i, nresult)
       self._VerifyOob(node_i, nresult)
@@ -2313,7 +2386,8 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
         if res.offline:
           # No need to investigate payload if node is offline
           continue
-        for script, hkr, output in res.payload:
+        for hook_result in res.payload:
+          (script, hkr, output) = hook_result[:3]
           test = hkr == constants.HKR_FAIL
           self._ErrorIf(test, constants.CV_ENODEHOOKS, node_name,
                         "Script %s failed, output:", script)
@@ -507,9 +507,10 @@ class LUInstanceMove(LogicalUnit):
                                  (",".join(errs),))
 
     self.instance.primary_node = target_node.uuid
-    self.cfg.Update(self.instance, feedback_fn)
-    for disk in disks:
-      self.cfg.SetDiskNodes(disk.uuid, [target_node.uuid])
+    with self.cfg.GetConfigTransaction():
+      self.cfg.Update(self.instance, feedback_fn)
+      for disk in disks:
+        self.cfg.SetDiskNodes(disk.uuid, [target_node.uuid])
 
     self.LogInfo("Removing the disks on the original node")
     RemoveDisks(self, self.instance, target_node_uuid=source_node.uuid)
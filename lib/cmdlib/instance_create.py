@@ -833,6 +833,7 @@ class LUInstanceCreate(LogicalUnit):
 
     if self.op.mode == constants.INSTANCE_IMPORT:
       disk_images = []
+      raw_images = []
       for idx in range(len(self.disks)):
         option = "disk%d_dump" % idx
         if export_info.has_option(constants.INISECT_INS, option):
@@ -843,7 +844,15 @@ class LUInstanceCreate(LogicalUnit):
         else:
           disk_images.append(False)
 
+        # Images of incremental exports contain the raw disk instead of the
+        # output of the OS export script
+        raw_option = "disk%d_raw" % idx
+        raw_images.append(
+          export_info.has_option(constants.INISECT_INS, raw_option) and
+          export_info.getboolean(constants.INISECT_INS, raw_option))
+
       self.src_images = disk_images
+      self.src_raw_images = raw_images
 
       if self.op.instance_name == self._old_instance_name:
         for idx, nic in enumerate(self.nics):
@@ -868,9 +877,15 @@ class LUInstanceCreate(LogicalUnit):
     # sure it will be when we actually add the instance. If things go bad
     # adding the instance will abort because of a duplicate mac, and the
     # creation job will fail.
+    # MACs are generated in one request per network.
+    generate_mac_nics = {}
     for nic in self.nics:
       if nic.mac in (constants.VALUE_AUTO, constants.VALUE_GENERATE):
-        nic.mac = self.cfg.GenerateMAC(nic.network, self.proc.GetECId())
+        generate_mac_nics.setdefault(nic.network, []).append(nic)
+    for (net_uuid, nics) in generate_mac_nics.items():
+      macs = self.cfg.GenerateMACs(net_uuid, len(nics), self.proc.GetECId())
+      for (nic, mac) in zip(nics, macs):
+        nic.mac = mac
 
     #### allocator run
 
@@ -914,7 +929,15 @@ class LUInstanceCreate(LogicalUnit):
     self.secondaries = []
 
     # Fill in any IPs from IP pools. This must happen here, because we need to
-    # know the nic's primary node, as specified by the iallocator
+    # know the nic's primary node, as specified by the iallocator. All IPs
+    # needed from a network's pool are generated in one request.
+    pool_ip_count = {}
+    for nic in self.nics:
+      if (nic.network is not None and nic.ip is not None and
+          nic.ip.lower() == constants.NIC_IP_POOL):
+        pool_ip_count[nic.network] = pool_ip_count.get(nic.network, 0) + 1
+    pool_ips = {}
+
     for idx, nic in enumerate(self.nics):
       net_uuid = nic.network
       if net_uuid is not None:
@@ -931,12 +954,16 @@ class LUInstanceCreate(LogicalUnit):
         nic.nicparams = dict(netparams)
         if nic.ip is not None:
           if nic.ip.lower() == constants.NIC_IP_POOL:
-            try:
-              nic.ip = self.cfg.GenerateIp(net_uuid, self.proc.GetECId())
-            except errors.ReservationError:
-              raise errors.OpPrereqError("Unable to get a free IP for NIC %d"
-                                         " from the address pool" % idx,
-                                         errors.ECODE_STATE)
+            if net_uuid not in pool_ips:
+              try:
+                pool_ips[net_uuid] = \
+                  self.cfg.GenerateIps(net_uuid, pool_ip_count[net_uuid],
+                                       self.proc.GetECId())
+              except errors.ReservationError:
+                raise errors.OpPrereqError("Unable to get a free IP for NIC %d"
+                                           " from the address pool" % idx,
+                                           errors.ECODE_STATE)
+            nic.ip = pool_ips[net_uuid].pop(0)
             self.LogInfo("Chose IP %s from network %s", nic.ip, nobj.name)
           else:
             try:
@@ -1007,14 +1034,14 @@ class LUInstanceCreate(LogicalUnit):
       if len(all_lvs) != len(self.disks):
         raise errors.OpPrereqError("Duplicate volume names given for adoption",
                                    errors.ECODE_INVAL)
-      for lv_name in all_lvs:
-        try:
-          # FIXME: lv_name here is "vg/lv" need to ensure that other calls
-          # to ReserveLV uses the same syntax
-          self.cfg.ReserveLV(lv_name, self.proc.GetECId())
-        except errors.ReservationError:
-          raise errors.OpPrereqError("LV named %s used by another instance" %
-                                     lv_name, errors.ECODE_NOTUNIQUE)
+      try:
+        # FIXME: lv_name here is "vg/lv" need to ensure that other calls
+        # to ReserveLV uses the same syntax
+        self.cfg.ReserveLVs(sorted(all_lvs), self.proc.GetECId())
+      except errors.ReservationError:
+        raise errors.OpPrereqError("One of the LVs %s is used by another"
+                                   " instance" % utils.CommaJoin(sorted(all_lvs)),
+                                   errors.ECODE_NOTUNIQUE)
 
       vg_names = self.rpc.call_vg_list([pnode.uuid])[pnode.uuid]
       vg_names.Raise("Cannot get VG information from node %s" % pnode.name,
@@ -1250,7 +1277,7 @@ class LUInstanceCreate(LogicalUnit):
           if not image:
             continue
 
-          if iobj.os:
+          if iobj.os and not self.src_raw_images[idx]:
             dst_io = constants.IEIO_SCRIPT
             dst_ioargs = ((disks[idx], iobj), idx)
           else:
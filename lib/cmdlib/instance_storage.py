@@ -66,6 +66,9 @@ _DISK_TEMPLATE_NAME_PREFIX = {
   constants.DT_SHARED_FILE: ".sharedfile",
   }
 
+#: Seconds between two queries of the progress of a wipe job
+_WIPE_POLL_INTERVAL = 5.0
+
 
 def CreateSingleBlockDev(lu, node_uuid, instance, device, info, force_open,
                          excl_stor):
@@ -541,13 +544,17 @@ def CheckRADOSFreeSpace():
 
 
 def _GenerateDRBD8Branch(lu, primary_uuid, secondary_uuid, size, vgnames, names,
-                         iv_name, forthcoming=False):
+                         iv_name, shared_secret, drbd_uuid, minors,
+                         forthcoming=False):
   """Generate a drbd8 device complete with its children.
 
+  The DRBD secret, UUID and minors are passed in, so that they can be reserved
+  for all disks of an instance at once.
+
   """
   assert len(vgnames) == len(names) == 2
+  assert len(minors) == 2
   port = lu.cfg.AllocatePort()
-  shared_secret = lu.cfg.GenerateDRBDSecret(lu.proc.GetECId())
 
   dev_data = objects.Disk(dev_type=constants.DT_PLAIN, size=size,
                           logical_id=(vgnames[0], names[0]),
@@ -561,9 +568,6 @@ def _GenerateDRBD8Branch(lu, primary_uuid, secondary_uuid, size, vgnames, names,
                           params={}, forthcoming=forthcoming)
   dev_meta.uuid = lu.cfg.GenerateUniqueID(lu.proc.GetECId())
 
-  drbd_uuid = lu.cfg.GenerateUniqueID(lu.proc.GetECId())
-  minors = lu.cfg.AllocateDRBDMinor([primary_uuid, secondary_uuid], drbd_uuid)
-  assert len(minors) == 2
   drbd_dev = objects.Disk(dev_type=constants.DT_DRBD8, size=size,
                           logical_id=(primary_uuid, secondary_uuid, port,
                                       minors[0], minors[1],
@@ -605,6 +609,15 @@ def GenerateDiskTemplate(
                                                for i in range(disk_count)]):
       names.append(lv_prefix + "_data")
       names.append(lv_prefix + "_meta")
+
+    # Reserve secrets and minors for all disks at once
+    secrets = lu.cfg.GenerateDRBDSecrets(disk_count, lu.proc.GetECId())
+    drbd_uuids = [lu.cfg.GenerateUniqueID(lu.proc.GetECId())
+                  for _ in disk_info]
+    all_minors = lu.cfg.AllocateDRBDMinors([([primary_node_uuid,
+                                              remote_node_uuid], drbd_uuid)
+                                            for drbd_uuid in drbd_uuids])
+
     for idx, disk in enumerate(disk_info):
       disk_index = idx + base_index
       data_vg = disk.get(constants.IDISK_VG, vgname)
@@ -614,6 +627,8 @@ def GenerateDiskTemplate(
                                       [data_vg, meta_vg],
                                       names[idx * 2:idx * 2 + 2],
                                       "disk/%d" % disk_index,
+                                      secrets[idx], drbd_uuids[idx],
+                                      all_minors[idx],
                                       forthcoming=forthcoming)
       disk_dev.mode = disk[constants.IDISK_MODE]
       disk_dev.name = disk.get(constants.IDISK_NAME, None)
@@ -1059,25 +1074,26 @@ class LUInstanceRecreateDisks(LogicalUnit):
 
     # now that we have passed all asserts above, we can apply the mods
     # in a single run (to avoid partial changes)
-    for idx, new_id, changes in mods:
-      disk = inst_disks[idx]
-      if new_id is not None:
-        assert disk.dev_type == constants.DT_DRBD8
-        disk.logical_id = new_id
-      if changes:
-        disk.Update(size=changes.get(constants.IDISK_SIZE, None),
-                    mode=changes.get(constants.IDISK_MODE, None),
-                    spindles=changes.get(constants.IDISK_SPINDLES, None))
-      self.cfg.Update(disk, feedback_fn)
-
-    # change primary node, if needed
-    if self.op.node_uuids:
-      self.LogWarning("Changing the instance's nodes, you will have to"
-                      " remove any disks left on the older nodes manually")
-      self.instance.primary_node = self.op.node_uuids[0]
-      self.cfg.Update(self.instance, feedback_fn)
-      for disk in inst_disks:
-        self.cfg.SetDiskNodes(disk.uuid, self.op.node_uuids)
+    with self.cfg.GetConfigTransaction():
+      for idx, new_id, changes in mods:
+        disk = inst_disks[idx]
+        if new_id is not None:
+          assert disk.dev_type == constants.DT_DRBD8
+          disk.logical_id = new_id
+        if changes:
+          disk.Update(size=changes.get(constants.IDISK_SIZE, None),
+                      mode=changes.get(constants.IDISK_MODE, None),
+                      spindles=changes.get(constants.IDISK_SPINDLES, None))
+        self.cfg.Update(disk, feedback_fn)
+
+      # change primary node, if needed
+      if self.op.node_uuids:
+        self.LogWarning("Changing the instance's nodes, you will have to"
+                        " remove any disks left on the older nodes manually")
+        self.instance.primary_node = self.op.node_uuids[0]
+        self.cfg.Update(self.instance, feedback_fn)
+        for disk in inst_disks:
+          self.cfg.SetDiskNodes(disk.uuid, self.op.node_uuids)
 
     # All touched nodes must be locked
     mylocks = self.owned_locks(locking.LEVEL_NODE)
@@ -1231,9 +1247,66 @@ def _CalcEta(time_taken, written, total_size):
   return (total_size - written) * avg_time
 
 
-def WipeDisks(lu, instance, disks=None):
+def _WaitForWipe(lu, node_uuid, name, indices, sleep_fn):
+  """Monitors a wipe job on a node until it is finished.
+
+  @type name: string
+  @param name: Name of the wipe job
+  @type indices: list of int
+  @param indices: Indices of the disks wiped by the job, in the order they
+    were passed to it
+  @raise errors.OpExecError: if wiping one of the disks failed
+
+  """
+  node_name = lu.cfg.GetNodeName(node_uuid)
+  start_time = time.time()
+  last_output = start_time
+
+  while True:
+    result = lu.rpc.call_blockdev_wipe_status(node_uuid, name)
+    result.Raise("Could not query wipe progress on node '%s'" % node_name)
+
+    status = result.payload
+
+    if status is not None:
+      devices = status["devices"]
+
+      for (idx, device) in zip(indices, devices):
+        if device["error"]:
+          raise errors.OpExecError("Could not wipe disk %d: %s" %
+                                   (idx, device["error"]))
+
+      if status["finished"]:
+        if len(devices) != len(indices):
+          raise errors.OpExecError("Wipe job reported %s devices instead of"
+                                   " %s" % (len(devices), len(indices)))
+
+        for (idx, device) in zip(indices, devices):
+          if device["done"] != device["size"]:
+            raise errors.OpExecError("Wiping disk %d stopped after %s of %s"
+                                     " bytes" % (idx, device["done"],
+                                                 device["size"]))
+        break
+
+      done = sum(device["done"] for device in devices)
+      size = sum(device["size"] for device in devices)
+      now = time.time()
+
+      if done and size and now - last_output >= 60:
+        eta = _CalcEta(now - start_time, done, size)
+        lu.LogInfo(" - done: %.1f%% ETA: %s",
+                   done / float(size) * 100, utils.FormatSeconds(eta))
+        last_output = now
+
+    sleep_fn(_WIPE_POLL_INTERVAL)
+
+
+def WipeDisks(lu, instance, disks=None, _sleep_fn=time.sleep):
   """Wipes instance disks.
 
+  All disks are wiped concurrently by a job on the primary node, which is
+  only monitored from here.
+
   @type lu: L{LogicalUnit}
   @param lu: the logical unit on whose behalf we execute
   @type instance: L{objects.Instance}
@@ -1266,47 +1339,35 @@ def WipeDisks(lu, instance, disks=None):
 
   try:
     for (idx, device, offset) in disks:
-      # The wipe size is MIN_WIPE_CHUNK_PERCENT % of the instance disk but
-      # MAX_WIPE_CHUNK at max. Truncating to integer to avoid rounding errors.
-      wipe_chunk_size = \
-        int(min(constants.MAX_WIPE_CHUNK,
-                device.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT))
-
-      size = device.size
-      last_output = 0
-      start_time = time.time()
-
       if offset == 0:
         info_text = ""
       else:
         info_text = (" (from %s to %s)" %
                      (utils.FormatUnit(offset, "h"),
-                      utils.FormatUnit(size, "h")))
+                      utils.FormatUnit(device.size, "h")))
 
       lu.LogInfo("* Wiping disk %s%s", idx, info_text)
 
-      logging.info("Wiping disk %d for instance %s on node %s using"
-                   " chunk size %s", idx, instance.name, node_name,
-                   wipe_chunk_size)
-
-      while offset < size:
-        wipe_size = min(wipe_chunk_size, size - offset)
-
-        logging.debug("Wiping disk %d, offset %s, chunk %s",
-                      idx, offset, wipe_size)
+    logging.info("Wiping disks %s of instance %s on node %s",
+                 utils.CommaJoin(idx for (idx, _, _) in disks),
+                 instance.name, node_name)
 
-        result = lu.rpc.call_blockdev_wipe(node_uuid, (device, instance),
-                                           offset, wipe_size)
-        result.Raise("Could not wipe disk %d at offset %d for size %d" %
-                     (idx, offset, wipe_size))
+    result = lu.rpc.call_blockdev_wipe_start(node_uuid,
+                                             (map(compat.snd, disks),
+                                              instance),
+                                             [offset
+                                              for (_, _, offset) in disks])
+    result.Raise("Could not start wiping disks on node '%s'" % node_name)
 
-        now = time.time()
-        offset += wipe_size
-        if now - last_output >= 60:
-          eta = _CalcEta(now - start_time, offset, size)
-          lu.LogInfo(" - done: %.1f%% ETA: %s",
-                     offset / float(size) * 100, utils.FormatSeconds(eta))
-          last_output = now
+    name = result.payload
+    try:
+      _WaitForWipe(lu, node_uuid, name, [idx for (idx, _, _) in disks],
+                   _sleep_fn)
+    finally:
+      result = lu.rpc.call_blockdev_wipe_cleanup(node_uuid, name)
+      if result.fail_msg:
+        lu.LogWarning("Failed to clean up wipe job on node '%s': %s",
+                      node_name, result.fail_msg)
   finally:
     logging.info("Resuming synchronization of disks for instance '%s'",
                  instance.name)
@@ -2805,13 +2866,14 @@ class TLReplaceDisks(Tasklet):
         the OpCode
     """
     self.lu.LogInfo("Updating instance configuration")
-    for dev, _, new_logical_id in iv_names.itervalues():
-      dev.logical_id = new_logical_id
-      self.cfg.Update(dev, feedback_fn)
-      self.cfg.SetDiskNodes(dev.uuid, [self.instance.primary_node,
-                                       self.new_node_uuid])
+    with self.cfg.GetConfigTransaction():
+      for dev, _, new_logical_id in iv_names.itervalues():
+        dev.logical_id = new_logical_id
+        self.cfg.Update(dev, feedback_fn)
+        self.cfg.SetDiskNodes(dev.uuid, [self.instance.primary_node,
+                                         self.new_node_uuid])
 
-    self.cfg.Update(self.instance, feedback_fn)
+      self.cfg.Update(self.instance, feedback_fn)
 
   def _ExecDrbd8Secondary(self, feedback_fn):
     """Replace the secondary node for DRBD 8.
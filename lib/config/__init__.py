@@ -59,6 +59,7 @@ from ganeti.config.utils import ConfigSync, ConfigManager
 from ganeti.config.verify import (VerifyType, VerifyNic, VerifyIpolicy,
                                   ValidateConfig)
 
+from ganeti import compat
 from ganeti import errors
 from ganeti import utils
 from ganeti import constants
@@ -189,6 +190,7 @@ class ConfigWriter(object):
     self._lock_count = 0
     self._lock_current_shared = None
     self._lock_forced = False
+    self._post_write_fns = []
 
   def _ConfigData(self):
     return self._config_data
@@ -636,6 +638,20 @@ class ConfigWriter(object):
     """
     return self._wconfd.GenerateMAC(self._GetWConfdContext(), net_uuid)
 
+  def GenerateMACs(self, net_uuid, count, _ec_id):
+    """Generate several MACs for instances at once.
+
+    Either all of the MACs are reserved, or none of them.
+
+    @type count: int
+    @param count: the number of MACs to generate
+    @rtype: list of strings
+
+    """
+    if not count:
+      return []
+    return self._wconfd.GenerateMACs(self._GetWConfdContext(), net_uuid, count)
+
   def ReserveMAC(self, mac, _ec_id):
     """Reserve a MAC for an instance.
 
@@ -669,6 +685,22 @@ class ConfigWriter(object):
       raise errors.ProgrammerError("Can't call GenerateIp in offline mode")
     return self._wconfd.GenerateIp(self._GetWConfdContext(), net_uuid)
 
+  def GenerateIps(self, net_uuid, count, _ec_id):
+    """Find several free IPv4 addresses for instances at once.
+
+    Either all of the addresses are reserved, or none of them.
+
+    @type count: int
+    @param count: the number of addresses to generate
+    @rtype: list of strings
+
+    """
+    if self._offline:
+      raise errors.ProgrammerError("Can't call GenerateIps in offline mode")
+    if not count:
+      return []
+    return self._wconfd.GenerateIps(self._GetWConfdContext(), net_uuid, count)
+
   def ReserveIp(self, net_uuid, address, _ec_id, check=True):
     """Reserve a given IPv4 address for use by an instance.
 
@@ -695,6 +727,32 @@ class ConfigWriter(object):
     """
     return self._wconfd.GenerateDRBDSecret(self._GetWConfdContext())
 
+  def ReserveLVs(self, lv_names, _ec_id):
+    """Reserve several VG/LV pairs at once.
+
+    Either all of the LVs are reserved, or none of them.
+
+    @type lv_names: list of strings
+    @param lv_names: the logical volume names to reserve
+
+    """
+    if lv_names:
+      self._wconfd.ReserveLVs(self._GetWConfdContext(), list(lv_names))
+
+  def GenerateDRBDSecrets(self, count, _ec_id):
+    """Generate several DRBD secrets at once.
+
+    This checks the current disks for duplicates.
+
+    @type count: int
+    @param count: the number of secrets to generate
+    @rtype: list of strings
+
+    """
+    if not count:
+      return []
+    return self._wconfd.GenerateDRBDSecrets(self._GetWConfdContext(), count)
+
   # FIXME: After _AllIDs is removed, move it to config_mock.py
   def _AllLVs(self):
     """Compute the list of all LVs.
@@ -1163,6 +1221,37 @@ class ConfigWriter(object):
                   node_uuids, result)
     return result
 
+  def AllocateDRBDMinors(self, requests):
+    """Allocate drbd minors for several disks at once.
+
+    This is just a wrapper over a call to WConfd. Either all of the minors are
+    allocated, or none of them.
+
+    @type requests: list of tuples; (list of strings, string)
+    @param requests: the nodes in which to allocate minors and the disk for
+        which they are allocated, as for L{AllocateDRBDMinor}
+    @rtype: list of lists of ints
+    @return: The lists of minors, in the same order as the passed requests
+
+    """
+    assert compat.all(isinstance(disk_uuid, basestring)
+                      for (_, disk_uuid) in requests), \
+           "Invalid argument '%s' passed to AllocateDRBDMinors" % (requests, )
+
+    if self._offline:
+      raise errors.ProgrammerError("Can't call AllocateDRBDMinors"
+                                   " in offline mode")
+
+    if not requests:
+      return []
+
+    result = self._wconfd.AllocateDRBDMinors([(disk_uuid, node_uuids)
+                                              for (node_uuids, disk_uuid)
+                                              in requests])
+    logging.debug("Request to allocate drbd minors, input: %s, returning %s",
+                  requests, result)
+    return result
+
   def ReleaseDRBDMinors(self, disk_uuid):
     """Release temporary drbd minors allocated for a given disk.
 
@@ -1693,6 +1782,10 @@ class ConfigWriter(object):
     @return: the updated instance object
 
     """
+    if self._InTransaction():
+      return self._UnlockedSetInstanceStatus(inst_uuid, status, disks_active,
+                                             admin_state_source)
+
     def WithRetry():
       result = self._wconfd.SetInstanceStatus(inst_uuid, status,
                                               disks_active, admin_state_source)
@@ -1704,6 +1797,38 @@ class ConfigWriter(object):
         return result
     return objects.Instance.FromDict(utils.Retry(WithRetry, 0.1, 30))
 
+  def _UnlockedSetInstanceStatus(self, inst_uuid, status, disks_active,
+                                 admin_state_source):
+    """Set the instance's status in the locked configuration.
+
+    @see: L{_SetInstanceStatus}
+
+    """
+    instance = self._UnlockedGetInstanceInfo(inst_uuid)
+    if instance is None:
+      raise errors.ConfigurationError("Unknown instance '%s'" % inst_uuid)
+
+    if status is None:
+      status = instance.admin_state
+    if disks_active is None:
+      disks_active = instance.disks_active
+    if admin_state_source is None:
+      admin_state_source = instance.admin_state_source
+
+    assert status in constants.ADMINST_ALL, \
+           "Invalid status '%s' passed to SetInstanceStatus" % (status,)
+
+    if (instance.admin_state != status or
+        instance.disks_active != disks_active or
+        instance.admin_state_source != admin_state_source):
+      instance.admin_state = status
+      instance.disks_active = disks_active
+      instance.admin_state_source = admin_state_source
+      instance.serial_no += 1
+      instance.mtime = time.time()
+
+    return instance.Copy()
+
   def MarkInstanceUp(self, inst_uuid):
     """Mark the instance status to up in the config.
 
@@ -2613,6 +2738,33 @@ class ConfigWriter(object):
 
     return ConfigManager(self, shared=shared, forcelock=forcelock)
 
+  def GetConfigTransaction(self):
+    """Returns a context manager grouping several configuration changes.
+
+    The configuration is locked and read once when entering the block. All
+    changes done through this object within the block, including calls to
+    L{Update}, are applied to the local copy of the configuration and sent to
+    WConfd in a single write when the block is left. If the block is left by
+    an exception, nothing is written and the local copy is discarded.
+
+    Methods changing the configuration directly in WConfd (e.g.
+    L{AddInstance}, L{RemoveInstance}) can't be used within the block.
+    Temporary reservations, e.g. of DRBD minors, are not rolled back.
+
+    WARNING: As with L{GetConfigManager}, this blocks all other configuration
+    operations, so the block must not contain any RPCs or other slow
+    operations.
+
+    """
+    return self.GetConfigManager(shared=False)
+
+  def _InTransaction(self):
+    """Whether the configuration is locked exclusively by this object.
+
+    """
+    return (not self._offline and self._lock_count > 0 and
+            not self._lock_current_shared)
+
   def _AddLockCount(self, count):
     self._lock_count += count
     return self._lock_count
@@ -2708,6 +2860,7 @@ class ConfigWriter(object):
     """
     if self._AddLockCount(-1) > 0:
       return # we still have the lock, do nothing
+    (post_write_fns, self._post_write_fns) = (self._post_write_fns, [])
     if save:
       try:
         logging.debug("Writing configuration and unlocking it")
@@ -2716,9 +2869,14 @@ class ConfigWriter(object):
       except Exception, err:
         logging.critical("Can't write the configuration: %s", str(err))
         raise
+      for fn in post_write_fns:
+        fn()
     elif not self._offline and \
          not (self._lock_current_shared and not self._lock_forced):
       logging.debug("Unlocking configuration without writing")
+      if not self._lock_current_shared:
+        # Discard any changes done while holding the exclusive lock
+        self.OutDate()
       self._wconfd.UnlockConfig(self._GetWConfdContext())
       self._lock_forced = False
 
@@ -3056,6 +3214,17 @@ class ConfigWriter(object):
 
     """
 
+    if self._InTransaction():
+      self._UnlockedUpdate(target)
+      if isinstance(target, objects.Disk):
+        self._post_write_fns.append(
+          compat.partial(self.ReleaseDRBDMinors, target.uuid))
+      if ec_id is not None:
+        self._post_write_fns.append(
+          compat.partial(self.CommitTemporaryIps, ec_id))
+      self._UnlockedVerifyConfigAndLog(feedback_fn=feedback_fn)
+      return
+
     update_function = None
     if isinstance(target, objects.Cluster):
       if self._offline:
@@ -3100,6 +3269,68 @@ class ConfigWriter(object):
     # It will get written automatically by the decorator.
     self.VerifyConfigAndLog(feedback_fn=feedback_fn)
 
+  def _UnlockedUpdate(self, target):
+    """Replaces an object in the locked configuration by its updated version.
+
+    This does the same checks as WConfd does when updating an object.
+
+    @param target: an instance of L{objects.Cluster}, L{objects.Node},
+        L{objects.Instance}, L{objects.NodeGroup}, L{objects.Network} or
+        L{objects.Disk} which is existing in the cluster
+
+    """
+    data = self._ConfigData()
+
+    if isinstance(target, objects.Cluster):
+      container = None
+      current = data.cluster
+    else:
+      for (cls, container) in [(objects.Node, data.nodes),
+                               (objects.Instance, data.instances),
+                               (objects.NodeGroup, data.nodegroups),
+                               (objects.Network, data.networks),
+                               (objects.Disk, data.disks)]:
+        if isinstance(target, cls):
+          break
+      else:
+        raise errors.ProgrammerError("Invalid object type (%s) passed to"
+                                     " ConfigWriter.Update" % type(target))
+      current = container.get(target.uuid, None)
+      if current is None:
+        raise errors.ConfigurationError("Configuration object unknown")
+
+    if target.serial_no != current.serial_no:
+      raise errors.ConfigurationError("Configuration object updated since it"
+                                      " has been read: %d != %d" %
+                                      (current.serial_no, target.serial_no))
+
+    # If the caller modified the object returned by one of the getters, the
+    # changes can't be detected anymore
+    if target is not current and target.ToDict() == current.ToDict():
+      logging.debug("Configuration object %s unchanged, not updating",
+                    getattr(target, "uuid", "cluster"))
+      return
+
+    now = time.time()
+    target.serial_no += 1
+    target.mtime = now
+
+    # Store a copy, so that further changes by the caller don't end up in the
+    # configuration without going through an update
+    stored = target.Copy()
+
+    if container is None:
+      data.cluster = stored
+    else:
+      if isinstance(target, objects.NodeGroup):
+        # Group members are not serialized, but computed when loading
+        stored.members = current.members
+      container[target.uuid] = stored
+
+    if isinstance(target, objects.Node):
+      data.cluster.serial_no += 1
+      data.cluster.mtime = now
+
   @ConfigSync()
   def UpdateOfflineCluster(self, target, feedback_fn):
     self._ConfigData().cluster = target
@@ -32,6 +32,8 @@
 
 """
 
+import logging
+
 from ganeti import constants
 from ganeti import errors
 from ganeti import utils
@@ -288,7 +290,13 @@ class HooksMaster(object):
         self.log_fn("Communication failure to node %s: %s", node_name, fail_msg)
         continue
 
-      for script, hkr, output in hooks_results:
+      for hook_result in hooks_results:
+        # Nodes may also return the run time of the script
+        (script, hkr, output) = hook_result[:3]
+        if (len(hook_result) > 3 and
+            hook_result[3] > constants.HOOKS_SLOW_SCRIPT):
+          logging.warning("Hook script %s on node %s took %.1f seconds",
+                          script, node_name, hook_result[3])
         if hkr == constants.HKR_FAIL:
           if phase == constants.HOOKS_PHASE_PRE:
             errs.append((node_name, script, output))
@@ -74,9 +74,19 @@ HTTP_WWW_AUTHENTICATE = "WWW-Authenticate"
 HTTP_AUTHORIZATION = "Authorization"
 HTTP_AUTHENTICATION_INFO = "Authentication-Info"
 HTTP_ALLOW = "Allow"
+HTTP_IF_NONE_MATCH = "If-None-Match"
+HTTP_ACCEPT_ENCODING = "Accept-Encoding"
+HTTP_CONTENT_ENCODING = "Content-Encoding"
+HTTP_TRANSFER_ENCODING = "Transfer-Encoding"
+HTTP_VARY = "Vary"
 
 HTTP_APP_OCTET_STREAM = "application/octet-stream"
 HTTP_APP_JSON = "application/json"
+HTTP_TEXT_EVENT_STREAM = "text/event-stream"
+
+HTTP_GZIP = "gzip"
+HTTP_DEFLATE = "deflate"
+HTTP_CHUNKED = "chunked"
 
 _SSL_UNEXPECTED_EOF = "Unexpected EOF"
 
@@ -133,6 +143,18 @@ class HttpException(Exception):
     self.headers = headers
 
 
+class HttpNotModified(HttpException):
+  """304 Not Modified
+
+  RFC2616, 10.3.5: If the client has performed a conditional GET
+  request and access is allowed, but the document has not been
+  modified, the server SHOULD respond with this status code. The 304
+  response MUST NOT contain a message-body.
+
+  """
+  code = 304
+
+
 class HttpBadRequest(HttpException):
   """400 Bad Request
 
@@ -699,6 +721,33 @@ class HttpServerToClientStartLine(object):
     return "%s %s %s" % (self.version, self.code, self.reason)
 
 
+def CoalesceChunks(chunks, size):
+  """Joins small strings from an iterable into blocks of a minimum size.
+
+  @type chunks: iterable of strings
+  @type size: int
+  @param size: Minimum size of returned blocks, except for the last one
+
+  """
+  buf = []
+  buflen = 0
+
+  for chunk in chunks:
+    if not chunk:
+      continue
+
+    buf.append(chunk)
+    buflen += len(chunk)
+
+    if buflen >= size:
+      yield "".join(buf)
+      buf = []
+      buflen = 0
+
+  if buf:
+    yield "".join(buf)
+
+
 class HttpMessageWriter(object):
   """Writes an HTTP message to a socket.
 
@@ -718,8 +767,31 @@ class HttpMessageWriter(object):
 
     self._PrepareMessage()
 
-    buf = self._FormatMessage()
+    self._SendData(sock, self._FormatMessage(), write_timeout)
+
+    if self._IsStreamed() and self.HasMessageBody():
+      chunked = (self._msg.headers.get(HTTP_TRANSFER_ENCODING) ==
+                 HTTP_CHUNKED)
+
+      # Chunks are sent as they are produced, see L{CoalesceChunks} for
+      # joining small ones
+      for data in self._msg.body:
+        if not data:
+          # An empty chunk would terminate a chunked message
+          continue
+        if chunked:
+          # RFC2616, section 3.6.1
+          data = "%x\r\n%s\r\n" % (len(data), data)
+        self._SendData(sock, data, write_timeout)
+
+      if chunked:
+        self._SendData(sock, "0\r\n\r\n", write_timeout)
+
+  @staticmethod
+  def _SendData(sock, buf, write_timeout):
+    """Writes a buffer to a socket.
 
+    """
     pos = 0
     end = len(buf)
     while pos < end:
@@ -733,6 +805,13 @@ class HttpMessageWriter(object):
 
     assert pos == end, "Message wasn't sent completely"
 
+  def _IsStreamed(self):
+    """Checks whether the message body is an iterable of strings.
+
+    """
+    return not (self._msg.body is None or
+                isinstance(self._msg.body, basestring))
+
   def _PrepareMessage(self):
     """Prepares the HTTP message by setting mandatory headers.
 
@@ -740,7 +819,7 @@ class HttpMessageWriter(object):
     # RFC2616, section 4.3: "The presence of a message-body in a request is
     # signaled by the inclusion of a Content-Length or Transfer-Encoding header
     # field in the request's message-headers."
-    if self._msg.body:
+    if self._msg.body and not self._IsStreamed():
       self._msg.headers[HTTP_CONTENT_LENGTH] = len(self._msg.body)
 
   def _FormatMessage(self):
@@ -760,9 +839,10 @@ class HttpMessageWriter(object):
 
     buf.write("\r\n")
 
-    # Add message body if needed
+    # Add message body if needed, streamed bodies are sent separately
     if self.HasMessageBody():
-      buf.write(self._msg.body)
+      if not self._IsStreamed():
+        buf.write(self._msg.body)
 
     elif self._msg.body:
       logging.warning("Ignoring message body")
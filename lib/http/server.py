@@ -39,6 +39,7 @@ import socket
 import time
 import signal
 import asyncore
+import zlib
 
 from ganeti import http
 from ganeti import utils
@@ -68,6 +69,15 @@ DEFAULT_ERROR_MESSAGE = """\
 </html>
 """
 
+#: Responses smaller than this aren't compressed
+_MIN_COMPRESS_SIZE = 1024
+
+#: Window size parameters for L{zlib.compressobj}, RFC2616 section 3.5
+_COMPRESS_WBITS = {
+  http.HTTP_GZIP: 16 + zlib.MAX_WBITS,
+  http.HTTP_DEFLATE: zlib.MAX_WBITS,
+  }
+
 
 def _DateTimeHeader(gmnow=None):
   """Return the current date and time formatted for a message header.
@@ -226,6 +236,105 @@ class _HttpClientToServerMessageReader(http.HttpMessageReader):
     return http.HttpClientToServerStartLine(method, path, version)
 
 
+def _GetContentEncoding(headers):
+  """Chooses a content coding acceptable to the client.
+
+  @param headers: Request headers
+  @rtype: string or None
+  @return: One of the codings in L{_COMPRESS_WBITS} or C{None} if the response
+    should not be compressed
+
+  """
+  if not headers:
+    return None
+
+  value = headers.get(http.HTTP_ACCEPT_ENCODING)
+  if not value:
+    return None
+
+  qvalues = {}
+
+  # RFC2616, section 14.3
+  for part in value.split(","):
+    params = part.split(";")
+    coding = params[0].strip().lower()
+    qvalue = 1.0
+    for param in params[1:]:
+      (name, _, param_value) = param.partition("=")
+      if name.strip().lower() == "q":
+        try:
+          qvalue = float(param_value)
+        except ValueError:
+          qvalue = 0.0
+    qvalues[coding] = qvalue
+
+  result = None
+  best = 0.0
+
+  # Prefer gzip over deflate if both are equally acceptable
+  for coding in [http.HTTP_GZIP, http.HTTP_DEFLATE]:
+    qvalue = qvalues.get(coding, qvalues.get("*", 0.0))
+    if qvalue > best:
+      result = coding
+      best = qvalue
+
+  return result
+
+
+def _CompressChunks(chunks, compressor):
+  """Compresses an iterable of strings.
+
+  """
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+
+  yield compressor.flush()
+
+
+def _EncodeResponse(req_msg, resp_msg):
+  """Applies content and transfer codings to a successful response.
+
+  Responses are compressed if the client accepts it. Bodies given as an
+  iterable of strings are sent using the chunked transfer coding to
+  HTTP/1.1 clients; older clients receive them delimited by the closing of
+  the connection.
+
+  @type req_msg: L{http.HttpMessage}
+  @param req_msg: Request message
+  @type resp_msg: L{http.HttpMessage}
+  @param resp_msg: Response message, modified in place
+
+  """
+  body = resp_msg.body
+  streamed = not isinstance(body, basestring)
+
+  resp_msg.headers[http.HTTP_VARY] = http.HTTP_ACCEPT_ENCODING
+
+  coding = _GetContentEncoding(req_msg.headers)
+
+  # Events must reach the client without being held back by the compressor
+  compress = (http.HTTP_CONTENT_ENCODING not in resp_msg.headers and
+              (resp_msg.headers.get(http.HTTP_CONTENT_TYPE) !=
+               http.HTTP_TEXT_EVENT_STREAM) and
+              (streamed or len(body) >= _MIN_COMPRESS_SIZE))
+
+  if coding and compress:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+                                  _COMPRESS_WBITS[coding])
+    if streamed:
+      body = _CompressChunks(body, compressor)
+    else:
+      body = compressor.compress(body) + compressor.flush()
+    resp_msg.headers[http.HTTP_CONTENT_ENCODING] = coding
+
+  if streamed and req_msg.start_line.version == http.HTTP_1_1:
+    resp_msg.headers[http.HTTP_TRANSFER_ENCODING] = http.HTTP_CHUNKED
+
+  resp_msg.body = body
+
+
 def _HandleServerRequestInner(handler, req_msg, reader):
   """Calls the handler function for the current request.
 
@@ -255,8 +364,9 @@ def _HandleServerRequestInner(handler, req_msg, reader):
       logging.exception("Unknown exception")
       raise http.HttpInternalServerError(message="Unknown error")
 
-    if not isinstance(result, basestring):
-      raise http.HttpError("Handler function didn't return string type")
+    if not (isinstance(result, basestring) or hasattr(result, "__iter__")):
+      raise http.HttpError("Handler function didn't return string or"
+                           " iterable type")
 
     return (http.HTTP_OK, handler_context.resp_headers, result)
   finally:
@@ -311,6 +421,8 @@ class HttpResponder(object):
       (response_msg.start_line.code, response_msg.headers,
        response_msg.body) = \
         _HandleServerRequestInner(self._handler, request_msg, req_msg_reader)
+
+      _EncodeResponse(request_msg, response_msg)
     except http.HttpException, err:
       self._SetError(self.responses, self._handler, response_msg, err)
     else:
@@ -645,7 +757,9 @@ class HttpServerHandler(object):
   def HandleRequest(self, req):
     """Handles a request.
 
-    Must be overridden by subclass.
+    Must be overridden by subclass. The response body can be returned as a
+    string or, for large responses, as an iterable of strings which is sent
+    while it's being produced.
 
     """
     raise NotImplementedError()
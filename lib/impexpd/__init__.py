@@ -345,8 +345,22 @@ class CommandBuilder(object):
     """Returns the complete child process command.
 
     """
-    transport_cmd = self._GetTransportCommand()
+    return self._WrapCommand(self._GetTransportCommand())
 
+  def GetNativeCommand(self):
+    """Returns the child process command for the native data pump.
+
+    The transport is done by L{pump.DataPump}, cat(1) only connects the command
+    prefix or suffix to the daemon through the child's standard input or
+    output.
+
+    """
+    return self._WrapCommand(["cat"])
+
+  def _WrapCommand(self, transport_cmd):
+    """Adds the command prefix and suffix to the transport command.
+
+    """
     buf = StringIO()
 
     if self._opts.cmd_prefix:
@@ -553,9 +567,7 @@ class ChildIOProcessor(object):
     """
     m = DD_INFO_RE.match(line)
     if m:
-      seconds = float(m.group("seconds"))
-      mbytes = utils.BytesToMebibyte(int(m.group("bytes")))
-      self._UpdateDdProgress(seconds, mbytes)
+      self.UpdateProgress(float(m.group("seconds")), int(m.group("bytes")))
       return (False, True)
 
     m = DD_STDERR_IGNORE.match(line)
@@ -566,15 +578,17 @@ class ChildIOProcessor(object):
     # Forward line
     return (True, False)
 
-  def _UpdateDdProgress(self, seconds, mbytes):
-    """Updates the internal status variables for dd(1) progress.
+  def UpdateProgress(self, seconds, nbytes):
+    """Updates the internal status variables for the transfer progress.
 
     @type seconds: float
     @param seconds: Timestamp of this update
-    @type mbytes: float
-    @param mbytes: Total number of MiB transferred so far
+    @type nbytes: int
+    @param nbytes: Total number of bytes transferred so far
 
     """
+    mbytes = float(nbytes) / (1024 * 1024)
+
     # Add latest sample
     self._dd_progress.append((seconds, mbytes))
 
@@ -595,7 +609,8 @@ class ChildIOProcessor(object):
       if throughput:
         eta = max(0, float(self._exp_size - mbytes) / throughput)
 
-    self._status_file.SetProgress(mbytes, throughput, percent, eta)
+    self._status_file.SetProgress(utils.BytesToMebibyte(nbytes), throughput,
+                                  percent, eta, nbytes=nbytes)
 
 
 def _CalcThroughput(samples):
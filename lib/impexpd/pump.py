@@ -0,0 +1,613 @@
+#
+#
+
+# Copyright (C) 2010 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Native data pump for the import/export daemon.
+
+The pump replaces the dd(1), compression and socat(1) parts of the pipeline
+built by L{ganeti.impexpd.CommandBuilder}. Data is exchanged with the source
+or sink command through a single pipe, compressed using zlib and sent over a
+TLS connection established by Python's ssl module. The wire format is the same
+as the one of the shell pipeline, so either side of a transfer can use either
+implementation.
+
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import socket
+import time
+import zlib
+
+try:
+  # pylint: disable=F0401
+  import ssl
+except ImportError:
+  ssl = None
+
+from ganeti import constants
+from ganeti import errors
+from ganeti import utils
+from ganeti import netutils
+from ganeti import compat
+
+
+#: Transfer data using the shell pipeline
+PUMP_SHELL = "shell"
+
+#: Transfer data in the daemon process
+PUMP_NATIVE = "native"
+
+PUMP_ALL = compat.UniqueFrozenset([
+  PUMP_SHELL,
+  PUMP_NATIVE,
+  ])
+
+#: Buffer size: at most this many bytes are read from the pipe or the
+#: connection at once
+BUFSIZE = 4 * 1024 * 1024
+
+#: Size requested for the pipe to the source or sink command
+PIPE_SIZE = 1024 * 1024
+
+#: Linux-specific fcntl(2) command to resize a pipe
+_F_SETPIPE_SZ = 1031
+
+#: Compression levels matching the gzip(1) invocations of the shell pipeline
+_GZIP_LEVELS = {
+  constants.IEC_GZIP: 1,
+  constants.IEC_GZIP_FAST: 1,
+  constants.IEC_GZIP_SLOW: 6,
+  }
+
+#: Window bits selecting zlib's gzip format
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+#: TCP keepalive settings, the same as L{ganeti.impexpd.SOCAT_TCP_OPTS}
+_TCP_KEEPALIVE_OPTS = [
+  ("TCP_KEEPIDLE", 60),
+  ("TCP_KEEPINTVL", 10),
+  ("TCP_KEEPCNT", 5),
+  ]
+
+#: Seconds between two attempts to connect to the remote peer
+CONNECT_RETRY_INTERVAL = 1.0
+
+(_STATE_LISTEN,
+ _STATE_CONNECT,
+ _STATE_TRANSFER,
+ _STATE_DONE) = range(1, 5)
+
+
+def GetUnsupportedReason(opts):
+  """Checks whether a transfer can be done by the native pump.
+
+  @param opts: Options object
+  @rtype: string or None
+  @return: Reason why the shell pipeline must be used, C{None} if the native
+    pump can be used
+
+  """
+  if ssl is None or not hasattr(ssl, "SSLContext"):
+    return "The ssl module doesn't support SSL contexts"
+
+  if not (opts.compress == constants.IEC_NONE or
+          opts.compress in _GZIP_LEVELS):
+    return "Compression method '%s' is not built in" % opts.compress
+
+  return None
+
+
+class _PassThrough(object):
+  """Codec for uncompressed transfers.
+
+  """
+  @staticmethod
+  def Process(data):
+    return data
+
+  @staticmethod
+  def Flush():
+    return ""
+
+
+class _GzipCompressor(object):
+  """Compresses data to the gzip format.
+
+  """
+  def __init__(self, level):
+    self._obj = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+  def Process(self, data):
+    return self._obj.compress(data)
+
+  def Flush(self):
+    return self._obj.flush()
+
+
+class _GzipDecompressor(object):
+  """Decompresses data in the gzip format.
+
+  Like gzip(1), this accepts several concatenated members.
+
+  """
+  def __init__(self):
+    self._obj = zlib.decompressobj(_GZIP_WBITS)
+
+  def Process(self, data):
+    result = []
+
+    while data:
+      result.append(self._obj.decompress(data))
+
+      # Data after the end of a member starts the next one
+      data = self._obj.unused_data
+      if data:
+        self._obj = zlib.decompressobj(_GZIP_WBITS)
+
+    return "".join(result)
+
+  def Flush(self):
+    return self._obj.flush()
+
+
+def _GetCodec(mode, compress):
+  """Returns the codec for a compression method.
+
+  @param mode: Daemon mode (import or export)
+  @param compress: Compression method
+
+  """
+  if compress == constants.IEC_NONE:
+    return _PassThrough()
+
+  if compress not in _GZIP_LEVELS:
+    raise errors.GenericError("Unsupported compression method '%s'" %
+                              compress)
+
+  if mode == constants.IEM_IMPORT:
+    return _GzipDecompressor()
+
+  elif mode == constants.IEM_EXPORT:
+    return _GzipCompressor(_GZIP_LEVELS[compress])
+
+  raise errors.GenericError("Invalid mode '%s'" % mode)
+
+
+def _CreateSslContext(opts):
+  """Creates the TLS context for the connection.
+
+  Like socat(1), both peers present their certificate and verify the one of
+  the other side against the CA.
+
+  """
+  ctx = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+
+  # Peers using the shell pipeline only support TLS 1.0, newer versions are
+  # used if both peers support them
+  ctx.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3
+  ctx.options |= getattr(ssl, "OP_NO_COMPRESSION", 0)
+
+  ctx.set_ciphers(constants.OPENSSL_CIPHERS)
+  ctx.load_cert_chain(opts.cert, keyfile=opts.key)
+  ctx.load_verify_locations(cafile=opts.ca)
+  ctx.verify_mode = ssl.CERT_REQUIRED
+
+  return ctx
+
+
+def _GetFamily(opts):
+  """Returns the address family to use.
+
+  """
+  if opts.ipv6:
+    return socket.AF_INET6
+
+  if not opts.ipv4:
+    for address in [opts.host, opts.bind]:
+      if address and netutils.IP6Address.IsValid(address):
+        return socket.AF_INET6
+
+  return socket.AF_INET
+
+
+def _SetKeepalive(sock):
+  """Enables TCP keepalive on a socket.
+
+  """
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+  for (name, value) in _TCP_KEEPALIVE_OPTS:
+    opt = getattr(socket, name, None)
+    if opt is not None:
+      sock.setsockopt(socket.IPPROTO_TCP, opt, value)
+
+
+def SetPipeSize(fd):
+  """Enlarges a pipe to reduce the number of system calls per buffer.
+
+  Failures are ignored, the default pipe size still works.
+
+  """
+  try:
+    fcntl.fcntl(fd, _F_SETPIPE_SZ, PIPE_SIZE)
+  except EnvironmentError, err:
+    logging.debug("Can't resize pipe %s: %s", fd, err)
+
+
+def _WriteAll(fd, data):
+  """Writes all data to a file descriptor.
+
+  """
+  view = buffer(data)
+
+  while view:
+    written = utils.RetryOnSignal(os.write, fd, view)
+    view = buffer(view, written)
+
+
+class DataPump(object):
+  """Transfers data between a pipe and a TLS connection.
+
+  The pump is driven by the daemon's main loop: L{GetPollFd} and L{GetTimeout}
+  tell when L{Process} needs to be called, which never blocks for longer than
+  needed to transfer one buffer.
+
+  """
+  def __init__(self, mode, opts, data_fd, status_file, progress_fn,
+               progress_interval, _time_fn=time.time):
+    """Initializes this class.
+
+    @param mode: Daemon mode (import or export)
+    @param opts: Options object
+    @type data_fd: int
+    @param data_fd: Pipe to the sink command (import) or from the source
+      command (export)
+    @param status_file: Status file manager
+    @type progress_fn: callable
+    @param progress_fn: Called with the seconds since the connection was
+      established and the number of bytes transferred since
+    @type progress_interval: number
+    @param progress_interval: Seconds between calls to C{progress_fn}
+
+    """
+    assert opts.magic is None or constants.IE_MAGIC_RE.match(opts.magic)
+
+    self._mode = mode
+    self._opts = opts
+    self._data_fd = data_fd
+    self._status_file = status_file
+    self._progress_fn = progress_fn
+    self._progress_interval = progress_interval
+    self._time_fn = _time_fn
+
+    self._codec = _GetCodec(mode, opts.compress)
+    self._ctx = None
+    self._listener = None
+    self._sock = None
+    self._state = None
+    self._connect_attempts = 0
+    self._next_attempt = None
+    self._start_time = None
+    self._last_progress = None
+    self._nbytes = 0
+
+    if opts.magic:
+      self._magic = "M=%s" % opts.magic
+    else:
+      self._magic = ""
+
+    # Received data still to be compared with the magic value
+    self._magic_buf = ""
+
+  def Start(self):
+    """Starts listening for or connecting to the remote peer.
+
+    """
+    self._ctx = _CreateSslContext(self._opts)
+
+    if self._mode == constants.IEM_IMPORT:
+      self._Listen()
+      self._state = _STATE_LISTEN
+
+    elif self._mode == constants.IEM_EXPORT:
+      self._next_attempt = self._time_fn()
+      self._state = _STATE_CONNECT
+
+    else:
+      raise errors.GenericError("Invalid mode '%s'" % self._mode)
+
+  def IsDone(self):
+    """Returns whether all data has been transferred.
+
+    """
+    return self._state == _STATE_DONE
+
+  def GetTransferred(self):
+    """Returns the number of bytes transferred so far.
+
+    """
+    return self._nbytes
+
+  def GetPollFd(self):
+    """Returns the file descriptor the pump is waiting for.
+
+    @rtype: int or None
+
+    """
+    if self._state == _STATE_LISTEN:
+      return self._listener.fileno()
+
+    if self._state == _STATE_TRANSFER:
+      if self._mode == constants.IEM_IMPORT:
+        return self._sock.fileno()
+      return self._data_fd
+
+    return None
+
+  def GetTimeout(self):
+    """Returns the seconds until L{Process} has to be called.
+
+    @rtype: number or None
+    @return: Timeout, C{None} when only waiting for L{GetPollFd}
+
+    """
+    if self._state == _STATE_CONNECT:
+      return max(0.0, self._next_attempt - self._time_fn())
+
+    if (self._state == _STATE_TRANSFER and
+        self._mode == constants.IEM_IMPORT and self._sock.pending()):
+      # Decrypted data is buffered in the TLS layer, the socket may not become
+      # readable again
+      return 0.0
+
+    return None
+
+  def Process(self):
+    """Makes progress on the transfer.
+
+    """
+    if self._state == _STATE_LISTEN:
+      self._Accept()
+    elif self._state == _STATE_CONNECT:
+      self._Connect()
+    elif self._state == _STATE_TRANSFER:
+      if self._mode == constants.IEM_IMPORT:
+        self._Receive()
+      else:
+        self._Send()
+
+  def Abort(self):
+    """Closes the connection without completing the transfer.
+
+    The peer notices the missing end of the stream.
+
+    """
+    self._CloseSockets()
+    self._CloseData()
+    self._state = _STATE_DONE
+
+  def _CloseSockets(self):
+    for sock in [self._listener, self._sock]:
+      if sock is not None:
+        sock.close()
+
+    self._listener = None
+    self._sock = None
+
+  def _CloseData(self):
+    if self._data_fd is not None:
+      utils.RetryOnSignal(os.close, self._data_fd)
+      self._data_fd = None
+
+  def _Listen(self):
+    """Creates the listening socket and publishes its port.
+
+    """
+    family = _GetFamily(self._opts)
+
+    if self._opts.bind is not None:
+      address = self._opts.bind
+    elif family == socket.AF_INET6:
+      address = "::"
+    else:
+      address = "0.0.0.0"
+
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+      sock.bind((address, self._opts.port or 0))
+      sock.listen(1)
+    except socket.error:
+      sock.close()
+      raise
+
+    self._listener = sock
+
+    port = sock.getsockname()[1]
+    logging.debug("Listening on %s port %s", address, port)
+    self._status_file.SetListenPort(port)
+    self._status_file.Update(True)
+
+  def _Accept(self):
+    """Accepts a connection, ignoring peers failing the TLS handshake.
+
+    """
+    (conn, peer) = self._listener.accept()
+
+    try:
+      _SetKeepalive(conn)
+      conn.settimeout(self._opts.connect_timeout)
+      sock = self._ctx.wrap_socket(conn, server_side=True)
+    except (socket.error, ssl.SSLError), err:
+      # Like socat(1) with the "forever" option, keep listening
+      logging.info("Connection from %s failed: %s", peer, err)
+      conn.close()
+      return
+
+    sock.settimeout(None)
+
+    self._listener.close()
+    self._listener = None
+
+    self._Connected(sock)
+
+  def _Connect(self):
+    """Tries to connect to the remote peer.
+
+    """
+    family = _GetFamily(self._opts)
+
+    self._connect_attempts += 1
+
+    conn = socket.socket(family, socket.SOCK_STREAM)
+    try:
+      _SetKeepalive(conn)
+      if self._opts.bind is not None:
+        conn.bind((self._opts.bind, 0))
+      conn.settimeout(self._opts.connect_timeout)
+      conn.connect((self._opts.host, self._opts.port))
+      sock = self._ctx.wrap_socket(conn)
+    except (socket.error, ssl.SSLError), err:
+      conn.close()
+
+      if self._connect_attempts > self._opts.connect_retries:
+        raise errors.GenericError("Connecting to %s port %s failed: %s" %
+                                  (self._opts.host, self._opts.port, err))
+
+      logging.info("Connection attempt %s failed: %s",
+                   self._connect_attempts, err)
+      self._next_attempt = self._time_fn() + CONNECT_RETRY_INTERVAL
+      return
+
+    sock.settimeout(None)
+
+    self._Connected(sock)
+
+    # The magic value is sent as part of the data stream
+    if self._magic:
+      self._sock.sendall(self._codec.Process(self._magic))
+
+  def _Connected(self, sock):
+    """Starts the transfer on an established connection.
+
+    """
+    logging.debug("Connection established")
+
+    self._sock = sock
+    self._state = _STATE_TRANSFER
+    self._start_time = self._time_fn()
+    self._last_progress = self._start_time
+
+    self._status_file.SetConnected()
+    self._status_file.Update(True)
+
+  def _Send(self):
+    """Sends one buffer read from the source command.
+
+    """
+    data = utils.RetryOnSignal(os.read, self._data_fd, BUFSIZE)
+
+    if data:
+      self._nbytes += len(data)
+      self._sock.sendall(self._codec.Process(data))
+      self._ReportProgress(False)
+      return
+
+    # End of data, complete the stream
+    self._sock.sendall(self._codec.Flush())
+
+    try:
+      self._sock.unwrap()
+    except (socket.error, ssl.SSLError), err:
+      logging.debug("TLS shutdown failed: %s", err)
+
+    self._Finish()
+
+  def _Receive(self):
+    """Writes one buffer received from the peer to the sink command.
+
+    """
+    data = self._sock.recv(BUFSIZE)
+
+    if data:
+      self._Write(self._codec.Process(data))
+      return
+
+    # End of data
+    self._Write(self._codec.Flush())
+
+    if self._magic and len(self._magic_buf) < len(self._magic):
+      raise errors.GenericError("Magic value mismatch")
+
+    self._Finish()
+
+  def _Write(self, data):
+    """Checks the magic value and writes data to the sink command.
+
+    """
+    if len(self._magic_buf) < len(self._magic):
+      needed = len(self._magic) - len(self._magic_buf)
+      self._magic_buf += data[:needed]
+      data = data[needed:]
+
+      if not self._magic.startswith(self._magic_buf):
+        raise errors.GenericError("Magic value mismatch")
+
+    if data:
+      try:
+        _WriteAll(self._data_fd, data)
+      except EnvironmentError, err:
+        if err.errno == errno.EPIPE:
+          raise errors.GenericError("Sink command stopped reading data")
+        raise
+
+      self._nbytes += len(data)
+      self._ReportProgress(False)
+
+  def _Finish(self):
+    """Completes the transfer.
+
+    """
+    self._ReportProgress(True)
+    self._CloseSockets()
+    self._CloseData()
+    self._state = _STATE_DONE
+
+  def _ReportProgress(self, force):
+    """Reports the progress every C{progress_interval} seconds.
+
+    """
+    now = self._time_fn()
+
+    if force or now >= self._last_progress + self._progress_interval:
+      self._last_progress = now
+      self._progress_fn(now - self._start_time, self._nbytes)
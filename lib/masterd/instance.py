@@ -221,6 +221,20 @@ class _DiskImportExportBase(object):
             self._daemon.progress_percent,
             self._daemon.progress_eta)
 
+  @property
+  def checkpoint(self):
+    """Returns the last verified checkpoint of a sparse transfer.
+
+    @rtype: dict or None
+    @return: Dictionary with the offset (in bytes, relative to the start of
+      the transfer) and digest of the checkpoint
+
+    """
+    if not self._daemon:
+      return None
+
+    return self._daemon.checkpoint
+
   @property
   def magic(self):
     """Returns the magic value for this import/export.
@@ -672,6 +686,10 @@ class ImportExportLoop(object):
   MIN_DELAY = 1.0
   MAX_DELAY = 20.0
 
+  #: Maximum wait while a daemon is still starting up or connecting, to check
+  #: for the respective timeouts
+  PENDING_DELAY = 5.0
+
   def __init__(self, lu):
     """Initializes this class.
 
@@ -680,6 +698,9 @@ class ImportExportLoop(object):
     self._queue = []
     self._pending_add = []
 
+    # Modification time of the last seen status, by node and daemon name
+    self._status_mtime = {}
+
   def Add(self, diskie):
     """Adds an import/export object to the loop.
 
@@ -717,6 +738,44 @@ class ImportExportLoop(object):
 
     return daemon_status
 
+  @staticmethod
+  def _WaitDaemonStatus(lu, daemons, known, timeout):
+    """Waits for a status change of any import/export daemon.
+
+    A single request is sent to every node, covering all daemons running on
+    it. Nodes reply as soon as the status of one of their daemons differs from
+    the one seen last, or once the timeout is reached.
+
+    @type known: dict
+    @param known: Modification time of the last seen status, indexed by node
+      and daemon name
+    @type timeout: number
+    @param timeout: Maximum number of seconds to wait
+
+    """
+    node_daemons = dict((node_name,
+                         [(name, known.get((node_name, name)))
+                          for name in names])
+                        for (node_name, names) in daemons.items())
+
+    result = lu.rpc.call_impexp_status_wait(node_daemons.keys(), node_daemons,
+                                            timeout)
+
+    daemon_status = {}
+
+    for node_name, names in daemons.iteritems():
+      nres = result[node_name]
+      if nres.fail_msg:
+        lu.LogWarning("Failed to get daemon status on %s: %s",
+                      node_name, nres.fail_msg)
+        continue
+
+      assert len(names) == len(nres.payload)
+
+      daemon_status[node_name] = dict(zip(names, nres.payload))
+
+    return daemon_status
+
   @staticmethod
   def _GetActiveDaemonNames(queue):
     """Gets the names of all active daemons.
@@ -755,20 +814,50 @@ class ImportExportLoop(object):
 
     del self._pending_add[:]
 
+  def _UpdateStatusMtime(self, data):
+    """Remembers the modification time of the collected status data.
+
+    """
+    for (node_name, statuses) in data.items():
+      for (name, status) in statuses.items():
+        if status is None:
+          mtime = None
+        else:
+          mtime = status.mtime
+        self._status_mtime[(node_name, name)] = mtime
+
   def Run(self):
     """Utility main loop.
 
     """
+    delay = None
+
     while True:
       self._AddPendingToQueue()
 
       # Collect all active daemon names
       daemons = self._GetActiveDaemonNames(self._queue)
       if not daemons:
+        if self._pending_add:
+          # Finalizing a failed object added new ones, e.g. to resume it
+          continue
         break
 
       # Collection daemon status data
-      data = self._CollectDaemonStatus(self._lu, daemons)
+      if delay is None:
+        data = self._CollectDaemonStatus(self._lu, daemons)
+      else:
+        # Instead of sleeping, wait on the nodes for a status change
+        logging.debug("Waiting up to %ss for status changes", delay)
+        data = self._WaitDaemonStatus(self._lu, daemons, self._status_mtime,
+                                      delay)
+
+      self._UpdateStatusMtime(data)
+
+      if delay is not None and len(data) < len(daemons):
+        # Failed requests return immediately, avoid retrying them in a
+        # tight loop
+        time.sleep(self.MIN_DELAY)
 
       # Use data
       delay = self.MAX_DELAY
@@ -787,8 +876,8 @@ class ImportExportLoop(object):
                                    all_daemon_data[diskie.GetDaemonName()])
 
           if not result:
-            # Daemon not yet ready, retry soon
-            delay = min(3.0, delay)
+            # Daemon not yet ready, the status file showing up ends the wait
+            delay = min(self.PENDING_DELAY, delay)
             continue
 
           if diskie.CheckFinished():
@@ -796,30 +885,27 @@ class ImportExportLoop(object):
             diskie.Finalize()
             continue
 
-          # Normal case: check again in 5 seconds
-          delay = min(5.0, delay)
-
           if not diskie.CheckListening():
-            # Not yet listening, retry soon
-            delay = min(1.0, delay)
+            # Not yet listening, the status update ends the wait
+            delay = min(self.PENDING_DELAY, delay)
             continue
 
           if not diskie.CheckConnected():
-            # Not yet connected, retry soon
-            delay = min(1.0, delay)
+            # Not yet connected, the status update ends the wait
+            delay = min(self.PENDING_DELAY, delay)
             continue
 
         except _ImportExportError, err:
           logging.exception("%s failed", diskie.MODE_TEXT)
           diskie.Finalize(error=str(err))
 
-      if not compat.any(diskie.active for diskie in self._queue):
+      # Objects added by callbacks, e.g. when resuming a failed transfer, must
+      # still be run
+      if not (self._pending_add or
+              compat.any(diskie.active for diskie in self._queue)):
         break
 
-      # Wait a bit
       delay = min(self.MAX_DELAY, max(self.MIN_DELAY, delay))
-      logging.debug("Waiting for %ss", delay)
-      time.sleep(delay)
 
   def FinalizeAll(self):
     """Finalizes all pending transfers.
@@ -867,6 +953,10 @@ class _TransferInstSourceCb(_TransferInstCbBase):
     """Called when new progress information should be reported.
 
     """
+    if dtp.group:
+      dtp.group.ReportProgress(self.feedback_fn)
+      return
+
     progress = ie.progress
     if not progress:
       return
@@ -898,6 +988,9 @@ class _TransferInstSourceCb(_TransferInstCbBase):
     if dtp.dest_import and not ie.success:
       dtp.dest_import.Abort()
 
+    if dtp.group:
+      dtp.group.PartFinished(dtp, self.feedback_fn)
+
 
 class _TransferInstDestCb(_TransferInstCbBase):
   def ReportListening(self, ie, dtp, component):
@@ -945,10 +1038,13 @@ class _TransferInstDestCb(_TransferInstCbBase):
     if dtp.src_export and not ie.success:
       dtp.src_export.Abort()
 
+    if dtp.group:
+      dtp.group.PartFinished(dtp, self.feedback_fn)
+
 
 class DiskTransfer(object):
   def __init__(self, name, src_io, src_ioargs, dest_io, dest_ioargs,
-               finished_fn):
+               finished_fn, chunk_size=None, base_chunk_map=None):
     """Initializes this class.
 
     @type name: string
@@ -959,6 +1055,12 @@ class DiskTransfer(object):
     @param dest_ioargs: Destination I/O arguments
     @type finished_fn: callable
     @param finished_fn: Function called once transfer has finished
+    @type chunk_size: int or None
+    @param chunk_size: Chunk size in bytes for recording chunk digests of a
+      raw disk exported to a file
+    @type base_chunk_map: dict or None
+    @param base_chunk_map: Chunk map of the previous export, only chunks
+      changed since are transferred
 
     """
     self.name = name
@@ -971,18 +1073,30 @@ class DiskTransfer(object):
 
     self.finished_fn = finished_fn
 
+    self.chunk_size = chunk_size
+    self.base_chunk_map = base_chunk_map
+
 
 class _DiskTransferPrivate(object):
-  def __init__(self, data, success, export_opts):
+  def __init__(self, data, success, export_opts, group=None):
     """Initializes this class.
 
     @type data: L{DiskTransfer}
     @type success: bool
+    @type group: L{_DiskTransferGroup} or None
+    @param group: Multi-stream transfer this transfer is a segment of
 
     """
     self.data = data
     self.success = success
     self.export_opts = export_opts
+    self.group = group
+
+    # Set for segments of a L{_DiskTransferGroup}
+    self.segment = None
+    self.segment_index = None
+    self.attempt = 0
+    self.superseded = False
 
     self.src_export = None
     self.dest_import = None
@@ -996,7 +1110,339 @@ class _DiskTransferPrivate(object):
     self.success = self.success and success
 
 
-def _GetInstDiskMagic(base, instance_name, index):
+class _DiskTransferGroup(object):
+  def __init__(self, data, size, progress_interval, start_fn,
+               _time_fn=time.time):
+    """Initializes this class.
+
+    @type data: L{DiskTransfer}
+    @param data: Transfer which is split into segments
+    @type size: number
+    @param size: Total size of all segments in mebibytes
+    @type progress_interval: number
+    @param progress_interval: Interval between aggregated progress reports
+    @type start_fn: callable
+    @param start_fn: Function starting the transfer of a segment, called with
+      this group, segment index, segment, attempt number and resume digest;
+      must return a L{_DiskTransferPrivate} instance
+
+    """
+    self.data = data
+    self.size = size
+    self.parts = []
+    self.retransmitted = 0
+
+    self._progress_interval = progress_interval
+    self._start_fn = start_fn
+    self._time_fn = _time_fn
+    self._ts_begin = _time_fn()
+    self._ts_last_progress = None
+    self._verified = 0
+    self._aborted = False
+    self._finished = False
+
+  @property
+  def success(self):
+    """Returns whether all segments have been transferred successfully.
+
+    """
+    return compat.all(dtp.success for dtp in self.parts
+                      if not dtp.superseded)
+
+  def StartPart(self, index, segment, attempt=0, resume_digest=None):
+    """Starts the transfer of a segment.
+
+    @type index: int
+    @param index: Segment index
+    @type segment: tuple; (offset, size)
+    @param segment: Offset and size of the segment in mebibytes
+    @type attempt: int
+    @param attempt: Number of previous attempts for this segment
+    @type resume_digest: string or None
+    @param resume_digest: Digest of the checkpoint the transfer resumes from
+
+    """
+    dtp = self._start_fn(self, index, segment, attempt, resume_digest)
+    dtp.segment = segment
+    dtp.segment_index = index
+    dtp.attempt = attempt
+    self.parts.append(dtp)
+    return dtp
+
+  def GetProgress(self):
+    """Returns the aggregated progress of all segments.
+
+    @rtype: tuple
+    @return: Progress in the format used by L{FormatProgress}
+
+    """
+    mbytes = self._verified
+    throughput = 0.0
+
+    for dtp in self.parts:
+      ie = dtp.src_export
+      if ie is None or dtp.superseded:
+        continue
+
+      if not ie.active:
+        if ie.success:
+          mbytes += dtp.segment[1]
+        continue
+
+      progress = ie.progress
+      if not progress:
+        continue
+
+      (part_mbytes, part_throughput, _, _) = progress
+      if part_mbytes is not None:
+        mbytes += part_mbytes
+      if part_throughput:
+        throughput += part_throughput
+
+    if self.size:
+      percent = max(0, min(100, (100.0 * mbytes) / self.size))
+    else:
+      percent = None
+
+    if throughput > 0:
+      eta = max(0, float(self.size - mbytes) / throughput)
+    else:
+      eta = None
+
+    return (mbytes, throughput, percent, eta)
+
+  def ReportProgress(self, feedback_fn):
+    """Reports the aggregated progress, at most once per interval.
+
+    """
+    if (self._ts_last_progress is None or
+        utils.TimeoutExpired(self._ts_last_progress, self._progress_interval,
+                             _time_fn=self._time_fn)):
+      self._ts_last_progress = self._time_fn()
+
+      msg = "%s sent %s" % (self.data.name, FormatProgress(self.GetProgress()))
+      active = len([dtp for dtp in self.parts if not dtp.superseded])
+      if active > 1:
+        msg += " (%d streams)" % active
+      feedback_fn(msg)
+
+  def _Resume(self, dtp, feedback_fn):
+    """Restarts a failed segment from its last verified checkpoint.
+
+    """
+    (seg_offset, seg_size) = dtp.segment
+    done = 0
+    resume_digest = dtp.export_opts.resume_digest
+
+    checkpoint = None
+    if dtp.dest_import:
+      checkpoint = dtp.dest_import.checkpoint
+
+    if checkpoint:
+      checkpoint_mbytes = checkpoint["offset"] // constants.DD_BLOCK_SIZE
+      if 0 <= checkpoint_mbytes < seg_size:
+        done = checkpoint_mbytes
+        resume_digest = checkpoint["digest"]
+
+    # Everything sent after the checkpoint has to be sent again
+    sent = 0
+    if dtp.src_export and dtp.src_export.progress:
+      sent = dtp.src_export.progress[0] or 0
+    self.retransmitted += max(0, sent - done)
+    self._verified += done
+
+    dtp.superseded = True
+
+    feedback_fn("%s failed, resuming at %s (attempt %d of %d)" %
+                (dtp.data.name, utils.FormatUnit(done, "h"),
+                 dtp.attempt + 2, constants.DISK_TRANSFER_MAX_RETRIES + 1))
+
+    self.StartPart(dtp.segment_index, (seg_offset + done, seg_size - done),
+                   attempt=dtp.attempt + 1, resume_digest=resume_digest)
+
+  def PartFinished(self, dtp, feedback_fn):
+    """Called when the import or export of a segment has finished.
+
+    A failed segment is resumed from its last verified checkpoint, up to
+    L{constants.DISK_TRANSFER_MAX_RETRIES} times. After that all other
+    segments are aborted. Once all segments are done, the aggregated
+    throughput is reported and the transfer's finish callback is called.
+
+    """
+    if (not dtp.success and not dtp.superseded and
+        not ((dtp.src_export and dtp.src_export.active) or
+             (dtp.dest_import and dtp.dest_import.active))):
+      if (not self._aborted and
+          dtp.attempt < constants.DISK_TRANSFER_MAX_RETRIES):
+        self._Resume(dtp, feedback_fn)
+      elif not self._aborted:
+        self._aborted = True
+        for other in self.parts:
+          for ie in [other.src_export, other.dest_import]:
+            if ie is not None and ie.active:
+              ie.Abort()
+
+    if self._finished:
+      return
+
+    if compat.any((other.src_export is not None and other.src_export.active) or
+                  (other.dest_import is not None and other.dest_import.active)
+                  for other in self.parts):
+      return
+
+    self._finished = True
+
+    if self.success:
+      duration = max(self._time_fn() - self._ts_begin, 0.001)
+      msg = ("%s transferred %s in %s (%0.1f MiB/s" %
+             (self.data.name, utils.FormatUnit(self.size, "h"),
+              utils.FormatSeconds(duration), self.size / duration))
+
+      streams = len(set(part.segment_index for part in self.parts))
+      if streams > 1:
+        msg += ", %d streams" % streams
+
+      if self.retransmitted:
+        msg += ", %s retransmitted" % utils.FormatUnit(self.retransmitted, "h")
+
+      feedback_fn(msg + ")")
+
+    cb = self.data.finished_fn
+    if cb:
+      cb()
+
+
+def _SplitDiskSegments(size, count):
+  """Splits a disk into segments of (nearly) equal size.
+
+  @type size: int
+  @param size: Disk size in mebibytes
+  @type count: int
+  @param count: Number of segments
+  @rtype: list of tuples; (offset, size)
+  @return: Offset and size of every segment in mebibytes
+
+  """
+  assert count > 0
+
+  (seg_size, remainder) = divmod(size, count)
+
+  result = []
+  offset = 0
+  for idx in range(count):
+    part_size = seg_size
+    if idx < remainder:
+      part_size += 1
+    result.append((offset, part_size))
+    offset += part_size
+
+  assert offset == size
+
+  return result
+
+
+def _IsSegmentableTransfer(transfer):
+  """Determines whether a transfer can be split into segments.
+
+  @type transfer: L{DiskTransfer}
+  @rtype: bool
+
+  """
+  return (transfer.src_io == constants.IEIO_RAW_DISK and
+          transfer.dest_io == constants.IEIO_RAW_DISK and
+          len(transfer.src_ioargs) == 2 and
+          len(transfer.dest_ioargs) == 2)
+
+
+def _NegotiateTransferStreams(lu, instance, node_uuids, streams):
+  """Determines the number of parallel streams all nodes can handle.
+
+  Every stream runs its own import/export daemon, TLS connection and
+  compressor on both nodes, so the number of streams is limited by the
+  number of physical CPUs of the node having the fewest. Nodes whose
+  information can't be retrieved don't limit the number of streams.
+
+  @param lu: Logical unit instance
+  @type instance: L{objects.Instance}
+  @param instance: Instance object
+  @type node_uuids: list of string
+  @param node_uuids: Source and destination node UUIDs
+  @type streams: int
+  @param streams: Requested number of streams
+  @rtype: int
+
+  """
+  if streams <= 1:
+    return streams
+
+  hvspecs = [(instance.hypervisor,
+              lu.cfg.GetClusterInfo().hvparams[instance.hypervisor])]
+  nodeinfo = lu.rpc.call_node_info(node_uuids, None, hvspecs)
+
+  result = streams
+
+  for node_uuid in node_uuids:
+    info = nodeinfo.get(node_uuid, None)
+    if info is None or info.fail_msg:
+      logging.warning("Can't get information from node %s, not limiting"
+                      " number of streams: %s", lu.cfg.GetNodeName(node_uuid),
+                      info and info.fail_msg)
+      continue
+
+    (_, _, (hv_info, )) = info.payload
+    num_cpus = hv_info.get("cpu_total", None)
+    if isinstance(num_cpus, int) and num_cpus > 0:
+      result = min(result, num_cpus)
+
+  logging.debug("Using up to %s streams (requested %s) for transfers between"
+                " nodes %s", result, streams, utils.CommaJoin(node_uuids))
+
+  return result
+
+
+def _ComputeTransferSegments(transfer, streams):
+  """Determines the segments for a multi-stream disk transfer.
+
+  Only transfers from a raw disk to a raw disk can be split (and resumed),
+  as only those can be written at an offset on the destination. The number
+  of streams is limited by L{constants.DISK_TRANSFER_MAX_STREAMS} and by
+  the disk size, so that no segment is smaller than
+  L{constants.DISK_TRANSFER_MIN_SEGMENT_SIZE}.
+
+  @type transfer: L{DiskTransfer}
+  @type streams: int
+  @param streams: Requested number of streams
+  @rtype: list of tuples or None
+  @return: Segments as returned by L{_SplitDiskSegments}, or C{None} if the
+    transfer can't be split
+
+  """
+  if not _IsSegmentableTransfer(transfer):
+    return None
+
+  size = min(transfer.src_ioargs[0].size, transfer.dest_ioargs[0].size)
+
+  count = min(streams, constants.DISK_TRANSFER_MAX_STREAMS,
+              size // constants.DISK_TRANSFER_MIN_SEGMENT_SIZE)
+
+  return _SplitDiskSegments(size, max(1, count))
+
+
+def _IsSparseTransfer(transfer):
+  """Determines whether a transfer can use sparse streams.
+
+  Both ends must be seekable, i.e. a raw disk or a file, as only then holes
+  can be detected on the source and recreated on the destination.
+
+  @type transfer: L{DiskTransfer}
+  @rtype: bool
+
+  """
+  return (transfer.src_io in constants.IEIO_SPARSE_TYPES and
+          transfer.dest_io in constants.IEIO_SPARSE_TYPES)
+
+
+def _GetInstDiskMagic(base, instance_name, index, segment=None, attempt=0):
   """Computes the magic value for a disk export or import.
 
   @type base: string
@@ -1005,6 +1451,10 @@ def _GetInstDiskMagic(base, instance_name, index):
   @param instance_name: Name of instance
   @type index: number
   @param index: Disk index
+  @type segment: number or None
+  @param segment: Segment index for multi-stream transfers
+  @type attempt: number
+  @param attempt: Number of previous attempts for resumed transfers
 
   """
   h = compat.sha1_hash()
@@ -1012,13 +1462,24 @@ def _GetInstDiskMagic(base, instance_name, index):
   h.update(base)
   h.update(instance_name)
   h.update(str(index))
+  if segment is not None:
+    h.update(".%d" % segment)
+  if attempt:
+    h.update(":%d" % attempt)
   return h.hexdigest()
 
 
 def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
-                         dest_ip, compress, instance, all_transfers):
+                         dest_ip, compress, instance, all_transfers,
+                         streams=None):
   """Transfers an instance's data from one node to another.
 
+  Transfers between raw disks are split into segments which are sent over
+  parallel connections, each with its own import/export daemon pair and
+  compressor. Failed segments are resumed from their last verified
+  checkpoint. Transfers between raw disks and files only send data extents
+  and skip holes.
+
   @param lu: Logical unit instance
   @param feedback_fn: Feedback function
   @type src_node_uuid: string
@@ -1033,11 +1494,25 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
   @param instance: Instance object
   @type all_transfers: list of L{DiskTransfer} instances
   @param all_transfers: List of all disk transfers to be made
+  @type streams: int or None
+  @param streams: Maximum number of parallel streams per disk, defaults to
+    L{constants.DISK_TRANSFER_STREAMS}; further limited by what both nodes
+    can handle (see L{_NegotiateTransferStreams})
   @rtype: list
   @return: List with a boolean (True=successful, False=failed) for success for
            each transfer
 
   """
+  if streams is None:
+    streams = constants.DISK_TRANSFER_STREAMS
+
+  if compat.any(transfer and _IsSegmentableTransfer(transfer)
+                for transfer in all_transfers):
+    streams = _NegotiateTransferStreams(lu, instance,
+                                        utils.UniqueSequence([src_node_uuid,
+                                                              dest_node_uuid]),
+                                        streams)
+
   src_node_name = lu.cfg.GetNodeName(src_node_uuid)
   dest_node_name = lu.cfg.GetNodeName(dest_node_uuid)
 
@@ -1056,17 +1531,82 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
   base_magic = utils.GenerateSecret(6)
 
   ieloop = ImportExportLoop(lu)
+
+  def _StartSegment(idx, count, group, sidx, segment, attempt, resume_digest):
+    """Starts the import of a segment, the export follows once listening.
+
+    """
+    transfer = group.data
+
+    if count > 1:
+      name = "%s [%d/%d]" % (transfer.name, sidx + 1, count)
+    else:
+      name = transfer.name
+
+    part = DiskTransfer(name,
+                        transfer.src_io, transfer.src_ioargs + (segment, ),
+                        transfer.dest_io, transfer.dest_ioargs + (segment, ),
+                        None)
+
+    magic = _GetInstDiskMagic(base_magic, instance.name, idx, segment=sidx,
+                              attempt=attempt)
+    opts = objects.ImportExportOptions(key_name=None, ca_pem=None,
+                                       compress=compress, magic=magic,
+                                       sparse=_IsSparseTransfer(transfer),
+                                       resume_digest=resume_digest)
+
+    part_dtp = _DiskTransferPrivate(part, True, opts, group=group)
+
+    di = DiskImport(lu, dest_node_uuid, opts, instance,
+                    "disk%d.%d" % (idx, sidx),
+                    part.dest_io, part.dest_ioargs,
+                    timeouts, dest_cbs, private=part_dtp)
+    ieloop.Add(di)
+
+    part_dtp.dest_import = di
+
+    return part_dtp
+
   try:
     for idx, transfer in enumerate(all_transfers):
+      segments = None
+      sparse = False
       if transfer:
+        segments = _ComputeTransferSegments(transfer, streams)
+        sparse = _IsSparseTransfer(transfer)
+
+      if segments:
+        if len(segments) > 1:
+          feedback_fn("Exporting %s from %s to %s using %d parallel streams" %
+                      (transfer.name, src_node_name, dest_node_name,
+                       len(segments)))
+        else:
+          feedback_fn("Exporting %s from %s to %s" %
+                      (transfer.name, src_node_name, dest_node_name))
+
+        dtp = _DiskTransferGroup(transfer, sum(size for (_, size) in segments),
+                                 timeouts.progress,
+                                 compat.partial(_StartSegment, idx,
+                                                len(segments)))
+
+        for (sidx, segment) in enumerate(segments):
+          dtp.StartPart(sidx, segment)
+
+      elif transfer:
         feedback_fn("Exporting %s from %s to %s" %
                     (transfer.name, src_node_name, dest_node_name))
 
         magic = _GetInstDiskMagic(base_magic, instance.name, idx)
         opts = objects.ImportExportOptions(key_name=None, ca_pem=None,
-                                           compress=compress, magic=magic)
+                                           compress=compress, magic=magic,
+                                           sparse=sparse,
+                                           chunk_size=transfer.chunk_size)
 
-        dtp = _DiskTransferPrivate(transfer, True, opts)
+        # Only the source needs the chunk map of the previous export
+        export_opts = opts.Copy()
+        export_opts.base_chunk_map = transfer.base_chunk_map
+
+        dtp = _DiskTransferPrivate(transfer, True, export_opts)
 
         di = DiskImport(lu, dest_node_uuid, opts, instance, "disk%d" % idx,
                         transfer.dest_io, transfer.dest_ioargs,
@@ -1088,12 +1628,24 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
                       dtp.src_export.success is not None) and
                      (dtp.dest_import is None or
                       dtp.dest_import.success is not None)
-                     for dtp in all_dtp), \
+                     for dtp in _FlattenTransferParts(all_dtp)), \
          "Not all imports/exports are finalized"
 
   return [bool(dtp.success) for dtp in all_dtp]
 
 
+def _FlattenTransferParts(all_dtp):
+  """Returns all single-stream transfers, expanding multi-stream ones.
+
+  """
+  for dtp in all_dtp:
+    if isinstance(dtp, _DiskTransferGroup):
+      for part in dtp.parts:
+        yield part
+    else:
+      yield dtp
+
+
 class _RemoteExportCb(ImportExportCbBase):
   def __init__(self, feedback_fn, disk_count):
     """Initializes this class.
@@ -1148,6 +1700,44 @@ class _RemoteExportCb(ImportExportCbBase):
       finished_fn()
 
 
+def _GetExportBaseImage(export_info, idx, disk):
+  """Finds the image of a disk in a previous export to base a new one on.
+
+  @type export_info: L{objects.SerializableConfigParser}
+  @param export_info: Configuration of the previous export
+  @type idx: int
+  @param idx: Disk index
+  @type disk: L{objects.Disk}
+  @param disk: Disk to be exported
+  @rtype: string or None
+  @return: File name of the image, C{None} if the disk can't be exported
+    incrementally
+
+  """
+  dump_option = "disk%d_dump" % idx
+  size_option = "disk%d_size" % idx
+  chain_option = "disk%d_chain" % idx
+
+  if not (export_info.has_section(constants.INISECT_INS) and
+          export_info.has_option(constants.INISECT_INS, dump_option) and
+          export_info.has_option(constants.INISECT_INS, size_option)):
+    return None
+
+  if export_info.getint(constants.INISECT_INS, size_option) != disk.size:
+    return None
+
+  if export_info.has_option(constants.INISECT_INS, chain_option):
+    chain = export_info.get(constants.INISECT_INS, chain_option).split()
+  else:
+    chain = []
+
+  # Including the new image, the chain must not become too long
+  if len(chain) + 2 > constants.EXPORT_MAX_CHAIN_LENGTH:
+    return None
+
+  return export_info.get(constants.INISECT_INS, dump_option)
+
+
 class ExportInstanceHelper(object):
   def __init__(self, lu, feedback_fn, instance):
     """Initializes this class.
@@ -1286,13 +1876,67 @@ class ExportInstanceHelper(object):
     else:
       return "disk/%d" % idx
 
-  def LocalExport(self, dest_node, compress):
+  def _GetBaseChunkMaps(self, dest_node, disks):
+    """Retrieves the chunk maps of the previous export on a node.
+
+    @type dest_node: L{objects.Node}
+    @param dest_node: Node with the previous export
+    @type disks: list of L{objects.Disk}
+    @param disks: Disks to be exported
+    @rtype: list
+    @return: Chunk map for every disk, C{None} for disks needing a full
+      export
+
+    """
+    instance = self._instance
+    result = [None] * len(disks)
+
+    info = self._lu.rpc.call_export_info(dest_node.uuid,
+                                         utils.PathJoin(pathutils.EXPORT_DIR,
+                                                        instance.name))
+    if info.fail_msg or not info.payload:
+      self._feedback_fn("No previous export on node %s, exporting all data" %
+                        dest_node.name)
+      return result
+
+    export_info = objects.SerializableConfigParser.Loads(str(info.payload))
+    chunk_size = constants.DISK_TRANSFER_CHUNK_SIZE * constants.DD_BLOCK_SIZE
+
+    for idx, dev in enumerate(disks):
+      image = _GetExportBaseImage(export_info, idx, dev)
+      if image is None:
+        self._feedback_fn("Disk %s can't be based on the previous export,"
+                          " exporting all data" % idx)
+        continue
+
+      cmres = self._lu.rpc.call_export_chunk_map(dest_node.uuid,
+                                                 instance.name, image)
+      cmap = cmres.payload
+      if cmres.fail_msg or not cmap:
+        self._feedback_fn("No chunk digests for disk %s in the previous"
+                          " export, exporting all data" % idx)
+        continue
+
+      if (cmap.get("chunk_size") != chunk_size or
+          cmap.get("size") != dev.size * constants.DD_BLOCK_SIZE):
+        self._feedback_fn("Chunks of disk %s in the previous export don't"
+                          " match, exporting all data" % idx)
+        continue
+
+      result[idx] = cmap
+
+    return result
+
+  def LocalExport(self, dest_node, compress, incremental=False):
     """Intra-cluster instance export.
 
     @type dest_node: L{objects.Node}
     @param dest_node: Destination node
     @type compress: string
     @param compress: Compression tool to use
+    @type incremental: bool
+    @param incremental: Whether to only transfer the chunks of the disks
+      changed since the previous export on the destination node
 
     """
     disks_to_transfer = self._GetDisksToTransfer()
@@ -1300,6 +1944,13 @@ class ExportInstanceHelper(object):
     instance = self._instance
     src_node_uuid = instance.primary_node
 
+    if incremental:
+      chunk_size = constants.DISK_TRANSFER_CHUNK_SIZE * constants.DD_BLOCK_SIZE
+      base_chunk_maps = self._GetBaseChunkMaps(dest_node, disks_to_transfer)
+    else:
+      chunk_size = None
+      base_chunk_maps = [None] * len(disks_to_transfer)
+
     transfers = []
 
     for idx, dev in enumerate(disks_to_transfer):
@@ -1308,7 +1959,11 @@ class ExportInstanceHelper(object):
 
       finished_fn = compat.partial(self._TransferFinished, idx)
 
-      if instance.os:
+      # The output of OS export scripts can't be compared chunk by chunk, so
+      # incremental exports always read the raw disk. Such images are
+      # recorded in the export's configuration and written to the disk
+      # directly when imported.
+      if instance.os and not incremental:
         src_io = constants.IEIO_SCRIPT
         src_ioargs = ((dev, instance), idx)
       else:
@@ -1317,7 +1972,9 @@ class ExportInstanceHelper(object):
 
       # FIXME: pass debug option from opcode to backend
       dt = DiskTransfer(self._GetDiskLabel(idx), src_io, src_ioargs,
-                        constants.IEIO_FILE, (path, ), finished_fn)
+                        constants.IEIO_FILE, (path, ), finished_fn,
+                        chunk_size=chunk_size,
+                        base_chunk_map=base_chunk_maps[idx])
       transfers.append(dt)
 
     # Actually export data
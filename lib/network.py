@@ -32,6 +32,11 @@
 
 """
 
+import bisect
+import re
+import socket
+import struct
+
 import ipaddr
 
 from bitarray import bitarray
@@ -53,6 +58,52 @@ IPV4_NETWORK_MAX_SIZE = 16
 IPV4_NETWORK_MIN_NUM_HOSTS = _ComputeIpv4NumHosts(IPV4_NETWORK_MIN_SIZE)
 IPV4_NETWORK_MAX_NUM_HOSTS = _ComputeIpv4NumHosts(IPV4_NETWORK_MAX_SIZE)
 
+_DOTTED_QUAD_RE = re.compile(r"^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$")
+_FREE_RUN_RE = re.compile("0+")
+
+
+def _AddressToInt(address):
+  """Converts an IPv4 address to its integer value.
+
+  Dotted-quad strings are converted directly, anything else (e.g.
+  C{ipaddr} objects) goes through L{ipaddr.IPAddress}.
+
+  @rtype: int or long
+  @raise ValueError: if the address is not valid
+
+  """
+  if isinstance(address, basestring):
+    m = _DOTTED_QUAD_RE.match(address)
+    if m:
+      octets = [int(i) for i in m.groups()]
+      if max(octets) <= 255:
+        return ((octets[0] << 24) | (octets[1] << 16) |
+                (octets[2] << 8) | octets[3])
+
+  return int(ipaddr.IPAddress(address))
+
+
+def _IntToAddress(value):
+  """Converts an integer to an IPv4 address in dotted-quad notation.
+
+  """
+  return socket.inet_ntoa(struct.pack("!I", value))
+
+
+def _ComputeFreeRanges(reservations, offset=0):
+  """Computes the runs of free addresses in a bitarray.
+
+  @type reservations: bitarray
+  @param reservations: Combined reservations
+  @type offset: int
+  @param offset: Index of the first bit in C{reservations}
+  @rtype: list of tuples; (start, end)
+  @return: Sorted list of half-open ranges of free indices
+
+  """
+  return [(offset + m.start(), offset + m.end())
+          for m in _FREE_RUN_RE.finditer(reservations.to01())]
+
 
 class AddressPool(object):
   """Address pool class, wrapping an C{objects.Network} object.
@@ -60,6 +111,12 @@ class AddressPool(object):
   This class provides methods to manipulate address pools, backed by
   L{objects.Network} objects.
 
+  Addresses are handled as integer indices relative to the network address.
+  The reservation bitarrays are only parsed when first needed, and an index of
+  the free address ranges (built on first use and maintained by all
+  reservation changes) allows to find free addresses without scanning the
+  whole pool.
+
   """
   FREE = bitarray("0")
   RESERVED = bitarray("1")
@@ -100,22 +157,94 @@ class AddressPool(object):
     if self.net.gateway6:
       self.gateway6 = ipaddr.IPv6Address(self.net.gateway6)
 
-    if self.net.reservations:
-      self.reservations = bitarray(self.net.reservations)
-    else:
-      self.reservations = bitarray(self.network.numhosts)
-      # pylint: disable=E1103
-      self.reservations.setall(False)
+    self._base = int(self.network.network)
+    self._numhosts = int(self.network.numhosts)
+
+    self._reservations = None
+    self._ext_reservations = None
+    self._free_ranges = None
+
+  def _LoadReservations(self, value):
+    """Parses a reservation map of the network object.
 
-    if self.net.ext_reservations:
-      self.ext_reservations = bitarray(self.net.ext_reservations)
+    """
+    if value:
+      result = bitarray(value)
     else:
-      self.ext_reservations = bitarray(self.network.numhosts)
+      result = bitarray(self._numhosts)
       # pylint: disable=E1103
-      self.ext_reservations.setall(False)
+      result.setall(False)
+
+    assert len(result) == self._numhosts
+
+    return result
+
+  @property
+  def reservations(self):
+    """Bitarray of the addresses reserved by instances.
+
+    """
+    if self._reservations is None:
+      self._reservations = self._LoadReservations(self.net.reservations)
+    return self._reservations
+
+  @property
+  def ext_reservations(self):
+    """Bitarray of the externally reserved addresses.
+
+    """
+    if self._ext_reservations is None:
+      self._ext_reservations = \
+        self._LoadReservations(self.net.ext_reservations)
+    return self._ext_reservations
+
+  def _GetFreeRanges(self):
+    """Returns the index of free address ranges, building it if necessary.
+
+    """
+    if self._free_ranges is None:
+      self._free_ranges = _ComputeFreeRanges(self.all_reservations)
+    return self._free_ranges
+
+  def _UpdateFreeRanges(self, start, end):
+    """Updates the free range index after changes to indices [start, end).
+
+    """
+    if self._free_ranges is None:
+      # Index will be built when needed
+      return
+
+    ranges = self._free_ranges
+
+    # First range ending at or after start (ranges are disjoint, so their ends
+    # are sorted as well)
+    lo = bisect.bisect_left(ranges, (start, ))
+    if lo > 0 and ranges[lo - 1][1] >= start:
+      lo -= 1
+
+    # First range starting after end
+    hi = bisect.bisect_right(ranges, (end, self._numhosts + 1))
+
+    affected = ranges[lo:hi]
+
+    combined = self.reservations[start:end] | self.ext_reservations[start:end]
+    pieces = _ComputeFreeRanges(combined, offset=start)
+
+    # Keep the parts of the affected ranges outside the modified area
+    if affected and affected[0][0] < start:
+      pieces.insert(0, (affected[0][0], start))
+    if affected and affected[-1][1] > end:
+      pieces.append((end, affected[-1][1]))
 
-    assert len(self.reservations) == self.network.numhosts
-    assert len(self.ext_reservations) == self.network.numhosts
+    # Merge adjacent ranges
+    merged = []
+    for (pstart, pend) in pieces:
+      if merged and merged[-1][1] == pstart:
+        merged[-1] = (merged[-1][0], pend)
+      else:
+        merged.append((pstart, pend))
+
+    ranges[lo:hi] = merged
 
   def Contains(self, address):
     if address is None:
@@ -125,13 +254,16 @@ class AddressPool(object):
     return addr in self.network
 
   def _GetAddrIndex(self, address):
-    addr = ipaddr.IPAddress(address)
+    idx = _AddressToInt(address) - self._base
 
-    if not addr in self.network:
+    if idx < 0 or idx >= self._numhosts:
       raise errors.AddressPoolError("%s does not contain %s" %
-                                    (self.network, addr))
+                                    (self.network, address))
 
-    return int(addr) - int(self.network.network)
+    return idx
+
+  def _GetAddress(self, idx):
+    return _IntToAddress(self._base + idx)
 
   def Update(self):
     """Write address pools back to the network object.
@@ -141,14 +273,27 @@ class AddressPool(object):
     self.net.ext_reservations = self.ext_reservations.to01()
     self.net.reservations = self.reservations.to01()
 
-  def _Mark(self, address, value=True, external=False):
-    idx = self._GetAddrIndex(address)
+  def _MarkRange(self, start, end, value=True, external=False):
     if external:
-      self.ext_reservations[idx] = value
+      pool = self.ext_reservations
     else:
-      self.reservations[idx] = value
+      pool = self.reservations
+
+    if end - start == 1:
+      pool[start] = value
+    else:
+      marks = bitarray(end - start)
+      # pylint: disable=E1103
+      marks.setall(value)
+      pool[start:end] = marks
+
+    self._UpdateFreeRanges(start, end)
     self.Update()
 
+  def _Mark(self, address, value=True, external=False):
+    idx = self._GetAddrIndex(address)
+    self._MarkRange(idx, idx + 1, value=value, external=external)
+
   def _GetSize(self):
     return 2 ** (32 - self.network.prefixlen)
 
@@ -173,19 +318,29 @@ class AddressPool(object):
     """Check whether the network is full.
 
     """
-    return self.all_reservations.all()
+    return not self._GetFreeRanges()
 
   def GetReservedCount(self):
     """Get the count of reserved addresses.
 
     """
-    return self.all_reservations.count(True)
+    return self._numhosts - self.GetFreeCount()
 
   def GetFreeCount(self):
     """Get the count of unused addresses.
 
     """
-    return self.all_reservations.count(False)
+    return sum(end - start for (start, end) in self._GetFreeRanges())
+
+  def GetFreeRanges(self):
+    """Returns the ranges of unused addresses.
+
+    @rtype: list of tuples; (string, string)
+    @return: First and last address of each range of unused addresses
+
+    """
+    return [(self._GetAddress(start), self._GetAddress(end - 1))
+            for (start, end) in self._GetFreeRanges()]
 
   def GetMap(self):
     """Return a textual representation of the network's occupation status.
@@ -229,17 +384,82 @@ class AddressPool(object):
 
     self._Mark(address, value=False, external=external)
 
+  def _GetRangeIndices(self, first, last):
+    """Returns the half-open index range for an inclusive address range.
+
+    """
+    start = self._GetAddrIndex(first)
+    end = self._GetAddrIndex(last) + 1
+
+    if end <= start:
+      raise errors.AddressPoolError("Invalid address range %s-%s" %
+                                    (first, last))
+
+    return (start, end)
+
+  def ReserveRange(self, first, last, external=False):
+    """Mark a range of addresses as used.
+
+    Either all addresses are reserved or, if any of them is already reserved,
+    none.
+
+    @param first: First address of the range
+    @param last: Last address of the range (inclusive)
+
+    """
+    (start, end) = self._GetRangeIndices(first, last)
+
+    if external:
+      pool = self.ext_reservations
+    else:
+      pool = self.reservations
+
+    if pool[start:end].any():
+      if external:
+        msg = "IP range %s-%s is already partially externally reserved"
+      else:
+        msg = "IP range %s-%s is already partially used by instances"
+      raise errors.AddressPoolError(msg % (first, last))
+
+    self._MarkRange(start, end, external=external)
+
+  def ReleaseRange(self, first, last, external=False):
+    """Release a range of address reservations.
+
+    Either all addresses are released or, if any of them is not reserved,
+    none.
+
+    @param first: First address of the range
+    @param last: Last address of the range (inclusive)
+
+    """
+    (start, end) = self._GetRangeIndices(first, last)
+
+    if external:
+      pool = self.ext_reservations
+    else:
+      pool = self.reservations
+
+    if not pool[start:end].all():
+      if external:
+        msg = "IP range %s-%s is not completely externally reserved"
+      else:
+        msg = "IP range %s-%s is not completely used by instances"
+      raise errors.AddressPoolError(msg % (first, last))
+
+    self._MarkRange(start, end, value=False, external=external)
+
   def GetFreeAddress(self):
     """Returns the first available address.
 
     """
-    if self.IsFull():
+    ranges = self._GetFreeRanges()
+    if not ranges:
       raise errors.AddressPoolError("%s is full" % self.network)
 
-    idx = self.all_reservations.index(False)
-    address = str(self.network[idx])
-    self.Reserve(address)
-    return address
+    idx = ranges[0][0]
+    self._MarkRange(idx, idx + 1)
+    return self._GetAddress(idx)
 
   def GenerateFree(self):
     """Returns the first free address of the network.
@@ -247,9 +467,9 @@ class AddressPool(object):
     @raise errors.AddressPoolError: Pool is full
 
     """
-    idx = self.all_reservations.search(self.FREE, 1)
-    if idx:
-      return str(self.network[idx[0]])
+    ranges = self._GetFreeRanges()
+    if ranges:
+      return self._GetAddress(ranges[0][0])
     else:
       raise errors.AddressPoolError("%s is full" % self.network)
 
@@ -259,7 +479,7 @@ class AddressPool(object):
     """
     # pylint: disable=E1103
     idxs = self.ext_reservations.search(self.RESERVED)
-    return [str(self.network[idx]) for idx in idxs]
+    return [self._GetAddress(idx) for idx in idxs]
 
   @classmethod
   def InitializeNetwork(cls, net):
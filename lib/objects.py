@@ -2210,11 +2210,13 @@ class ImportExportStatus(ConfigObject):
     "listen_port",
     "connected",
     "progress_mbytes",
+    "progress_bytes",
     "progress_throughput",
     "progress_eta",
     "progress_percent",
     "exit_status",
     "error_message",
+    "checkpoint",
     ] + _TIMESTAMPS
 
 
@@ -2227,6 +2229,13 @@ class ImportExportOptions(ConfigObject):
   @ivar magic: Used to ensure the connection goes to the right disk
   @ivar ipv6: Whether to use IPv6
   @ivar connect_timeout: Number of seconds for establishing connection
+  @ivar sparse: Whether to transfer files and raw disks as sparse stream
+  @ivar resume_digest: Digest of the checkpoint a sparse transfer is resumed
+    from
+  @ivar chunk_size: Chunk size in bytes for recording chunk digests of
+    incremental exports
+  @ivar base_chunk_map: Chunk map of the previous export, unchanged chunks
+    are not transferred
 
   """
   __slots__ = [
@@ -2236,6 +2245,10 @@ class ImportExportOptions(ConfigObject):
     "magic",
     "ipv6",
     "connect_timeout",
+    "sparse",
+    "resume_digest",
+    "chunk_size",
+    "base_chunk_map",
     ]
 
 
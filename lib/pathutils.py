@@ -61,6 +61,8 @@ LOCALSTATEDIR = vcluster.AddNodePrefix(_constants.LOCALSTATEDIR)
 # Paths which don't change for a virtual cluster
 DAEMON_UTIL = _constants.PKGLIBDIR + "/daemon-util"
 IMPORT_EXPORT_DAEMON = _constants.PKGLIBDIR + "/import-export"
+SPARSE_COPY = _constants.PKGLIBDIR + "/sparse-copy"
+WIPE_DISKS = _constants.PKGLIBDIR + "/wipe-disks"
 KVM_CONSOLE_WRAPPER = _constants.PKGLIBDIR + "/tools/kvm-console-wrapper"
 KVM_IFUP = _constants.PKGLIBDIR + "/kvm-ifup"
 PREPARE_NODE_JOIN = _constants.PKGLIBDIR + "/prepare-node-join"
@@ -95,6 +97,7 @@ DISK_LINKS_DIR = RUN_DIR + "/instance-disks"
 SOCKET_DIR = RUN_DIR + "/socket"
 CRYPTO_KEYS_DIR = RUN_DIR + "/crypto"
 IMPORT_EXPORT_DIR = RUN_DIR + "/import-export"
+WIPE_DIR = RUN_DIR + "/wipe"
 INSTANCE_STATUS_FILE = RUN_DIR + "/instance-status"
 INSTANCE_REASON_DIR = RUN_DIR + "/instance-reason"
 #: User-id pool lock directory (used user IDs have a corresponding lock file in
@@ -121,6 +124,7 @@ XEN_IFUP_OS = CONF_DIR + "/xen-ifup-os"
 USER_SCRIPTS_DIR = CONF_DIR + "/scripts"
 VNC_PASSWORD_FILE = CONF_DIR + "/vnc-cluster-password"
 HOOKS_BASE_DIR = CONF_DIR + "/hooks"
+HOOKS_PARALLEL_FILE = CONF_DIR + "/hooks-parallel"
 FILE_STORAGE_PATHS_FILE = CONF_DIR + "/file-storage-paths"
 RESTRICTED_COMMANDS_DIR = CONF_DIR + "/restricted-commands"
 REPAIR_COMMANDS_DIR = CONF_DIR + "/node-repair-commands"
@@ -149,6 +153,14 @@ WATCHER_GROUP_STATE_FILE = DATA_DIR + "/watcher.%s.data"
 #: per-group processes
 WATCHER_GROUP_INSTANCE_STATUS_FILE = DATA_DIR + "/watcher.%s.instance-status"
 
+#: Cache of per-group instance status files already merged into
+#: L{INSTANCE_STATUS_FILE}, used to avoid re-reading unmodified files
+WATCHER_INSTANCE_STATUS_MERGE_CACHE = \
+  DATA_DIR + "/watcher.instance-status-merge-cache"
+
+#: Cache of file fingerprints computed by node verify
+NODE_VERIFY_FINGERPRINT_CACHE = DATA_DIR + "/node-verify-fingerprints"
+
 #: File containing Unix timestamp until which watcher should be paused
 WATCHER_PAUSEFILE = DATA_DIR + "/watcher.pause"
 
@@ -101,13 +101,17 @@ class BasicAuthenticator(auth.RapiAuthenticator):
 
   """
 
-  def __init__(self, user_fn=None):
+  def __init__(self, user_fn=None, cache=None):
     """Loads users file and initializes a watcher for it.
 
     @param user_fn: A function that should be called to obtain a user info
                     instead of the default users_file interface.
+    @type cache: L{cache.CredentialCache}
+    @param cache: Cache for verified passwords
 
     """
+    self._cache = cache
+
     if user_fn:
       self.user_fn = user_fn
       return
@@ -116,11 +120,41 @@ class BasicAuthenticator(auth.RapiAuthenticator):
     self.user_fn = self.users.Get
     # Setup file watcher (it'll be driven by asyncore)
     SetupFileWatcher(pathutils.RAPI_USERS_FILE,
-                     compat.partial(self.users.Load,
+                     compat.partial(self._LoadUsers,
                                     pathutils.RAPI_USERS_FILE))
 
     self.users.Load(pathutils.RAPI_USERS_FILE)
 
+  def _LoadUsers(self, filename):
+    """Reloads the users file and drops cached passwords.
+
+    """
+    self.users.Load(filename)
+
+    if self._cache:
+      self._cache.Clear()
+
+  def _VerifyPassword(self, user, username, password, realm):
+    """Verifies a user's password, using the cache if available.
+
+    """
+    # The stored password is part of the key, so entries for changed passwords
+    # don't match even before the cache is cleared
+    credentials = (realm, username, password, user.password)
+
+    if self._cache and self._cache.Get(credentials) is not None:
+      return True
+
+    if not (HttpServerRequestAuthentication
+              .VerifyBasicAuthPassword(username, password, user.password,
+                                       realm)):
+      return False
+
+    if self._cache:
+      self._cache.Set(credentials, username)
+
+    return True
+
   def ValidateRequest(self, req, handler_access, realm):
     """Checks whether a user can access a resource.
 
@@ -134,10 +168,8 @@ class BasicAuthenticator(auth.RapiAuthenticator):
                                          " password"))
 
     user = self.user_fn(request_username)
-    if not (user and HttpServerRequestAuthentication
-                       .VerifyBasicAuthPassword(request_username,
-                                                request_password,
-                                                user.password, realm)):
+    if not (user and self._VerifyPassword(user, request_username,
+                                          request_password, realm)):
       # Unknown user or password wrong
       return None
 
@@ -0,0 +1,184 @@
+#
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Cache for verified RAPI credentials.
+
+The RAPI daemon forks for every request. To let the request processes share
+verified credentials, the cache is kept in anonymous shared memory which has
+to be set up before forking. Entries are stored in fixed-size slots and keyed
+on a salted digest of the credentials, the credentials themselves are never
+stored. Only successful verifications are cached.
+
+"""
+
+import hashlib
+import hmac
+import mmap
+import os
+import struct
+import time
+
+
+#: Default time in seconds for which an entry is valid
+DEFAULT_TTL = 30
+
+#: Default number of entries
+DEFAULT_SLOTS = 1024
+
+#: Maximum length of a cached value, longer values are not cached
+_MAX_VALUE_LEN = 255
+
+#: Slot contents: key, expiry time, value length and value
+_SLOT = struct.Struct("=32sdB%ds" % _MAX_VALUE_LEN)
+
+#: Length of the checksum stored after every slot
+_CHECKSUM_LEN = 8
+
+_SLOT_SIZE = _SLOT.size + _CHECKSUM_LEN
+
+
+def _Checksum(data):
+  """Computes the checksum of slot contents.
+
+  Request processes write to the cache concurrently, the checksum detects
+  partially written slots.
+
+  """
+  return hashlib.sha1(data).digest()[:_CHECKSUM_LEN]
+
+
+class CredentialCache(object):
+  """Short-lived cache for verified credentials shared by forked processes.
+
+  """
+  def __init__(self, ttl=DEFAULT_TTL, slots=DEFAULT_SLOTS,
+               _time_fn=time.time):
+    """Initializes this class.
+
+    Must be called before forking request processes.
+
+    @type ttl: number
+    @param ttl: Time in seconds for which an entry is valid
+    @type slots: int
+    @param slots: Number of entries
+
+    """
+    assert slots > 0
+
+    self._ttl = ttl
+    self._slots = slots
+    self._time_fn = _time_fn
+
+    # The salt never leaves this process and its children, making digests
+    # useless outside of them
+    self._salt = os.urandom(32)
+
+    # Anonymous mappings are shared with child processes
+    self._mem = mmap.mmap(-1, slots * _SLOT_SIZE)
+
+  def _GetKey(self, credentials):
+    """Computes the cache key for credentials.
+
+    @type credentials: sequence
+    @param credentials: Strings or C{None}
+
+    """
+    parts = []
+    for value in credentials:
+      if value is None:
+        parts.append("-")
+      else:
+        if isinstance(value, unicode):
+          value = value.encode("utf-8")
+        parts.append("%d:%s" % (len(value), value))
+
+    return hmac.new(self._salt, ",".join(parts), hashlib.sha256).digest()
+
+  def _GetOffset(self, key):
+    """Returns the offset of the slot for a key.
+
+    """
+    return (struct.unpack("=I", key[:4])[0] % self._slots) * _SLOT_SIZE
+
+  def Get(self, credentials):
+    """Looks up previously verified credentials.
+
+    @type credentials: sequence
+    @param credentials: Credentials and everything else the verification
+      depends on
+    @rtype: string or None
+    @return: The value stored with L{Set} or C{None} if not found or expired
+
+    """
+    key = self._GetKey(credentials)
+    offset = self._GetOffset(key)
+
+    data = self._mem[offset:offset + _SLOT.size]
+    checksum = self._mem[offset + _SLOT.size:offset + _SLOT_SIZE]
+
+    if _Checksum(data) != checksum:
+      # Empty or partially written slot
+      return None
+
+    (slot_key, expires, length, value) = _SLOT.unpack(data)
+
+    if slot_key != key or expires < self._time_fn():
+      return None
+
+    return value[:length]
+
+  def Set(self, credentials, value):
+    """Stores successfully verified credentials.
+
+    @type credentials: sequence
+    @param credentials: Credentials and everything else the verification
+      depends on
+    @type value: string
+    @param value: Verification result, e.g. the user name
+
+    """
+    if isinstance(value, unicode):
+      value = value.encode("utf-8")
+
+    if len(value) > _MAX_VALUE_LEN:
+      return
+
+    key = self._GetKey(credentials)
+    offset = self._GetOffset(key)
+
+    data = _SLOT.pack(key, self._time_fn() + self._ttl, len(value), value)
+
+    self._mem[offset:offset + _SLOT_SIZE] = data + _Checksum(data)
+
+  def Clear(self):
+    """Removes all entries.
+
+    """
+    self._mem[:] = "\0" * len(self._mem)
@@ -353,11 +353,15 @@ class PamAuthenticator(auth.RapiAuthenticator):
 
   """
 
-  def __init__(self):
+  def __init__(self, cache=None):
     """Checks whether ctypes has been imported.
 
+    @type cache: L{cache.CredentialCache}
+    @param cache: Cache for successful PAM conversations
+
     """
     self.cf = CFunctions()
+    self._cache = cache
 
   def ValidateRequest(self, req, handler_access, _):
     """Checks whether a user can access a resource.
@@ -370,10 +374,22 @@ class PamAuthenticator(auth.RapiAuthenticator):
     authtok = req.request_headers.get(constants.HTTP_RAPI_PAM_CREDENTIAL, None)
     if handler_access is not None:
       handler_access_ = ','.join(handler_access)
-    return ValidateRequest(self.cf, MakeStringC(username),
-                           MakeStringC(handler_access_),
-                           MakeStringC(password),
-                           MakeStringC(DEFAULT_SERVICE_NAME),
-                           MakeStringC(authtok), MakeStringC(req.request_path),
-                           MakeStringC(req.request_method),
-                           MakeStringC(req.request_body))
+
+    params = (MakeStringC(username), MakeStringC(handler_access_),
+              MakeStringC(password), MakeStringC(DEFAULT_SERVICE_NAME),
+              MakeStringC(authtok), MakeStringC(req.request_path),
+              MakeStringC(req.request_method), MakeStringC(req.request_body))
+
+    # PAM modules may base their decision on any of the parameters, hence
+    # only identical requests can use a cached result
+    if self._cache:
+      user = self._cache.Get(params)
+      if user is not None:
+        return user
+
+    user = ValidateRequest(self.cf, *params)
+
+    if self._cache and user is not None:
+      self._cache.Set(params, user)
+
+    return user
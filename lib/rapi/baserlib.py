@@ -45,6 +45,7 @@ from ganeti import http
 from ganeti import errors
 from ganeti import compat
 from ganeti import constants
+from ganeti import serializer
 from ganeti import utils
 
 
@@ -105,6 +106,26 @@ def _BuildOpcodeAttributes():
 OPCODE_ATTRS = _BuildOpcodeAttributes()
 
 
+class StreamedResponse(object):
+  """Response body which is sent while it's being produced.
+
+  Handlers can return an instance of this class instead of data to be
+  encoded as JSON.
+
+  """
+  def __init__(self, content_type, chunks):
+    """Initializes this class.
+
+    @type content_type: string
+    @param content_type: Value for the C{Content-Type} response header
+    @type chunks: iterable of strings
+    @param chunks: Response body, each chunk is sent as soon as it's produced
+
+    """
+    self.content_type = content_type
+    self.chunks = chunks
+
+
 def BuildUriList(ids, uri_format, uri_fields=("name", "uri")):
   """Builds a URI list as used by index resources.
 
@@ -413,6 +434,35 @@ class ResourceBase(object):
       raise http.HttpInternalServerError("Internal error: no permission to"
                                          " connect to the master daemon")
 
+  def GetETag(self):
+    """Returns the entity tag for the current GET request.
+
+    Resources whose GET result only depends on the cluster configuration
+    can override this, usually with L{_GetConfigETag}, to allow clients to
+    send conditional requests. The default is not to use entity tags.
+
+    @rtype: string or None
+
+    """
+    # Could be a function, pylint: disable=R0201
+    return None
+
+  def _GetConfigETag(self):
+    """Builds an entity tag from the configuration serial number.
+
+    The tag is only valid for as long as the configuration isn't modified
+    and is specific to the resource, its URL variables and query arguments.
+
+    @rtype: string or None
+
+    """
+    (serial, ) = self.GetClient().QueryConfigValues(["config_serial"])
+    if serial is None:
+      return None
+
+    return MakeETag(self.__class__.__name__, self.items, self.queryargs,
+                    serial)
+
   def GetAuthReason(self):
     return (constants.OPCODE_REASON_SRC_RLIB2,
             constants.OPCODE_REASON_AUTH_USER + self.auth_user,
@@ -452,6 +502,25 @@ class ResourceBase(object):
                                     " daemon: %s" % err)
 
 
+def MakeETag(resource, items, queryargs, serial):
+  """Builds a strong entity tag for a resource.
+
+  @type resource: string
+  @param resource: Name of the resource
+  @type items: list
+  @param items: Variables encoded in the URL
+  @type queryargs: dict
+  @param queryargs: Query arguments
+  @param serial: Serial number the resource state is derived from
+  @rtype: string
+
+  """
+  fp = compat.sha1_hash()
+  fp.update(serializer.DumpJson([resource, list(items),
+                                 sorted(queryargs.items()), serial]))
+  return "\"%s\"" % fp.hexdigest()
+
+
 def GetResourceOpcodes(cls):
   """Returns all opcodes used by a resource.
 
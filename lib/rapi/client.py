@@ -42,6 +42,7 @@
 # No Ganeti-specific modules should be imported. The RAPI client is supposed to
 # be standalone.
 
+import copy
 import logging
 import socket
 import threading
@@ -68,6 +69,12 @@ HTTP_OK = 200
 HTTP_NOT_FOUND = 404
 HTTP_APP_JSON = "application/json"
 
+#: Content codings requested from the server, decoded by cURL
+_ACCEPT_ENCODING = "gzip, deflate"
+
+#: Default number of concurrent requests sent by a L{RapiBatch}
+DEFAULT_BATCH_CONCURRENCY = 10
+
 REPLACE_DISK_PRI = "replace_on_primary"
 REPLACE_DISK_SECONDARY = "replace_on_secondary"
 REPLACE_DISK_CHG = "replace_new_secondary"
@@ -205,6 +212,20 @@ class CertificateError(GanetiApiError):
   pass
 
 
+def _MakeCurlError(err):
+  """Converts a cURL error to an exception of this module.
+
+  @type err: pycurl.error
+  @rtype: L{GanetiApiError}
+
+  """
+  if err.args[0] in _CURL_SSL_CERT_ERRORS:
+    return CertificateError("SSL certificate error %s" % err,
+                            code=err.args[0])
+
+  return GanetiApiError(str(err), code=err.args[0])
+
+
 def EpochNano():
   """Return the current timestamp expressed as number of nanoseconds since the
   unix epoch
@@ -382,6 +403,244 @@ def GenericCurlConfig(verbose=False, use_signal=False,
   return _ConfigCurl
 
 
+class _SuspendCall(Exception):
+  """Internal exception to suspend a batched call until a request is done.
+
+  Deliberately not derived from L{Error} so client methods don't catch it.
+
+  """
+
+
+class RapiFuture(object):
+  """Result of a call added to a L{RapiBatch}.
+
+  """
+  def __init__(self, batch):
+    """Initializes this class.
+
+    """
+    self._batch = batch
+    self._done = False
+    self._result = None
+    self._error = None
+
+  def _SetResult(self, result, error):
+    """Stores the outcome of the call.
+
+    """
+    assert not self._done
+    self._done = True
+    self._result = result
+    self._error = error
+
+  def Done(self):
+    """Returns whether the call has finished.
+
+    """
+    return self._done
+
+  def Result(self):
+    """Returns the result of the call.
+
+    If the batch hasn't been executed yet, this is done first.
+
+    @raise Error: If the call failed
+
+    """
+    if not self._done:
+      self._batch.Execute()
+
+    assert self._done
+
+    if self._error:
+      raise self._error # pylint: disable=E0702
+
+    return self._result
+
+
+class _BatchCall(object):
+  """A call to a client method in a batch.
+
+  Client methods send their requests one after another. To wait for
+  concurrent requests, the method is called again whenever a request has
+  finished, replaying the responses received so far, until it either sends a
+  new request or returns.
+
+  """
+  def __init__(self, client, fn, args, kwargs, future):
+    """Initializes this class.
+
+    """
+    self._client = client
+    self._fn = fn
+    self._args = args
+    self._kwargs = kwargs
+    self._responses = []
+    self.future = future
+
+  def AddResponse(self, result, error):
+    """Records the outcome of the most recent request.
+
+    """
+    self._responses.append((result, error))
+
+  def Resume(self):
+    """Continues the call until it sends another request or finishes.
+
+    @return: Arguments for L{GanetiRapiClient._StartRequest} or C{None} if the
+      call finished
+
+    """
+    responses = iter(self._responses)
+    request = []
+
+    def _SendRequest(method, path, query, content):
+      try:
+        (result, error) = responses.next()
+      except StopIteration:
+        request.extend([method, path, query, content])
+        raise _SuspendCall()
+
+      if error:
+        raise error # pylint: disable=E0702
+
+      return result
+
+    # Client methods call other client methods, hence the replaying function
+    # is set on a copy of the client
+    client = copy.copy(self._client)
+    client._SendRequest = _SendRequest # pylint: disable=W0212
+
+    try:
+      result = self._fn(client, *self._args, **self._kwargs)
+    except _SuspendCall:
+      return request
+    except Exception, err: # pylint: disable=W0703
+      self.future._SetResult(None, err) # pylint: disable=W0212
+    else:
+      self.future._SetResult(result, None) # pylint: disable=W0212
+
+    return None
+
+
+class RapiBatch(object):
+  """Sends requests of multiple client calls concurrently.
+
+  Any method of L{GanetiRapiClient} can be called on a batch. Instead of the
+  method's result a L{RapiFuture} is returned. All calls are processed when
+  L{Execute} or the C{Result} method of one of the futures is called. Methods
+  waiting for jobs shouldn't be used in batches.
+
+  Example::
+
+    batch = client.CreateBatch()
+    futures = [batch.GetInstance(name) for name in names]
+    infos = [future.Result() for future in futures]
+
+  """
+  def __init__(self, client, max_concurrent):
+    """Initializes this class.
+
+    @type client: L{GanetiRapiClient}
+    @param client: Client used for sending requests
+    @type max_concurrent: int
+    @param max_concurrent: Maximum number of concurrent requests
+
+    """
+    assert max_concurrent > 0
+
+    self._client = client
+    self._max_concurrent = max_concurrent
+    self._calls = []
+
+  def __getattr__(self, name):
+    """Returns a function adding a call of a client method to the batch.
+
+    """
+    if name.startswith("_"):
+      raise AttributeError(name)
+
+    fn = getattr(GanetiRapiClient, name)
+
+    def wrapper(*args, **kwargs):
+      future = RapiFuture(self)
+      self._calls.append(_BatchCall(self._client, fn, args, kwargs, future))
+      return future
+
+    return wrapper
+
+  def Execute(self):
+    """Processes all calls added to the batch until they're finished.
+
+    """
+    client = self._client
+    (calls, self._calls) = (self._calls, [])
+
+    multi = client._GetCurlMulti() # pylint: disable=W0212
+    active = {}
+
+    while calls or active:
+      # Start new requests
+      while calls and len(active) < self._max_concurrent:
+        call = calls.pop(0)
+        request = call.Resume()
+        if request is not None:
+          curl = client._GetCurl() # pylint: disable=W0212
+          buf = client._StartRequest(curl, *request) # pylint: disable=W0212
+          active[curl] = (call, buf)
+          multi.add_handle(curl)
+
+      if not active:
+        break
+
+      (ret, _) = multi.perform()
+      assert ret in (pycurl.E_MULTI_OK, pycurl.E_CALL_MULTI_PERFORM)
+
+      if ret == pycurl.E_CALL_MULTI_PERFORM:
+        # cURL wants to be called again
+        continue
+
+      finished = []
+      resumed = []
+
+      while True:
+        (remaining_messages, successful, failed) = multi.info_read()
+
+        finished.extend((curl, None) for curl in successful)
+        finished.extend((curl, _MakeCurlError(pycurl.error(errnum, errmsg)))
+                        for (curl, errnum, errmsg) in failed)
+
+        if remaining_messages == 0:
+          break
+
+      for (curl, error) in finished:
+        multi.remove_handle(curl)
+        client._ResetCurl(curl) # pylint: disable=W0212
+
+        (call, buf) = active.pop(curl)
+
+        if error:
+          call.AddResponse(None, error)
+        else:
+          try:
+            result = client._FinishRequest(curl, buf) # pylint: disable=W0212
+          except Exception, err: # pylint: disable=W0703
+            call.AddResponse(None, err)
+          else:
+            call.AddResponse(result, None)
+
+          client._ReleaseCurl(curl) # pylint: disable=W0212
+
+        resumed.append(call)
+
+      # Continue calls right away
+      calls[:0] = resumed
+
+      if not finished:
+        # Wait for I/O
+        multi.select(1.0)
+
+
 class GanetiRapiClient(object): # pylint: disable=R0904
   """Ganeti RAPI client.
 
@@ -391,7 +650,8 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
   def __init__(self, host, port=GANETI_RAPI_PORT,
                username=None, password=None, logger=logging,
-               curl_config_fn=None, curl_factory=None):
+               curl_config_fn=None, curl_factory=None, max_connections=None,
+               curl_multi_factory=None):
     """Initializes this class.
 
     @type host: string
@@ -405,6 +665,10 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     @type curl_config_fn: callable
     @param curl_config_fn: Function to configure C{pycurl.Curl} object
     @param logger: Logging object
+    @type max_connections: int
+    @param max_connections: If given, up to this number of connections are
+      kept open and reused for subsequent requests, otherwise a new
+      connection is opened for every request
 
     """
     self._username = username
@@ -412,6 +676,10 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     self._logger = logger
     self._curl_config_fn = curl_config_fn
     self._curl_factory = curl_factory
+    self._curl_multi_factory = curl_multi_factory
+    self._max_connections = max_connections
+    self._curl_pool = []
+    self._curl_multi = None
 
     try:
       socket.inet_pton(socket.AF_INET6, host)
@@ -445,6 +713,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     curl.setopt(pycurl.USERAGENT, self.USER_AGENT)
     curl.setopt(pycurl.SSL_VERIFYHOST, 0)
     curl.setopt(pycurl.SSL_VERIFYPEER, False)
+    curl.setopt(pycurl.ENCODING, _ACCEPT_ENCODING)
     curl.setopt(pycurl.HTTPHEADER, [
       "Accept: %s" % HTTP_APP_JSON,
       "Content-type: %s" % HTTP_APP_JSON,
@@ -493,32 +762,36 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
     return result
 
-  def _SendRequest(self, method, path, query, content):
-    """Sends an HTTP request.
+  def _GetCurl(self):
+    """Returns an idle cURL object, creating a new one if necessary.
 
-    This constructs a full URL, encodes and decodes HTTP bodies, and
-    handles invalid responses in a pythonic way.
+    """
+    try:
+      return self._curl_pool.pop()
+    except IndexError:
+      return self._CreateCurl()
 
-    @type method: string
-    @param method: HTTP method to use
-    @type path: string
-    @param path: HTTP URL path
-    @type query: list of two-tuples
-    @param query: query arguments to pass to urllib.urlencode
-    @type content: str or None
-    @param content: HTTP body content
+  def _ReleaseCurl(self, curl):
+    """Returns a cURL object to the pool of idle objects.
 
-    @rtype: str
-    @return: JSON-Decoded response
+    The object is kept for later requests, and with it its open connection,
+    only if the client was created with C{max_connections}.
 
-    @raises CertificateError: If an invalid SSL certificate is found
-    @raises GanetiApiError: If an invalid response is returned
+    """
+    if self._max_connections and len(self._curl_pool) < self._max_connections:
+      self._curl_pool.append(curl)
+
+  def _StartRequest(self, curl, method, path, query, content):
+    """Configures a cURL object for a request.
+
+    @type curl: pycurl.Curl
+    @param curl: cURL object
+    @rtype: StringIO
+    @return: Buffer for the response body
 
     """
     assert path.startswith("/")
 
-    curl = self._CreateCurl()
-
     if content is not None:
       encoded_content = self._json_encoder.encode(content)
     else:
@@ -544,22 +817,30 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     curl.setopt(pycurl.POSTFIELDS, str(encoded_content))
     curl.setopt(pycurl.WRITEFUNCTION, encoded_resp_body.write)
 
-    try:
-      # Send request and wait for response
-      try:
-        curl.perform()
-      except pycurl.error, err:
-        if err.args[0] in _CURL_SSL_CERT_ERRORS:
-          raise CertificateError("SSL certificate error %s" % err,
-                                 code=err.args[0])
+    return encoded_resp_body
 
-        raise GanetiApiError(str(err), code=err.args[0])
-    finally:
-      # Reset settings to not keep references to large objects in memory
-      # between requests
-      curl.setopt(pycurl.POSTFIELDS, "")
-      curl.setopt(pycurl.WRITEFUNCTION, lambda _: None)
+  @staticmethod
+  def _ResetCurl(curl):
+    """Resets request-specific settings of a cURL object.
+
+    """
+    # Reset settings to not keep references to large objects in memory
+    # between requests
+    curl.setopt(pycurl.POSTFIELDS, "")
+    curl.setopt(pycurl.WRITEFUNCTION, lambda _: None)
 
+  @staticmethod
+  def _FinishRequest(curl, encoded_resp_body):
+    """Decodes the response of a completed request.
+
+    @type curl: pycurl.Curl
+    @param curl: cURL object
+    @type encoded_resp_body: StringIO
+    @param encoded_resp_body: Buffer returned by L{_StartRequest}
+    @return: JSON-Decoded response
+    @raises GanetiApiError: If an invalid response is returned
+
+    """
     # Get HTTP response code
     http_code = curl.getinfo(pycurl.RESPONSE_CODE)
 
@@ -582,6 +863,79 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
     return response_content
 
+  def _SendRequest(self, method, path, query, content):
+    """Sends an HTTP request.
+
+    This constructs a full URL, encodes and decodes HTTP bodies, and
+    handles invalid responses in a pythonic way.
+
+    @type method: string
+    @param method: HTTP method to use
+    @type path: string
+    @param path: HTTP URL path
+    @type query: list of two-tuples
+    @param query: query arguments to pass to urllib.urlencode
+    @type content: str or None
+    @param content: HTTP body content
+
+    @rtype: str
+    @return: JSON-Decoded response
+
+    @raises CertificateError: If an invalid SSL certificate is found
+    @raises GanetiApiError: If an invalid response is returned
+
+    """
+    curl = self._GetCurl()
+
+    encoded_resp_body = self._StartRequest(curl, method, path, query, content)
+
+    try:
+      # Send request and wait for response
+      try:
+        curl.perform()
+      except pycurl.error, err:
+        raise _MakeCurlError(err)
+    finally:
+      self._ResetCurl(curl)
+
+    try:
+      return self._FinishRequest(curl, encoded_resp_body)
+    finally:
+      self._ReleaseCurl(curl)
+
+  def _GetCurlMulti(self):
+    """Returns a cURL multi object for processing concurrent requests.
+
+    """
+    if self._curl_multi:
+      return self._curl_multi
+
+    if self._curl_multi_factory:
+      multi = self._curl_multi_factory()
+    else:
+      multi = pycurl.CurlMulti()
+
+    if self._max_connections:
+      # Keep the multi object, and the connections cached in it
+      self._curl_multi = multi
+
+    return multi
+
+  def CreateBatch(self, max_concurrent=None):
+    """Creates a batch for sending requests concurrently.
+
+    @type max_concurrent: int
+    @param max_concurrent: Maximum number of concurrent requests, defaults to
+      C{max_connections} as given to the constructor or to
+      L{DEFAULT_BATCH_CONCURRENCY}
+    @rtype: L{RapiBatch}
+
+    """
+    if max_concurrent is None:
+      max_concurrent = self._max_connections or DEFAULT_BATCH_CONCURRENCY
+
+    return RapiBatch(self, max_concurrent)
+
   def GetVersion(self):
     """Gets the Remote API version running on the cluster.
 
@@ -1550,6 +1904,71 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              "/%s/jobs/%s/wait" % (GANETI_RAPI_VERSION, job_id),
                              None, body)
 
+  def WaitForJobsChange(self, jobs):
+    """Waits for changes on any of multiple jobs.
+
+    @type jobs: dict
+    @param jobs: Job IDs as keys, tuples of previously received status and
+      highest log serial number (both can be C{None}) as values
+    @return: C{None} if no changes have been detected and a dict with the
+      changed jobs' status and new log entries by job ID otherwise
+    @rtype: dict
+
+    """
+    body = {
+      "jobs": dict((str(job_id), {"status": status, "log_serial": serial})
+                   for (job_id, (status, serial)) in jobs.items()),
+      }
+
+    result = self._SendRequest(HTTP_GET,
+                               "/%s/jobs/wait" % GANETI_RAPI_VERSION,
+                               None, body)
+
+    if result is None:
+      return None
+
+    return dict((int(job_id), change)
+                for (job_id, change) in result["jobs"].items())
+
+  def WaitForJobsCompletion(self, job_ids, log_fn=None):
+    """Waits for multiple jobs to finish.
+
+    Only one request is sent at a time for all jobs, and it returns as soon as
+    any of them changed.
+
+    @type job_ids: list
+    @param job_ids: Job IDs to wait for
+    @type log_fn: callable
+    @param log_fn: Called with job ID and log entry for every new job log entry
+    @rtype: dict
+    @return: C{True} for every job which succeeded or C{False} if it failed, by
+      job ID
+
+    """
+    pending = dict((int(job_id), (None, None)) for job_id in job_ids)
+    result = {}
+
+    while pending:
+      changes = self.WaitForJobsChange(pending)
+      if changes is None:
+        continue
+
+      for (job_id, change) in changes.items():
+        (_, serial) = pending[job_id]
+
+        for entry in change["log_entries"]:
+          serial = entry[0]
+          if log_fn:
+            log_fn(job_id, entry)
+
+        if change["status"] in JOB_STATUS_FINALIZED:
+          result[job_id] = (change["status"] == JOB_STATUS_SUCCESS)
+          del pending[job_id]
+        else:
+          pending[job_id] = (change["status"], serial)
+
+    return result
+
   def CancelJob(self, job_id, dry_run=False):
     """Cancels a job.
 
@@ -64,6 +64,8 @@ PUT should be prefered over POST.
 
 # C0103: Invalid name, since the R_* names are not conforming
 
+import time
+
 import OpenSSL
 
 from ganeti import opcodes
@@ -74,6 +76,10 @@ from ganeti import cli
 from ganeti import rapi
 from ganeti import ht
 from ganeti import compat
+from ganeti import errors
+from ganeti import qlang
+from ganeti import utils
+from ganeti import serializer
 from ganeti.rapi import baserlib
 
 
@@ -175,16 +181,35 @@ _NODE_MIGRATE_REQV1 = "node-migrate-reqv1"
 # Feature string for node evacuation with LU-generated jobs
 _NODE_EVAC_RES1 = "node-evac-res1"
 
+# Feature string for field selection, filters and pagination on list resources
+_LIST_QUERY1 = "list-query1"
+
+# Feature string for multi-job wait and job event stream support
+_JOBS_WAIT1 = "jobs-wait1"
+
 ALL_FEATURES = compat.UniqueFrozenset([
   _INST_CREATE_REQV1,
   _INST_REINSTALL_REQV1,
   _NODE_MIGRATE_REQV1,
   _NODE_EVAC_RES1,
+  _LIST_QUERY1,
+  _JOBS_WAIT1,
+  ])
+
+# Query arguments handled by L{_R_QueryList}
+_LIST_QUERY_ARGS = compat.UniqueFrozenset([
+  "fields",
+  "filter",
+  "limit",
+  "cursor",
   ])
 
 # Timeout for /2/jobs/[job_id]/wait. Gives job up to 10 seconds to change.
 _WFJC_TIMEOUT = 10
 
+# Delay between checks for changes of multiple jobs: start, factor and limit
+_JOBS_POLL_DELAY = (0.1, 1.5, 1.0)
+
 
 # FIXME: For compatibility we update the beparams/memory field. Needs to be
 #        removed in Ganeti 2.8
@@ -561,15 +586,403 @@ class R_2_jobs_id_wait(baserlib.ResourceBase):
       }
 
 
-class R_2_nodes(baserlib.OpcodeResource):
+class _JobChangeTracker(object):
+  """Tracks status and log changes of multiple jobs.
+
+  All jobs are queried using a single LUXI call. Jobs are no longer tracked
+  once their finalized status has been reported.
+
+  """
+  _FIELDS = ["id", "status", "oplog"]
+
+  def __init__(self, jobs):
+    """Initializes this class.
+
+    @type jobs: dict
+    @param jobs: Job IDs as keys, tuples of previously seen status and highest
+      log serial number (both can be C{None}) as values
+
+    """
+    self._jobs = dict(jobs)
+
+  def HasPending(self):
+    """Returns whether there are jobs left to be tracked.
+
+    """
+    return bool(self._jobs)
+
+  def Update(self, client):
+    """Queries the jobs and returns their changes.
+
+    @type client: L{luxi.Client}
+    @rtype: list of dict
+    @return: For every changed job its ID, status and new log entries
+    @raise http.HttpNotFound: If a job doesn't exist
+
+    """
+    job_ids = sorted(self._jobs.keys())
+
+    changes = []
+
+    for (job_id, row) in zip(job_ids, client.QueryJobs(job_ids, self._FIELDS)):
+      if row is None:
+        raise http.HttpNotFound("Job %s not found" % job_id)
+
+      (_, status, oplog) = row
+      (prev_status, prev_serial) = self._jobs[job_id]
+
+      log_entries = [entry for oplog_entries in oplog
+                     for entry in oplog_entries
+                     if prev_serial is None or entry[0] > prev_serial]
+
+      if log_entries:
+        serial = max(entry[0] for entry in log_entries)
+      else:
+        serial = prev_serial
+
+      if status != prev_status or log_entries:
+        changes.append({
+          "id": job_id,
+          "status": status,
+          "log_entries": log_entries,
+          })
+
+      if status in constants.JOBS_FINALIZED:
+        del self._jobs[job_id]
+      else:
+        self._jobs[job_id] = (status, serial)
+
+    return changes
+
+
+def _FormatEvent(event, data):
+  """Formats an event for a server-sent event stream.
+
+  @type event: string
+  @param event: Event type
+  @param data: Event data, encoded as JSON
+
+  """
+  return "event: %s\ndata: %s\n\n" % (event,
+                                      serializer.DumpJson(data).rstrip("\n"))
+
+
+class R_2_jobs_wait(baserlib.ResourceBase):
+  """/2/jobs/wait resource.
+
+  """
+  # Like /2/jobs/[job_id]/wait this gives access to sensitive information and
+  # blocks machine resources
+  GET_ACCESS = [rapi.RAPI_ACCESS_WRITE]
+
+  def GET(self):
+    """Waits for changes of any of multiple jobs.
+
+    @return: C{None} if no job changed until the timeout, otherwise a
+      dictionary with the changes of each changed job by job ID
+
+    """
+    jobs = self.getBodyParameter("jobs")
+
+    if not isinstance(jobs, dict):
+      raise http.HttpBadRequest("The 'jobs' parameter should be a dictionary")
+
+    prev = {}
+    for (job_id, info) in jobs.items():
+      if not isinstance(info, dict):
+        raise http.HttpBadRequest("Job information for job %s should be a"
+                                  " dictionary" % job_id)
+
+      prev_status = info.get("status", None)
+      prev_serial = info.get("log_serial", None)
+
+      if not (prev_status is None or isinstance(prev_status, basestring)):
+        raise http.HttpBadRequest("The status of job %s should be a string" %
+                                  job_id)
+
+      if not (prev_serial is None or isinstance(prev_serial, (int, long))):
+        raise http.HttpBadRequest("The log serial of job %s should be a"
+                                  " number" % job_id)
+
+      try:
+        prev[int(job_id)] = (prev_status, prev_serial)
+      except ValueError:
+        raise http.HttpBadRequest("Invalid job ID '%s'" % job_id)
+
+    tracker = _JobChangeTracker(prev)
+    client = self.GetClient()
+
+    def _CheckJobs():
+      changes = tracker.Update(client)
+      if not changes and tracker.HasPending():
+        raise utils.RetryAgain()
+      return changes
+
+    try:
+      changes = utils.Retry(_CheckJobs, _JOBS_POLL_DELAY, _WFJC_TIMEOUT)
+    except utils.RetryTimeout:
+      changes = None
+
+    if not changes:
+      return None
+
+    return {
+      "jobs": dict((str(change["id"]), change) for change in changes),
+      }
+
+
+class R_2_jobs_events(baserlib.ResourceBase):
+  """/2/jobs/events resource.
+
+  """
+  GET_ACCESS = [rapi.RAPI_ACCESS_WRITE]
+
+  @staticmethod
+  def _StreamEvents(tracker, client, changes, _sleep_fn=time.sleep):
+    """Generates events until all jobs are finalized.
+
+    """
+    idle = 0
+    delay = _JOBS_POLL_DELAY[0]
+
+    while True:
+      for change in changes:
+        yield _FormatEvent("job", change)
+
+      if not tracker.HasPending():
+        break
+
+      if changes:
+        idle = 0
+        delay = _JOBS_POLL_DELAY[0]
+      elif idle >= _WFJC_TIMEOUT:
+        # Comments are ignored by clients, but detect closed connections
+        yield ": keepalive\n\n"
+        idle = 0
+
+      _sleep_fn(delay)
+      idle += delay
+      delay = min(delay * _JOBS_POLL_DELAY[1], _JOBS_POLL_DELAY[2])
+
+      changes = tracker.Update(client)
+
+    yield _FormatEvent("end", None)
+
+  def GET(self):
+    """Streams status and log changes of jobs as server-sent events.
+
+    A C{job} event is sent with the status and new log entries whenever a job
+    changes, starting with the current state of each job. The stream ends
+    with an C{end} event when all jobs are finalized.
+
+    """
+    try:
+      job_ids = [int(i) for i in _SplitQueryFields(self.queryargs["jobs"][0])]
+    except KeyError:
+      raise http.HttpBadRequest("Missing 'jobs' query argument")
+    except ValueError:
+      raise http.HttpBadRequest("Invalid job ID in 'jobs' query argument")
+
+    tracker = _JobChangeTracker(dict((job_id, (None, None))
+                                     for job_id in job_ids))
+    client = self.GetClient()
+
+    # Query once before starting the stream so errors can be reported
+    changes = tracker.Update(client)
+
+    return baserlib.StreamedResponse(http.HTTP_TEXT_EVENT_STREAM,
+                                     self._StreamEvents(tracker, client,
+                                                        changes))
+
+
+def _CheckFilterFields(qfilter, fields):
+  """Checks whether a query filter only refers to the given fields.
+
+  @type qfilter: list
+  @param qfilter: Query filter
+  @type fields: list of string
+  @param fields: Allowed field names
+  @raise http.HttpBadRequest: When the filter refers to another field
+
+  """
+  op = qfilter[0]
+
+  if op in (qlang.OP_OR, qlang.OP_AND):
+    for operand in qfilter[1:]:
+      _CheckFilterFields(operand, fields)
+  elif op == qlang.OP_NOT:
+    _CheckFilterFields(qfilter[1], fields)
+  elif qfilter[1] not in fields:
+    # All other operators take the field name as their first operand
+    raise http.HttpBadRequest("Can't filter on field '%s'" % qfilter[1])
+
+
+def _GetQueryValue(status, value):
+  """Returns the value of a query result field.
+
+  @type status: int
+  @param status: Result status, one of L{constants.RS_ALL}
+  @return: The value or C{None} if the status isn't L{constants.RS_NORMAL}
+
+  """
+  if status == constants.RS_NORMAL:
+    return value
+
+  return None
+
+
+class _R_QueryList(baserlib.OpcodeResource):
+  """Quasiclass for list resources with field selection and pagination.
+
+  If any of the C{fields}, C{filter}, C{limit} or C{cursor} query arguments
+  is given, the list is retrieved using a single LUXI query with the filter
+  pushed down to the master daemon. Items are ordered by name; the name of
+  the last returned item can be passed as C{cursor} to retrieve the next
+  page. When inheriting this class you must define the C{LIST_*} variables.
+
+  @cvar LIST_WHAT: Resource type to query, one of L{constants.QR_VIA_LUXI}
+  @cvar LIST_FIELDS: Fields which can be selected and filtered on
+  @cvar LIST_URI: Format for item URIs in non-bulk results
+  @cvar LIST_URI_FIELDS: Field names for item URIs in non-bulk results
+
+  """
+  LIST_WHAT = None
+  LIST_FIELDS = None
+  LIST_URI = None
+  LIST_URI_FIELDS = None
+
+  def _UseListQuery(self):
+    """Checks whether the request uses any of the list query arguments.
+
+    """
+    return bool(_LIST_QUERY_ARGS.intersection(self.queryargs))
+
+  @staticmethod
+  def _FormatListItem(item):
+    """Post-processes an item returned in bulk mode.
+
+    """
+    return item
+
+  def _GetListQueryFilter(self):
+    """Builds the query filter from the C{filter} and C{cursor} arguments.
+
+    """
+    qfilter = None
+
+    text = self._checkStringVariable("filter")
+    if text:
+      try:
+        qfilter = qlang.ParseFilter(text)
+      except errors.QueryFilterParseError, err:
+        raise http.HttpBadRequest(str(err))
+
+      _CheckFilterFields(qfilter, self.LIST_FIELDS)
+
+    cursor = self._checkStringVariable("cursor")
+    if cursor:
+      cursor_filter = [qlang.OP_GT, "name", cursor]
+      if qfilter is None:
+        qfilter = cursor_filter
+      else:
+        qfilter = [qlang.OP_AND, qfilter, cursor_filter]
+
+    return qfilter
+
+  def _GetListPage(self):
+    """Queries a page of the list.
+
+    @return: A list of items or, if C{limit} is given, a dictionary with the
+      items and the cursor for the next page (C{None} after the last page)
+
+    """
+    if "fields" in self.queryargs:
+      fields = _GetQueryFields(self.queryargs)
+      unknown = set(fields) - set(self.LIST_FIELDS)
+      if unknown:
+        raise http.HttpBadRequest("Unknown fields: %s" %
+                                  utils.CommaJoin(sorted(unknown)))
+      bulk = True
+    else:
+      bulk = self.useBulk()
+      if bulk:
+        fields = self.LIST_FIELDS
+      else:
+        fields = ["name"]
+
+    if "limit" in self.queryargs:
+      limit = self._checkIntVariable("limit")
+      if limit < 1:
+        raise http.HttpBadRequest("Limit must be a positive number")
+    else:
+      limit = None
+
+    # The name is needed for ordering and the cursor
+    if "name" in fields:
+      qfields = fields
+    else:
+      qfields = fields + ["name"]
+    name_idx = qfields.index("name")
+
+    response = self.GetClient().Query(self.LIST_WHAT, qfields,
+                                      self._GetListQueryFilter())
+
+    # Like the legacy query calls, return None for unavailable values
+    rows = [[_GetQueryValue(status, value) for (status, value) in row]
+            for row in response.data]
+    rows.sort(key=lambda row: row[name_idx])
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+      del rows[limit:]
+      next_cursor = rows[-1][name_idx]
+
+    if bulk:
+      items = [self._FormatListItem(baserlib.MapFields(fields,
+                                                       row[:len(fields)]))
+               for row in rows]
+    else:
+      items = baserlib.BuildUriList([row[name_idx] for row in rows],
+                                    self.LIST_URI,
+                                    uri_fields=self.LIST_URI_FIELDS)
+
+    if limit is None:
+      return items
+
+    return {
+      "items": items,
+      "next_cursor": next_cursor,
+      }
+
+
+class R_2_nodes(_R_QueryList):
   """/2/nodes resource.
 
   """
+  LIST_WHAT = constants.QR_NODE
+  LIST_FIELDS = N_FIELDS
+  LIST_URI = "/2/nodes/%s"
+  LIST_URI_FIELDS = ("id", "uri")
+
+  def GetETag(self):
+    """Returns an entity tag for the configuration-only node list.
+
+    """
+    if self.useBulk() or "fields" in self.queryargs:
+      # Bulk data contains runtime information
+      return None
+    if "filter" in self.queryargs:
+      # Filters can refer to runtime information
+      return None
+    return self._GetConfigETag()
 
   def GET(self):
     """Returns a list of all nodes.
 
     """
+    if self._UseListQuery():
+      return self._GetListPage()
+
     client = self.GetClient()
 
     if self.useBulk():
@@ -827,10 +1240,15 @@ class R_2_nodes_name_storage_repair(baserlib.OpcodeResource):
       })
 
 
-class R_2_networks(baserlib.OpcodeResource):
+class R_2_networks(_R_QueryList):
   """/2/networks resource.
 
   """
+  LIST_WHAT = constants.QR_NETWORK
+  LIST_FIELDS = NET_FIELDS
+  LIST_URI = "/2/networks/%s"
+  LIST_URI_FIELDS = ("name", "uri")
+
   POST_OPCODE = opcodes.OpNetworkAdd
   POST_RENAME = {
     "name": "network_name",
@@ -849,6 +1267,9 @@ class R_2_networks(baserlib.OpcodeResource):
     """Returns a list of all networks.
 
     """
+    if self._UseListQuery():
+      return self._GetListPage()
+
     client = self.GetClient()
 
     if self.useBulk():
@@ -942,10 +1363,15 @@ class R_2_networks_name_modify(baserlib.OpcodeResource):
       })
 
 
-class R_2_groups(baserlib.OpcodeResource):
+class R_2_groups(_R_QueryList):
   """/2/groups resource.
 
   """
+  LIST_WHAT = constants.QR_GROUP
+  LIST_FIELDS = G_FIELDS
+  LIST_URI = "/2/groups/%s"
+  LIST_URI_FIELDS = ("name", "uri")
+
   POST_OPCODE = opcodes.OpGroupAdd
   POST_RENAME = {
     "name": "group_name",
@@ -961,10 +1387,19 @@ class R_2_groups(baserlib.OpcodeResource):
       "dry_run": self.dryRun(),
       })
 
+  def GetETag(self):
+    """Returns an entity tag for the node group list.
+
+    """
+    return self._GetConfigETag()
+
   def GET(self):
     """Returns a list of all node groups.
 
     """
+    if self._UseListQuery():
+      return self._GetListPage()
+
     client = self.GetClient()
 
     if self.useBulk():
@@ -983,6 +1418,12 @@ class R_2_groups_name(baserlib.OpcodeResource):
   """
   DELETE_OPCODE = opcodes.OpGroupRemove
 
+  def GetETag(self):
+    """Returns an entity tag for the node group.
+
+    """
+    return self._GetConfigETag()
+
   def GET(self):
     """Send information about a node group.
 
@@ -1084,20 +1525,49 @@ def _ConvertUsbDevices(data):
     pass
 
 
-class R_2_instances(baserlib.OpcodeResource):
+class R_2_instances(_R_QueryList):
   """/2/instances resource.
 
   """
+  LIST_WHAT = constants.QR_INSTANCE
+  LIST_FIELDS = I_FIELDS
+  LIST_URI = "/2/instances/%s"
+  LIST_URI_FIELDS = ("id", "uri")
+
   POST_OPCODE = opcodes.OpInstanceCreate
   POST_RENAME = {
     "os": "os_type",
     "name": "instance_name",
     }
 
+  def GetETag(self):
+    """Returns an entity tag for the configuration-only instance list.
+
+    """
+    if self.useBulk() or "fields" in self.queryargs:
+      # Bulk data contains runtime information
+      return None
+    if "filter" in self.queryargs:
+      # Filters can refer to runtime information
+      return None
+    return self._GetConfigETag()
+
+  @staticmethod
+  def _FormatListItem(item):
+    """Updates the backend parameters of instances returned in bulk mode.
+
+    """
+    if item.get("beparams") is not None:
+      return _UpdateBeparams(item)
+    return item
+
   def GET(self):
     """Returns a list of all available instances.
 
     """
+    if self._UseListQuery():
+      return self._GetListPage()
+
     client = self.GetClient()
 
     use_locking = self.useLocking()
@@ -35,6 +35,7 @@
 import base64
 import logging
 import re
+import zlib
 
 from cStringIO import StringIO
 
@@ -209,15 +210,70 @@ class FakeCurl(object):
       headers[http.HTTP_AUTHORIZATION] = \
         "%s %s" % (http.auth.HTTP_BASIC_AUTH, base64.b64encode(userpwd))
 
+    if self._opts.get(pycurl.ENCODING):
+      headers[http.HTTP_ACCEPT_ENCODING] = self._opts[pycurl.ENCODING]
+
     path = _GetPathFromUri(url)
-    (code, _, resp_body) = \
+    (code, resp_headers, resp_body) = \
       self._handler.FetchResponse(path, method, headers, request_body)
 
     self._info[pycurl.RESPONSE_CODE] = code
     if resp_body is not None:
+      # cURL transparently decodes compressed responses
+      coding = resp_headers.get(http.HTTP_CONTENT_ENCODING)
+      if coding == http.HTTP_GZIP:
+        resp_body = zlib.decompress(resp_body, 16 + zlib.MAX_WBITS)
+      elif coding == http.HTTP_DEFLATE:
+        resp_body = zlib.decompress(resp_body)
       writefn(resp_body)
 
 
+class FakeCurlMulti(object):
+  """Fake cURL multi object.
+
+  Requests added to this object are performed one after another using
+  L{FakeCurl}.
+
+  """
+  def __init__(self):
+    """Initialize this class
+
+    """
+    self._pending = []
+    self._successful = []
+    self._failed = []
+    self.handles = set()
+
+  def add_handle(self, curl):
+    assert curl not in self.handles
+    self.handles.add(curl)
+    self._pending.append(curl)
+
+  def remove_handle(self, curl):
+    self.handles.remove(curl)
+
+  def perform(self):
+    while self._pending:
+      curl = self._pending.pop(0)
+      try:
+        curl.perform()
+      except pycurl.error, err:
+        self._failed.append((curl, err.args[0], err.args[1]))
+      else:
+        self._successful.append(curl)
+
+    return (pycurl.E_MULTI_OK, 0)
+
+  def info_read(self):
+    result = (0, self._successful, self._failed)
+    self._successful = []
+    self._failed = []
+    return result
+
+  def select(self, timeout): # pylint: disable=W0613
+    return 0
+
+
 class _RapiMock(object):
   """Mocking out the RAPI server parts.
 
@@ -259,7 +315,12 @@ class _RapiMock(object):
     (_, _, _, resp_msg) = \
       http.server.HttpResponder(self.handler)(lambda: (req_msg, req_reader))
 
-    return (resp_msg.start_line.code, resp_msg.headers, resp_msg.body)
+    resp_body = resp_msg.body
+    if not (resp_body is None or isinstance(resp_body, basestring)):
+      # Collect streamed response
+      resp_body = "".join(resp_body)
+
+    return (resp_msg.start_line.code, resp_msg.headers, resp_body)
 
 
 class _TestLuxiTransport(object):
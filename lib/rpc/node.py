@@ -968,8 +968,10 @@ class RpcRunner(_RpcClientBase,
 
     """
     if ieio == constants.IEIO_RAW_DISK:
-      assert len(ieioargs) == 2
-      return (ieio, (self._SingleDiskDictDP(node, ieioargs), ))
+      assert len(ieioargs) in (2, 3)
+      # The optional third element is the (offset, size) segment to transfer
+      return (ieio, (self._SingleDiskDictDP(node, ieioargs[:2]), ) +
+              tuple(ieioargs[2:]))
 
     if ieio == constants.IEIO_SCRIPT:
       assert len(ieioargs) == 2
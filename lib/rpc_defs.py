@@ -175,6 +175,23 @@ def _ImpExpStatusPostProc(result):
   return result
 
 
+def _ImpExpStatusWaitPreProc(node, args):
+  """Prepares the per-node arguments for impexp_status_wait.
+
+  """
+  # the first argument is a node->daemons dictionary, only the daemons on the
+  # current node are sent to it
+  assert len(args) == 2
+  return [args[0][node], args[1]]
+
+
+def _ImpExpStatusWaitTimeout((_, timeout)):
+  """Calculate timeout for "impexp_status_wait" RPC.
+
+  """
+  return int(timeout) + constants.RPC_TMO_FAST
+
+
 def _TestDelayTimeout((duration, )):
   """Calculate timeout for "test_delay" RPC.
 
@@ -328,6 +345,12 @@ _IMPEXP_CALLS = [
   ("impexp_status", SINGLE, None, constants.RPC_TMO_FAST, [
     ("names", None, "Import/export names"),
     ], None, _ImpExpStatusPostProc, "Gets the status of an import or export"),
+  ("impexp_status_wait", MULTI, None, _ImpExpStatusWaitTimeout, [
+    ("node_daemons", None,
+     "Per-node list of import/export names and last seen status mtime"),
+    ("timeout", None, "Maximum number of seconds to wait"),
+    ], _ImpExpStatusWaitPreProc, _ImpExpStatusPostProc,
+    "Waits for the status of imports or exports to change"),
   ("impexp_abort", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("name", None, "Import/export name"),
     ], None, None, "Aborts an import or export"),
@@ -341,6 +364,10 @@ _IMPEXP_CALLS = [
     ("instance", ED_INST_DICT, None),
     ("snap_disks", ED_FINALIZE_EXPORT_DISKS, None),
     ], None, None, "Request the completion of an export operation"),
+  ("export_chunk_map", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("export", None, "Export name"),
+    ("image", None, "Disk image file name"),
+    ], None, None, "Returns the chunk digests of a disk image in an export"),
   ("export_list", MULTI, None, constants.RPC_TMO_FAST, [], None, None,
    "Gets the stored exports list"),
   ("export_remove", SINGLE, None, constants.RPC_TMO_FAST, [
@@ -387,6 +414,16 @@ _BLOCKDEV_CALLS = [
     ("size", None, None),
     ], None, None,
     "Request wipe at given offset with given size of a block device"),
+  ("blockdev_wipe_start", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("disks", ED_DISKS_DICT_DP, None),
+    ("offsets", None, "Offset in MiB from which to wipe each disk"),
+    ], None, None, "Starts wiping block devices in the background"),
+  ("blockdev_wipe_status", SINGLE, None, constants.RPC_TMO_FAST, [
+    ("name", None, "Wipe job name"),
+    ], None, None, "Returns the progress of a wipe job"),
+  ("blockdev_wipe_cleanup", SINGLE, None, constants.RPC_TMO_FAST, [
+    ("name", None, "Wipe job name"),
+    ], None, None, "Stops a wipe job and removes its status"),
   ("blockdev_remove", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("bdev", ED_SINGLE_DISK_DICT_DP, None),
     ], None, None, "Request removal of a given block device"),
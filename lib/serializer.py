@@ -76,6 +76,32 @@ def DumpJson(data, private_encoder=None):
   return txt
 
 
+def DumpJsonIter(data, private_encoder=None):
+  """Serialize a given object piece by piece.
+
+  Lists are serialized one element at a time, so that the complete encoded
+  form never has to be kept in memory. Joining the returned strings gives
+  the same result as L{DumpJson}.
+
+  @param data: the data to serialize
+  @param private_encoder: see L{DumpJson}
+  @return: an iterator over parts of the string representation of data
+
+  """
+  if not isinstance(data, list):
+    yield DumpJson(data, private_encoder=private_encoder)
+    return
+
+  yield "["
+
+  for (idx, item) in enumerate(data):
+    if idx:
+      yield ", "
+    yield DumpJson(item, private_encoder=private_encoder).rstrip("\n")
+
+  yield "]\n"
+
+
 def LoadJson(txt):
   """Unserialize data from a string.
 
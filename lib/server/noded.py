@@ -118,8 +118,8 @@ def _DecodeImportExportIO(ieio, ieioargs):
 
   """
   if ieio == constants.IEIO_RAW_DISK:
-    assert len(ieioargs) == 1
-    return (objects.Disk.FromDict(ieioargs[0]), )
+    assert len(ieioargs) in (1, 2)
+    return (objects.Disk.FromDict(ieioargs[0]), ) + tuple(ieioargs[1:])
 
   if ieio == constants.IEIO_SCRIPT:
     assert len(ieioargs) == 2
@@ -257,6 +257,31 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     bdev = objects.Disk.FromDict(bdev_s)
     return backend.BlockdevWipe(bdev, offset, size)
 
+  @staticmethod
+  def perspective_blockdev_wipe_start(params):
+    """Start wiping block devices in the background.
+
+    """
+    disks_s, offsets = params
+    disks = [objects.Disk.FromDict(bdev_s) for bdev_s in disks_s]
+    return backend.StartBlockdevWipe(disks, offsets)
+
+  @staticmethod
+  def perspective_blockdev_wipe_status(params):
+    """Query the progress of a wipe job.
+
+    """
+    (name, ) = params
+    return backend.GetBlockdevWipeStatus(name)
+
+  @staticmethod
+  def perspective_blockdev_wipe_cleanup(params):
+    """Stop a wipe job and remove its status.
+
+    """
+    (name, ) = params
+    return backend.CleanupBlockdevWipe(name)
+
   @staticmethod
   def perspective_blockdev_remove(params):
     """Remove a block device.
@@ -519,6 +544,14 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     path = params[0]
     return backend.ExportInfo(path)
 
+  @staticmethod
+  def perspective_export_chunk_map(params):
+    """Returns the chunk digests of a disk image in an export.
+
+    """
+    (export, image) = params
+    return backend.GetExportChunkMap(export, image)
+
   @staticmethod
   def perspective_export_list(params):
     """List the available exports on this node.
@@ -1296,6 +1329,14 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     """
     return backend.GetImportExportStatus(params[0])
 
+  @staticmethod
+  def perspective_impexp_status_wait(params):
+    """Waits for the status of import or export daemons to change.
+
+    """
+    (daemons, timeout) = params
+    return backend.WaitImportExportStatus(daemons, timeout)
+
   @staticmethod
   def perspective_impexp_abort(params):
     """Aborts an import or export.
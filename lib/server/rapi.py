@@ -49,6 +49,7 @@ from ganeti import pathutils
 from ganeti.rapi import connector
 from ganeti.rapi import baserlib
 from ganeti.rapi.auth import basic_auth
+from ganeti.rapi.auth import cache
 from ganeti.rapi.auth import pam
 
 import ganeti.http.auth   # pylint: disable=W0611
@@ -65,6 +66,31 @@ class RemoteApiRequestContext(object):
     self.body_data = None
 
 
+def _MatchETag(header, etag):
+  """Checks whether an C{If-None-Match} header matches an entity tag.
+
+  @type header: string or None
+  @param header: Value of the C{If-None-Match} request header
+  @type etag: string
+  @param etag: Current entity tag of the resource
+  @rtype: bool
+
+  """
+  if not header:
+    return False
+
+  for value in header.split(","):
+    value = value.strip()
+    # RFC2616, 14.26: The weak comparison function can only be used with GET
+    # or HEAD requests
+    if value.startswith("W/"):
+      value = value[2:]
+    if value == "*" or value == etag:
+      return True
+
+  return False
+
+
 class RemoteApiHandler(http.auth.HttpServerRequestAuthentication,
                        http.server.HttpServerHandler):
   """REST Request Handler Class.
@@ -191,14 +217,35 @@ class RemoteApiHandler(http.auth.HttpServerRequestAuthentication,
       ctx.body_data = None
 
     try:
+      if req.request_method.upper() == http.HTTP_GET:
+        etag = ctx.handler.GetETag()
+      else:
+        etag = None
+
+      if etag is not None:
+        if _MatchETag(req.request_headers.get(http.HTTP_IF_NONE_MATCH), etag):
+          raise http.HttpNotModified(headers={
+            http.HTTP_ETAG: etag,
+            })
+        req.resp_headers[http.HTTP_ETAG] = etag
+
       result = ctx.handler_fn()
     except rpcerr.TimeoutError:
       raise http.HttpGatewayTimeout()
     except rpcerr.ProtocolError, err:
       raise http.HttpBadGateway(str(err))
 
+    if isinstance(result, baserlib.StreamedResponse):
+      req.resp_headers[http.HTTP_CONTENT_TYPE] = result.content_type
+      return result.chunks
+
     req.resp_headers[http.HTTP_CONTENT_TYPE] = http.HTTP_APP_JSON
 
+    if isinstance(result, list):
+      # Listings can be large, encode and send them one element at a time
+      return http.CoalesceChunks(serializer.DumpJsonIter(result),
+                                 http.SOCK_BUF_SIZE)
+
     return serializer.DumpJson(result)
 
 
@@ -232,11 +279,17 @@ def PrepRapi(options, _):
   """
   mainloop = daemon.Mainloop()
 
+  # Created before any request process is forked to be shared by all of them
+  if options.auth_cache_ttl > 0:
+    auth_cache = cache.CredentialCache(ttl=options.auth_cache_ttl)
+  else:
+    auth_cache = None
+
   if options.pamauth:
     options.reqauth = True
-    authenticator = pam.PamAuthenticator()
+    authenticator = pam.PamAuthenticator(cache=auth_cache)
   else:
-    authenticator = basic_auth.BasicAuthenticator()
+    authenticator = basic_auth.BasicAuthenticator(cache=auth_cache)
 
   handler = RemoteApiHandler(authenticator, options.reqauth)
 
@@ -282,6 +335,10 @@ def Main():
                     default=20, type="int",
                     help="Number of simultaneous connections accepted"
                     " by ganeti-rapi")
+  parser.add_option("--auth-cache-ttl", dest="auth_cache_ttl",
+                    default=cache.DEFAULT_TTL, type="int",
+                    help=("Number of seconds for which successfully verified"
+                          " credentials are cached, 0 disables the cache"))
 
   daemon.GenericMain(constants.RAPI, parser, CheckRapi, PrepRapi, ExecRapi,
                      default_ssl_cert=pathutils.RAPI_CERT_FILE,
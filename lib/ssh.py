@@ -33,13 +33,13 @@
 """
 
 
+import errno
 import logging
 import os
 import shutil
 import tempfile
 
 from collections import namedtuple
-from functools import partial
 
 from ganeti import utils
 from ganeti import errors
@@ -141,10 +141,10 @@ def _SplitSshKey(key):
   if parts and parts[0] in constants.SSHAK_ALL:
     # If the key has no options in front of it, we only want the significant
     # fields
-    return (False, parts[:2])
+    return (False, tuple(parts[:2]))
   else:
     # Can't properly split the line, so use everything
-    return (True, parts)
+    return (True, tuple(parts))
 
 
 def AddAuthorizedKeys(file_obj, keys):
@@ -156,8 +156,6 @@ def AddAuthorizedKeys(file_obj, keys):
   @param keys: list of strings containing keys
 
   """
-  key_field_list = [(key, _SplitSshKey(key)) for key in keys]
-
   if isinstance(file_obj, basestring):
     f = open(file_obj, "a+")
   else:
@@ -165,17 +163,19 @@ def AddAuthorizedKeys(file_obj, keys):
 
   try:
     nl = True
+    # Ignore whitespace changes
+    existing_keys = set()
     for line in f:
-      # Ignore whitespace changes
-      line_key = _SplitSshKey(line)
-      key_field_list[:] = [(key, split_key) for (key, split_key)
-                           in key_field_list
-                           if split_key != line_key]
+      existing_keys.add(_SplitSshKey(line))
       nl = line.endswith("\n")
 
     if not nl:
       f.write("\n")
-    for (key, _) in key_field_list:
+    for key in keys:
+      split_key = _SplitSshKey(key)
+      if split_key in existing_keys:
+        continue
+      existing_keys.add(split_key)
       f.write(key.rstrip("\r\n"))
       f.write("\n")
     f.flush()
@@ -274,7 +274,7 @@ def RemoveAuthorizedKeys(file_name, keys):
   @param keys: list of strings containing keys
 
   """
-  key_field_list = [_SplitSshKey(key) for key in keys]
+  key_field_list = frozenset(_SplitSshKey(key) for key in keys)
 
   fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(file_name))
   try:
@@ -310,164 +310,6 @@ def RemoveAuthorizedKey(file_name, key):
   RemoveAuthorizedKeys(file_name, [key])
 
 
-def _AddPublicKeyProcessLine(new_uuid, new_key, line_uuid, line_key, found):
-  """Processes one line of the public key file when adding a key.
-
-  This is a sub function that can be called within the
-  C{_ManipulatePublicKeyFile} function. It processes one line of the public
-  key file, checks if this line contains the key to add already and if so,
-  notes the occurrence in the return value.
-
-  @type new_uuid: string
-  @param new_uuid: the node UUID of the node whose key is added
-  @type new_key: string
-  @param new_key: the SSH key to be added
-  @type line_uuid: the UUID of the node whose line in the public key file
-    is processed in this function call
-  @param line_key: the SSH key of the node whose line in the public key
-    file is processed in this function call
-  @type found: boolean
-  @param found: whether or not the (UUID, key) pair of the node whose key
-    is being added was found in the public key file already.
-  @rtype: (boolean, string)
-  @return: a possibly updated value of C{found} and the processed line
-
-  """
-  if line_uuid == new_uuid and line_key == new_key:
-    logging.debug("SSH key of node '%s' already in key file.", new_uuid)
-    found = True
-  return (found, "%s %s\n" % (line_uuid, line_key))
-
-
-def _AddPublicKeyElse(new_uuid, new_key):
-  """Adds a new SSH key to the key file if it did not exist already.
-
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which
-  is carried out when a new key is added to the public key file and
-  after processing the whole file, we found out that the key does
-  not exist in the file yet but needs to be appended at the end.
-
-  @type new_uuid: string
-  @param new_uuid: the UUID of the node whose key is added
-  @type new_key: string
-  @param new_key: the SSH key to be added
-  @rtype: string
-  @return: a new line to be added to the file
-
-  """
-  return "%s %s\n" % (new_uuid, new_key)
-
-
-def _RemovePublicKeyProcessLine(
-    target_uuid, _target_key,
-    line_uuid, line_key, found):
-  """Processes a line in the public key file when aiming for removing a key.
-
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} when we
-  are removing a key from the public key file. This particular function
-  only checks if the current line contains the UUID of the node in
-  question and writes the line to the temporary file otherwise.
-
-  @type target_uuid: string
-  @param target_uuid: UUID of the node whose key is being removed
-  @type _target_key: string
-  @param _target_key: SSH key of the node (not used)
-  @type line_uuid: string
-  @param line_uuid: UUID of the node whose line is processed in this call
-  @type line_key: string
-  @param line_key: SSH key of the nodes whose line is processed in this call
-  @type found: boolean
-  @param found: whether or not the UUID was already found.
-  @rtype: (boolean, string)
-  @return: a tuple, indicating if the target line was found and the processed
-    line; the line is 'None', if the original line is removed
-
-  """
-  if line_uuid != target_uuid:
-    return (found, "%s %s\n" % (line_uuid, line_key))
-  else:
-    return (True, None)
-
-
-def _RemovePublicKeyElse(
-    target_uuid, _target_key):
-  """Logs when we tried to remove a key that does not exist.
-
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which is
-  run after we have processed the complete public key file and did not find
-  the key to be removed.
-
-  @type target_uuid: string
-  @param target_uuid: the UUID of the node whose key was supposed to be removed
-  @type _target_key: string
-  @param _target_key: the key of the node which was supposed to be removed
-    (not used)
-  @rtype: string
-  @return: in this case, always None
-
-  """
-  logging.debug("Trying to remove key of node '%s' which is not in list"
-                " of public keys.", target_uuid)
-  return None
-
-
-def _ReplaceNameByUuidProcessLine(
-    node_name, _key, line_identifier, line_key, found, node_uuid=None):
-  """Replaces a node's name with its UUID on a matching line in the key file.
-
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which processes
-  a line of the ganeti public key file. If the line in question matches the
-  node's name, the name will be replaced by the node's UUID.
-
-  @type node_name: string
-  @param node_name: name of the node to be replaced by the UUID
-  @type _key: string
-  @param _key: SSH key of the node (not used)
-  @type line_identifier: string
-  @param line_identifier: an identifier of a node in a line of the public key
-    file. This can be either a node name or a node UUID, depending on if it
-    got replaced already or not.
-  @type line_key: string
-  @param line_key: SSH key of the node whose line is processed
-  @type found: boolean
-  @param found: whether or not the line matches the node's name
-  @type node_uuid: string
-  @param node_uuid: the node's UUID which will replace the node name
-  @rtype: (boolean, string)
-  @return: a tuple indicating whether the target line was found and the
-    processed line
-
-  """
-  if node_name == line_identifier:
-    return (True, "%s %s\n" % (node_uuid, line_key))
-  else:
-    return (found, "%s %s\n" % (line_identifier, line_key))
-
-
-def _ReplaceNameByUuidElse(
-    node_uuid, node_name, _key):
-  """Logs a debug message when we try to replace a key that is not there.
-
-  This is an implementation of the auxiliary C{process_else_fn} function for
-  the C{_ManipulatePubKeyFile} function when we use it to replace a line
-  in the public key file that is indexed by the node's name instead of the
-  node's UUID.
-
-  @type node_uuid: string
-  @param node_uuid: the node's UUID
-  @type node_name: string
-  @param node_name: the node's UUID
-  @type _key: string (not used)
-  @param _key: the node's SSH key (not used)
-  @rtype: string
-  @return: in this case, always None
-
-  """
-  logging.debug("Trying to replace node name '%s' with UUID '%s', but"
-                " no line with that name was found.", node_name, node_uuid)
-  return None
-
-
 def _ParseKeyLine(line, error_fn):
   """Parses a line of the public key file.
 
@@ -491,110 +333,171 @@ def _ParseKeyLine(line, error_fn):
   return (uuid, key)
 
 
-def _ManipulatePubKeyFile(target_identifier, target_key,
-                          key_file=pathutils.SSH_PUB_KEYS,
-                          error_fn=errors.ProgrammerError,
-                          process_line_fn=None, process_else_fn=None):
-  """Manipulates the list of public SSH keys of the cluster.
-
-  This is a general function to manipulate the public key file. It needs
-  two auxiliary functions C{process_line_fn} and C{process_else_fn} to
-  work. Generally, the public key file is processed as follows:
-  1) The function processes each line of the original ganeti public key file,
-  applies the C{process_line_fn} function on it, which returns a possibly
-  manipulated line and an indicator whether the line in question was found.
-  If a line is returned, it is added to a list of lines for later writing
-  to the file.
-  2) If all lines are processed and the 'found' variable is False, the
-  seconds auxiliary function C{process_else_fn} is called to possibly
-  add more lines to the list of lines.
-  3) Finally, the list of lines is assembled to a string and written
-  atomically to the public key file, thereby overriding it.
-
-  If the public key file does not exist, we create it. This is necessary for
-  a smooth transition after an upgrade.
-
-  @type target_identifier: str
-  @param target_identifier: identifier of the node whose key is added; in most
-    cases this is the node's UUID, but in some it is the node's host name
-  @type target_key: str
-  @param target_key: string containing a public SSH key (a complete line
-    possibly including more parameters than just the key)
-  @type key_file: str
-  @param key_file: filename of the file of public node keys (optional
-    parameter for testing)
-  @type error_fn: function
-  @param error_fn: Function that returns an exception, used to customize
-    exception types depending on the calling context
-  @type process_line_fn: function
-  @param process_line_fn: function to process one line of the public key file
-  @type process_else_fn: function
-  @param process_else_fn: function to be called if no line of the key file
-    matches the target uuid
+class PubKeyStore(object):
+  """In-memory copy of the list of public SSH keys of the cluster.
+
+  The public key file is read and parsed once; lookups by node UUID (or, for
+  nodes not yet known by UUID, by name) use an index. Any number of changes
+  can be applied before the file is written once by L{Save}. The order of
+  the lines in the file is kept.
 
   """
-  assert process_else_fn is not None
-  assert process_line_fn is not None
+  def __init__(self, key_file=pathutils.SSH_PUB_KEYS,
+               error_fn=errors.ProgrammerError):
+    """Initializes this class and reads the public key file.
+
+    If the public key file does not exist, it is created when saving. This is
+    necessary for a smooth transition after an upgrade.
+
+    @type key_file: str
+    @param key_file: filename of the file of public node keys (optional
+      parameter for testing)
+    @type error_fn: function
+    @param error_fn: Function that returns an exception, used to customize
+      exception types depending on the calling context
+
+    """
+    self._key_file = key_file
+    self._modified = False
+
+    # Each entry is a list of identifier and key; the identifier of removed
+    # entries is set to None
+    self._entries = []
+    self._index = {}
 
-  old_lines = []
-  f_orig = None
-  if os.path.exists(key_file):
-    try:
-      f_orig = open(key_file, "r")
-      old_lines = f_orig.readlines()
-    finally:
-      f_orig.close()
-  else:
     try:
-      f_orig = open(key_file, "w")
-      f_orig.close()
-    except IOError as e:
-      raise errors.SshUpdateError("Cannot create public key file: %s" % e)
+      lines = utils.ReadFile(key_file).splitlines()
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        raise
+      lines = []
+      self._modified = True
 
-  found = False
-  new_lines = []
-  for line in old_lines:
-    (uuid, key) = _ParseKeyLine(line, error_fn)
-    if not uuid:
-      continue
-    (new_found, new_line) = process_line_fn(target_identifier, target_key,
-                                            uuid, key, found)
-    if new_found:
-      found = True
-    if new_line is not None:
-      new_lines.append(new_line)
-  if not found:
-    new_line = process_else_fn(target_identifier, target_key)
-    if new_line is not None:
-      new_lines.append(new_line)
-  new_file_content = "".join(new_lines)
-  utils.WriteFile(key_file, data=new_file_content)
+    for line in lines:
+      (identifier, key) = _ParseKeyLine(line, error_fn)
+      if identifier:
+        self._AddEntry(identifier, key)
+
+  def _AddEntry(self, identifier, key):
+    """Appends a key to the list.
+
+    """
+    entry = [identifier, key]
+    self._entries.append(entry)
+    self._index.setdefault(identifier, []).append(entry)
+
+  def Query(self, target_uuids):
+    """Retrieves a map of keys for the requested node UUIDs.
+
+    @type target_uuids: str or list of str
+    @param target_uuids: UUID of the node to retrieve the key for or a list
+      of UUIDs of nodes to retrieve the keys for; C{None} for all nodes
+    @rtype: dict mapping strings to list of strings
+    @return: dictionary mapping node uuids to their ssh keys
+
+    """
+    if target_uuids is None:
+      target_uuids = self._index.keys()
+    elif isinstance(target_uuids, basestring):
+      target_uuids = [target_uuids]
+
+    return dict((uuid, [key for (_, key) in self._index[uuid]])
+                for uuid in target_uuids
+                if uuid in self._index)
+
+  def Add(self, new_uuid, new_key):
+    """Adds a key, unless the node already has it.
+
+    @type new_uuid: str
+    @param new_uuid: UUID of the node whose key is added
+    @type new_key: str
+    @param new_key: string containing a public SSH key (a complete line
+      possibly including more parameters than just the key)
+
+    """
+    new_key = new_key.rstrip()
+
+    if compat.any(key == new_key
+                  for (_, key) in self._index.get(new_uuid, [])):
+      logging.debug("SSH key of node '%s' already in key file.", new_uuid)
+      return
+
+    self._AddEntry(new_uuid, new_key)
+    self._modified = True
+
+  def Remove(self, target_uuid):
+    """Removes all keys of a node.
+
+    @type target_uuid: str
+    @param target_uuid: UUID of the node whose keys are removed
+
+    """
+    entries = self._index.pop(target_uuid, None)
+    if not entries:
+      logging.debug("Trying to remove key of node '%s' which is not in list"
+                    " of public keys.", target_uuid)
+      return
+
+    for entry in entries:
+      entry[0] = None
+    self._modified = True
+
+  def ReplaceNameByUuid(self, node_uuid, node_name):
+    """Replaces a host name with the node's corresponding UUID.
+
+    @type node_uuid: str
+    @param node_uuid: the node's UUID to replace the node's name
+    @type node_name: str
+    @param node_name: the node's name to be replaced by the node's UUID
+
+    """
+    entries = self._index.pop(node_name, None)
+    if not entries:
+      logging.debug("Trying to replace node name '%s' with UUID '%s', but"
+                    " no line with that name was found.", node_name, node_uuid)
+      return
+
+    for entry in entries:
+      entry[0] = node_uuid
+    self._index.setdefault(node_uuid, []).extend(entries)
+    self._modified = True
+
+  def Save(self):
+    """Writes the public key file if it was modified.
+
+    """
+    if not self._modified:
+      return
+
+    self._entries = [entry for entry in self._entries if entry[0] is not None]
+    utils.WriteFile(self._key_file,
+                    data="".join("%s %s\n" % (identifier, key)
+                                 for (identifier, key) in self._entries))
+    self._modified = False
 
 
 def AddPublicKey(new_uuid, new_key, key_file=pathutils.SSH_PUB_KEYS,
                  error_fn=errors.ProgrammerError):
   """Adds a new key to the list of public keys.
 
-  @see: _ManipulatePubKeyFile for parameter descriptions.
+  @see: L{PubKeyStore} for parameter descriptions.
 
   """
-  _ManipulatePubKeyFile(new_uuid, new_key, key_file=key_file,
-                        process_line_fn=_AddPublicKeyProcessLine,
-                        process_else_fn=_AddPublicKeyElse,
-                        error_fn=error_fn)
+  key_store = PubKeyStore(key_file=key_file, error_fn=error_fn)
+  key_store.Add(new_uuid, new_key)
+  key_store.Save()
 
 
 def RemovePublicKey(target_uuid, key_file=pathutils.SSH_PUB_KEYS,
                     error_fn=errors.ProgrammerError):
   """Removes a key from the list of public keys.
 
-  @see: _ManipulatePubKeyFile for parameter descriptions.
+  @see: L{PubKeyStore} for parameter descriptions.
 
   """
-  _ManipulatePubKeyFile(target_uuid, None, key_file=key_file,
-                        process_line_fn=_RemovePublicKeyProcessLine,
-                        process_else_fn=_RemovePublicKeyElse,
-                        error_fn=error_fn)
+  key_store = PubKeyStore(key_file=key_file, error_fn=error_fn)
+  key_store.Remove(target_uuid)
+  key_store.Save()
 
 
 def ReplaceNameByUuid(node_uuid, node_name, key_file=pathutils.SSH_PUB_KEYS,
@@ -605,20 +508,12 @@ def ReplaceNameByUuid(node_uuid, node_name, key_file=pathutils.SSH_PUB_KEYS,
   its SSH key gets added to the public key file and in a second step, the
   node's name gets replaced with the node's UUID as soon as we know the UUID.
 
-  @type node_uuid: string
-  @param node_uuid: the node's UUID to replace the node's name
-  @type node_name: string
-  @param node_name: the node's name to be replaced by the node's UUID
-
-  @see: _ManipulatePubKeyFile for the other parameter descriptions.
+  @see: L{PubKeyStore} for parameter descriptions.
 
   """
-  process_line_fn = partial(_ReplaceNameByUuidProcessLine, node_uuid=node_uuid)
-  process_else_fn = partial(_ReplaceNameByUuidElse, node_uuid=node_uuid)
-  _ManipulatePubKeyFile(node_name, None, key_file=key_file,
-                        process_line_fn=process_line_fn,
-                        process_else_fn=process_else_fn,
-                        error_fn=error_fn)
+  key_store = PubKeyStore(key_file=key_file, error_fn=error_fn)
+  key_store.ReplaceNameByUuid(node_uuid, node_name)
+  key_store.Save()
 
 
 def ClearPubKeyFile(key_file=pathutils.SSH_PUB_KEYS, mode=0600):
@@ -650,33 +545,12 @@ def QueryPubKeyFile(target_uuids, key_file=pathutils.SSH_PUB_KEYS,
   @type target_uuids: str or list of str
   @param target_uuids: UUID of the node to retrieve the key for or a list
     of UUIDs of nodes to retrieve the keys for
-  @type key_file: str
-  @param key_file: filename of the file of public node keys (optional
-    parameter for testing)
-  @type error_fn: function
-  @param error_fn: Function that returns an exception, used to customize
-    exception types depending on the calling context
   @rtype: dict mapping strings to list of strings
   @return: dictionary mapping node uuids to their ssh keys
+  @see: L{PubKeyStore} for the other parameter descriptions.
 
   """
-  all_keys = target_uuids is None
-  if isinstance(target_uuids, str):
-    target_uuids = [target_uuids]
-  result = {}
-  f = open(key_file, "r")
-  try:
-    for line in f:
-      (uuid, key) = _ParseKeyLine(line, error_fn)
-      if not uuid:
-        continue
-      if all_keys or (uuid in target_uuids):
-        if uuid not in result:
-          result[uuid] = []
-        result[uuid].append(key)
-  finally:
-    f.close()
-  return result
+  return PubKeyStore(key_file=key_file, error_fn=error_fn).Query(target_uuids)
 
 
 def InitSSHSetup(key_type, key_bits, error_fn=errors.OpPrereqError,
@@ -1010,7 +884,7 @@ def _EnsureCorrectGanetiVersion(cmd):
 def RunSshCmdWithStdin(cluster_name, node, basecmd, port, data,
                        debug=False, verbose=False, use_cluster_key=False,
                        ask_key=False, strict_host_check=False,
-                       ensure_version=False):
+                       ensure_version=False, timeout=None):
   """Runs a command on a remote machine via SSH and provides input in stdin.
 
   @type cluster_name: string
@@ -1032,6 +906,8 @@ def RunSshCmdWithStdin(cluster_name, node, basecmd, port, data,
   @param ask_key: See L{ssh.SshRunner.BuildCmd}
   @type strict_host_check: bool
   @param strict_host_check: See L{ssh.SshRunner.BuildCmd}
+  @type timeout: int or None
+  @param timeout: Seconds after which the command is terminated
 
   """
   cmd = [basecmd]
@@ -1065,7 +941,8 @@ def RunSshCmdWithStdin(cluster_name, node, basecmd, port, data,
     tempfh.write(serializer.DumpJson(data))
     tempfh.seek(0)
 
-    result = utils.RunCmd(scmd, interactive=True, input_fd=tempfh)
+    result = utils.RunCmd(scmd, interactive=True, input_fd=tempfh,
+                          timeout=timeout)
   finally:
     tempfh.close()
 
@@ -34,6 +34,7 @@ import logging
 
 from ganeti import objects
 from ganeti import constants
+from ganeti import pathutils
 from ganeti import utils
 from ganeti import errors
 
@@ -258,6 +259,109 @@ class BlockDev(object):
             "count=%s" % self.size,
             "iflag=direct"]
 
+  def ImportSegment(self, offset, size):
+    """Builds the shell command for importing a segment of the device.
+
+    Used by multi-stream transfers, where every stream writes its own
+    byte range of the target device. Unlike L{Import}, the data is always
+    written in place using direct I/O.
+
+    @type offset: int
+    @param offset: Segment offset in mebibytes
+    @type size: int
+    @param size: Segment size in mebibytes
+    @rtype: list of strings
+    @return: List containing the import command for the segment
+
+    """
+    if not self.minor and not self.Attach():
+      ThrowError("Can't attach to target device during ImportSegment()")
+
+    return [constants.DD_CMD,
+            "of=%s" % self.dev_path,
+            "bs=%s" % constants.DD_BLOCK_SIZE,
+            "seek=%s" % offset,
+            "count=%s" % size,
+            "oflag=direct", "conv=notrunc"]
+
+  def ExportSegment(self, offset, size):
+    """Builds the shell command for exporting a segment of the device.
+
+    @see: L{ImportSegment} for details
+    @rtype: list of strings
+    @return: List containing the export command for the segment
+
+    """
+    if not self.minor and not self.Attach():
+      ThrowError("Can't attach to source device during ExportSegment()")
+
+    return [constants.DD_CMD,
+            "if=%s" % self.dev_path,
+            "bs=%s" % constants.DD_BLOCK_SIZE,
+            "skip=%s" % offset,
+            "count=%s" % size,
+            "iflag=direct"]
+
+  def _GetSparseCopyCommand(self, mode, offset, size):
+    """Builds the sparse copy command for the device.
+
+    @see: L{SparseImport} for details
+
+    """
+    return [pathutils.SPARSE_COPY, mode,
+            "--offset=%s" % (offset * constants.DD_BLOCK_SIZE),
+            "--size=%s" % (size * constants.DD_BLOCK_SIZE),
+            self.dev_path]
+
+  def SparseImport(self, offset, size):
+    """Builds the shell command for importing a sparse stream to the device.
+
+    The stream is produced by L{SparseExport} and contains only the data
+    extents of the source, holes are zeroed out on the device.
+
+    @type offset: int
+    @param offset: Offset in mebibytes
+    @type size: int
+    @param size: Size in mebibytes
+    @rtype: list of strings
+    @return: List containing the import command for device
+
+    """
+    if not self.minor and not self.Attach():
+      ThrowError("Can't attach to target device during SparseImport()")
+
+    return self._GetSparseCopyCommand(constants.IEM_IMPORT, offset, size)
+
+  def SparseExport(self, offset, size):
+    """Builds the shell command for exporting the device as sparse stream.
+
+    @see: L{SparseImport} for details
+    @rtype: list of strings
+    @return: List containing the export command for device
+
+    """
+    if not self.minor and not self.Attach():
+      ThrowError("Can't attach to source device during SparseExport()")
+
+    return self._GetSparseCopyCommand(constants.IEM_EXPORT, offset, size)
+
+  def GetWipeMethods(self):
+    """Returns the methods which can be used to zero the device.
+
+    The methods are tried in order by L{ganeti.tools.wipe_disks}, so the
+    fastest one should come first. Methods which deallocate storage are
+    verified by reading back samples, writing zeroes is always the last
+    resort.
+
+    Block devices on storage which reads back zeroes from deallocated ranges
+    should override this method to add L{constants.WIPE_DISCARD}.
+
+    @rtype: list of strings
+    @return: Wipe methods, see L{constants.WIPE_METHODS}
+
+    """
+    return [constants.WIPE_ZERO_OUT, constants.WIPE_WRITE]
+
   def Snapshot(self, snap_name, snap_size):
     """Creates a snapshot of the block device.
 
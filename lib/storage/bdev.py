@@ -93,6 +93,7 @@ class LogicalVolume(base.BlockDev):
     self._ValidateName(self._lv_name)
     self.dev_path = utils.PathJoin("/dev", self._vg_name, self._lv_name)
     self._degraded = True
+    self._thin = False
     self.major = self.minor = self.pe_size = self.stripe_count = None
     self.pv_names = None
     lvs_cache = kwargs.get("lvs_cache")
@@ -534,6 +535,7 @@ class LogicalVolume(base.BlockDev):
     self.stripe_count = stripes
     self._degraded = status[0] == "v" # virtual volume, i.e. doesn't backing
                                       # storage
+    self._thin = status[0] == "V" # thin volume
     self.pv_names = pv_names
     self.attached = True
     return True
@@ -610,6 +612,20 @@ class LogicalVolume(base.BlockDev):
     """
     pass
 
+  def GetWipeMethods(self):
+    """Returns the methods which can be used to zero the device.
+
+    Discarded ranges of thin volumes are returned to the pool and read back
+    as zeroes.
+
+    @see: L{BlockDev.GetWipeMethods} for details
+
+    """
+    methods = super(LogicalVolume, self).GetWipeMethods()
+    if self._thin:
+      methods.insert(0, constants.WIPE_DISCARD)
+    return methods
+
   def Snapshot(self, snap_name=None, snap_size=None):
     """Create a snapshot copy of an lvm block device.
 
@@ -861,6 +877,24 @@ class PersistentBlockDevice(base.BlockDev):
     base.ThrowError("Importing data is not supported for the"
                     " PersistentBlockDevice template")
 
+  def ImportSegment(self, offset, size):
+    """Builds the shell command for importing a segment of the device.
+
+    @see: L{BlockDev.ImportSegment} for details
+
+    """
+    base.ThrowError("Importing data is not supported for the"
+                    " PersistentBlockDevice template")
+
+  def SparseImport(self, offset, size):
+    """Builds the shell command for importing a sparse stream to the device.
+
+    @see: L{BlockDev.SparseImport} for details
+
+    """
+    base.ThrowError("Importing data is not supported for the"
+                    " PersistentBlockDevice template")
+
 
 class RADOSBlockDevice(base.BlockDev):
   """A RADOS Block Device (rbd).
@@ -1295,6 +1329,18 @@ class RADOSBlockDevice(base.BlockDev):
         "-p", rbd_pool,
         rbd_name, "-"])
 
+  def GetWipeMethods(self):
+    """Returns the methods which can be used to zero the device.
+
+    RBD images are thinly provisioned, discarded objects are freed and read
+    back as zeroes.
+
+    @see: L{BlockDev.GetWipeMethods} for details
+
+    """
+    return ([constants.WIPE_DISCARD] +
+            super(RADOSBlockDevice, self).GetWipeMethods())
+
   def GetUserspaceAccessUri(self, hypervisor):
     """Generate KVM userspace URIs to be used as `-drive file` settings.
 
@@ -285,6 +285,17 @@ class FileStorage(base.BlockDev):
     """
     return self.file.Size()
 
+  def GetWipeMethods(self):
+    """Returns the methods which can be used to zero the file.
+
+    Punching a hole deallocates the range on file systems supporting it, the
+    block device ioctls don't apply to files.
+
+    @see: L{base.BlockDev.GetWipeMethods} for details
+
+    """
+    return [constants.WIPE_PUNCH_HOLE, constants.WIPE_WRITE]
+
   @classmethod
   def Create(cls, unique_id, children, size, spindles, params, excl_stor,
              dyn_params, **kwargs):
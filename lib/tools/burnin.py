@@ -33,6 +33,7 @@
 """
 
 import sys
+import math
 import optparse
 import time
 import socket
@@ -51,6 +52,7 @@ from ganeti import utils
 from ganeti import hypervisor
 from ganeti import compat
 from ganeti import pathutils
+from ganeti import serializer
 
 from ganeti.confd import client as confd_client
 from ganeti.runtime import (GetClient)
@@ -87,6 +89,13 @@ _SUPPORTED_DISK_TEMPLATES = compat.UniqueFrozenset([
   constants.DT_GLUSTER
   ])
 
+#: Job fields queried for jobs submitted in load generator mode
+_LOAD_JOB_FIELDS = ["status", "received_ts", "start_ts", "end_ts",
+                    "opstart", "opend"]
+
+#: Interval for polling jobs in load generator mode
+_LOAD_POLL_INTERVAL = 0.5
+
 #: Disk templates for which import/export is tested
 _IMPEXP_DISK_TEMPLATES = (_SUPPORTED_DISK_TEMPLATES - frozenset([
   constants.DT_DISKLESS,
@@ -279,6 +288,18 @@ OPTIONS = [
                  help=("Leave instances on the cluster after burnin,"
                        " for investigation in case of errors or simply"
                        " to use them")),
+  cli.cli_option("--load-rate", dest="load_rate", default=None,
+                 type="float",
+                 help=("Instead of running the burnin phases one after the"
+                       " other, submit jobs of random phases for random idle"
+                       " instances at this rate (jobs per second)")),
+  cli.cli_option("--load-duration", dest="load_duration", default=300,
+                 type="int",
+                 help=("Duration of the load generation in seconds"
+                       " (defaults to 300 seconds)")),
+  cli.cli_option("--results-file", dest="results_file", default=None,
+                 help=("Write the results of the load generation in JSON"
+                       " format to this file")),
   cli.REASON_OPT,
   ]
 
@@ -319,6 +340,157 @@ def _DoBatch(retry):
   return wrap
 
 
+def _Percentile(values, percent):
+  """Returns a percentile of a sorted list using the nearest-rank method.
+
+  @type values: list
+  @param values: Sorted, non-empty list of values
+  @type percent: number
+  @param percent: Percentile (0-100)
+
+  """
+  assert values
+
+  idx = int(math.ceil(percent * len(values) / 100.0)) - 1
+
+  return values[max(0, idx)]
+
+
+def _SummarizeLatencies(latencies):
+  """Summarizes a list of latencies.
+
+  @type latencies: list of float
+  @param latencies: Latencies in seconds
+  @rtype: dict
+
+  """
+  values = sorted(latencies)
+
+  if not values:
+    return {
+      "count": 0,
+      }
+
+  return {
+    "count": len(values),
+    "mean": sum(values) / len(values),
+    "min": values[0],
+    "p50": _Percentile(values, 50),
+    "p90": _Percentile(values, 90),
+    "p99": _Percentile(values, 99),
+    "max": values[-1],
+    }
+
+
+def _GetTimeDiff(start, end):
+  """Returns the seconds between two job timestamps, if both are set.
+
+  """
+  if start and end:
+    return utils.MergeTime(end) - utils.MergeTime(start)
+
+  return None
+
+
+class LoadStatistics(object):
+  """Collects job and opcode statistics in load generator mode.
+
+  @ivar submitted: Number of submitted jobs
+  @ivar skipped: Number of submissions skipped because all instances were busy
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    self.submitted = 0
+    self.skipped = 0
+    self._phases = {}
+    self._job_latencies = []
+    self._queue_waits = []
+    self._op_latencies = {}
+
+  def AddJob(self, phase, op_ids, job_info):
+    """Records a finished job.
+
+    @type phase: string
+    @param phase: Name of the burnin phase the job belongs to
+    @type op_ids: list of string
+    @param op_ids: Opcode IDs of the job's opcodes
+    @type job_info: list or None
+    @param job_info: Values of L{_LOAD_JOB_FIELDS}, C{None} if the job was lost
+    @rtype: bool
+    @return: Whether the job was successful
+
+    """
+    if job_info is None:
+      job_info = [None] * len(_LOAD_JOB_FIELDS)
+
+    (status, received_ts, start_ts, end_ts, opstart, opend) = job_info
+
+    success = (status == constants.JOB_STATUS_SUCCESS)
+
+    counts = self._phases.setdefault(phase, {
+      "succeeded": 0,
+      "failed": 0,
+      })
+    if success:
+      counts["succeeded"] += 1
+    else:
+      counts["failed"] += 1
+
+    latency = _GetTimeDiff(received_ts, end_ts)
+    if latency is not None:
+      self._job_latencies.append(latency)
+
+    wait = _GetTimeDiff(received_ts, start_ts)
+    if wait is not None:
+      self._queue_waits.append(wait)
+
+    for (op_id, op_start, op_end) in zip(op_ids, opstart or [], opend or []):
+      latency = _GetTimeDiff(op_start, op_end)
+      if latency is not None:
+        self._op_latencies.setdefault(op_id, []).append(latency)
+
+    return success
+
+  def GetResults(self, duration, target_rate):
+    """Returns the collected statistics.
+
+    @type duration: float
+    @param duration: Duration of the load generation in seconds
+    @type target_rate: float
+    @param target_rate: Targeted number of job submissions per second
+    @rtype: dict
+
+    """
+    succeeded = sum(i["succeeded"] for i in self._phases.values())
+    failed = sum(i["failed"] for i in self._phases.values())
+
+    if duration > 0:
+      throughput = (succeeded + failed) / duration
+    else:
+      throughput = 0.0
+
+    return {
+      "duration": duration,
+      "target_rate": target_rate,
+      "jobs": {
+        "submitted": self.submitted,
+        "skipped": self.skipped,
+        "succeeded": succeeded,
+        "failed": failed,
+        "throughput": throughput,
+        },
+      "phases": self._phases,
+      "job_latency": _SummarizeLatencies(self._job_latencies),
+      "queue_wait": _SummarizeLatencies(self._queue_waits),
+      "opcodes": dict((op_id, _SummarizeLatencies(latencies))
+                      for (op_id, latencies)
+                      in self._op_latencies.items()),
+      }
+
+
 class FeedbackAccumulator(object):
   """Feedback accumulator class."""
 
@@ -346,6 +518,7 @@ class JobHandler(FeedbackAccumulator):
 
   queued_ops = []
   queue_retry = False
+  collected_jobs = None
 
   def __init__(self):
     self.cl = cli.GetClient()
@@ -412,7 +585,11 @@ class JobHandler(FeedbackAccumulator):
 
   def ExecOrQueue(self, name, ops, post_process=None):
     """Execute an opcode and manage the exec buffer."""
-    if self.opts.parallel:
+    if self.collected_jobs is not None:
+      # Only collecting jobs for load generation
+      cli.SetGenericOpcodeOpts(ops, self.opts)
+      self.collected_jobs.append((name, ops))
+    elif self.opts.parallel:
       cli.SetGenericOpcodeOpts(ops, self.opts)
       self.queued_ops.append((ops, name, post_process))
     else:
@@ -552,6 +729,15 @@ class Burner(JobHandler):
     if options.http_check and not options.name_check:
       Err("Can't enable HTTP checks without name checks")
 
+    if options.load_rate is not None and options.load_rate <= 0:
+      Err("The load rate must be a positive number")
+
+    if options.load_duration <= 0:
+      Err("The load duration must be a positive number")
+
+    if options.results_file and options.load_rate is None:
+      Err("A results file can only be written when generating load")
+
     self.opts = options
     self.instances = args
     self.bep = {
@@ -1157,6 +1343,241 @@ class Burner(JobHandler):
       raise InstanceDown(instance, ("Hostname mismatch, expected %s, got %s" %
                                     (instance, hostname)))
 
+  def BurnPhases(self):
+    """Runs the burnin phases one after the other.
+
+    """
+    if self.opts.do_startstop:
+      self.BurnStopStart()
+
+    if self.bep[constants.BE_MINMEM] < self.bep[constants.BE_MAXMEM]:
+      self.BurnModifyRuntimeMemory()
+
+    if self.opts.do_replace1 and \
+         self.opts.disk_template in constants.DTS_INT_MIRROR:
+      self.BurnReplaceDisks1D8()
+    if (self.opts.do_replace2 and len(self.nodes) > 2 and
+        self.opts.disk_template in constants.DTS_INT_MIRROR):
+      self.BurnReplaceDisks2()
+
+    if (self.opts.disk_template in constants.DTS_GROWABLE and
+        compat.any(n > 0 for n in self.disk_growth)):
+      self.BurnGrowDisks()
+
+    if self.opts.do_failover and \
+         self.opts.disk_template in constants.DTS_MIRRORED:
+      self.BurnFailover()
+
+    if self.opts.do_migrate:
+      if self.opts.disk_template not in constants.DTS_MIRRORED:
+        Log("Skipping migration (disk template %s does not support it)",
+            self.opts.disk_template)
+      elif not self.hv_can_migrate:
+        Log("Skipping migration (hypervisor %s does not support it)",
+            self.hypervisor)
+      else:
+        self.BurnMigrate()
+
+    if (self.opts.do_move and len(self.nodes) > 1 and
+        self.opts.disk_template in [constants.DT_PLAIN, constants.DT_FILE]):
+      self.BurnMove()
+
+    if (self.opts.do_importexport and
+        self.opts.disk_template in _IMPEXP_DISK_TEMPLATES):
+      self.BurnImportExport()
+
+    if self.opts.do_reinstall:
+      self.BurnReinstall()
+
+    if self.opts.do_reboot:
+      self.BurnReboot()
+
+    if self.opts.do_renamesame:
+      self.BurnRenameSame(self.opts.name_check, self.opts.ip_check)
+
+    if self.opts.do_confd_tests:
+      self.BurnConfd()
+
+    default_nic_mode = self.cluster_default_nicparams[constants.NIC_MODE]
+    # Don't add/remove nics in routed mode, as we would need an ip to add
+    # them with
+    if self.opts.do_addremove_nics:
+      if default_nic_mode == constants.NIC_MODE_BRIDGED:
+        self.BurnAddRemoveNICs()
+      else:
+        Log("Skipping nic add/remove as the cluster is not in bridged mode")
+
+    if self.opts.do_activate_disks:
+      self.BurnActivateDisks()
+
+    if self.opts.do_addremove_disks:
+      self.BurnAddDisks()
+      self.BurnRemoveDisks()
+
+    if self.opts.rename:
+      self.BurnRename(self.opts.name_check, self.opts.ip_check)
+
+  def _GetLoadPhases(self):
+    """Returns the burnin phases which can be repeated in load generator mode.
+
+    @rtype: list of tuples; (string, callable)
+    @return: Phase names and functions
+
+    """
+    phases = []
+
+    if self.opts.do_startstop:
+      phases.append(("stopstart", self.BurnStopStart))
+
+    if self.bep[constants.BE_MINMEM] < self.bep[constants.BE_MAXMEM]:
+      phases.append(("runtime-memory", self.BurnModifyRuntimeMemory))
+
+    if (self.opts.do_replace1 and
+        self.opts.disk_template in constants.DTS_INT_MIRROR):
+      phases.append(("replace-disks", self.BurnReplaceDisks1D8))
+
+    if (self.opts.do_failover and
+        self.opts.disk_template in constants.DTS_MIRRORED):
+      phases.append(("failover", self.BurnFailover))
+
+    if (self.opts.do_migrate and
+        self.opts.disk_template in constants.DTS_MIRRORED and
+        self.hv_can_migrate):
+      phases.append(("migrate", self.BurnMigrate))
+
+    if (self.opts.do_importexport and
+        self.opts.disk_template in _IMPEXP_DISK_TEMPLATES):
+      phases.append(("importexport", self.BurnImportExport))
+
+    if self.opts.do_reinstall:
+      phases.append(("reinstall", self.BurnReinstall))
+
+    if self.opts.do_reboot:
+      phases.append(("reboot", self.BurnReboot))
+
+    if self.opts.do_renamesame:
+      phases.append(("renamesame",
+                     compat.partial(self.BurnRenameSame, self.opts.name_check,
+                                    self.opts.ip_check)))
+
+    default_nic_mode = self.cluster_default_nicparams[constants.NIC_MODE]
+    if (self.opts.do_addremove_nics and
+        default_nic_mode == constants.NIC_MODE_BRIDGED):
+      phases.append(("addremove-nics", self.BurnAddRemoveNICs))
+
+    if self.opts.do_activate_disks:
+      phases.append(("activate-disks", self.BurnActivateDisks))
+
+    return phases
+
+  def _CollectLoadJobs(self):
+    """Collects the jobs of all repeatable phases for all instances.
+
+    @rtype: list of tuples; (string, dict)
+    @return: Phase names and the phase's opcodes for every instance
+
+    """
+    Log("Preparing jobs for load generation")
+
+    result = []
+
+    for (phase, fn) in self._GetLoadPhases():
+      self.collected_jobs = []
+      try:
+        fn()
+        result.append((phase, dict(self.collected_jobs)))
+      finally:
+        self.collected_jobs = None
+
+    return result
+
+  def BurnLoad(self):
+    """Generates a mixed load from the burnin phases.
+
+    Jobs of random phases are submitted for random idle instances at the
+    requested rate, so that different instances go through different phases
+    at the same time. Every instance runs at most one job at a time; an
+    instance whose job failed isn't used anymore.
+
+    """
+    phases = self._CollectLoadJobs()
+    if not phases:
+      Err("None of the selected burnin phases can be used for load generation")
+
+    rate = self.opts.load_rate
+    Log("Generating load at %s jobs/s for %s seconds", rate,
+        self.opts.load_duration)
+
+    stats = LoadStatistics()
+    idle = set(self.instances)
+    running = {}
+
+    start = time.time()
+    end = start + self.opts.load_duration
+    next_submit = start
+
+    while True:
+      now = time.time()
+
+      if not running and (now >= end or not idle):
+        break
+
+      # Submit jobs which are due
+      while next_submit <= now < end:
+        next_submit += 1.0 / rate
+
+        if not idle:
+          stats.skipped += 1
+          continue
+
+        instance = random.choice(list(idle))
+        (phase, jobs) = random.choice(phases)
+        ops = jobs[instance]
+
+        job_id = cli.SendJob(ops, cl=self.cl)
+        stats.submitted += 1
+
+        idle.remove(instance)
+        running[job_id] = (phase, instance, [op.OP_ID for op in ops])
+
+      # Check for finished jobs
+      if running:
+        job_ids = running.keys()
+        for (job_id, job_info) in zip(job_ids,
+                                      self.cl.QueryJobs(job_ids,
+                                                        _LOAD_JOB_FIELDS)):
+          if (job_info is not None and
+              job_info[0] not in constants.JOBS_FINALIZED):
+            continue
+
+          (phase, instance, op_ids) = running.pop(job_id)
+
+          if stats.AddJob(phase, op_ids, job_info):
+            idle.add(instance)
+          else:
+            Log("Job %s (%s for instance %s) failed", job_id, phase, instance,
+                indent=1)
+
+      timeout = now + _LOAD_POLL_INTERVAL
+      if now < end:
+        timeout = min(timeout, next_submit)
+      time.sleep(max(0, timeout - time.time()))
+
+    results = stats.GetResults(time.time() - start, rate)
+
+    Log("Load generation finished: %s jobs submitted, %s succeeded, %s failed,"
+        " %.2f jobs/s", results["jobs"]["submitted"],
+        results["jobs"]["succeeded"], results["jobs"]["failed"],
+        results["jobs"]["throughput"])
+
+    if self.opts.results_file:
+      Log("Writing results to %s", self.opts.results_file)
+      utils.WriteFile(self.opts.results_file,
+                      data=serializer.DumpJson(results))
+
+    if results["jobs"]["failed"]:
+      raise BurninFailure()
+
   def BurninCluster(self):
     """Test a cluster intensively.
 
@@ -1176,75 +1597,10 @@ class Burner(JobHandler):
     try:
       self.BurnCreateInstances()
 
-      if self.opts.do_startstop:
-        self.BurnStopStart()
-
-      if self.bep[constants.BE_MINMEM] < self.bep[constants.BE_MAXMEM]:
-        self.BurnModifyRuntimeMemory()
-
-      if self.opts.do_replace1 and \
-           self.opts.disk_template in constants.DTS_INT_MIRROR:
-        self.BurnReplaceDisks1D8()
-      if (self.opts.do_replace2 and len(self.nodes) > 2 and
-          self.opts.disk_template in constants.DTS_INT_MIRROR):
-        self.BurnReplaceDisks2()
-
-      if (self.opts.disk_template in constants.DTS_GROWABLE and
-          compat.any(n > 0 for n in self.disk_growth)):
-        self.BurnGrowDisks()
-
-      if self.opts.do_failover and \
-           self.opts.disk_template in constants.DTS_MIRRORED:
-        self.BurnFailover()
-
-      if self.opts.do_migrate:
-        if self.opts.disk_template not in constants.DTS_MIRRORED:
-          Log("Skipping migration (disk template %s does not support it)",
-              self.opts.disk_template)
-        elif not self.hv_can_migrate:
-          Log("Skipping migration (hypervisor %s does not support it)",
-              self.hypervisor)
-        else:
-          self.BurnMigrate()
-
-      if (self.opts.do_move and len(self.nodes) > 1 and
-          self.opts.disk_template in [constants.DT_PLAIN, constants.DT_FILE]):
-        self.BurnMove()
-
-      if (self.opts.do_importexport and
-          self.opts.disk_template in _IMPEXP_DISK_TEMPLATES):
-        self.BurnImportExport()
-
-      if self.opts.do_reinstall:
-        self.BurnReinstall()
-
-      if self.opts.do_reboot:
-        self.BurnReboot()
-
-      if self.opts.do_renamesame:
-        self.BurnRenameSame(self.opts.name_check, self.opts.ip_check)
-
-      if self.opts.do_confd_tests:
-        self.BurnConfd()
-
-      default_nic_mode = self.cluster_default_nicparams[constants.NIC_MODE]
-      # Don't add/remove nics in routed mode, as we would need an ip to add
-      # them with
-      if self.opts.do_addremove_nics:
-        if default_nic_mode == constants.NIC_MODE_BRIDGED:
-          self.BurnAddRemoveNICs()
-        else:
-          Log("Skipping nic add/remove as the cluster is not in bridged mode")
-
-      if self.opts.do_activate_disks:
-        self.BurnActivateDisks()
-
-      if self.opts.do_addremove_disks:
-        self.BurnAddDisks()
-        self.BurnRemoveDisks()
-
-      if self.opts.rename:
-        self.BurnRename(self.opts.name_check, self.opts.ip_check)
+      if self.opts.load_rate:
+        self.BurnLoad()
+      else:
+        self.BurnPhases()
 
       has_err = False
     finally:
@@ -0,0 +1,1048 @@
+#
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Sparse-aware copying of disk contents for the import/export daemon.
+
+In export mode a device or file is read and written to standard output as a
+stream of data extents and holes. Holes are found using C{SEEK_DATA} and
+C{SEEK_HOLE} where the file system supports them and by detecting blocks
+containing only zeroes otherwise. In import mode such a stream is read from
+standard input and the data extents are written at their offsets, while holes
+are zeroed out using C{BLKZEROOUT} on block devices or skipped on files.
+
+Optionally the exporter adds checkpoints to the stream, containing a digest
+over all records sent so far. The importer verifies the digest and, once the
+data is on disk, records the checkpoint in a file. A failed transfer can then
+be resumed from the last checkpoint by starting a new transfer at its offset
+and seeding the digest with the checkpoint's digest.
+
+For incremental exports the data is split into fixed-size chunks and the
+digest of every chunk's contents is added to the stream. Chunks whose digest
+matches the one in the chunk map of a previous export are not sent. The
+importer leaves them as holes and writes a chunk map for the new image,
+listing the digests and the chunks which are only contained in its base
+image. When exporting such an image, these chunks are read from the chain of
+base images instead.
+
+Stream format (all numbers are big-endian)::
+
+  header: magic (8 bytes), total size in bytes (uint64)
+  record: type (1 byte), offset (uint64), length (uint64)[, data]
+
+"""
+
+import errno
+import fcntl
+import optparse
+import os
+import stat
+import struct
+import sys
+import logging
+
+from ganeti import cli
+from ganeti import compat
+from ganeti import constants
+from ganeti import errors
+from ganeti import serializer
+from ganeti import utils
+
+
+#: Magic value at the start of every stream
+STREAM_MAGIC = "GNTSPRS1"
+
+_HEADER = struct.Struct(">8sQ")
+_RECORD = struct.Struct(">cQQ")
+
+#: Record types
+REC_DATA = "D"
+REC_HOLE = "H"
+REC_CHECKPOINT = "C"
+REC_UNCHANGED = "U"
+REC_CHUNK_HASH = "K"
+REC_END = "E"
+
+#: Granularity for detecting zero blocks
+ZERO_BLOCK_SIZE = 64 * 1024
+
+#: Maximum length of a single data record
+MAX_DATA_SIZE = 1024 * 1024
+
+# Not available from the os module in Python 2
+_SEEK_DATA = 3
+_SEEK_HOLE = 4
+
+# From linux/fs.h: _IO(0x12, 127)
+_BLKZEROOUT = 0x127f
+
+_ZERO_BLOCK = "\0" * ZERO_BLOCK_SIZE
+
+_MAX_CHECKPOINT_LENGTH = 128
+
+#: Maximum number of images in a chain, protects against loops
+_MAX_CHAIN_LENGTH = 100
+
+# Digests of chunks consisting of zeroes only, by length
+_zero_digests = {}
+
+
+class SparseCopyError(errors.GenericError):
+  """Local exception to report errors in the sparse stream.
+
+  """
+
+
+def _GetDataRanges(fd, start, end):
+  """Returns the ranges of a file which may contain data.
+
+  Uses C{SEEK_DATA} and C{SEEK_HOLE} to skip over unallocated parts of the
+  file. If the file or file system doesn't support them, the whole range is
+  returned.
+
+  @type fd: int
+  @param fd: File descriptor
+  @type start: int
+  @param start: Start offset
+  @type end: int
+  @param end: End offset (exclusive)
+  @rtype: list of tuples; (offset, length)
+
+  """
+  result = []
+  offset = start
+
+  while offset < end:
+    try:
+      data_start = os.lseek(fd, offset, _SEEK_DATA)
+    except EnvironmentError, err:
+      if err.errno == errno.ENXIO:
+        # No more data after offset
+        break
+      if err.errno == errno.EINVAL:
+        return [(offset, end - offset)]
+      raise
+
+    if data_start >= end:
+      break
+
+    try:
+      data_end = os.lseek(fd, data_start, _SEEK_HOLE)
+    except EnvironmentError, err:
+      if err.errno == errno.EINVAL:
+        return result + [(data_start, end - data_start)]
+      raise
+
+    data_end = min(data_end, end)
+    result.append((data_start, data_end - data_start))
+    offset = data_end
+
+  return result
+
+
+def _IsZero(data, start, end):
+  """Checks whether a part of a string consists of zero bytes only.
+
+  """
+  return data.count("\0", start, end) == end - start
+
+
+def _ReadExtents(fd, start, end):
+  """Reads a range of a file and splits it into data extents and holes.
+
+  @rtype: generator
+  @return: Tuples of (record type, offset, data or length)
+
+  """
+  offset = start
+
+  for (range_start, range_length) in _GetDataRanges(fd, start, end):
+    if range_start > offset:
+      yield (REC_HOLE, offset, range_start - offset)
+
+    os.lseek(fd, range_start, os.SEEK_SET)
+
+    offset = range_start
+    range_end = range_start + range_length
+
+    while offset < range_end:
+      data = os.read(fd, min(MAX_DATA_SIZE, range_end - offset))
+      if not data:
+        raise SparseCopyError("Unexpected end of file at offset %s" % offset)
+
+      # Split chunk into zero blocks and data
+      pos = 0
+      while pos < len(data):
+        block_end = min(pos + ZERO_BLOCK_SIZE, len(data))
+        is_zero = _IsZero(data, pos, block_end)
+
+        # Extend run of blocks of the same kind
+        run_end = block_end
+        while run_end < len(data):
+          next_end = min(run_end + ZERO_BLOCK_SIZE, len(data))
+          if _IsZero(data, run_end, next_end) != is_zero:
+            break
+          run_end = next_end
+
+        if is_zero:
+          yield (REC_HOLE, offset + pos, run_end - pos)
+        else:
+          yield (REC_DATA, offset + pos, data[pos:run_end])
+
+        pos = run_end
+
+      offset += len(data)
+
+  if end > offset:
+    yield (REC_HOLE, offset, end - offset)
+
+
+def _MergeHoles(extents):
+  """Merges adjacent holes into a single record.
+
+  """
+  hole = None
+
+  for (kind, offset, value) in extents:
+    if kind == REC_HOLE:
+      if hole is None:
+        hole = (offset, value)
+      else:
+        assert hole[0] + hole[1] == offset
+        hole = (hole[0], hole[1] + value)
+      continue
+
+    if hole is not None:
+      yield (REC_HOLE, hole[0], hole[1])
+      hole = None
+
+    yield (kind, offset, value)
+
+  if hole is not None:
+    yield (REC_HOLE, hole[0], hole[1])
+
+
+def _SplitAtBoundaries(extents, start, interval):
+  """Splits records crossing a checkpoint or chunk boundary.
+
+  @type start: int
+  @param start: Offset of the first record
+  @type interval: int
+  @param interval: Distance between boundaries in bytes
+
+  """
+  for (kind, offset, value) in extents:
+    while True:
+      if kind == REC_DATA:
+        length = len(value)
+      else:
+        length = value
+
+      boundary = start + ((offset - start) // interval + 1) * interval
+      if offset + length <= boundary:
+        yield (kind, offset, value)
+        break
+
+      part_length = boundary - offset
+      if kind == REC_DATA:
+        yield (kind, offset, value[:part_length])
+        value = value[part_length:]
+      else:
+        yield (kind, offset, part_length)
+        value -= part_length
+      offset = boundary
+
+
+def _RecordLength(kind, value):
+  """Returns the number of bytes covered by a data, hole or unchanged record.
+
+  """
+  if kind == REC_DATA:
+    return len(value)
+  return value
+
+
+def _GetZeroDigest(length):
+  """Returns the digest of a chunk consisting of zeroes only.
+
+  """
+  try:
+    return _zero_digests[length]
+  except KeyError:
+    pass
+
+  digest = compat.sha1_hash()
+  _HashZeroes(digest, length)
+  result = _zero_digests[length] = digest.hexdigest()
+
+  return result
+
+
+def _HashZeroes(digest, length):
+  """Adds a number of zero bytes to a digest.
+
+  """
+  while length > 0:
+    count = min(length, ZERO_BLOCK_SIZE)
+    digest.update(_ZERO_BLOCK[:count])
+    length -= count
+
+
+def _FinishChunk(index, records, base_hashes):
+  """Computes the digest of a chunk and decides whether to send it.
+
+  @type index: int
+  @param index: Chunk index
+  @type records: list
+  @param records: Data and hole records making up the chunk
+  @type base_hashes: list of strings or None
+  @param base_hashes: Chunk digests of the base image
+  @rtype: generator
+  @return: The chunk's records, or a single L{REC_UNCHANGED} record if the
+    chunk equals the one in the base image, followed by a L{REC_CHUNK_HASH}
+    record
+
+  """
+  (_, start, _) = records[0]
+  length = sum(_RecordLength(kind, value) for (kind, _, value) in records)
+
+  if len(records) == 1 and records[0][0] == REC_HOLE:
+    chunk_digest = _GetZeroDigest(length)
+  else:
+    digest = compat.sha1_hash()
+    for (kind, _, value) in records:
+      if kind == REC_DATA:
+        digest.update(value)
+      else:
+        _HashZeroes(digest, value)
+    chunk_digest = digest.hexdigest()
+
+  if (base_hashes is not None and index < len(base_hashes) and
+      base_hashes[index] == chunk_digest):
+    yield (REC_UNCHANGED, start, length)
+  else:
+    for record in records:
+      yield record
+
+  yield (REC_CHUNK_HASH, start + length, chunk_digest)
+
+
+def _HashChunks(extents, start, chunk_size, base_hashes):
+  """Groups records by chunk and adds the chunk digests.
+
+  @type start: int
+  @param start: Offset of the first record
+  @type chunk_size: int
+  @param chunk_size: Chunk size in bytes
+  @type base_hashes: list of strings or None
+  @param base_hashes: Chunk digests of the base image, C{None} to send all
+    chunks
+
+  """
+  index = None
+  records = []
+
+  for (kind, offset, value) in _SplitAtBoundaries(extents, start, chunk_size):
+    record_index = (offset - start) // chunk_size
+    if record_index != index:
+      if records:
+        for record in _FinishChunk(index, records, base_hashes):
+          yield record
+      index = record_index
+      records = []
+
+    records.append((kind, offset, value))
+
+  if records:
+    for record in _FinishChunk(index, records, base_hashes):
+      yield record
+
+
+class ImageChain(object):
+  """An incremental image together with the images it is based on.
+
+  Chunks which are not contained in an image are read from the newest base
+  image containing them.
+
+  """
+  def __init__(self, path):
+    """Opens all images of the chain.
+
+    @type path: string
+    @param path: Path of the newest image
+
+    """
+    self.chunk_size = None
+    self._layers = []
+
+    try:
+      current = path
+      while True:
+        if len(self._layers) >= _MAX_CHAIN_LENGTH:
+          raise SparseCopyError("Chain of image %s is too long" % path)
+
+        cmap = ReadChunkMap(current)
+        unchanged = frozenset(cmap["unchanged"])
+
+        self._layers.append((os.open(current, os.O_RDONLY), unchanged))
+
+        if not unchanged:
+          # Full image
+          break
+
+        if self.chunk_size is None:
+          self.chunk_size = cmap["chunk_size"]
+        elif self.chunk_size != cmap["chunk_size"]:
+          raise SparseCopyError("Image %s uses a different chunk size" %
+                                current)
+
+        base = cmap.get("base")
+        if not base or os.path.basename(base) != base:
+          raise SparseCopyError("Image %s doesn't have a valid base image" %
+                                current)
+
+        current = utils.PathJoin(os.path.dirname(current), base)
+    except:
+      self.Close()
+      raise
+
+  @property
+  def fd(self):
+    """File descriptor of the newest image.
+
+    """
+    return self._layers[0][0]
+
+  def Close(self):
+    """Closes all images.
+
+    """
+    for (fd, _) in self._layers:
+      os.close(fd)
+    self._layers = []
+
+  def _FindLayer(self, index):
+    """Returns the file descriptor of the newest image containing a chunk.
+
+    """
+    for (fd, unchanged) in self._layers:
+      if index not in unchanged:
+        return fd
+
+    raise SparseCopyError("Chunk %s is missing from all images" % index)
+
+  def ReadExtents(self, start, end):
+    """Reads a range of the image, see L{_ReadExtents}.
+
+    """
+    if self.chunk_size is None:
+      # Only a single full image
+      for extent in _ReadExtents(self.fd, start, end):
+        yield extent
+      return
+
+    offset = start
+
+    while offset < end:
+      fd = self._FindLayer(offset // self.chunk_size)
+
+      # Extend run of chunks coming from the same image
+      run_end = min((offset // self.chunk_size + 1) * self.chunk_size, end)
+      while run_end < end and self._FindLayer(run_end // self.chunk_size) == fd:
+        run_end = min(run_end + self.chunk_size, end)
+
+      for extent in _ReadExtents(fd, offset, run_end):
+        yield extent
+
+      offset = run_end
+
+
+def _NewDigest(resume_digest):
+  """Returns the hash object used for checkpoint digests.
+
+  @type resume_digest: string or None
+  @param resume_digest: Digest of the checkpoint a transfer is resumed from
+
+  """
+  digest = compat.sha1_hash()
+  if resume_digest:
+    digest.update(resume_digest)
+  return digest
+
+
+def Export(fd, output, offset, size, checkpoint_size=None,
+           resume_digest=None, chunk_size=None, base_hashes=None, chain=None):
+  """Writes a range of a file as sparse stream.
+
+  @type fd: int
+  @param fd: File descriptor to read from
+  @type output: file-like object
+  @param output: Stream output
+  @type offset: int
+  @param offset: Start offset in bytes
+  @type size: int
+  @param size: Number of bytes to export
+  @type checkpoint_size: int or None
+  @param checkpoint_size: Distance between checkpoints in bytes, C{None} to
+    not add checkpoints
+  @type resume_digest: string or None
+  @param resume_digest: Digest of the checkpoint this transfer resumes from
+  @type chunk_size: int or None
+  @param chunk_size: Chunk size in bytes for adding chunk digests, must divide
+    C{checkpoint_size}
+  @type base_hashes: list of strings or None
+  @param base_hashes: Chunk digests of the base image, chunks with the same
+    digest are not sent
+  @type chain: L{ImageChain} or None
+  @param chain: Incremental image to read from instead of C{fd}
+  @rtype: tuple; (int, int)
+  @return: Number of data and hole bytes, unchanged chunks count as holes
+
+  """
+  assert not (chunk_size and checkpoint_size and
+              checkpoint_size % chunk_size)
+
+  output.write(_HEADER.pack(STREAM_MAGIC, size))
+
+  data_bytes = 0
+  hole_bytes = 0
+  digest = _NewDigest(resume_digest)
+
+  if chain:
+    extents = chain.ReadExtents(offset, offset + size)
+  else:
+    extents = _ReadExtents(fd, offset, offset + size)
+
+  extents = _MergeHoles(extents)
+  if chunk_size:
+    extents = _HashChunks(extents, offset, chunk_size, base_hashes)
+  elif checkpoint_size:
+    extents = _SplitAtBoundaries(extents, offset, checkpoint_size)
+
+  for (kind, ext_offset, value) in extents:
+    if kind == REC_DATA:
+      header = _RECORD.pack(kind, ext_offset - offset, len(value))
+      output.write(header)
+      output.write(value)
+      digest.update(header)
+      digest.update(value)
+      data_bytes += len(value)
+      position = ext_offset - offset + len(value)
+    elif kind == REC_CHUNK_HASH:
+      header = _RECORD.pack(kind, ext_offset - offset, len(value))
+      output.write(header)
+      output.write(value)
+      digest.update(header)
+      digest.update(value)
+      position = ext_offset - offset
+    else:
+      header = _RECORD.pack(kind, ext_offset - offset, value)
+      output.write(header)
+      digest.update(header)
+      hole_bytes += value
+      position = ext_offset - offset + value
+
+    if chunk_size and kind != REC_CHUNK_HASH:
+      # Checkpoints follow the digest of the chunk ending at them
+      continue
+
+    if checkpoint_size and position % checkpoint_size == 0 and position < size:
+      checkpoint = digest.hexdigest()
+      output.write(_RECORD.pack(REC_CHECKPOINT, position, len(checkpoint)))
+      output.write(checkpoint)
+
+  output.write(_RECORD.pack(REC_END, size, 0))
+  output.flush()
+
+  return (data_bytes, hole_bytes)
+
+
+def ExportRaw(fd, output, offset, size, chain=None):
+  """Writes a range of a file as plain data, with holes as zeroes.
+
+  Used to restore incremental images where the consumer doesn't support
+  sparse streams.
+
+  @see: L{Export} for the parameters
+
+  """
+  data_bytes = 0
+  hole_bytes = 0
+
+  if chain:
+    extents = chain.ReadExtents(offset, offset + size)
+  else:
+    extents = _ReadExtents(fd, offset, offset + size)
+
+  for (kind, _, value) in extents:
+    if kind == REC_DATA:
+      output.write(value)
+      data_bytes += len(value)
+    else:
+      hole_bytes += value
+      while value > 0:
+        count = min(value, ZERO_BLOCK_SIZE)
+        output.write(_ZERO_BLOCK[:count])
+        value -= count
+
+  output.flush()
+
+  return (data_bytes, hole_bytes)
+
+
+def _ReadExact(stream, length):
+  """Reads exactly C{length} bytes from a stream.
+
+  """
+  parts = []
+
+  while length > 0:
+    data = stream.read(length)
+    if not data:
+      raise SparseCopyError("Unexpected end of stream")
+    parts.append(data)
+    length -= len(data)
+
+  return "".join(parts)
+
+
+def _WriteAt(fd, offset, data):
+  """Writes data at the given offset.
+
+  """
+  os.lseek(fd, offset, os.SEEK_SET)
+  while data:
+    written = os.write(fd, data)
+    data = data[written:]
+
+
+def _ZeroBlockDevice(fd, offset, length, _ioctl=fcntl.ioctl):
+  """Zeroes a range of a block device.
+
+  C{BLKZEROOUT} lets the kernel use write-zeroes offload or unmap the range
+  on thinly provisioned devices. If unsupported, zeroes are written.
+
+  """
+  try:
+    _ioctl(fd, _BLKZEROOUT, struct.pack("QQ", offset, length))
+  except EnvironmentError, err:
+    logging.debug("BLKZEROOUT failed (%s), writing zeroes", err)
+  else:
+    return
+
+  _WriteZeroes(fd, offset, length)
+
+
+def _WriteZeroes(fd, offset, length):
+  """Writes zeroes to a range of a file.
+
+  """
+  end = offset + length
+  while offset < end:
+    count = min(end - offset, ZERO_BLOCK_SIZE)
+    _WriteAt(fd, offset, _ZERO_BLOCK[:count])
+    offset += count
+
+
+def Import(fd, stream, offset, size, truncate=False, checkpoint_fn=None,
+           resume_digest=None, chunk_fn=None, _zero_fn=_ZeroBlockDevice):
+  """Writes a sparse stream to a file or block device.
+
+  @type fd: int
+  @param fd: File descriptor to write to
+  @type stream: file-like object
+  @param stream: Stream input
+  @type offset: int
+  @param offset: Start offset in bytes
+  @type size: int or None
+  @param size: Expected number of bytes, C{None} to accept any size
+  @type truncate: bool
+  @param truncate: Whether to discard the previous contents of a regular file
+  @type checkpoint_fn: callable or None
+  @param checkpoint_fn: Called with offset and digest of every verified
+    checkpoint once all data before it has been written to disk
+  @type resume_digest: string or None
+  @param resume_digest: Digest of the checkpoint this transfer resumes from
+  @type chunk_fn: callable or None
+  @param chunk_fn: Called with the end offset and digest of every chunk and
+    whether the chunk was left unchanged
+  @rtype: tuple; (int, int)
+  @return: Number of data and hole bytes, unchanged chunks count as holes
+
+  """
+  (magic, total) = _HEADER.unpack(_ReadExact(stream, _HEADER.size))
+  if magic != STREAM_MAGIC:
+    raise SparseCopyError("Invalid stream magic %r" % magic)
+
+  if size is not None and total != size:
+    raise SparseCopyError("Stream contains %s bytes, expected %s" %
+                          (total, size))
+
+  st = os.fstat(fd)
+  is_block = stat.S_ISBLK(st.st_mode)
+
+  if truncate and not is_block:
+    os.ftruncate(fd, offset)
+    file_size = offset
+  else:
+    file_size = st.st_size
+
+  data_bytes = 0
+  hole_bytes = 0
+  position = 0
+  digest = _NewDigest(resume_digest)
+  chunk_unchanged = False
+
+  while True:
+    header = _ReadExact(stream, _RECORD.size)
+    (kind, rec_offset, length) = _RECORD.unpack(header)
+
+    if kind == REC_CHECKPOINT:
+      if length > _MAX_CHECKPOINT_LENGTH:
+        raise SparseCopyError("Invalid checkpoint length %s" % length)
+      checkpoint = _ReadExact(stream, length)
+      if rec_offset != position:
+        raise SparseCopyError("Checkpoint at offset %s, expected %s" %
+                              (rec_offset, position))
+      if checkpoint != digest.hexdigest():
+        raise SparseCopyError("Checkpoint digest mismatch at offset %s" %
+                              position)
+      os.fsync(fd)
+      if checkpoint_fn:
+        checkpoint_fn(position, checkpoint)
+      continue
+
+    if kind == REC_CHUNK_HASH:
+      if length > _MAX_CHECKPOINT_LENGTH:
+        raise SparseCopyError("Invalid chunk digest length %s" % length)
+      chunk_digest = _ReadExact(stream, length)
+      if rec_offset != position:
+        raise SparseCopyError("Chunk digest at offset %s, expected %s" %
+                              (rec_offset, position))
+      digest.update(header)
+      digest.update(chunk_digest)
+      if chunk_fn:
+        chunk_fn(position, chunk_digest, chunk_unchanged)
+      chunk_unchanged = False
+      continue
+
+    if kind == REC_END:
+      if rec_offset != total or position != total:
+        raise SparseCopyError("Stream ended at offset %s, expected %s" %
+                              (position, total))
+      break
+
+    if rec_offset != position or rec_offset + length > total:
+      raise SparseCopyError("Invalid record at offset %s (expected %s)" %
+                            (rec_offset, position))
+
+    digest.update(header)
+
+    if kind == REC_DATA:
+      data = _ReadExact(stream, length)
+      digest.update(data)
+      _WriteAt(fd, offset + rec_offset, data)
+      data_bytes += length
+
+    elif kind == REC_HOLE:
+      if is_block:
+        _zero_fn(fd, offset + rec_offset, length)
+      elif offset + rec_offset < file_size:
+        # Only the part inside the existing file needs to be zeroed, anything
+        # beyond becomes a hole when the file is extended
+        _WriteZeroes(fd, offset + rec_offset,
+                     min(length, file_size - offset - rec_offset))
+      hole_bytes += length
+
+    elif kind == REC_UNCHANGED:
+      # The chunk is contained in the base image, leave it untouched
+      chunk_unchanged = True
+      hole_bytes += length
+
+    else:
+      raise SparseCopyError("Unknown record type %r" % kind)
+
+    position += length
+
+  if not is_block and offset + total > file_size:
+    os.ftruncate(fd, offset + total)
+
+  os.fsync(fd)
+
+  return (data_bytes, hole_bytes)
+
+
+def ReadChunkMap(path):
+  """Reads the chunk map of an image.
+
+  @type path: string
+  @param path: Path of the image
+  @rtype: dict
+  @return: Chunk map with the total size (C{size}), the chunk size
+    (C{chunk_size}), the digest of every chunk (C{hashes}), the indices of
+    chunks contained only in the base image (C{unchanged}) and the file name
+    of the base image (C{base})
+
+  """
+  return LoadChunkMap(path + constants.EXPORT_CHUNK_MAP_SUFFIX)
+
+
+def LoadChunkMap(filename):
+  """Loads a chunk map from a file.
+
+  @see: L{ReadChunkMap}
+
+  """
+  cmap = serializer.LoadJson(utils.ReadFile(filename))
+
+  if not (isinstance(cmap, dict) and
+          isinstance(cmap.get("hashes"), list) and
+          isinstance(cmap.get("unchanged"), list)):
+    raise SparseCopyError("Invalid chunk map in %s" % filename)
+
+  return cmap
+
+
+def WriteChunkMap(path, cmap):
+  """Writes the chunk map of an image.
+
+  @see: L{ReadChunkMap}
+
+  """
+  utils.WriteFile(path + constants.EXPORT_CHUNK_MAP_SUFFIX,
+                  data=serializer.DumpJson(cmap), mode=0600)
+
+
+def _BuildChunkMap(size, chunks):
+  """Builds a chunk map from the chunks received by L{Import}.
+
+  @type size: int
+  @param size: Total size of the image
+  @type chunks: list of tuples; (int, string, bool)
+  @param chunks: End offset, digest and whether the chunk was unchanged
+
+  """
+  if chunks:
+    chunk_size = chunks[0][0]
+  else:
+    chunk_size = None
+
+  for (idx, (end, _, _)) in enumerate(chunks):
+    if end != min((idx + 1) * chunk_size, size):
+      raise SparseCopyError("Chunk %s ends at unexpected offset %s" %
+                            (idx, end))
+
+  if chunks and chunks[-1][0] != size:
+    raise SparseCopyError("Chunk digests don't cover the whole image")
+
+  return {
+    "size": size,
+    "chunk_size": chunk_size,
+    "hashes": [chunk_digest for (_, chunk_digest, _) in chunks],
+    "unchanged": [idx for (idx, (_, _, unchanged)) in enumerate(chunks)
+                  if unchanged],
+    "base": None,
+    }
+
+
+def _WriteCheckpoint(path, offset, digest):
+  """Records a verified checkpoint.
+
+  """
+  utils.WriteFile(path, data=serializer.DumpJson({
+    "offset": offset,
+    "digest": digest,
+    }), mode=0600)
+
+
+def ParseOptions():
+  """Parses the options passed to the program.
+
+  @return: Options and arguments
+
+  """
+  parser = optparse.OptionParser(usage="%prog {import|export} <path>",
+                                 prog=os.path.basename(sys.argv[0]))
+  parser.add_option(cli.DEBUG_OPT)
+  parser.add_option(cli.VERBOSE_OPT)
+  parser.add_option("--offset", dest="offset", action="store", type="int",
+                    default=0, help="Start offset in bytes")
+  parser.add_option("--size", dest="size", action="store", type="int",
+                    default=None, help="Number of bytes to transfer")
+  parser.add_option("--truncate", dest="truncate", action="store_true",
+                    default=False,
+                    help="Discard previous contents of the target file")
+  parser.add_option("--checkpoint-size", dest="checkpoint_size",
+                    action="store", type="int", default=None,
+                    help="Distance between checkpoints in bytes (export)")
+  parser.add_option("--checkpoint-file", dest="checkpoint_file",
+                    action="store", type="string", default=None,
+                    help="File to record verified checkpoints in (import)")
+  parser.add_option("--resume-digest", dest="resume_digest",
+                    action="store", type="string", default=None,
+                    help="Digest of the checkpoint to resume from")
+  parser.add_option("--chunk-size", dest="chunk_size",
+                    action="store", type="int", default=None,
+                    help="Add digests of chunks of this size (export)")
+  parser.add_option("--base-chunk-map", dest="base_chunk_map",
+                    action="store", type="string", default=None,
+                    help=("Chunk map of the base image, unchanged chunks are"
+                          " not sent (export)"))
+  parser.add_option("--chunk-map", dest="chunk_map", action="store_true",
+                    default=False,
+                    help="Write a chunk map for the target file (import)")
+  parser.add_option("--chain", dest="chain", action="store_true",
+                    default=False,
+                    help=("Read unchanged chunks of an incremental image from"
+                          " its base images (export)"))
+  parser.add_option("--raw", dest="raw", action="store_true", default=False,
+                    help="Write plain data instead of a sparse stream (export)")
+
+  (opts, args) = parser.parse_args()
+
+  return VerifyOptions(parser, opts, args)
+
+
+def VerifyOptions(parser, opts, args):
+  """Verifies options and arguments for correctness.
+
+  """
+  if len(args) != 2:
+    parser.error("Expected mode and path as arguments")
+
+  (mode, path) = args
+
+  if mode not in (constants.IEM_IMPORT, constants.IEM_EXPORT):
+    parser.error("Invalid mode: %s" % mode)
+
+  if opts.offset < 0 or (opts.size is not None and opts.size < 0):
+    parser.error("Offset and size must not be negative")
+
+  if opts.checkpoint_size is not None and opts.checkpoint_size <= 0:
+    parser.error("Checkpoint size must be positive")
+
+  if opts.chunk_size is not None:
+    if opts.chunk_size <= 0:
+      parser.error("Chunk size must be positive")
+
+    if opts.checkpoint_size and opts.checkpoint_size % opts.chunk_size:
+      parser.error("Checkpoint size must be a multiple of the chunk size")
+
+  if opts.base_chunk_map and not opts.chunk_size:
+    parser.error("A base chunk map requires a chunk size")
+
+  if opts.raw and (opts.checkpoint_size or opts.chunk_size):
+    parser.error("Raw output can't contain checkpoints or chunk digests")
+
+  return (opts, mode, path)
+
+
+def Main():
+  """Main routine.
+
+  """
+  (opts, mode, path) = ParseOptions()
+
+  utils.SetupToolLogging(
+      opts.debug, opts.verbose,
+      toolname=os.path.splitext(os.path.basename(__file__))[0])
+
+  try:
+    if mode == constants.IEM_EXPORT:
+      if opts.chain:
+        chain = ImageChain(path)
+        fd = chain.fd
+      else:
+        chain = None
+        fd = os.open(path, os.O_RDONLY)
+      try:
+        size = opts.size
+        if size is None:
+          size = os.lseek(fd, 0, os.SEEK_END) - opts.offset
+
+        base_hashes = None
+        if opts.base_chunk_map:
+          base = LoadChunkMap(opts.base_chunk_map)
+          if (base.get("chunk_size") == opts.chunk_size and
+              base.get("size") == size):
+            base_hashes = base["hashes"]
+          else:
+            logging.warning("Base chunk map doesn't match, sending all"
+                            " chunks")
+
+        if opts.raw:
+          (data_bytes, hole_bytes) = \
+            ExportRaw(fd, sys.stdout, opts.offset, size, chain=chain)
+        else:
+          (data_bytes, hole_bytes) = \
+            Export(fd, sys.stdout, opts.offset, size,
+                   checkpoint_size=opts.checkpoint_size,
+                   resume_digest=opts.resume_digest,
+                   chunk_size=opts.chunk_size, base_hashes=base_hashes,
+                   chain=chain)
+      finally:
+        if chain:
+          chain.Close()
+        else:
+          os.close(fd)
+    else:
+      fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0600)
+      try:
+        if opts.checkpoint_file:
+          checkpoint_fn = compat.partial(_WriteCheckpoint,
+                                         opts.checkpoint_file)
+        else:
+          checkpoint_fn = None
+
+        chunks = []
+        if opts.chunk_map:
+          chunk_fn = lambda *args: chunks.append(args)
+        else:
+          chunk_fn = None
+
+        (data_bytes, hole_bytes) = \
+          Import(fd, sys.stdin, opts.offset, opts.size,
+                 truncate=opts.truncate, checkpoint_fn=checkpoint_fn,
+                 resume_digest=opts.resume_digest, chunk_fn=chunk_fn)
+      finally:
+        os.close(fd)
+
+      if opts.chunk_map:
+        WriteChunkMap(path, _BuildChunkMap(data_bytes + hole_bytes, chunks))
+
+    logging.info("%s of %s: %s data bytes, %s bytes in holes", mode, path,
+                 data_bytes, hole_bytes)
+  except Exception, err: # pylint: disable=W0703
+    logging.debug("Caught unhandled exception", exc_info=True)
+
+    (retcode, message) = cli.FormatError(err)
+    logging.error(message)
+
+    return retcode
+  else:
+    return constants.EXIT_SUCCESS
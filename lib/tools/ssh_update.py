@@ -164,17 +164,21 @@ def UpdatePubKeyFile(data, dry_run, key_file=pathutils.SSH_PUB_KEYS):
       logging.info("This is a dry run, not adding or replacing a key to %s",
                    key_file)
     else:
+      key_store = ssh.PubKeyStore(key_file=key_file)
       for uuid, keys in public_keys.items():
         if action == constants.SSHS_REPLACE_OR_ADD:
-          ssh.RemovePublicKey(uuid, key_file=key_file)
+          key_store.Remove(uuid)
         for key in keys:
-          ssh.AddPublicKey(uuid, key, key_file=key_file)
+          key_store.Add(uuid, key)
+      key_store.Save()
   elif action == constants.SSHS_REMOVE:
     if dry_run:
       logging.info("This is a dry run, not removing keys from %s", key_file)
     else:
+      key_store = ssh.PubKeyStore(key_file=key_file)
       for uuid in public_keys.keys():
-        ssh.RemovePublicKey(uuid, key_file=key_file)
+        key_store.Remove(uuid)
+      key_store.Save()
   elif action == constants.SSHS_CLEAR:
     if dry_run:
       logging.info("This is a dry run, not clearing file %s", key_file)
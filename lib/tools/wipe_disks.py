@@ -0,0 +1,414 @@
+#
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Background wiping of block devices.
+
+All devices given on the command line are wiped concurrently, one thread per
+device. Every device comes with the list of wipe methods its storage type
+supports, fastest first (see L{ganeti.storage.base.BlockDev.GetWipeMethods}):
+
+  - C{discard} (C{BLKDISCARD}) deallocates the range on thinly provisioned
+    storage, which reads back zeroes afterwards
+  - C{punch-hole} deallocates the range of a file
+  - C{zeroout} (C{BLKZEROOUT}) lets the kernel use write-zeroes offload or
+    unmap the range where the device supports it
+  - C{write} writes zeroes using large page-aligned buffers with C{O_DIRECT}
+
+A method failing on a device makes the wiper fall back to the next one.
+Deallocating methods don't guarantee zeroes on every device, so the result is
+verified by reading back samples of each range; if they aren't all zero, the
+range is wiped again using the next method. Writing zeroes is always the last
+resort.
+
+The progress of every device is regularly written to a status file in JSON
+format, which the node daemon reads on behalf of the master.
+
+"""
+
+import errno
+import fcntl
+import mmap
+import optparse
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import logging
+
+try:
+  # pylint: disable=F0401
+  import ctypes
+except ImportError:
+  ctypes = None
+
+from ganeti import cli
+from ganeti import compat
+from ganeti import constants
+from ganeti import serializer
+from ganeti import utils
+
+
+#: Size of the ranges zeroed at once; the progress is updated after each
+WIPE_STEP = 256 * 1024 * 1024
+
+#: Size of the buffer used when writing zeroes, a multiple of the page size
+WRITE_BUFSIZE = 4 * 1024 * 1024
+
+#: Seconds between updates of the status file
+STATUS_INTERVAL = 1.0
+
+#: Number of blocks read back to verify deallocated ranges, in addition to
+#: the first and last block of each range
+VERIFY_SAMPLES = 16
+
+#: Size of the blocks read back for verification
+VERIFY_BLOCK_SIZE = 4096
+
+#: Methods whose result is verified by reading back samples
+_VERIFIED_METHODS = compat.UniqueFrozenset([
+  constants.WIPE_DISCARD,
+  constants.WIPE_PUNCH_HOLE,
+  ])
+
+# Linux ioctls from <linux/fs.h>
+_BLKDISCARD = 0x1277
+_BLKZEROOUT = 0x127f
+
+# fallocate(2) flags from <linux/falloc.h>
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOC_FL_PUNCH_HOLE = 0x02
+
+_ZERO_BLOCK = "\0" * VERIFY_BLOCK_SIZE
+
+
+def _Fallocate(fd, mode, offset, length, _ctypes=ctypes):
+  """Calls fallocate(2), which isn't available in Python 2.
+
+  """
+  if _ctypes is None:
+    raise EnvironmentError(errno.ENOSYS, "The ctypes module is not available")
+
+  libc = _ctypes.CDLL("libc.so.6", use_errno=True)
+  fallocate = libc.fallocate
+  fallocate.argtypes = [_ctypes.c_int, _ctypes.c_int, _ctypes.c_longlong,
+                        _ctypes.c_longlong]
+
+  if fallocate(fd, mode, offset, length) != 0:
+    err = _ctypes.get_errno()
+    raise EnvironmentError(err, os.strerror(err))
+
+
+def _VerifyZeroes(path, offset, length, _rand=random):
+  """Checks whether samples of a range read back as zeroes.
+
+  @rtype: bool
+
+  """
+  nblocks = length // VERIFY_BLOCK_SIZE
+  if nblocks == 0:
+    return True
+
+  indices = set([0, nblocks - 1])
+  indices.update(_rand.randrange(nblocks)
+                 for _ in range(min(VERIFY_SAMPLES, nblocks)))
+
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    for idx in sorted(indices):
+      os.lseek(fd, offset + idx * VERIFY_BLOCK_SIZE, os.SEEK_SET)
+      if os.read(fd, VERIFY_BLOCK_SIZE) != _ZERO_BLOCK:
+        return False
+  finally:
+    os.close(fd)
+
+  return True
+
+
+class DeviceWiper(object):
+  """Wipes a byte range of one device.
+
+  """
+  def __init__(self, path, offset, size, methods=None):
+    """Initializes this class.
+
+    @type path: string
+    @param path: Path to the block device
+    @type offset: int
+    @param offset: Start offset in bytes
+    @type size: int
+    @param size: Number of bytes to wipe
+    @type methods: list of string
+    @param methods: Wipe methods to try, fastest first; writing zeroes is
+      always added as the last resort
+
+    """
+    if methods is None:
+      methods = [constants.WIPE_ZERO_OUT]
+
+    self.path = path
+    self.offset = offset
+    self.size = size
+    self.methods = [i for i in methods if i != constants.WIPE_WRITE]
+    self.methods.append(constants.WIPE_WRITE)
+    self.done = 0
+    self.method = None
+    self.error = None
+
+  def ToDict(self):
+    """Returns the status of this device.
+
+    """
+    return {
+      "path": self.path,
+      "offset": self.offset,
+      "size": self.size,
+      "done": self.done,
+      "method": self.method,
+      "error": self.error,
+      }
+
+  def Run(self, _ioctl=fcntl.ioctl, _open_fn=os.open,
+          _fallocate=_Fallocate, _verify_fn=_VerifyZeroes):
+    """Wipes the device, recording any error.
+
+    """
+    try:
+      fd = _OpenDevice(self.path, _open_fn)
+      try:
+        self._Wipe(fd, _ioctl, _fallocate, _verify_fn)
+        os.fsync(fd)
+      finally:
+        os.close(fd)
+    except Exception, err: # pylint: disable=W0703
+      # Any error must be recorded, otherwise the device would be reported as
+      # unfinished without a reason
+      logging.exception("Wiping %s failed", self.path)
+      self.error = "Wiping %s at offset %s failed: %s" % \
+        (self.path, self.offset + self.done, err)
+
+  def _Wipe(self, fd, ioctl_fn, fallocate_fn, verify_fn):
+    """Zeroes the device step by step.
+
+    """
+    methods = list(self.methods)
+    buf = None
+
+    while self.done < self.size:
+      start = self.offset + self.done
+      length = min(WIPE_STEP, self.size - self.done)
+      method = methods[0]
+
+      try:
+        if method == constants.WIPE_DISCARD:
+          ioctl_fn(fd, _BLKDISCARD, struct.pack("QQ", start, length))
+        elif method == constants.WIPE_PUNCH_HOLE:
+          fallocate_fn(fd, _FALLOC_FL_PUNCH_HOLE | _FALLOC_FL_KEEP_SIZE,
+                       start, length)
+        elif method == constants.WIPE_ZERO_OUT:
+          ioctl_fn(fd, _BLKZEROOUT, struct.pack("QQ", start, length))
+        else:
+          assert method == constants.WIPE_WRITE
+          if buf is None:
+            buf = mmap.mmap(-1, WRITE_BUFSIZE)
+          _WriteZeroes(fd, buf, start, length)
+      except EnvironmentError, err:
+        if method == constants.WIPE_WRITE:
+          raise
+        logging.info("Wipe method %s failed on %s (%s), falling back to %s",
+                     method, self.path, err, methods[1])
+        methods.pop(0)
+        continue
+
+      if (method in _VERIFIED_METHODS and
+          not verify_fn(self.path, start, length)):
+        logging.warning("Wipe method %s didn't zero %s at offset %s, falling"
+                        " back to %s", method, self.path, start, methods[1])
+        methods.pop(0)
+        continue
+
+      self.method = method
+      self.done += length
+
+
+def _OpenDevice(path, open_fn):
+  """Opens a device for writing, bypassing the page cache if possible.
+
+  """
+  flags = os.O_WRONLY
+  direct = getattr(os, "O_DIRECT", 0)
+
+  try:
+    return open_fn(path, flags | direct)
+  except EnvironmentError, err:
+    if not (direct and err.errno == errno.EINVAL):
+      raise
+
+  # Some file systems don't support direct I/O
+  logging.debug("Can't use O_DIRECT for %s", path)
+  return open_fn(path, flags)
+
+
+def _WriteZeroes(fd, buf, offset, length):
+  """Writes zeroes from an aligned buffer to a range of a device.
+
+  """
+  os.lseek(fd, offset, os.SEEK_SET)
+
+  while length > 0:
+    count = min(len(buf), length)
+    written = os.write(fd, buffer(buf, 0, count))
+    if written <= 0:
+      raise IOError(errno.EIO, "Short write at offset %s" % offset)
+    offset += written
+    length -= written
+
+
+def _WriteStatus(path, wipers, finished):
+  """Writes the status of all devices.
+
+  """
+  utils.WriteFile(path, data=serializer.DumpJson({
+    "devices": [wiper.ToDict() for wiper in wipers],
+    "finished": finished,
+    "mtime": time.time(),
+    }), mode=0400)
+
+
+def WipeDevices(wipers, status_fn, _interval=STATUS_INTERVAL):
+  """Wipes devices concurrently.
+
+  @type wipers: list of L{DeviceWiper}
+  @param status_fn: Called with the list of wipers and whether all of them
+    are finished, at least every C{_interval} seconds
+  @rtype: bool
+  @return: Whether all devices were wiped successfully
+
+  """
+  threads = [threading.Thread(target=wiper.Run, name=wiper.path)
+             for wiper in wipers]
+
+  for thread in threads:
+    thread.daemon = True
+    thread.start()
+
+  for thread in threads:
+    while thread.is_alive():
+      status_fn(wipers, False)
+      thread.join(_interval)
+
+  status_fn(wipers, True)
+
+  return compat.all(wiper.error is None for wiper in wipers)
+
+
+def _ParseDevice(value):
+  """Parses a device argument in the form C{path:offset:size[:methods]}.
+
+  The methods are separated by commas.
+
+  """
+  parts = value.rsplit(":", 3)
+
+  if len(parts) == 4 and not parts[3].isdigit():
+    methods = parts.pop().split(",")
+  else:
+    parts = value.rsplit(":", 2)
+    methods = None
+
+  if len(parts) != 3:
+    raise ValueError("Expected path, offset and size")
+
+  (path, offset, size) = (parts[0], int(parts[1]), int(parts[2]))
+
+  if offset < 0 or size < 0:
+    raise ValueError("Offset and size must not be negative")
+
+  if methods is not None:
+    unknown = frozenset(methods) - constants.WIPE_METHODS
+    if unknown:
+      raise ValueError("Unknown wipe methods: %s" % utils.CommaJoin(unknown))
+
+  return (path, offset, size, methods)
+
+
+def ParseOptions():
+  """Parses the options passed to the program.
+
+  @return: Options and device arguments
+
+  """
+  parser = optparse.OptionParser(usage=("%prog <path:offset:size[:methods]>"
+                                        " [...]"),
+                                 prog=os.path.basename(sys.argv[0]))
+  parser.add_option(cli.DEBUG_OPT)
+  parser.add_option(cli.VERBOSE_OPT)
+  parser.add_option("--status-file", dest="status_file", action="store",
+                    type="string", default=None,
+                    help="File to write the progress to")
+
+  (opts, args) = parser.parse_args()
+
+  if not args:
+    parser.error("Expected at least one device")
+
+  if not opts.status_file:
+    parser.error("A status file is required")
+
+  devices = []
+  for value in args:
+    try:
+      devices.append(_ParseDevice(value))
+    except ValueError, err:
+      parser.error("Invalid device '%s': %s" % (value, err))
+
+  return (opts, devices)
+
+
+def Main():
+  """Main routine.
+
+  """
+  (opts, devices) = ParseOptions()
+
+  utils.SetupToolLogging(
+      opts.debug, opts.verbose,
+      toolname=os.path.splitext(os.path.basename(__file__))[0])
+
+  wipers = [DeviceWiper(path, offset, size, methods=methods)
+            for (path, offset, size, methods) in devices]
+
+  def _UpdateStatus(current, finished):
+    _WriteStatus(opts.status_file, current, finished)
+
+  if WipeDevices(wipers, _UpdateStatus):
+    return constants.EXIT_SUCCESS
+
+  return constants.EXIT_FAILURE
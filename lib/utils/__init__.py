@@ -61,6 +61,7 @@ from ganeti.utils.log import *
 from ganeti.utils.lvm import *
 from ganeti.utils.mlock import *
 from ganeti.utils.nodesetup import *
+from ganeti.utils.parallel import *
 from ganeti.utils.process import *
 from ganeti.utils.retry import *
 from ganeti.utils.security import *
@@ -33,10 +33,18 @@
 
 import os
 import hmac
+import stat
+import time
 
 from ganeti import compat
 
 
+#: Files modified less than this many seconds ago are not added to a
+#: fingerprint cache, as further changes within the timestamp resolution of
+#: the filesystem would go unnoticed
+_FINGERPRINT_CACHE_MIN_AGE = 2
+
+
 def Sha1Hmac(key, text, salt=None):
   """Calculates the HMAC-SHA1 digest of a text.
 
@@ -101,11 +109,39 @@ def _FingerprintFile(filename):
   return fp.hexdigest()
 
 
-def FingerprintFiles(files):
+def _GetFingerprintCacheKey(filename):
+  """Returns the data identifying a version of a file in a fingerprint cache.
+
+  @type filename: str
+  @param filename: the filename to look up
+  @rtype: list or None
+  @return: device, inode, size, modification and change time of the file,
+      or None if it is not a regular file
+
+  """
+  try:
+    st = os.stat(filename)
+  except EnvironmentError:
+    return None
+
+  if not stat.S_ISREG(st.st_mode):
+    return None
+
+  return [st.st_dev, st.st_ino, st.st_size, st.st_mtime, st.st_ctime]
+
+
+def FingerprintFiles(files, cache=None, _time_fn=time.time):
   """Compute fingerprints for a list of files.
 
+  If a cache is given, files whose inode, size and timestamps did not change
+  since they were last fingerprinted are not read again. The cache is updated
+  in place and can be stored by the caller, e.g. using L{serializer}.
+
   @type files: list
   @param files: the list of filename to fingerprint
+  @type cache: dict or None
+  @param cache: fingerprint cache, mapping filenames to the cache key and
+      fingerprint of the file
   @rtype: dict
   @return: a dictionary filename: fingerprint, holding only
       existing files
@@ -114,8 +150,43 @@ def FingerprintFiles(files):
   ret = {}
 
   for filename in files:
-    cksum = _FingerprintFile(filename)
+    if cache is None:
+      cksum = _FingerprintFile(filename)
+    else:
+      key = _GetFingerprintCacheKey(filename)
+      entry = cache.pop(filename, None)
+      if key is None:
+        cksum = None
+      elif entry is not None and list(entry[0]) == key:
+        cksum = entry[1]
+      else:
+        cksum = _FingerprintFile(filename)
+      if (cksum and
+          _time_fn() - max(key[3], key[4]) >= _FINGERPRINT_CACHE_MIN_AGE):
+        cache[filename] = [key, cksum]
+
     if cksum:
       ret[filename] = cksum
 
   return ret
+
+
+def AggregateFingerprint(fingerprints):
+  """Compute a single fingerprint for the result of L{FingerprintFiles}.
+
+  Two sets of files have the same aggregate fingerprint if and only if they
+  consist of the same filenames with the same fingerprints.
+
+  @type fingerprints: dict
+  @param fingerprints: a dictionary filename: fingerprint
+  @rtype: str
+  @return: the hex digest of the sha checksum of all filenames and
+      fingerprints
+
+  """
+  fp = compat.sha1_hash()
+
+  for (filename, cksum) in sorted(fingerprints.items()):
+    fp.update("%s\0%s\n" % (filename, cksum))
+
+  return fp.hexdigest()
@@ -0,0 +1,202 @@
+#
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Utility functions for running tasks in parallel threads.
+
+"""
+
+
+import logging
+import threading
+import time
+
+from ganeti import errors
+
+
+#: Task has finished, the value is its return value
+TASK_SUCCESS = "success"
+
+#: Task raised an exception, the value is the exception
+TASK_FAILED = "failed"
+
+#: Task didn't finish in time, the value is C{None}
+TASK_TIMEOUT = "timeout"
+
+
+class _ParallelRunner(object):
+  """Runs a list of tasks using a bounded number of threads.
+
+  """
+  def __init__(self, tasks, max_workers, timeout, time_fn):
+    """Initializes this class.
+
+    See L{RunParallel} for a description of the parameters.
+
+    """
+    self._max_workers = max_workers
+    self._timeout = timeout
+    self._time_fn = time_fn
+
+    self._cond = threading.Condition(threading.Lock())
+
+    # Tasks are taken from the end of the list
+    self._pending = list(reversed(tasks))
+    self._num_tasks = len(tasks)
+
+    # Start time of running tasks, by key
+    self._running = {}
+    self._results = {}
+
+  def _StartWorker(self):
+    """Starts a new worker thread.
+
+    """
+    thread = threading.Thread(target=self._Worker)
+    # Threads of tasks which timed out must not keep the process alive
+    thread.setDaemon(True)
+    thread.start()
+
+  def _Worker(self):
+    """Worker thread main loop.
+
+    """
+    while True:
+      self._cond.acquire()
+      try:
+        if not self._pending:
+          return
+        (key, fn, args) = self._pending.pop()
+        start = self._time_fn()
+        self._running[key] = start
+        # Let the main thread know about the task's deadline
+        self._cond.notifyAll()
+      finally:
+        self._cond.release()
+
+      try:
+        value = fn(*args)
+        status = TASK_SUCCESS
+      except Exception, err: # pylint: disable=W0703
+        logging.exception("Task '%s' failed", key)
+        value = err
+        status = TASK_FAILED
+
+      self._cond.acquire()
+      try:
+        if key not in self._running:
+          # Task has been given up on, another thread took over the slot
+          return
+        del self._running[key]
+        self._results[key] = (status, value, self._time_fn() - start)
+        self._cond.notifyAll()
+      finally:
+        self._cond.release()
+
+  def _CheckTimeouts(self):
+    """Gives up on tasks running for longer than the timeout.
+
+    Must be called with the lock held.
+
+    @rtype: None or number
+    @return: Time until the next running task reaches the timeout
+
+    """
+    if self._timeout is None:
+      return None
+
+    now = self._time_fn()
+    next_timeout = None
+
+    for (key, start) in self._running.items():
+      remaining = start + self._timeout - now
+      if remaining > 0:
+        if next_timeout is None or remaining < next_timeout:
+          next_timeout = remaining
+        continue
+
+      logging.warning("Task '%s' didn't finish in %s seconds, giving up",
+                      key, self._timeout)
+      del self._running[key]
+      self._results[key] = (TASK_TIMEOUT, None, now - start)
+
+      # The thread is still busy with the task, so start another one for the
+      # remaining tasks
+      if self._pending:
+        self._StartWorker()
+
+    return next_timeout
+
+  def __call__(self):
+    """Runs all tasks and waits for them.
+
+    """
+    self._cond.acquire()
+    try:
+      for _ in range(min(self._max_workers, self._num_tasks)):
+        self._StartWorker()
+
+      while len(self._results) < self._num_tasks:
+        wait = self._CheckTimeouts()
+        if len(self._results) < self._num_tasks:
+          self._cond.wait(wait)
+
+      return self._results
+    finally:
+      self._cond.release()
+
+
+def RunParallel(tasks, max_workers, timeout=None, _time_fn=time.time):
+  """Runs functions concurrently using a bounded number of threads.
+
+  Tasks are started in the given order. A task which hasn't finished
+  C{timeout} seconds after it was started is reported as L{TASK_TIMEOUT} and a
+  new thread takes over its slot. As Python threads can't be interrupted, the
+  function keeps running in the background and its result is discarded.
+
+  @type tasks: list of tuples; (key, callable, list)
+  @param tasks: Unique key, function and arguments for every task
+  @type max_workers: int
+  @param max_workers: Maximum number of tasks running at the same time
+  @type timeout: number or None
+  @param timeout: Maximum duration of every task in seconds
+  @rtype: dict
+  @return: Dictionary mapping task keys to tuples of status (one of
+    L{TASK_SUCCESS}, L{TASK_FAILED} and L{TASK_TIMEOUT}), value and duration
+    in seconds
+
+  """
+  if max_workers < 1:
+    raise errors.ProgrammerError("Need at least one worker, got %s" %
+                                 max_workers)
+
+  if len(set(key for (key, _, _) in tasks)) != len(tasks):
+    raise errors.ProgrammerError("Task keys must be unique")
+
+  return _ParallelRunner(tasks, max_workers, timeout, _time_fn)()
@@ -33,6 +33,7 @@
 
 
 import os
+import re
 import sys
 import subprocess
 import errno
@@ -40,6 +41,7 @@ import select
 import logging
 import signal
 import resource
+import time
 
 from cStringIO import StringIO
 
@@ -52,6 +54,7 @@ from ganeti.utils import wrapper as utils_wrapper
 from ganeti.utils import text as utils_text
 from ganeti.utils import io as utils_io
 from ganeti.utils import algo as utils_algo
+from ganeti.utils import parallel as utils_parallel
 
 
 #: when set to True, L{RunCmd} is disabled
@@ -61,6 +64,9 @@ _no_fork = False
  _TIMEOUT_TERM,
  _TIMEOUT_KILL) = range(3)
 
+#: Scripts run by L{RunParts} with the same numeric prefix form a group
+_RUNPARTS_GROUP_RE = re.compile(r"^(\d+)")
+
 
 def DisableFork():
   """Disables the use of fork(2).
@@ -711,15 +717,68 @@ def _RunCmdFile(cmd, env, via_shell, output, cwd, noclose_fds):
   return status
 
 
-def RunParts(dir_name, env=None, reset_env=False):
+def _RunPartsScript(fname, env, reset_env, timeout):
+  """Runs a single script for L{RunParts}.
+
+  @rtype: tuple
+  @return: (one of RUNDIR_STATUS, RunResult or error message)
+
+  """
+  try:
+    result = RunCmd([fname], env=env, reset_env=reset_env, timeout=timeout)
+  except Exception, err: # pylint: disable=W0703
+    return (constants.RUNPARTS_ERR, str(err))
+  else:
+    return (constants.RUNPARTS_RUN, result)
+
+
+def _GroupRunPartsScripts(relnames):
+  """Groups scripts by their numeric prefix.
+
+  Consecutive scripts with the same numeric prefix (e.g. C{10-dns} and
+  C{10-monitoring}) form a group; scripts without such a prefix are put in a
+  group of their own.
+
+  @type relnames: list of string
+  @param relnames: sorted script names
+  @rtype: list of lists of string
+
+  """
+  groups = []
+  last_prefix = None
+
+  for relname in relnames:
+    m = _RUNPARTS_GROUP_RE.match(relname)
+    prefix = m and m.group(1)
+    if prefix is None or prefix != last_prefix:
+      groups.append([])
+    groups[-1].append(relname)
+    last_prefix = prefix
+
+  return groups
+
+
+def RunParts(dir_name, env=None, reset_env=False, max_workers=1,
+             timeout=None, durations=None):
   """Run Scripts or programs in a directory
 
+  If C{max_workers} is larger than one, scripts with the same numeric prefix
+  (see L{_GroupRunPartsScripts}) are run concurrently; the groups themselves
+  are still run one after the other, in the order of their names.
+
   @type dir_name: string
   @param dir_name: absolute path to a directory
   @type env: dict
   @param env: The environment to use
   @type reset_env: boolean
   @param reset_env: whether to reset or keep the default os environment
+  @type max_workers: int
+  @param max_workers: maximum number of scripts run at the same time
+  @type timeout: int or None
+  @param timeout: if not None, time in seconds after which a script is killed
+  @type durations: dict or None
+  @param durations: if not None, the run time of each script is stored in
+      this dictionary, indexed by the script name
   @rtype: list of tuples
   @return: list of (name, (one of RUNDIR_STATUS), RunResult)
 
@@ -732,18 +791,48 @@ def RunParts(dir_name, env=None, reset_env=False):
     logging.warning("RunParts: skipping %s (cannot list: %s)", dir_name, err)
     return rr
 
+  if durations is None:
+    durations = {}
+
+  results = {}
+  runnable = []
+
   for relname in sorted(dir_contents):
     fname = utils_io.PathJoin(dir_name, relname)
     if not (constants.EXT_PLUGIN_MASK.match(relname) is not None and
             utils_wrapper.IsExecutable(fname)):
-      rr.append((relname, constants.RUNPARTS_SKIP, None))
+      results[relname] = (constants.RUNPARTS_SKIP, None)
     else:
-      try:
-        result = RunCmd([fname], env=env, reset_env=reset_env)
-      except Exception, err: # pylint: disable=W0703
-        rr.append((relname, constants.RUNPARTS_ERR, str(err)))
-      else:
-        rr.append((relname, constants.RUNPARTS_RUN, result))
+      runnable.append(relname)
+
+  if max_workers > 1:
+    groups = _GroupRunPartsScripts(runnable)
+  else:
+    groups = [[relname] for relname in runnable]
+
+  for group in groups:
+    if len(group) == 1:
+      relname = group[0]
+      start = time.time()
+      results[relname] = _RunPartsScript(utils_io.PathJoin(dir_name, relname),
+                                         env, reset_env, timeout)
+      durations[relname] = time.time() - start
+    else:
+      tasks = [(relname, _RunPartsScript,
+                [utils_io.PathJoin(dir_name, relname), env, reset_env,
+                 timeout])
+               for relname in group]
+      for (relname, (status, value, duration)) in \
+          utils_parallel.RunParallel(tasks, max_workers).items():
+        if status == utils_parallel.TASK_SUCCESS:
+          results[relname] = value
+        else:
+          results[relname] = (constants.RUNPARTS_ERR, str(value))
+        durations[relname] = duration
+
+  for relname in sorted(dir_contents):
+    (status, value) = results[relname]
+    rr.append((relname, status, value))
 
   return rr
 
@@ -59,6 +59,7 @@ from ganeti import qlang
 from ganeti import ssconf
 from ganeti import ht
 from ganeti import pathutils
+from ganeti import serializer
 
 import ganeti.rapi.client # pylint: disable=W0611
 from ganeti.rapi.client import UsesRapiClient
@@ -84,6 +85,10 @@ CHILD_PROCESS_DELAY = 1.0
 #: How many seconds to wait for instance status file lock
 INSTANCE_STATUS_LOCK_TIMEOUT = 10.0
 
+#: How many seconds an unchanged instance status file is left untouched before
+#: its modification time is refreshed
+STATUS_FILE_REFRESH_INTERVAL = 24 * 3600
+
 
 class NotMasterError(errors.GenericError):
   """Exception raised when this host is not the master."""
@@ -518,22 +523,55 @@ def ParseOptions():
   return (options, args)
 
 
-def _WriteInstanceStatus(filename, data):
-  """Writes the per-group instance status file.
+def _FormatInstanceStatus(data):
+  """Formats instance status data for writing to a status file.
 
   The entries are sorted.
 
+  @type data: list of tuple; (instance name as string, status as string)
+  @param data: Instance name and status
+  @rtype: string
+
+  """
+  return "\n".join("%s %s" % (n, s) for (n, s) in sorted(data))
+
+
+def _WriteInstanceStatus(filename, data):
+  """Writes an instance status file.
+
+  The file is only rewritten if its contents would change, so that the
+  modification time of an unchanged file is preserved and readers can use it
+  to detect updates. Unchanged files are touched every
+  L{STATUS_FILE_REFRESH_INTERVAL} seconds.
+
   @type filename: string
   @param filename: Path to instance status file
   @type data: list of tuple; (instance name as string, status as string)
   @param data: Instance name and status
+  @rtype: bool
+  @return: Whether the file has been written
 
   """
+  content = _FormatInstanceStatus(data)
+
+  statcb = utils.FileStatHelper()
+  try:
+    if utils.ReadFile(filename, preread=statcb) == content:
+      logging.debug("Instance status file '%s' is up to date", filename)
+      if statcb.st.st_mtime + STATUS_FILE_REFRESH_INTERVAL < time.time():
+        # Keep the file from being considered stale by ganeti-cleaner
+        os.utime(filename, None)
+      return False
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Unable to read '%s', rewriting: %s", filename, err)
+
   logging.debug("Updating instance status file '%s' with %s instances",
                 filename, len(data))
 
-  utils.WriteFile(filename,
-                  data="\n".join("%s %s" % (n, s) for (n, s) in sorted(data)))
+  utils.WriteFile(filename, data=content)
+
+  return True
 
 
 def _UpdateInstanceStatus(filename, instances):
@@ -575,9 +613,63 @@ def _ReadInstanceStatus(filename):
                                  for line in content.splitlines()])
 
 
-def _MergeInstanceStatus(filename, pergroup_filename, groups):
+def _GetStatusFileKey(filename):
+  """Returns the data used to detect changes of a per-group status file.
+
+  @type filename: string
+  @param filename: Path to status file
+  @rtype: None or list
+  @return: Device, inode, mtime and size of the file; C{None} if the file
+    can't be accessed
+
+  """
+  try:
+    st = os.stat(filename)
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't stat '%s': %s", filename, err)
+    return None
+
+  return [st.st_dev, st.st_ino, st.st_mtime, st.st_size]
+
+
+def _LoadMergeCache(filename):
+  """Loads the cache of already merged per-group instance status files.
+
+  @type filename: string
+  @param filename: Path to cache file
+  @rtype: dict
+  @return: Dictionary containing the file key (see L{_GetStatusFileKey}),
+    mtime and instance status per group UUID; empty if the cache can't be
+    read
+
+  """
+  try:
+    data = serializer.LoadJson(utils.ReadFile(filename))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read merge cache '%s': %s", filename, err)
+    return {}
+  except Exception, err: # pylint: disable=W0703
+    logging.warning("Invalid merge cache '%s', ignoring: %s", filename, err)
+    return {}
+
+  if not isinstance(data, dict):
+    logging.warning("Invalid merge cache '%s', ignoring", filename)
+    return {}
+
+  return data
+
+
+def _MergeInstanceStatus(filename, pergroup_filename, groups,
+                         _cache_filename=
+                           pathutils.WATCHER_INSTANCE_STATUS_MERGE_CACHE):
   """Merges all per-group instance status files into a global one.
 
+  Per-group files are only read if they have been modified since the last
+  merge, as recorded in a cache file. The global file is only rewritten if
+  the merged status differs from its current contents.
+
   @type filename: string
   @param filename: Path to global instance status file
   @type pergroup_filename: string
@@ -601,20 +693,51 @@ def _MergeInstanceStatus(filename, pergroup_filename, groups):
 
   logging.debug("Acquired exclusive lock on '%s'", filename)
 
+  cache = _LoadMergeCache(_cache_filename)
+  newcache = {}
+
   data = {}
 
-  # Load instance status from all groups
+  # Load instance status from all groups, re-reading only modified files
   for group_uuid in groups:
-    (mtime, instdata) = _ReadInstanceStatus(pergroup_filename % group_uuid)
+    group_filename = pergroup_filename % group_uuid
+    key = _GetStatusFileKey(group_filename)
+
+    if key is None:
+      continue
 
-    if mtime is not None:
-      for (instance_name, status) in instdata:
-        data.setdefault(instance_name, []).append((mtime, status))
+    entry = cache.get(group_uuid)
+    if entry is None or entry.get("key") != key:
+      (mtime, instdata) = _ReadInstanceStatus(group_filename)
+      if mtime is None:
+        continue
+      entry = {
+        "key": key,
+        "mtime": mtime,
+        "status": instdata,
+        }
+    else:
+      logging.debug("Per-group instance status file '%s' is unchanged",
+                    group_filename)
+
+    newcache[group_uuid] = entry
+
+    for (instance_name, status) in entry["status"]:
+      data.setdefault(instance_name, []).append((entry["mtime"], status))
 
   # Select last update based on file mtime
   inststatus = [(instance_name, sorted(status, reverse=True)[0][1])
                 for (instance_name, status) in data.items()]
 
+  # Update the cache while still holding the lock. Should writing the global
+  # status file fail, the cache is still valid as it only describes the
+  # per-group files.
+  if newcache != cache:
+    try:
+      utils.WriteFile(_cache_filename, data=serializer.DumpJson(newcache))
+    except EnvironmentError, err:
+      logging.warning("Can't write merge cache '%s': %s", _cache_filename, err)
+
   # Write the global status file. Don't touch file after it's been
   # updated--there is no lock anymore.
   _WriteInstanceStatus(filename, inststatus)
@@ -320,6 +320,27 @@ maxWipeChunk = 1024
 minWipeChunkPercent :: Int
 minWipeChunkPercent = 10
 
+-- | Wipe by discarding the range, for storage which reads back zeroes from
+-- discarded ranges
+wipeDiscard :: String
+wipeDiscard = "discard"
+
+-- | Wipe files by punching a hole
+wipePunchHole :: String
+wipePunchHole = "punch-hole"
+
+-- | Wipe using the kernel's zero-out operation
+wipeZeroOut :: String
+wipeZeroOut = "zeroout"
+
+-- | Wipe by writing zeroes
+wipeWrite :: String
+wipeWrite = "write"
+
+wipeMethods :: FrozenSet String
+wipeMethods =
+  ConstantUtils.mkSet [wipeDiscard, wipePunchHole, wipeZeroOut, wipeWrite]
+
 -- * Directories
 
 runDirsMode :: Int
@@ -496,6 +517,14 @@ syslogSocket = "/dev/log"
 exportConfFile :: String
 exportConfFile = "config.ini"
 
+-- | Suffix of the file listing the chunk digests of an exported disk image
+exportChunkMapSuffix :: String
+exportChunkMapSuffix = ".chunks"
+
+-- | Maximum number of disk images in the chain of an incremental export
+exportMaxChainLength :: Int
+exportMaxChainLength = 8
+
 -- * Xen
 
 xenBootloader :: String
@@ -684,6 +713,10 @@ ieioRawDisk = "raw"
 ieioScript :: String
 ieioScript = "script"
 
+-- | I/O types which can be transferred as sparse stream, skipping holes
+ieioSparseTypes :: FrozenSet String
+ieioSparseTypes = ConstantUtils.mkSet [ieioFile, ieioRawDisk]
+
 -- * Values
 
 valueDefault :: String
@@ -772,6 +805,10 @@ hkrFail = 1
 hkrSuccess :: Int
 hkrSuccess = 2
 
+-- | Hook scripts running longer than this (seconds) are logged as slow
+hooksSlowScript :: Int
+hooksSlowScript = 10
+
 -- * Storage types
 
 stBlock :: String
@@ -1376,6 +1413,30 @@ nodeMaxClockSkew = 150
 diskTransferConnectTimeout :: Int
 diskTransferConnectTimeout = 60
 
+-- | Default number of parallel streams used for raw disk transfers
+diskTransferStreams :: Int
+diskTransferStreams = 4
+
+-- | Maximum number of parallel streams used for raw disk transfers
+diskTransferMaxStreams :: Int
+diskTransferMaxStreams = 16
+
+-- | Minimum size (in MiB) of a disk segment sent over its own stream
+diskTransferMinSegmentSize :: Int
+diskTransferMinSegmentSize = 1024
+
+-- | Distance (in MiB) between checkpoints of resumable disk transfers
+diskTransferCheckpointSize :: Int
+diskTransferCheckpointSize = 256
+
+-- | How many times a failed disk transfer segment is resumed
+diskTransferMaxRetries :: Int
+diskTransferMaxRetries = 3
+
+-- | Size (in MiB) of the chunks compared by incremental exports
+diskTransferChunkSize :: Int
+diskTransferChunkSize = 4
+
 -- | Disk index separator
 diskSeparator :: String
 diskSeparator = AutoConf.diskSeparator
@@ -3343,6 +3404,10 @@ nvExclusivepvs = "exclusive-pvs"
 nvFilelist :: String
 nvFilelist = "filelist"
 
+-- | Aggregate fingerprint of the files, see 'nvFilelist'
+nvFileDigest :: String
+nvFileDigest = "file-digest"
+
 nvAcceptedStoragePaths :: String
 nvAcceptedStoragePaths = "allowed-file-storage-paths"
 
@@ -3412,6 +3477,24 @@ nvSshSetup = "ssh-setup"
 nvSshClutter :: String
 nvSshClutter = "ssh-clutter"
 
+-- | Duration and outcome of the individual node verify checks
+nvCheckStats :: String
+nvCheckStats = "check-stats"
+
+-- | Maximum number of node verify checks run concurrently on a node
+nodeVerifyMaxWorkers :: Int
+nodeVerifyMaxWorkers = 8
+
+-- | Maximum duration of a single node verify check (seconds); must be
+-- well below the timeout of the node verify RPC
+nodeVerifyCheckTimeout :: Int
+nodeVerifyCheckTimeout = 300
+
+-- | Node verify checks running longer than this (seconds) are reported
+-- as slow by cluster verify
+nodeVerifySlowCheck :: Int
+nodeVerifySlowCheck = 10
+
 -- * Instance status
 
 inststAdmindown :: String
@@ -4801,6 +4884,14 @@ sshsSshKeyBits = "ssh_key_bits"
 sshsMaxRetries :: Integer
 sshsMaxRetries = 3
 
+-- | Maximum number of nodes whose SSH key files are updated concurrently
+sshsMaxParallel :: Int
+sshsMaxParallel = 16
+
+-- | Timeout in seconds for updating the SSH key files of a single node
+sshsTimeout :: Int
+sshsTimeout = 5 * 60
+
 sshsAdd :: String
 sshsAdd = "add"
 
@@ -858,6 +858,7 @@ $(genOpCode "OpCode"
      , pZeroingTimeoutFixed
      , pZeroingTimeoutPerMiB
      , pLongSleep
+     , pIncrementalExport
      ],
      "instance_name")
   , ("OpBackupRemove",
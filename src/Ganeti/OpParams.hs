@@ -320,6 +320,7 @@ module Ganeti.OpParams
   , pNodeSetup
   , pVerifyClutter
   , pLongSleep
+  , pIncrementalExport
   , pIsStrict
   , pEnabledPredictiveQueue
   ) where
@@ -2026,6 +2027,13 @@ pLongSleep =
   defaultField [| False |] $
   simpleField "long_sleep" [t| Bool |]
 
+pIncrementalExport :: Field
+pIncrementalExport =
+  withDoc "Whether to only transfer disk data changed since the previous\
+           \ export" .
+  defaultField [| False |] $
+  simpleField "incremental" [t| Bool |]
+
 pIsStrict :: Field
 pIsStrict =
   withDoc "Whether the operation is in strict mode or not." .
@@ -405,6 +405,7 @@ handleCall _ _ cfg (QueryConfigValues fields) = do
                   return $ clusterProperty clusterModifySshSetup)
                , ("ssh_key_type", return $ clusterProperty clusterSshKeyType)
                , ("ssh_key_bits", return $ clusterProperty clusterSshKeyBits)
+               , ("config_serial", return . showJSON $ configSerial cfg)
                ] :: [(String, IO JSValue)]
   let answer = map (fromMaybe (return JSNull) . flip lookup params) fields
   answerEval <- sequence answer
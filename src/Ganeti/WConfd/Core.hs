@@ -44,7 +44,7 @@ module Ganeti.WConfd.Core where
 import Control.Arrow ((&&&))
 import Control.Concurrent (myThreadId)
 import Control.Lens.Setter (set)
-import Control.Monad (liftM, unless)
+import Control.Monad (forM, liftM, replicateM, unless)
 import qualified Data.Map as M
 import qualified Data.Set as S
 import Language.Haskell.TH (Name)
@@ -215,6 +215,18 @@ allocateDRBDMinor
 allocateDRBDMinor disk nodes =
   modifyTempResStateErr (\cfg -> T.allocateDRBDMinor cfg disk nodes)
 
+-- Allocate drbd minors for several disks at once.
+--
+-- Each element of the list is a disk together with the nodes to allocate
+-- minors on, as for 'allocateDRBDMinor'. Either all minors are allocated,
+-- or none of them. The result contains the lists of minors, in the same
+-- order as the passed disks.
+allocateDRBDMinors
+  :: [(T.DiskUUID, [T.NodeUUID])] -> WConfdMonad [[T.DRBDMinor]]
+allocateDRBDMinors disks =
+  modifyTempResStateErr (\cfg -> forM disks
+                                   (uncurry $ T.allocateDRBDMinor cfg))
+
 -- Release temporary drbd minors allocated for a given disk using
 -- 'allocateDRBDMinor'.
 --
@@ -235,6 +247,14 @@ generateMAC cid (J.MaybeForJSON netId) = do
   g <- liftIO Rand.newStdGen
   modifyTempResStateErr $ T.generateMAC g cid netId
 
+-- Randomly generate a given number of MACs and reserve them for a given
+-- client. Either all of the MACs are reserved, or none of them.
+generateMACs
+  :: ClientId -> J.MaybeForJSON T.NetworkUUID -> Int -> WConfdMonad [T.MAC]
+generateMACs cid (J.MaybeForJSON netId) count = do
+  gs <- liftIO $ replicateM count Rand.newStdGen
+  modifyTempResStateErr $ \cfg -> forM gs (\g -> T.generateMAC g cid netId cfg)
+
 -- Reserves a MAC for an instance in the list of temporary reservations.
 reserveMAC :: ClientId -> T.MAC -> WConfdMonad ()
 reserveMAC = (modifyTempResStateErr .) . T.reserveMAC
@@ -248,11 +268,24 @@ generateDRBDSecret cid = do
   g <- liftIO Rand.newStdGen
   modifyTempResStateErr $ T.generateDRBDSecret g cid
 
+-- Randomly generate a given number of DRBDSecrets and reserve them for
+-- a given client. Either all of the secrets are reserved, or none of them.
+generateDRBDSecrets :: ClientId -> Int -> WConfdMonad [DRBDSecret]
+generateDRBDSecrets cid count = do
+  gs <- liftIO $ replicateM count Rand.newStdGen
+  modifyTempResStateErr $ \cfg -> forM gs (\g -> T.generateDRBDSecret g cid cfg)
+
 -- *** LVs
 
 reserveLV :: ClientId -> LogicalVolume -> WConfdMonad ()
 reserveLV jobId lv = modifyTempResStateErr $ T.reserveLV jobId lv
 
+-- Reserve several LVs at once. Either all of them are reserved,
+-- or none of them.
+reserveLVs :: ClientId -> [LogicalVolume] -> WConfdMonad ()
+reserveLVs jobId lvs =
+  modifyTempResStateErr $ \cfg -> mapM_ (\lv -> T.reserveLV jobId lv cfg) lvs
+
 -- *** IPv4s
 
 -- | Reserve a given IPv4 address for use by an instance.
@@ -269,6 +302,12 @@ releaseIp = (((modifyTempResStateErr .) const .) .) . T.releaseIp
 generateIp :: ClientId -> T.NetworkUUID -> WConfdMonad Ip4Address
 generateIp = (modifyTempResStateErr .) . T.generateIp
 
+-- Find a given number of free IPv4 addresses for instances and reserve them.
+-- Either all of the addresses are reserved, or none of them.
+generateIps :: ClientId -> T.NetworkUUID -> Int -> WConfdMonad [Ip4Address]
+generateIps cid netId count =
+  modifyTempResStateErr $ \cfg -> replicateM count (T.generateIp cid netId cfg)
+
 -- | Commit all reserved/released IP address to an IP pool.
 -- The IP addresses are taken from the network's IP pool and marked as
 -- reserved/free for instances.
@@ -435,18 +474,23 @@ exportedFunctions = [ 'echo
                     -- DRBD
                     , 'computeDRBDMap
                     , 'allocateDRBDMinor
+                    , 'allocateDRBDMinors
                     , 'releaseDRBDMinors
                     -- MACs
                     , 'reserveMAC
                     , 'generateMAC
+                    , 'generateMACs
                     -- DRBD secrets
                     , 'generateDRBDSecret
+                    , 'generateDRBDSecrets
                     -- LVs
                     , 'reserveLV
+                    , 'reserveLVs
                     -- IPv4s
                     , 'reserveIp
                     , 'releaseIp
                     , 'generateIp
+                    , 'generateIps
                     , 'commitTemporaryIps
                     , 'commitReleaseTemporaryIp
                     , 'listReservedIps
@@ -496,6 +496,7 @@ genOpCodeFromId op_id cfg =
         <*> arbitrary                -- zeroing_timeout_fixed
         <*> arbitrary                -- zeroing_timeout_per_mib
         <*> arbitrary                -- long_sleep
+        <*> arbitrary                -- incremental
     "OP_BACKUP_REMOVE" ->
       OpCodes.OpBackupRemove <$> getInstanceName <*> return Nothing
     "OP_TEST_ALLOCATOR" ->
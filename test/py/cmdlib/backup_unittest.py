@@ -30,6 +30,7 @@
 
 """Tests for LUBackup*"""
 
+from ganeti import compat
 from ganeti import constants
 from ganeti import objects
 from ganeti import opcodes
@@ -134,6 +135,15 @@ class TestLUBackupExportBase(CmdlibTestCase):
                                            )])
     self.rpc.call_impexp_status.side_effect = ImpExpStatus
 
+    def ImpExpStatusWait(node_uuids, node_daemons, _):
+      results = self.RpcResultsBuilder()
+      for node_uuid in node_uuids:
+        status = objects.ImportExportStatus(exit_status=0)
+        results.AddSuccessfulNode(node_uuid,
+                                  [status] * len(node_daemons[node_uuid]))
+      return results.Build()
+    self.rpc.call_impexp_status_wait.side_effect = ImpExpStatusWait
+
     def ImpExpCleanup(node_uuid, name):
       return self.RpcResultsBuilder() \
                .CreateSuccessfulNodeResult(node_uuid)
@@ -261,6 +271,36 @@ class TestLUBackupExportLocalExport(TestLUBackupExportBase):
     op = self.CopyOpCode(self.op, shutdown=False, long_sleep=True)
     self.ExecOpCodeExpectOpPrereqError(op, ".*long sleep.*")
 
+  def _GetExportSources(self):
+    return [args[6][0]
+            for (args, _) in self.rpc.call_export_start.call_args_list]
+
+  @TrySnapshots(True)
+  @InstanceRemoved(False)
+  def testExportWithOsScripts(self):
+    self._PrepareInstance(online=True)
+    self.ExecOpCode(self.op)
+    self.assertTrue(self._GetExportSources())
+    self.assertTrue(compat.all(src_io == constants.IEIO_SCRIPT
+                               for src_io in self._GetExportSources()))
+
+  @TrySnapshots(True)
+  @InstanceRemoved(False)
+  def testIncrementalExportWithOsScripts(self):
+    self._PrepareInstance(online=True)
+    self.rpc.call_export_info.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateFailedNodeResult(self.target_node)
+
+    op = self.CopyOpCode(self.op, incremental=True)
+    self.ExecOpCode(op)
+
+    # The raw disks are read instead of running the OS export scripts
+    self.mcpu.assertLogContainsRegex("No previous export on node")
+    self.assertTrue(self._GetExportSources())
+    self.assertTrue(compat.all(src_io == constants.IEIO_RAW_DISK
+                               for src_io in self._GetExportSources()))
+
 
 class TestLUBackupExportRemoteExport(TestLUBackupExportBase):
   def setUp(self):
@@ -285,6 +325,11 @@ class TestLUBackupExportRemoteExport(TestLUBackupExportBase):
     self.ExecOpCodeExpectOpPrereqError(op,
                                        "Missing destination X509 CA")
 
+  @InstanceRemoved(False)
+  def testRemoteIncrementalExport(self):
+    op = self.CopyOpCode(self.op, incremental=True)
+    self.ExecOpCodeExpectOpPrereqError(op, "only supported for local exports")
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -1977,6 +1977,66 @@ class TestLUClusterVerifyGroupVerifyFiles(TestLUClusterVerifyGroupMethods):
       self.mcpu.assertLogContainsInLine(expected_msg)
 
 
+class TestLUClusterVerifyGroupFetchFileFingerprints(
+    TestLUClusterVerifyGroupMethods):
+  @withLockedLU
+  def test(self, lu):
+    node1 = self.cfg.AddNewNode()
+    node2 = self.cfg.AddNewNode()
+    node3 = self.cfg.AddNewNode()
+    node4 = self.cfg.AddNewNode()
+    files = [pathutils.RAPI_CERT_FILE]
+    fps = {
+      self.master.uuid: {pathutils.RAPI_CERT_FILE: "b4a8a824ab3cac3d88839a"},
+      node1.uuid: {pathutils.RAPI_CERT_FILE: "b4a8a824ab3cac3d88839a"},
+      node2.uuid: {pathutils.RAPI_CERT_FILE: "77935cee92afd26d162f9e"},
+      node3.uuid: {pathutils.RAPI_CERT_FILE: "77935cee92afd26d162f9e"},
+      }
+
+    nvinfo = RpcResultsBuilder() \
+      .AddSuccessfulNode(self.master, {constants.NV_FILE_DIGEST: "digest1"}) \
+      .AddSuccessfulNode(node1, {constants.NV_FILE_DIGEST: "digest1"}) \
+      .AddSuccessfulNode(node2, {constants.NV_FILE_DIGEST: "digest2"}) \
+      .AddSuccessfulNode(node3, {constants.NV_FILE_DIGEST: "digest2"}) \
+      .AddFailedNode(node4) \
+      .Build()
+
+    queried = []
+    failed = []
+
+    def _NodeVerify(node_uuids, what, *_):
+      self.assertEqual(what, {constants.NV_FILELIST: files})
+      queried.extend(node_uuids)
+      builder = RpcResultsBuilder(cfg=self.cfg)
+      for node_uuid in node_uuids:
+        if node_uuid in (node2.uuid, node3.uuid) and not failed:
+          # The first node queried for the second digest fails
+          failed.append(node_uuid)
+          builder.AddFailedNode(node_uuid)
+        else:
+          builder.AddSuccessfulNode(node_uuid,
+                                    {constants.NV_FILELIST: fps[node_uuid]})
+      return builder.Build()
+
+    self.rpc.call_node_verify.side_effect = _NodeVerify
+
+    lu._FetchFileFingerprints(nvinfo, files)
+
+    # One node per digest, and another one if the first failed
+    self.assertEqual(len(queried), 3)
+    self.assertTrue(node2.uuid in queried)
+    self.assertTrue(node3.uuid in queried)
+    self.assertFalse(node4.uuid in queried)
+    self.assertEqual(nvinfo[self.master.uuid].payload[constants.NV_FILELIST],
+                     fps[self.master.uuid])
+    self.assertEqual(nvinfo[node1.uuid].payload[constants.NV_FILELIST],
+                     fps[node1.uuid])
+    self.assertEqual(nvinfo[node2.uuid].payload[constants.NV_FILELIST],
+                     fps[node2.uuid])
+    self.assertEqual(nvinfo[node3.uuid].payload[constants.NV_FILELIST],
+                     fps[node3.uuid])
+
+
 class TestLUClusterVerifyGroupVerifyNodeOs(TestLUClusterVerifyGroupMethods):
   @withLockedLU
   def testUpdateNodeOsInvalidNodeResult(self, lu):
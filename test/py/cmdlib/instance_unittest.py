@@ -811,6 +811,52 @@ param1=val1
                          src_node=self.master.name)
     self.ExecOpCode(op)
 
+  def _ImportDisk(self, raw_option):
+    exp_info = """
+[export]
+version=0
+os=%s
+[instance]
+name=old_name.example.com
+disk0_size=1024
+disk0_dump=mock_path
+%s
+""" % (self.os.name, raw_option)
+
+    self.rpc.call_export_info.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateSuccessfulNodeResult(self.master, exp_info)
+    self.rpc.call_import_start.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateSuccessfulNodeResult(self.master, "daemon_name")
+    self.rpc.call_impexp_status.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateSuccessfulNodeResult(self.master,
+                                    [
+                                      objects.ImportExportStatus(exit_status=0)
+                                    ])
+    self.rpc.call_impexp_cleanup.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateSuccessfulNodeResult(self.master, True)
+
+    op = self.CopyOpCode(self.plain_op,
+                         disks=[],
+                         mode=constants.INSTANCE_IMPORT,
+                         src_node=self.master.name)
+    self.ExecOpCode(op)
+
+    return [args[4][0]
+            for (args, _) in self.rpc.call_import_start.call_args_list]
+
+  def testImportWithOsScript(self):
+    self.assertEqual(self._ImportDisk("disk0_raw=False"),
+                     [constants.IEIO_SCRIPT])
+
+  def testImportRawImage(self):
+    # Incremental exports contain raw disk images even if there is an OS
+    self.assertEqual(self._ImportDisk("disk0_raw=True"),
+                     [constants.IEIO_RAW_DISK])
+
 
 class TestDiskTemplateDiskTypeBijection(TestLUInstanceCreate):
   """Tests that one disk template corresponds to exactly one disk type."""
@@ -1258,6 +1304,7 @@ class _FakeConfigForGenDiskTemplate(ConfigMock):
     self._drbd_minor = itertools.count(20)
     self._port = itertools.count(constants.FIRST_DRBD_PORT)
     self._secret = itertools.count()
+    self.batched_calls = []
 
   def GenerateUniqueID(self, ec_id):
     return "ec%s-uq%s" % (ec_id, self._unique_id.next())
@@ -1272,6 +1319,16 @@ class _FakeConfigForGenDiskTemplate(ConfigMock):
   def GenerateDRBDSecret(self, ec_id):
     return "ec%s-secret%s" % (ec_id, self._secret.next())
 
+  def AllocateDRBDMinors(self, requests):
+    self.batched_calls.append(("AllocateDRBDMinors", len(requests)))
+    return super(_FakeConfigForGenDiskTemplate, self).AllocateDRBDMinors(
+      requests)
+
+  def GenerateDRBDSecrets(self, count, ec_id):
+    self.batched_calls.append(("GenerateDRBDSecrets", count))
+    return super(_FakeConfigForGenDiskTemplate, self).GenerateDRBDSecrets(
+      count, ec_id)
+
 
 class TestGenerateDiskTemplate(CmdlibTestCase):
   def setUp(self):
@@ -1532,6 +1589,12 @@ class TestGenerateDiskTemplate(CmdlibTestCase):
        constants.FIRST_DRBD_PORT + 2, 24, 25, "ec1-secret2"),
       ])
 
+    # Secrets and minors are reserved for all disks with one request each
+    self.assertEqual(self.lu.cfg.batched_calls, [
+      ("GenerateDRBDSecrets", len(disk_info)),
+      ("AllocateDRBDMinors", len(disk_info)),
+      ])
+
 
 class _DiskPauseTracker:
   def __init__(self):
@@ -1565,14 +1628,34 @@ class _RpcForDiskWipe:
     self._exp_node = exp_node
     self._pause_cb = pause_cb
     self._wipe_cb = wipe_cb
+    self.jobs = {}
 
   def call_blockdev_pause_resume_sync(self, node, disks, pause):
     assert node == self._exp_node
     return rpc.RpcResult(data=self._pause_cb(disks, pause))
 
-  def call_blockdev_wipe(self, node, bdev, offset, size):
+  def call_blockdev_wipe_start(self, node, (disks, _), offsets):
     assert node == self._exp_node
-    return rpc.RpcResult(data=self._wipe_cb(bdev, offset, size))
+    name = "wipe%s" % len(self.jobs)
+    self.jobs[name] = iter(self._wipe_cb(disks, offsets))
+    return rpc.RpcResult(data=(True, name))
+
+  def call_blockdev_wipe_status(self, node, name):
+    assert node == self._exp_node
+    return rpc.RpcResult(data=(True, self.jobs[name].next()))
+
+  def call_blockdev_wipe_cleanup(self, node, name):
+    assert node == self._exp_node
+    del self.jobs[name]
+    return rpc.RpcResult(data=(True, None))
+
+
+def _WipeStatus(devices, finished):
+  return {
+    "devices": [{"size": size, "done": done, "error": error}
+                for (size, done, error) in devices],
+    "finished": finished,
+    }
 
 
 class _DiskWipeProgressTracker:
@@ -1580,30 +1663,24 @@ class _DiskWipeProgressTracker:
     self._start_offset = start_offset
     self.progress = {}
 
-  def __call__(self, (disk, _), offset, size):
-    assert isinstance(offset, (long, int))
-    assert isinstance(size, (long, int))
-
-    max_chunk_size = (disk.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT)
-
-    assert offset >= self._start_offset
-    assert (offset + size) <= disk.size
+  def __call__(self, disks, offsets):
+    assert len(disks) == len(offsets)
 
-    assert size > 0
-    assert size <= constants.MAX_WIPE_CHUNK
-    assert size <= max_chunk_size
+    devices = []
 
-    assert offset == self._start_offset or disk.logical_id in self.progress
+    for (disk, offset) in zip(disks, offsets):
+      assert isinstance(offset, (long, int))
+      assert offset == self._start_offset
+      assert offset <= disk.size
+      assert disk.logical_id not in self.progress
 
-    # Keep track of progress
-    cur_progress = self.progress.setdefault(disk.logical_id, self._start_offset)
+      # The whole remainder of the disk is wiped at once
+      self.progress[disk.logical_id] = disk.size
 
-    assert cur_progress == offset
+      size = (disk.size - offset) * 1024 * 1024
+      devices.append((size, size, None))
 
-    # Record progress
-    self.progress[disk.logical_id] += size
-
-    return (True, None)
+    return [None, _WipeStatus(devices, True)]
 
 
 class TestWipeDisks(unittest.TestCase):
@@ -1633,10 +1710,16 @@ class TestWipeDisks(unittest.TestCase):
 
     self.assertRaises(errors.OpExecError, instance_create.WipeDisks, lu, inst)
 
-  def _FailingWipeCb(self, (disk, _), offset, size):
-    # This should only ever be called for the first disk
-    self.assertEqual(disk.logical_id, "disk0")
-    return (False, None)
+  def _FailingWipeCb(self, disks, offsets):
+    self.assertEqual([disk.logical_id for disk in disks],
+                     ["disk0", "disk1", "disk2"])
+    self.assertEqual(offsets, [0, 0, 0])
+    return [
+      _WipeStatus([(100, 10, None), (500, 20, None), (256, 30, None)],
+                  False),
+      _WipeStatus([(100, 50, "I/O error"), (500, 40, None), (256, 60, None)],
+                  False),
+      ]
 
   def testFailingWipe(self):
     node_uuid = "node13445-uuid"
@@ -1651,21 +1734,29 @@ class TestWipeDisks(unittest.TestCase):
                    size=256, uuid="disk2"),
       ]
 
-    lu = _FakeLU(rpc=_RpcForDiskWipe(node_uuid, pt, self._FailingWipeCb),
-                 cfg=_ConfigForDiskWipe(node_uuid, disks))
+    rpc_fake = _RpcForDiskWipe(node_uuid, pt, self._FailingWipeCb)
+    lu = _FakeLU(rpc=rpc_fake, cfg=_ConfigForDiskWipe(node_uuid, disks))
 
     inst = objects.Instance(name="inst562",
                             primary_node=node_uuid,
                             disk_template=constants.DT_PLAIN,
                             disks=[d.uuid for d in disks])
 
+    sleeps = []
+
     try:
-      instance_create.WipeDisks(lu, inst)
+      instance_create.WipeDisks(lu, inst, _sleep_fn=sleeps.append)
     except errors.OpExecError, err:
-      self.assertTrue(str(err), "Could not wipe disk 0 at offset 0 ")
+      self.assertTrue(str(err).startswith("Could not wipe disk 0: I/O error"))
     else:
       self.fail("Did not raise exception")
 
+    # The node was polled until the error was reported
+    self.assertEqual(len(sleeps), 1)
+
+    # The wipe job was cleaned up
+    self.assertFalse(rpc_fake.jobs)
+
     # Check if all disks were paused and resumed
     self.assertEqual(pt.history, [
       ("disk0", 100 * 1024, True),
@@ -1676,6 +1767,40 @@ class TestWipeDisks(unittest.TestCase):
       ("disk2", 256, False),
       ])
 
+  def _IncompleteWipeCb(self, disks, offsets):
+    return [
+      _WipeStatus([(100, 100, None), (500, 200, None)], True),
+      ]
+
+  def testIncompleteWipe(self):
+    node_uuid = "node9262-uuid"
+    pt = _DiskPauseTracker()
+
+    disks = [
+      objects.Disk(dev_type=constants.DT_PLAIN, logical_id="disk0",
+                   size=100, uuid="disk0"),
+      objects.Disk(dev_type=constants.DT_PLAIN, logical_id="disk1",
+                   size=500, uuid="disk1"),
+      ]
+
+    rpc_fake = _RpcForDiskWipe(node_uuid, pt, self._IncompleteWipeCb)
+    lu = _FakeLU(rpc=rpc_fake, cfg=_ConfigForDiskWipe(node_uuid, disks))
+
+    inst = objects.Instance(name="inst9262",
+                            primary_node=node_uuid,
+                            disk_template=constants.DT_PLAIN,
+                            disks=[d.uuid for d in disks])
+
+    try:
+      instance_create.WipeDisks(lu, inst, _sleep_fn=NotImplemented)
+    except errors.OpExecError, err:
+      self.assertTrue(str(err).startswith("Wiping disk 1 stopped after 200 of"
+                                          " 500 bytes"))
+    else:
+      self.fail("Did not raise exception")
+
+    self.assertFalse(rpc_fake.jobs)
+
   def _PrepareWipeTest(self, start_offset, disks):
     node_name = "node-with-offset%s.example.com" % start_offset
     pauset = _DiskPauseTracker()
@@ -1705,7 +1830,8 @@ class TestWipeDisks(unittest.TestCase):
 
     (lu, inst, pauset, progresst) = self._PrepareWipeTest(0, disks)
 
-    instance_create.WipeDisks(lu, inst)
+    sleeps = []
+    instance_create.WipeDisks(lu, inst, _sleep_fn=sleeps.append)
 
     self.assertEqual(pauset.history, [
       ("disk0", 1024, True),
@@ -1722,6 +1848,10 @@ class TestWipeDisks(unittest.TestCase):
     self.assertEqual(progresst.progress,
                      dict((i.logical_id, i.size) for i in disks))
 
+    # The first query happened before the job reported its status
+    self.assertEqual(len(sleeps), 1)
+    self.assertFalse(lu.rpc.jobs)
+
   def testWipeWithStartOffset(self):
     for start_offset in [0, 280, 8895, 1563204]:
       disks = [
@@ -1736,7 +1866,8 @@ class TestWipeDisks(unittest.TestCase):
 
       # Test start offset with only one disk
       instance_create.WipeDisks(lu, inst,
-                                disks=[(1, disks[1], start_offset)])
+                                disks=[(1, disks[1], start_offset)],
+                                _sleep_fn=lambda _: None)
 
       # Only the second disk may have been paused and wiped
       self.assertEqual(pauset.history, [
@@ -1810,6 +1941,15 @@ class TestLUInstanceMove(CmdlibTestCase):
                                            )])
     self.rpc.call_impexp_status.side_effect = ImpExpStatus
 
+    def ImpExpStatusWait(node_uuids, node_daemons, _):
+      results = self.RpcResultsBuilder()
+      for node_uuid in node_uuids:
+        status = objects.ImportExportStatus(exit_status=0)
+        results.AddSuccessfulNode(node_uuid,
+                                  [status] * len(node_daemons[node_uuid]))
+      return results.Build()
+    self.rpc.call_impexp_status_wait.side_effect = ImpExpStatusWait
+
     def ImpExpCleanup(node_uuid, name):
       return self.RpcResultsBuilder() \
                .CreateSuccessfulNodeResult(node_uuid)
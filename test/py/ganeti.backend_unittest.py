@@ -202,6 +202,29 @@ class TestNodeVerify(testutils.GanetiTestCase):
     self.failUnless(result[constants.NV_NODENETTEST] == {},
                     "Test ran by non master candidate")
 
+  def testCheckStats(self):
+    local_data = (netutils.Hostname.GetSysName(),
+                  constants.IP4_ADDRESS_LOCALHOST, [])
+    result = backend.VerifyNode({constants.NV_MASTERIP: local_data},
+                                None, {})
+    stats = result[constants.NV_CHECK_STATS]
+    self.assertEqual(stats["MasterIp"][0], utils.TASK_SUCCESS)
+    self.assertTrue(stats["MasterIp"][1] >= 0)
+
+  def testFailingCheck(self):
+    local_data = (netutils.Hostname.GetSysName(),
+                  constants.IP4_ADDRESS_LOCALHOST, [])
+    with mock.patch("ganeti.backend.VerifyMasterIP",
+                    side_effect=errors.GenericError("failed")):
+      result = backend.VerifyNode({constants.NV_MASTERIP: local_data,
+                                   constants.NV_USERSCRIPTS: []},
+                                  None, {})
+    self.assertFalse(constants.NV_MASTERIP in result)
+    self.assertEqual(result[constants.NV_USERSCRIPTS], [])
+    stats = result[constants.NV_CHECK_STATS]
+    self.assertEqual(stats["MasterIp"][0], utils.TASK_FAILED)
+    self.assertEqual(stats["UserScripts"][0], utils.TASK_SUCCESS)
+
   def testVerifyHvparams(self):
     test_hvparams = {constants.HV_XEN_CMD: constants.XEN_CMD_XL}
     test_what = {constants.NV_HVPARAMS: \
@@ -670,6 +693,365 @@ class TestSetWatcherPause(unittest.TestCase):
       self.assertEqual(os.stat(self.filename).st_mode & 0777, 0644)
 
 
+class TestWaitImportExportStatus(unittest.TestCase):
+  def setUp(self):
+    self.now = 1000.0
+    self.statuses = []
+    self.sleeps = []
+
+  def _Time(self):
+    return self.now
+
+  def _Sleep(self, duration):
+    self.sleeps.append(duration)
+    self.now += duration
+
+  def _Status(self, names):
+    self.assertEqual(names, ["a", "b"])
+    if len(self.statuses) > 1:
+      return self.statuses.pop(0)
+    return self.statuses[0]
+
+  def _Wait(self, daemons, timeout):
+    return backend.WaitImportExportStatus(daemons, timeout,
+                                          _status_fn=self._Status,
+                                          _time_fn=self._Time,
+                                          _sleep_fn=self._Sleep)
+
+  def testChangedAlready(self):
+    self.statuses = [[{"mtime": 10.0}, None]]
+    result = self._Wait([("a", None), ("b", None)], 10)
+    self.assertEqual(result, [{"mtime": 10.0}, None])
+    self.assertEqual(self.sleeps, [])
+
+  def testWaitForChange(self):
+    self.statuses = [
+      [{"mtime": 10.0}, None],
+      [{"mtime": 10.0}, None],
+      [{"mtime": 10.0}, {"mtime": 11.0}],
+      ]
+    result = self._Wait([("a", 10.0), ("b", None)], 10)
+    self.assertEqual(result, [{"mtime": 10.0}, {"mtime": 11.0}])
+    self.assertEqual(len(self.sleeps), 2)
+
+  def testDisappeared(self):
+    self.statuses = [[{"mtime": 10.0}, {"mtime": 5.0}], [None, {"mtime": 5.0}]]
+    result = self._Wait([("a", 10.0), ("b", 5.0)], 10)
+    self.assertEqual(result, [None, {"mtime": 5.0}])
+
+  def testTimeout(self):
+    self.statuses = [[{"mtime": 10.0}, {"mtime": 5.0}]]
+    result = self._Wait([("a", 10.0), ("b", 5.0)], 3)
+    self.assertEqual(result, [{"mtime": 10.0}, {"mtime": 5.0}])
+    self.assertEqual(sum(self.sleeps), 3)
+    self.assertTrue(self.sleeps)
+
+  def testNoWait(self):
+    self.statuses = [[{"mtime": 10.0}, {"mtime": 5.0}]]
+    self._Wait([("a", 10.0), ("b", 5.0)], 0)
+    self.assertEqual(self.sleeps, [])
+
+  def testMaximumWait(self):
+    self.statuses = [[None, None]]
+    self._Wait([("a", None), ("b", None)], 1e6)
+    self.assertEqual(sum(self.sleeps), backend._IES_MAX_WAIT)
+
+
+class TestExportBaseImages(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.olddir = utils.PathJoin(self.tmpdir, "inst")
+    self.newdir = utils.PathJoin(self.tmpdir, "inst.new")
+    os.mkdir(self.olddir)
+    os.mkdir(self.newdir)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteOldConfig(self, options):
+    config = objects.SerializableConfigParser()
+    config.add_section(constants.INISECT_INS)
+    for (name, value) in options.items():
+      config.set(constants.INISECT_INS, name, value)
+    utils.WriteFile(utils.PathJoin(self.olddir, constants.EXPORT_CONF_FILE),
+                    data=config.Dumps())
+
+  def _WriteChunkMap(self, directory, name, unchanged, base=None):
+    utils.WriteFile(utils.PathJoin(directory,
+                                   name + constants.EXPORT_CHUNK_MAP_SUFFIX),
+                    data=serializer.DumpJson({
+                      "hashes": [],
+                      "unchanged": unchanged,
+                      "base": base,
+                      }))
+
+  def _ReadChunkMap(self, name, directory=None):
+    if directory is None:
+      directory = self.newdir
+    return serializer.LoadJson(utils.ReadFile(
+      utils.PathJoin(directory, name + constants.EXPORT_CHUNK_MAP_SUFFIX)))
+
+  def _LinkBaseImages(self, disks):
+    (chains, links, chunk_maps) = \
+      backend._GetExportBaseImages(disks, self.newdir, self.olddir)
+    backend._LinkExportBaseImages(links, chunk_maps)
+    return chains
+
+  def testFullAndIncremental(self):
+    self._WriteOldConfig({
+      "disk0_dump": "old0",
+      "disk1_dump": "old1",
+      "disk1_chain": "older1",
+      })
+    for name in ["old0", "old1", "older1"]:
+      utils.WriteFile(utils.PathJoin(self.olddir, name), data=name)
+    self._WriteChunkMap(self.olddir, "old1", [1], base="older1")
+    self._WriteChunkMap(self.olddir, "older1", [])
+
+    disks = [objects.Disk(uuid="new0"), objects.Disk(uuid="new1")]
+    self._WriteChunkMap(self.newdir, "new0", [])
+    self._WriteChunkMap(self.newdir, "new1", [0, 2])
+
+    old_files = sorted(os.listdir(self.olddir))
+    new_files = sorted(os.listdir(self.newdir))
+
+    (chains, links, chunk_maps) = \
+      backend._GetExportBaseImages(disks, self.newdir, self.olddir)
+    self.assertEqual(chains, [[], ["old1", "older1"]])
+    self.assertEqual(sorted(os.listdir(self.newdir)), new_files)
+
+    backend._LinkExportBaseImages(links, chunk_maps)
+
+    # The previous export is left untouched
+    self.assertEqual(sorted(os.listdir(self.olddir)), old_files)
+    for name in ["old1", "older1"]:
+      self.assertEqual(utils.ReadFile(utils.PathJoin(self.newdir, name)),
+                       name)
+    self.assertFalse(os.path.exists(utils.PathJoin(self.newdir, "old0")))
+
+    self.assertEqual(self._ReadChunkMap("new1")["base"], "old1")
+    self.assertEqual(self._ReadChunkMap("old1")["base"], "older1")
+
+  def testSameDiskTwice(self):
+    # Without snapshots, images of all exports are named after the disk
+    self._WriteOldConfig({"disk0_dump": "disk0"})
+    utils.WriteFile(utils.PathJoin(self.olddir, "disk0"), data="first")
+    self._WriteChunkMap(self.olddir, "disk0", [])
+
+    disks = [objects.Disk(uuid="disk0")]
+    utils.WriteFile(utils.PathJoin(self.newdir, "disk0"), data="second")
+    self._WriteChunkMap(self.newdir, "disk0", [1])
+
+    chains = self._LinkBaseImages(disks)
+    self.assertEqual(chains, [["disk0.base1"]])
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.newdir, "disk0")),
+                     "second")
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.newdir,
+                                                   "disk0.base1")),
+                     "first")
+    self.assertEqual(self._ReadChunkMap("disk0")["unchanged"], [1])
+    self.assertEqual(self._ReadChunkMap("disk0")["base"], "disk0.base1")
+    self.assertEqual(self._ReadChunkMap("disk0.base1")["unchanged"], [])
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.olddir, "disk0")),
+                     "first")
+
+    # Export the same disk a third time
+    shutil.rmtree(self.olddir)
+    os.rename(self.newdir, self.olddir)
+    os.mkdir(self.newdir)
+    self._WriteOldConfig({
+      "disk0_dump": "disk0",
+      "disk0_chain": "disk0.base1",
+      })
+    utils.WriteFile(utils.PathJoin(self.newdir, "disk0"), data="third")
+    self._WriteChunkMap(self.newdir, "disk0", [2])
+
+    chains = self._LinkBaseImages(disks)
+    self.assertEqual(chains, [["disk0.base2", "disk0.base1"]])
+    for (name, data) in [("disk0", "third"), ("disk0.base2", "second"),
+                         ("disk0.base1", "first")]:
+      self.assertEqual(utils.ReadFile(utils.PathJoin(self.newdir, name)),
+                       data)
+    self.assertEqual(self._ReadChunkMap("disk0")["base"], "disk0.base2")
+    self.assertEqual(self._ReadChunkMap("disk0.base2")["base"],
+                     "disk0.base1")
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.olddir, "disk0")),
+                     "second")
+
+  def testRenamedBaseOfBase(self):
+    self._WriteOldConfig({
+      "disk0_dump": "old0",
+      "disk0_chain": "disk0",
+      })
+    utils.WriteFile(utils.PathJoin(self.olddir, "old0"), data="second")
+    self._WriteChunkMap(self.olddir, "old0", [1], base="disk0")
+    utils.WriteFile(utils.PathJoin(self.olddir, "disk0"), data="first")
+
+    disks = [objects.Disk(uuid="disk0")]
+    utils.WriteFile(utils.PathJoin(self.newdir, "disk0"), data="third")
+    self._WriteChunkMap(self.newdir, "disk0", [2])
+
+    chains = self._LinkBaseImages(disks)
+    self.assertEqual(chains, [["old0", "disk0.base1"]])
+    self.assertEqual(self._ReadChunkMap("old0")["base"], "disk0.base1")
+
+    # The chunk map in the previous export isn't modified
+    self.assertEqual(self._ReadChunkMap("old0", directory=self.olddir)["base"],
+                     "disk0")
+
+  def testMissingBase(self):
+    self._WriteOldConfig({"disk0_dump": "old0"})
+    disks = [objects.Disk(uuid="new0")]
+    self._WriteChunkMap(self.newdir, "new0", [0])
+
+    self.assertRaises(backend.RPCFail, backend._GetExportBaseImages,
+                      disks, self.newdir, self.olddir)
+
+  def testWithoutChunkMaps(self):
+    disks = [objects.Disk(uuid="new0"), False]
+    self.assertEqual(self._LinkBaseImages(disks), [[], []])
+
+
+class TestFinalizeExport(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.olddir = utils.PathJoin(self.tmpdir, "inst1.example.com")
+    self.newdir = utils.PathJoin(self.tmpdir, "inst1.example.com.new")
+    os.mkdir(self.olddir)
+    os.mkdir(self.newdir)
+
+    patcher = mock.patch("ganeti.pathutils.EXPORT_DIR", self.tmpdir)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    self.instance = objects.Instance(name="inst1.example.com",
+                                     primary_node="node1-uuid",
+                                     os="debian-image",
+                                     hypervisor=constants.HT_FAKE,
+                                     beparams={
+                                       constants.BE_MAXMEM: 128,
+                                       constants.BE_MINMEM: 128,
+                                       constants.BE_VCPUS: 1,
+                                       },
+                                     hvparams={}, osparams={},
+                                     osparams_private={}, nics=[])
+    self.disks = [objects.Disk(uuid="disk0", dev_type=constants.DT_FILE,
+                               iv_name="disk/0", size=1, name="disk0")]
+
+    # Previous export of the disk and its incremental successor
+    config = objects.SerializableConfigParser()
+    config.add_section(constants.INISECT_INS)
+    config.set(constants.INISECT_INS, "disk0_dump", "disk0")
+    utils.WriteFile(utils.PathJoin(self.olddir, constants.EXPORT_CONF_FILE),
+                    data=config.Dumps())
+    self._WriteImage(self.olddir, "first", [])
+    self._WriteImage(self.newdir, "second", [1])
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteImage(self, directory, data, unchanged):
+    utils.WriteFile(utils.PathJoin(directory, "disk0"), data=data)
+    utils.WriteFile(utils.PathJoin(directory,
+                                   "disk0" + constants.EXPORT_CHUNK_MAP_SUFFIX),
+                    data=serializer.DumpJson({
+                      "hashes": [],
+                      "unchanged": unchanged,
+                      "base": None,
+                      }))
+
+  def _ReadConfig(self, directory):
+    config = objects.SerializableConfigParser()
+    config.read(utils.PathJoin(directory, constants.EXPORT_CONF_FILE))
+    return config
+
+  def test(self):
+    backend.FinalizeExport(self.instance, self.disks)
+
+    self.assertFalse(os.path.exists(self.newdir))
+    config = self._ReadConfig(self.olddir)
+    self.assertEqual(config.get(constants.INISECT_INS, "disk0_chain"),
+                     "disk0.base1")
+    self.assertTrue(config.getboolean(constants.INISECT_INS, "disk0_raw"))
+    self.assertTrue(config.getboolean(constants.INISECT_EXP, "incremental"))
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.olddir, "disk0")),
+                     "second")
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.olddir,
+                                                   "disk0.base1")),
+                     "first")
+
+  def testWriteFailure(self):
+    old_files = sorted(os.listdir(self.olddir))
+    write_file_fn = utils.WriteFile
+
+    def _WriteFile(path, **kwargs):
+      # Writing chunk maps happens after the base images have been added
+      if path.endswith(constants.EXPORT_CHUNK_MAP_SUFFIX):
+        raise EnvironmentError("Disk full")
+      return write_file_fn(path, **kwargs)
+
+    with mock.patch("ganeti.utils.WriteFile", side_effect=_WriteFile):
+      self.assertRaises(EnvironmentError, backend.FinalizeExport,
+                        self.instance, self.disks)
+
+    self.assertTrue(os.path.exists(utils.PathJoin(self.newdir,
+                                                  "disk0.base1")))
+
+    # The previous export is still complete
+    self.assertEqual(sorted(os.listdir(self.olddir)), old_files)
+    self.assertEqual(utils.ReadFile(utils.PathJoin(self.olddir, "disk0")),
+                     "first")
+    config = self._ReadConfig(self.olddir)
+    self.assertEqual(config.get(constants.INISECT_INS, "disk0_dump"),
+                     "disk0")
+    self.assertFalse(config.has_option(constants.INISECT_INS, "disk0_chain"))
+
+
+class TestGetBlockdevWipeStatus(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.status_dir = utils.PathJoin(self.tmpdir, "wipe1")
+    os.mkdir(self.status_dir)
+
+    patcher = mock.patch("ganeti.pathutils.WIPE_DIR", self.tmpdir)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteStatus(self, finished):
+    utils.WriteFile(utils.PathJoin(self.status_dir, backend._WIPE_STATUS_FILE),
+                    data=serializer.DumpJson({
+                      "devices": [],
+                      "finished": finished,
+                      }))
+
+  def _GetStatus(self, pid):
+    with mock.patch("ganeti.utils.ReadLockedPidFile", return_value=pid):
+      return backend.GetBlockdevWipeStatus("wipe1")
+
+  def testUnknown(self):
+    self.assertRaises(backend.RPCFail, backend.GetBlockdevWipeStatus,
+                      "wipe2")
+
+  def testNoStatus(self):
+    self.assertEqual(self._GetStatus(1234), None)
+    self.assertRaises(backend.RPCFail, self._GetStatus, None)
+
+  def testRunning(self):
+    self._WriteStatus(False)
+    self.assertFalse(self._GetStatus(1234)["finished"])
+
+  def testExitedBeforeFinishing(self):
+    self._WriteStatus(False)
+    self.assertRaises(backend.RPCFail, self._GetStatus, None)
+
+  def testFinished(self):
+    self._WriteStatus(True)
+    self.assertTrue(self._GetStatus(None)["finished"])
+
+
 class TestGetBlockDevSymlinkPath(unittest.TestCase):
   def setUp(self):
     self.tmpdir = tempfile.mkdtemp()
@@ -1044,6 +1426,13 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
     self._ssh_replace_name_by_uuid_mock.side_effect = \
       self._ssh_file_manager.ReplaceNameByUuid
 
+    self._ssh_pub_key_store_patcher = testutils \
+      .patch_object(ssh, "PubKeyStore")
+    self._ssh_pub_key_store_mock = \
+      self._ssh_pub_key_store_patcher.start()
+    self._ssh_pub_key_store_mock.side_effect = \
+      self._ssh_file_manager.GetPubKeyStore
+
     self._time_sleep_patcher = testutils \
         .patch_object(time, "sleep")
     self._time_sleep_mock = \
@@ -1061,6 +1450,7 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
     self._ssh_remove_public_key_patcher.stop()
     self._ssh_query_pub_key_file_patcher.stop()
     self._ssh_replace_name_by_uuid_patcher.stop()
+    self._ssh_pub_key_store_patcher.stop()
     self._time_sleep_patcher.stop()
     self._TearDownTestData()
 
@@ -82,6 +82,19 @@ class TestConfigRunner(unittest.TestCase):
     cfg = ConfigMock(cfg_file=self.cfg_file)
     return cfg
 
+  def _get_object_wconfd(self):
+    """Returns an instance of ConfigWriter using a mocked WConfd"""
+    wconfd = mock.Mock()
+    wconfd.LockConfig.side_effect = \
+      lambda *_: serializer.Load(utils.ReadFile(self.cfg_file))
+    wconfd.ReadConfig.side_effect = \
+      lambda *_: serializer.Load(utils.ReadFile(self.cfg_file))
+    cfg = config.ConfigWriter(cfg_file=self.cfg_file,
+                              _getents=_StubGetEntResolver,
+                              wconfdcontext=("job-1", "/livelock", 1),
+                              wconfd=wconfd)
+    return (cfg, wconfd)
+
   def _init_cluster(self, cfg):
     """Initializes the cfg object"""
     me = netutils.Hostname()
@@ -341,6 +354,129 @@ class TestConfigRunner(unittest.TestCase):
     newsaved = utils.ReadFile(self.cfg_file)
     self.assertEqual(oldsaved, newsaved)
 
+  def testBatchedReservations(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+    ctx = ("job-1", "/livelock", 1)
+
+    wconfd.GenerateMACs.return_value = ["aa:00:00:00:00:01",
+                                        "aa:00:00:00:00:02"]
+    self.assertEqual(cfg.GenerateMACs("net-uuid", 2, None),
+                     wconfd.GenerateMACs.return_value)
+    wconfd.GenerateMACs.assert_called_once_with(ctx, "net-uuid", 2)
+
+    wconfd.GenerateDRBDSecrets.return_value = ["secret1", "secret2"]
+    self.assertEqual(cfg.GenerateDRBDSecrets(2, None), ["secret1", "secret2"])
+    wconfd.GenerateDRBDSecrets.assert_called_once_with(ctx, 2)
+
+    cfg.ReserveLVs(["xenvg/lv1", "xenvg/lv2"], None)
+    wconfd.ReserveLVs.assert_called_once_with(ctx, ["xenvg/lv1", "xenvg/lv2"])
+
+    # The minors are returned in the order of the requests
+    wconfd.AllocateDRBDMinors.return_value = [[0, 1], [2, 0]]
+    self.assertEqual(cfg.AllocateDRBDMinors([(["node1", "node2"], "disk1"),
+                                             (["node1", "node3"], "disk2")]),
+                     [[0, 1], [2, 0]])
+    wconfd.AllocateDRBDMinors.assert_called_once_with([
+      ("disk1", ["node1", "node2"]),
+      ("disk2", ["node1", "node3"]),
+      ])
+
+  def testBatchedReservationsEmpty(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+
+    self.assertEqual(cfg.GenerateMACs("net-uuid", 0, None), [])
+    self.assertEqual(cfg.GenerateIps("net-uuid", 0, None), [])
+    self.assertEqual(cfg.GenerateDRBDSecrets(0, None), [])
+    self.assertEqual(cfg.AllocateDRBDMinors([]), [])
+    cfg.ReserveLVs([], None)
+
+    self.assertFalse(wconfd.GenerateMACs.called)
+    self.assertFalse(wconfd.GenerateIps.called)
+    self.assertFalse(wconfd.GenerateDRBDSecrets.called)
+    self.assertFalse(wconfd.AllocateDRBDMinors.called)
+    self.assertFalse(wconfd.ReserveLVs.called)
+
+  def testTransaction(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+
+    with cfg.GetConfigTransaction():
+      node = cfg.GetNodeInfo(cfg.GetMasterNode())
+      serial_no = node.serial_no
+      node.powered = False
+      cfg.Update(node, None)
+      cfg.SetVGName("othervg")
+
+    self.assertEqual(wconfd.LockConfig.call_count, 1)
+    self.assertEqual(wconfd.WriteConfigAndUnlock.call_count, 1)
+    self.assertFalse(wconfd.UpdateNode.called)
+    self.assertFalse(wconfd.UnlockConfig.called)
+
+    written = wconfd.WriteConfigAndUnlock.call_args[0][1]
+    self.assertEqual(written["cluster"]["volume_group_name"], "othervg")
+    self.assertFalse(written["nodes"][node.uuid]["powered"])
+    self.assertEqual(written["nodes"][node.uuid]["serial_no"], serial_no + 1)
+
+  def testTransactionStoresCopy(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+
+    with cfg.GetConfigTransaction():
+      node = cfg.GetNodeInfo(cfg.GetMasterNode()).Copy()
+      serial_no = node.serial_no
+      node.powered = False
+      cfg.Update(node, None)
+      self.assertEqual(node.serial_no, serial_no + 1)
+
+      # Changes after the update must not end up in the configuration
+      node.offline = True
+      self.assertFalse(cfg.GetNodeInfo(node.uuid).offline)
+
+    written = wconfd.WriteConfigAndUnlock.call_args[0][1]
+    self.assertFalse(written["nodes"][node.uuid]["powered"])
+    self.assertFalse(written["nodes"][node.uuid]["offline"])
+    self.assertEqual(written["nodes"][node.uuid]["serial_no"], serial_no + 1)
+
+  def testTransactionUnchanged(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+
+    with cfg.GetConfigTransaction():
+      node = cfg.GetNodeInfo(cfg.GetMasterNode()).Copy()
+      (serial_no, mtime) = (node.serial_no, node.mtime)
+      cluster_serial_no = cfg.GetClusterInfo().serial_no
+      cfg.Update(node, None)
+      self.assertEqual(node.serial_no, serial_no)
+
+    written = wconfd.WriteConfigAndUnlock.call_args[0][1]
+    self.assertEqual(written["nodes"][node.uuid]["serial_no"], serial_no)
+    self.assertEqual(written["nodes"][node.uuid]["mtime"], mtime)
+    self.assertEqual(written["cluster"]["serial_no"], cluster_serial_no)
+
+  def testTransactionSerialMismatch(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+    node = cfg.GetNodeInfo(cfg.GetMasterNode()).Copy()
+    node.serial_no += 1
+
+    def _Update():
+      with cfg.GetConfigTransaction():
+        cfg.Update(node, None)
+
+    self.assertRaises(errors.ConfigurationError, _Update)
+    self.assertFalse(wconfd.WriteConfigAndUnlock.called)
+
+  def testTransactionRollback(self):
+    (cfg, wconfd) = self._get_object_wconfd()
+
+    def _Abort():
+      with cfg.GetConfigTransaction():
+        cfg.SetVGName("othervg")
+        raise errors.OpExecError("Aborted")
+
+    self.assertRaises(errors.OpExecError, _Abort)
+    self.assertFalse(wconfd.WriteConfigAndUnlock.called)
+    self.assertEqual(wconfd.UnlockConfig.call_count, 1)
+
+    # The local changes have been discarded
+    self.assertEqual(cfg.GetVGName(), "xenvg")
+
   def testNICParameterSyntaxCheck(self):
     """Test the NIC's CheckParameterSyntax function"""
     mode = constants.NIC_MODE
@@ -46,6 +46,7 @@ from ganeti import cmdlib
 from ganeti.rpc import node as rpc
 from ganeti import compat
 from ganeti import pathutils
+from ganeti import utils
 from ganeti.constants import HKR_SUCCESS, HKR_FAIL, HKR_SKIP
 
 from mocks import FakeConfig, FakeProc, FakeContext
@@ -79,7 +80,9 @@ class TestHooksRunner(unittest.TestCase):
       os.mkdir(dname)
       self.torm.append((dname, True))
       self.ph_dirs[i] = dname
-    self.hr = backend.HooksRunner(hooks_base_dir=self.tmpdir)
+    self.parallel_file = "%s/hooks-parallel" % self.tmpdir
+    self.hr = backend.HooksRunner(hooks_base_dir=self.tmpdir,
+                                  parallel_file=self.parallel_file)
 
   def tearDown(self):
     self.torm.reverse()
@@ -92,10 +95,18 @@ class TestHooksRunner(unittest.TestCase):
   def _rname(self, fname):
     return "/".join(fname.split("/")[-2:])
 
+  def _RunHooks(self, phase, env):
+    """Runs the hooks and returns their results without the run times"""
+    results = self.hr.RunHooks(self.hpath, phase, env)
+    for (_, _, _, duration) in results:
+      self.assertTrue(isinstance(duration, float))
+      self.assertTrue(duration >= 0)
+    return [result[:3] for result in results]
+
   def testEmpty(self):
     """Test no hooks"""
     for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), [])
+      self.failUnlessEqual(self._RunHooks(phase, {}), [])
 
   def testSkipNonExec(self):
     """Test skip non-exec file"""
@@ -104,7 +115,7 @@ class TestHooksRunner(unittest.TestCase):
       f = open(fname, "w")
       f.close()
       self.torm.append((fname, False))
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_SKIP, "")])
 
   def testSkipInvalidName(self):
@@ -116,7 +127,7 @@ class TestHooksRunner(unittest.TestCase):
       f.close()
       os.chmod(fname, 0700)
       self.torm.append((fname, False))
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_SKIP, "")])
 
   def testSkipDir(self):
@@ -125,7 +136,7 @@ class TestHooksRunner(unittest.TestCase):
       fname = "%s/testdir" % self.ph_dirs[phase]
       os.mkdir(fname)
       self.torm.append((fname, True))
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_SKIP, "")])
 
   def testSuccess(self):
@@ -137,7 +148,7 @@ class TestHooksRunner(unittest.TestCase):
       f.close()
       self.torm.append((fname, False))
       os.chmod(fname, 0700)
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_SUCCESS, "")])
 
   def testSymlink(self):
@@ -146,7 +157,7 @@ class TestHooksRunner(unittest.TestCase):
       fname = "%s/success" % self.ph_dirs[phase]
       os.symlink("/bin/true", fname)
       self.torm.append((fname, False))
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_SUCCESS, "")])
 
   def testFail(self):
@@ -158,7 +169,7 @@ class TestHooksRunner(unittest.TestCase):
       f.close()
       self.torm.append((fname, False))
       os.chmod(fname, 0700)
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+      self.failUnlessEqual(self._RunHooks(phase, {}),
                            [(self._rname(fname), HKR_FAIL, "")])
 
   def testCombined(self):
@@ -176,7 +187,7 @@ class TestHooksRunner(unittest.TestCase):
         self.torm.append((fname, False))
         os.chmod(fname, 0700)
         expect.append((self._rname(fname), rs, ""))
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
+      self.failUnlessEqual(self._RunHooks(phase, {}), expect)
 
   def testOrdering(self):
     for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
@@ -192,7 +203,7 @@ class TestHooksRunner(unittest.TestCase):
         self.torm.append((fname, False))
         expect.append((self._rname(fname), HKR_SUCCESS, ""))
       expect.sort()
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
+      self.failUnlessEqual(self._RunHooks(phase, {}), expect)
 
   def testEnv(self):
     """Test environment execution"""
@@ -203,9 +214,54 @@ class TestHooksRunner(unittest.TestCase):
       self.torm.append((fname, False))
       env_snt = {"PHASE": phase}
       env_exp = "PHASE=%s" % phase
-      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, env_snt),
+      self.failUnlessEqual(self._RunHooks(phase, env_snt),
                            [(self._rname(fname), HKR_SUCCESS, env_exp)])
 
+  def _WriteScript(self, phase, fbase, text):
+    fname = "%s/%s" % (self.ph_dirs[phase], fbase)
+    utils.WriteFile(fname, data=text, mode=0700)
+    self.torm.append((fname, False))
+    return fname
+
+  def testParallel(self):
+    """Test running scripts with the same prefix concurrently"""
+    utils.WriteFile(self.parallel_file, data="max-workers = 4\ntimeout = 30\n")
+    self.torm.append((self.parallel_file, False))
+    phase = constants.HOOKS_PHASE_PRE
+    # Each script waits for the other one to have started
+    wait = ("#!/bin/sh\ntouch %s/$1\n"
+            "for i in $(seq 1 100); do\n"
+            "  [ -e %s/$2 ] && exit 0\n"
+            "  sleep 0.1\n"
+            "done\nexit 1\n" % (self.tmpdir, self.tmpdir))
+    expect = []
+    for (fbase, own, other) in [("10-a", "started-a", "started-b"),
+                                ("10-b", "started-b", "started-a")]:
+      fname = self._WriteScript(phase, fbase,
+                                wait.replace("$1", own).replace("$2", other))
+      self.torm.append(("%s/%s" % (self.tmpdir, own), False))
+      expect.append((self._rname(fname), HKR_SUCCESS, ""))
+    fname = self._WriteScript(phase, "20-c", "#!/bin/sh\nexit 1\n")
+    expect.append((self._rname(fname), HKR_FAIL, ""))
+    self.failUnlessEqual(self._RunHooks(phase, {}), expect)
+
+  def testTimeout(self):
+    """Test killing a script running for too long"""
+    utils.WriteFile(self.parallel_file, data="timeout = 1\n")
+    self.torm.append((self.parallel_file, False))
+    phase = constants.HOOKS_PHASE_POST
+    fname = self._WriteScript(phase, "sleep", "#!/bin/sh\nsleep 60\n")
+    [(name, status, output)] = self._RunHooks(phase, {})
+    self.assertEqual(name, self._rname(fname))
+    self.assertEqual(status, HKR_FAIL)
+    self.assertTrue("timeout" in output)
+
+  def testInvalidParallelConfig(self):
+    utils.WriteFile(self.parallel_file,
+                    data="# comment\nmax-workers = -1\nfoo = 1\ntimeout=x\n")
+    self.torm.append((self.parallel_file, False))
+    self.assertEqual(self.hr._ReadParallelConfig(), (1, None))
+
 
 def FakeHooksRpcSuccess(node_list, hpath, phase, env):
   """Fake call_hooks_runner function.
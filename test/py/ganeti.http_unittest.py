@@ -32,12 +32,14 @@
 
 
 import os
+import socket
 import unittest
 import time
 import tempfile
 import pycurl
 import itertools
 import threading
+import zlib
 from cStringIO import StringIO
 
 from ganeti import http
@@ -122,6 +124,137 @@ class TestMisc(unittest.TestCase):
                   "Digest realm=secure foo=\"x,y\""))
 
 
+class TestResponseEncoding(unittest.TestCase):
+  @staticmethod
+  def _MakeMessages(version, accept_encoding, body):
+    req_msg = http.HttpMessage()
+    req_msg.start_line = http.HttpClientToServerStartLine("GET", "/", version)
+    req_msg.headers = {}
+    if accept_encoding is not None:
+      req_msg.headers[http.HTTP_ACCEPT_ENCODING] = accept_encoding
+
+    resp_msg = http.HttpMessage()
+    resp_msg.start_line = \
+      http.HttpServerToClientStartLine(version, http.HTTP_OK, None)
+    resp_msg.headers = {}
+    resp_msg.body = body
+
+    return (req_msg, resp_msg)
+
+  def testGetContentEncoding(self):
+    fn = http.server._GetContentEncoding
+    for (value, expected) in [
+      (None, None),
+      ("", None),
+      ("identity", None),
+      ("gzip", http.HTTP_GZIP),
+      ("deflate", http.HTTP_DEFLATE),
+      ("deflate, gzip", http.HTTP_GZIP),
+      ("GZIP;q=0.5, deflate", http.HTTP_DEFLATE),
+      ("gzip;q=0, deflate;q=0", None),
+      ("gzip;q=invalid", None),
+      ("*", http.HTTP_GZIP),
+      ("*;q=0.1, gzip;q=0", http.HTTP_DEFLATE),
+      ]:
+      self.assertEqual(fn({http.HTTP_ACCEPT_ENCODING: value}), expected)
+
+    self.assertEqual(fn(None), None)
+    self.assertEqual(fn({}), None)
+
+  def testCoalesceChunks(self):
+    fn = http.CoalesceChunks
+    self.assertEqual(list(fn([], 10)), [])
+    self.assertEqual(list(fn(["", ""], 10)), [])
+    self.assertEqual(list(fn(["a", "b", "c"], 10)), ["abc"])
+    self.assertEqual(list(fn(["a", "bc", "", "d", "ef"], 3)),
+                     ["abc", "def"])
+    self.assertEqual(list(fn(["abcdef", "g"], 3)), ["abcdef", "g"])
+
+  def testSmallBody(self):
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, "gzip", "Hello")
+    http.server._EncodeResponse(req_msg, resp_msg)
+    self.assertEqual(resp_msg.body, "Hello")
+    self.assertFalse(http.HTTP_CONTENT_ENCODING in resp_msg.headers)
+    self.assertFalse(http.HTTP_TRANSFER_ENCODING in resp_msg.headers)
+    self.assertEqual(resp_msg.headers[http.HTTP_VARY],
+                     http.HTTP_ACCEPT_ENCODING)
+
+  def testCompressed(self):
+    body = "Hello World\n" * 1000
+
+    for (coding, wbits) in [(http.HTTP_GZIP, 16 + zlib.MAX_WBITS),
+                            (http.HTTP_DEFLATE, zlib.MAX_WBITS)]:
+      (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, coding, body)
+      http.server._EncodeResponse(req_msg, resp_msg)
+      self.assertEqual(resp_msg.headers[http.HTTP_CONTENT_ENCODING], coding)
+      self.assertFalse(http.HTTP_TRANSFER_ENCODING in resp_msg.headers)
+      self.assertTrue(len(resp_msg.body) < len(body))
+      self.assertEqual(zlib.decompress(resp_msg.body, wbits), body)
+
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, None, body)
+    http.server._EncodeResponse(req_msg, resp_msg)
+    self.assertEqual(resp_msg.body, body)
+    self.assertFalse(http.HTTP_CONTENT_ENCODING in resp_msg.headers)
+
+  def testStreamed(self):
+    chunks = ["[", "1", ", ", "2", "]\n"]
+
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, None, iter(chunks))
+    http.server._EncodeResponse(req_msg, resp_msg)
+    self.assertEqual(resp_msg.headers[http.HTTP_TRANSFER_ENCODING],
+                     http.HTTP_CHUNKED)
+    self.assertEqual("".join(resp_msg.body), "".join(chunks))
+
+    # HTTP/1.0 doesn't support the chunked transfer coding
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_0, "gzip",
+                                             iter(chunks))
+    http.server._EncodeResponse(req_msg, resp_msg)
+    self.assertFalse(http.HTTP_TRANSFER_ENCODING in resp_msg.headers)
+    self.assertEqual(resp_msg.headers[http.HTTP_CONTENT_ENCODING],
+                     http.HTTP_GZIP)
+    self.assertEqual(zlib.decompress("".join(resp_msg.body),
+                                     16 + zlib.MAX_WBITS),
+                     "".join(chunks))
+
+  def testEventStream(self):
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, "gzip",
+                                             iter(["data: 1\n\n"]))
+    resp_msg.headers[http.HTTP_CONTENT_TYPE] = http.HTTP_TEXT_EVENT_STREAM
+    http.server._EncodeResponse(req_msg, resp_msg)
+    self.assertFalse(http.HTTP_CONTENT_ENCODING in resp_msg.headers)
+    self.assertEqual(resp_msg.headers[http.HTTP_TRANSFER_ENCODING],
+                     http.HTTP_CHUNKED)
+    self.assertEqual(list(resp_msg.body), ["data: 1\n\n"])
+
+  def testWriteChunked(self):
+    (req_msg, resp_msg) = self._MakeMessages(http.HTTP_1_1, None,
+                                             iter(["Hello", "", " ", "World"]))
+    http.server._EncodeResponse(req_msg, resp_msg)
+
+    (sock, peer) = socket.socketpair()
+    try:
+      http.server._HttpServerToClientMessageWriter(sock, req_msg, resp_msg,
+                                                   10)
+      sock.close()
+
+      data = []
+      while True:
+        buf = peer.recv(4096)
+        if not buf:
+          break
+        data.append(buf)
+    finally:
+      peer.close()
+
+    (headers, body) = "".join(data).split("\r\n\r\n", 1)
+    self.assertTrue(headers.startswith("HTTP/1.1 200"))
+    self.assertFalse(http.HTTP_CONTENT_LENGTH in headers)
+    self.assertTrue("%s: %s" % (http.HTTP_TRANSFER_ENCODING,
+                                http.HTTP_CHUNKED) in headers)
+    self.assertEqual(body,
+                     "5\r\nHello\r\n1\r\n \r\n5\r\nWorld\r\n0\r\n\r\n")
+
+
 class _FakeRequestAuth(http.auth.HttpServerRequestAuthentication):
   def __init__(self, realm, authreq, authenticator):
     http.auth.HttpServerRequestAuthentication.__init__(self)
@@ -0,0 +1,237 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2010 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for testing ganeti.impexpd.pump"""
+
+import os
+import select
+import shutil
+import tempfile
+import threading
+import unittest
+import zlib
+
+from ganeti import constants
+from ganeti import errors
+from ganeti import objects
+from ganeti import utils
+from ganeti.impexpd import pump
+
+import testutils
+
+
+class PumpConfig(objects.ConfigObject):
+  __slots__ = [
+    "bind",
+    "key",
+    "cert",
+    "ca",
+    "host",
+    "port",
+    "ipv4",
+    "ipv6",
+    "compress",
+    "magic",
+    "connect_timeout",
+    "connect_retries",
+    ]
+
+
+class _FakeStatusFile(object):
+  def __init__(self):
+    self.listen_port = None
+    self.connected = False
+
+  def SetListenPort(self, port):
+    self.listen_port = port
+
+  def SetConnected(self):
+    self.connected = True
+
+  def Update(self, _):
+    pass
+
+
+class TestCodecs(unittest.TestCase):
+  def testPassThrough(self):
+    for mode in [constants.IEM_IMPORT, constants.IEM_EXPORT]:
+      codec = pump._GetCodec(mode, constants.IEC_NONE)
+      self.assertEqual(codec.Process("data"), "data")
+      self.assertEqual(codec.Flush(), "")
+
+  def testGzip(self):
+    data = "".join(chr(i % 251) for i in range(100000))
+
+    for compress in [constants.IEC_GZIP, constants.IEC_GZIP_FAST,
+                     constants.IEC_GZIP_SLOW]:
+      compressor = pump._GetCodec(constants.IEM_EXPORT, compress)
+      compressed = compressor.Process(data) + compressor.Flush()
+
+      # Must be readable by gzip(1)
+      self.assertEqual(zlib.decompress(compressed, pump._GZIP_WBITS), data)
+
+      decompressor = pump._GetCodec(constants.IEM_IMPORT, compress)
+      result = [decompressor.Process(compressed[i:i + 1000])
+                for i in range(0, len(compressed), 1000)]
+      result.append(decompressor.Flush())
+      self.assertEqual("".join(result), data)
+
+  def testGzipMultipleMembers(self):
+    compressed = []
+    for part in ["Hello ", "World"]:
+      obj = zlib.compressobj(6, zlib.DEFLATED, pump._GZIP_WBITS)
+      compressed.append(obj.compress(part) + obj.flush())
+
+    decompressor = pump._GetCodec(constants.IEM_IMPORT, constants.IEC_GZIP)
+    self.assertEqual(decompressor.Process("".join(compressed)) +
+                     decompressor.Flush(), "Hello World")
+
+  def testUnsupported(self):
+    self.assertRaises(errors.GenericError, pump._GetCodec,
+                      constants.IEM_EXPORT, constants.IEC_LZOP)
+
+  def testUnsupportedReason(self):
+    opts = PumpConfig(compress=constants.IEC_LZOP)
+    self.assertTrue(pump.GetUnsupportedReason(opts))
+
+    for compress in [constants.IEC_NONE, constants.IEC_GZIP]:
+      opts = PumpConfig(compress=compress)
+      self.assertEqual(pump.GetUnsupportedReason(opts), None)
+
+
+def _RunPump(data_pump):
+  while not data_pump.IsDone():
+    timeout = data_pump.GetTimeout()
+    fd = data_pump.GetPollFd()
+
+    if timeout is None and fd is not None:
+      select.select([fd], [], [], 10.0)
+    elif timeout:
+      select.select([], [], [], timeout)
+
+    data_pump.Process()
+
+
+class TestDataPump(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cert = utils.PathJoin(self.tmpdir, "server.pem")
+    utils.GenerateSelfSignedSslCert(self.cert, 1)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _GetOptions(self, **kwargs):
+    return PumpConfig(bind="127.0.0.1", host="127.0.0.1", port=None,
+                      key=self.cert, cert=self.cert, ca=self.cert,
+                      ipv4=True, ipv6=False,
+                      connect_timeout=10, connect_retries=5, **kwargs)
+
+  def _Transfer(self, data, compress, import_magic, export_magic):
+    import_opts = self._GetOptions(compress=compress, magic=import_magic)
+    export_opts = self._GetOptions(compress=compress, magic=export_magic)
+
+    (import_read_fd, import_write_fd) = os.pipe()
+    (export_read_fd, export_write_fd) = os.pipe()
+
+    progress = []
+    import_status = _FakeStatusFile()
+    import_pump = pump.DataPump(constants.IEM_IMPORT, import_opts,
+                                import_write_fd, import_status,
+                                lambda *args: progress.append(args), 0)
+    import_pump.Start()
+    self.assertTrue(import_status.listen_port)
+    self.assertFalse(import_status.connected)
+
+    export_opts.port = import_status.listen_port
+    export_status = _FakeStatusFile()
+    export_pump = pump.DataPump(constants.IEM_EXPORT, export_opts,
+                                export_read_fd, export_status,
+                                lambda *_: None, 0)
+    export_pump.Start()
+
+    def _Feed():
+      os.write(export_write_fd, data)
+      os.close(export_write_fd)
+
+    received = []
+
+    def _Drain():
+      while True:
+        buf = os.read(import_read_fd, 65536)
+        if not buf:
+          break
+        received.append(buf)
+      os.close(import_read_fd)
+
+    import_error = []
+
+    def _Import():
+      try:
+        _RunPump(import_pump)
+      except errors.GenericError, err:
+        import_error.append(err)
+        import_pump.Abort()
+
+    threads = [threading.Thread(target=fn)
+               for fn in [_Feed, _Drain, _Import]]
+    for thread in threads:
+      thread.start()
+
+    try:
+      _RunPump(export_pump)
+    finally:
+      for thread in threads:
+        thread.join()
+
+    self.assertTrue(export_status.connected)
+    self.assertEqual(export_pump.GetTransferred(), len(data))
+
+    return ("".join(received), import_error, progress)
+
+  def testTransfer(self):
+    data = os.urandom(1024 * 1024) + "\0" * (3 * 1024 * 1024)
+
+    for compress in [constants.IEC_NONE, constants.IEC_GZIP]:
+      (received, import_error, progress) = \
+        self._Transfer(data, compress, "magic", "magic")
+      self.assertFalse(import_error)
+      self.assertEqual(received, data)
+      self.assertEqual(progress[-1][1], len(data))
+
+  def testMagicMismatch(self):
+    (received, import_error, _) = \
+      self._Transfer("data" * 1000, constants.IEC_GZIP, "magic", "other")
+    self.assertEqual(received, "")
+    self.assertEqual(len(import_error), 1)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -37,13 +37,17 @@ import unittest
 from ganeti import constants
 from ganeti import errors
 from ganeti import utils
+from ganeti import objects
 from ganeti import masterd
 
 from ganeti.masterd.instance import \
   ImportExportTimeouts, _DiskImportExportBase, \
   ComputeRemoteExportHandshake, CheckRemoteExportHandshake, \
   ComputeRemoteImportDiskInfo, CheckRemoteExportDiskInfo, \
-  FormatProgress
+  FormatProgress, DiskTransfer, _DiskTransferPrivate, _DiskTransferGroup, \
+  _SplitDiskSegments, _ComputeTransferSegments, _IsSparseTransfer, \
+  _GetExportBaseImage, _NegotiateTransferStreams, ImportExportLoop, \
+  _ImportExportError
 
 import testutils
 
@@ -166,5 +170,453 @@ class TestFormatProgress(unittest.TestCase):
                      "1.5G, 12.0 MiB/s, 30%")
 
 
+class TestSplitDiskSegments(unittest.TestCase):
+  def test(self):
+    self.assertEqual(_SplitDiskSegments(100, 1), [(0, 100)])
+    self.assertEqual(_SplitDiskSegments(100, 4),
+                     [(0, 25), (25, 25), (50, 25), (75, 25)])
+    self.assertEqual(_SplitDiskSegments(10, 3), [(0, 4), (4, 3), (7, 3)])
+
+  def testCoverage(self):
+    for size in [1, 7, 1024, 10241, 99999]:
+      for count in range(1, 9):
+        if count > size:
+          continue
+        segments = _SplitDiskSegments(size, count)
+        self.assertEqual(len(segments), count)
+        self.assertEqual(sum(part for (_, part) in segments), size)
+        offset = 0
+        for (seg_offset, seg_size) in segments:
+          self.assertEqual(seg_offset, offset)
+          offset += seg_size
+
+
+class TestComputeTransferSegments(unittest.TestCase):
+  def _MakeTransfer(self, size, src_io=constants.IEIO_RAW_DISK,
+                    dest_io=constants.IEIO_RAW_DISK):
+    disk = objects.Disk(size=size)
+    return DiskTransfer("disk/0", src_io, (disk, None), dest_io, (disk, None),
+                        None)
+
+  def test(self):
+    size = 8 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE
+    segments = _ComputeTransferSegments(self._MakeTransfer(size), 4)
+    self.assertEqual(len(segments), 4)
+    self.assertEqual(segments[-1],
+                     (6 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE,
+                      2 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE))
+
+  def testSingleStream(self):
+    size = 8 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE
+    self.assertEqual(_ComputeTransferSegments(self._MakeTransfer(size), 1),
+                     [(0, size)])
+    self.assertEqual(_ComputeTransferSegments(self._MakeTransfer(size), 0),
+                     [(0, size)])
+
+  def testSmallDisk(self):
+    size = 3 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE - 1
+    segments = _ComputeTransferSegments(self._MakeTransfer(size), 16)
+    self.assertEqual(len(segments), 2)
+
+    for size in [1, constants.DISK_TRANSFER_MIN_SEGMENT_SIZE]:
+      self.assertEqual(_ComputeTransferSegments(self._MakeTransfer(size), 16),
+                       [(0, size)])
+
+  def testMaxStreams(self):
+    size = 1000 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE
+    segments = _ComputeTransferSegments(self._MakeTransfer(size), 1000)
+    self.assertEqual(len(segments), constants.DISK_TRANSFER_MAX_STREAMS)
+
+  def testNotRawDisk(self):
+    size = 8 * constants.DISK_TRANSFER_MIN_SEGMENT_SIZE
+    for (src_io, dest_io) in [(constants.IEIO_FILE, constants.IEIO_RAW_DISK),
+                              (constants.IEIO_RAW_DISK, constants.IEIO_FILE),
+                              (constants.IEIO_RAW_DISK,
+                               constants.IEIO_SCRIPT)]:
+      transfer = self._MakeTransfer(size, src_io=src_io, dest_io=dest_io)
+      self.assertTrue(_ComputeTransferSegments(transfer, 4) is None)
+
+
+class _FakeRpcResult(object):
+  def __init__(self, payload):
+    self.fail_msg = None
+    self.payload = payload
+
+
+class _FakeDaemonStatus(object):
+  mtime = None
+
+
+class _FakeLuForLoop(object):
+  def __init__(self):
+    self.rpc = self
+
+  def call_impexp_status(self, node_name, names):
+    return _FakeRpcResult([_FakeDaemonStatus() for _ in names])
+
+  def call_impexp_status_wait(self, node_names, node_daemons, timeout):
+    return dict((node_name,
+                 _FakeRpcResult([_FakeDaemonStatus()
+                                 for _ in node_daemons[node_name]]))
+                for node_name in node_names)
+
+
+class _FakeLoopTransfer(object):
+  MODE_TEXT = "Fake transfer"
+
+  def __init__(self, name, fail, finalize_fn=None):
+    self.name = name
+    self.node_name = "node1"
+    self.loop = None
+    self.active = True
+    self.error = None
+    self._fail = fail
+    self._finalize_fn = finalize_fn
+
+  def SetLoop(self, loop):
+    self.loop = loop
+
+  def CheckDaemon(self):
+    return self.name
+
+  def GetDaemonName(self):
+    return self.name
+
+  def SetDaemonData(self, success, data):
+    return success
+
+  def CheckFinished(self):
+    if self._fail:
+      raise _ImportExportError("Transfer %s failed" % self.name)
+    return True
+
+  def Finalize(self, error=None):
+    if self.active:
+      self.active = False
+      self.error = error
+      if self._finalize_fn:
+        self._finalize_fn(self)
+    return error is None
+
+
+class TestImportExportLoop(unittest.TestCase):
+  def testResumeOnlyActive(self):
+    loop = ImportExportLoop(_FakeLuForLoop())
+    resumed = []
+
+    def _Resume(diskie):
+      # Resume the failed transfer, as done when a segment fails
+      assert diskie.error
+      part = _FakeLoopTransfer("part1.1", False)
+      resumed.append(part)
+      loop.Add(part)
+
+    part = _FakeLoopTransfer("part1.0", True, finalize_fn=_Resume)
+    loop.Add(part)
+    loop.Run()
+
+    self.assertFalse(part.active)
+    self.assertTrue(part.error)
+    self.assertEqual(len(resumed), 1)
+    self.assertFalse(resumed[0].active)
+    self.assertTrue(resumed[0].error is None)
+    self.assertTrue(loop.FinalizeAll())
+
+  def testResumeOnDaemonFailure(self):
+    loop = ImportExportLoop(_FakeLuForLoop())
+    resumed = []
+
+    def _Resume(diskie):
+      part = _FakeLoopTransfer("part1.1", False)
+      resumed.append(part)
+      loop.Add(part)
+
+    part = _FakeLoopTransfer("part1.0", False, finalize_fn=_Resume)
+
+    def _FailDaemon():
+      raise _ImportExportError("Daemon failed to start")
+
+    part.CheckDaemon = _FailDaemon
+    loop.Add(part)
+    loop.Run()
+
+    self.assertTrue(part.error)
+    self.assertEqual(len(resumed), 1)
+    self.assertFalse(resumed[0].active)
+    self.assertTrue(resumed[0].error is None)
+
+
+class _FakeNodeInfoResult(object):
+  def __init__(self, fail_msg=None, cpu_total=None):
+    self.fail_msg = fail_msg
+    self.payload = (None, None, ({"cpu_total": cpu_total}, ))
+
+
+class _FakeLuForStreams(object):
+  def __init__(self, nodeinfo):
+    self.calls = []
+    self._nodeinfo = nodeinfo
+    self.cfg = self
+    self.rpc = self
+
+  def GetClusterInfo(self):
+    return objects.Cluster(hvparams={
+      constants.HT_FAKE: {},
+      })
+
+  def GetNodeName(self, node_uuid):
+    return node_uuid
+
+  def call_node_info(self, node_uuids, storage_units, hvspecs):
+    self.calls.append((node_uuids, storage_units, hvspecs))
+    return self._nodeinfo
+
+
+class TestNegotiateTransferStreams(unittest.TestCase):
+  def setUp(self):
+    self.instance = objects.Instance(hypervisor=constants.HT_FAKE)
+
+  def test(self):
+    lu = _FakeLuForStreams({
+      "node1": _FakeNodeInfoResult(cpu_total=24),
+      "node2": _FakeNodeInfoResult(cpu_total=2),
+      })
+    self.assertEqual(_NegotiateTransferStreams(lu, self.instance,
+                                               ["node1", "node2"], 8), 2)
+    self.assertEqual(lu.calls, [
+      (["node1", "node2"], None, [(constants.HT_FAKE, {})]),
+      ])
+
+  def testRequestedIsLower(self):
+    lu = _FakeLuForStreams({
+      "node1": _FakeNodeInfoResult(cpu_total=24),
+      "node2": _FakeNodeInfoResult(cpu_total=16),
+      })
+    self.assertEqual(_NegotiateTransferStreams(lu, self.instance,
+                                               ["node1", "node2"], 4), 4)
+
+  def testSingleStream(self):
+    lu = _FakeLuForStreams({})
+    self.assertEqual(_NegotiateTransferStreams(lu, self.instance,
+                                               ["node1", "node2"], 1), 1)
+    self.assertEqual(lu.calls, [])
+
+  def testUnknown(self):
+    lu = _FakeLuForStreams({
+      "node1": _FakeNodeInfoResult(fail_msg="Node offline"),
+      "node2": _FakeNodeInfoResult(cpu_total=None),
+      })
+    self.assertEqual(_NegotiateTransferStreams(lu, self.instance,
+                                               ["node1", "node2"], 4), 4)
+
+
+class TestIsSparseTransfer(unittest.TestCase):
+  def test(self):
+    for (src_io, dest_io, sparse) in [
+      (constants.IEIO_RAW_DISK, constants.IEIO_RAW_DISK, True),
+      (constants.IEIO_RAW_DISK, constants.IEIO_FILE, True),
+      (constants.IEIO_FILE, constants.IEIO_RAW_DISK, True),
+      (constants.IEIO_FILE, constants.IEIO_SCRIPT, False),
+      (constants.IEIO_SCRIPT, constants.IEIO_FILE, False),
+      ]:
+      transfer = DiskTransfer("disk/0", src_io, None, dest_io, None, None)
+      self.assertEqual(_IsSparseTransfer(transfer), sparse)
+
+
+class TestGetExportBaseImage(unittest.TestCase):
+  def _Config(self, options):
+    config = objects.SerializableConfigParser()
+    config.add_section(constants.INISECT_INS)
+    for (name, value) in options.items():
+      config.set(constants.INISECT_INS, name, value)
+    return config
+
+  def test(self):
+    config = self._Config({
+      "disk0_dump": "image0",
+      "disk0_size": "1024",
+      "disk1_dump": "image1",
+      "disk1_size": "2048",
+      "disk1_chain": "base1",
+      })
+
+    self.assertEqual(_GetExportBaseImage(config, 0, objects.Disk(size=1024)),
+                     "image0")
+    self.assertEqual(_GetExportBaseImage(config, 1, objects.Disk(size=2048)),
+                     "image1")
+
+  def testMismatch(self):
+    config = self._Config({
+      "disk0_dump": "image0",
+      "disk0_size": "1024",
+      })
+
+    # Resized disk
+    self.assertEqual(_GetExportBaseImage(config, 0, objects.Disk(size=2048)),
+                     None)
+    # New disk
+    self.assertEqual(_GetExportBaseImage(config, 1, objects.Disk(size=1024)),
+                     None)
+    # No previous export
+    self.assertEqual(_GetExportBaseImage(objects.SerializableConfigParser(), 0,
+                                         objects.Disk(size=1024)), None)
+
+  def testChainTooLong(self):
+    chain = ["base%d" % i for i in range(constants.EXPORT_MAX_CHAIN_LENGTH)]
+    for length in range(len(chain)):
+      config = self._Config({
+        "disk0_dump": "image0",
+        "disk0_size": "1024",
+        "disk0_chain": " ".join(chain[:length]),
+        })
+      result = _GetExportBaseImage(config, 0, objects.Disk(size=1024))
+      if length + 2 <= constants.EXPORT_MAX_CHAIN_LENGTH:
+        self.assertEqual(result, "image0")
+      else:
+        self.assertEqual(result, None)
+
+
+class _FakeDiskExport(object):
+  def __init__(self, progress, success=None, checkpoint=None):
+    self.progress = progress
+    self.success = success
+    self.checkpoint = checkpoint
+    self.aborted = False
+
+  @property
+  def active(self):
+    return self.success is None
+
+  def Abort(self):
+    self.aborted = True
+
+
+class TestDiskTransferGroup(unittest.TestCase):
+  def _StartPart(self, group, index, segment, attempt, resume_digest):
+    opts = objects.ImportExportOptions(resume_digest=resume_digest)
+    dtp = _DiskTransferPrivate(group.data, True, opts, group=group)
+    dtp.src_export = _FakeDiskExport(None)
+    dtp.dest_import = _FakeDiskExport(None)
+    self.started.append((index, segment, attempt, resume_digest))
+    return dtp
+
+  def _MakeGroup(self, segments, finished_fn=None):
+    self.started = []
+    transfer = DiskTransfer("disk/0", None, None, None, None, finished_fn)
+    group = _DiskTransferGroup(transfer, sum(size for (_, size) in segments),
+                               10, self._StartPart, _time_fn=lambda: 100.0)
+    for (idx, segment) in enumerate(segments):
+      group.StartPart(idx, segment)
+    return group
+
+  @staticmethod
+  def _Finish(dtp, success):
+    dtp.src_export.success = success
+    dtp.dest_import.success = success
+    dtp.RecordResult(success)
+
+  def testProgress(self):
+    group = self._MakeGroup([(0, 100), (100, 100)])
+    self.assertEqual(group.GetProgress(), (0, 0.0, 0, None))
+
+    group.parts[0].src_export = _FakeDiskExport((30, 10.0, 30, 7))
+    group.parts[1].src_export = _FakeDiskExport((50, 20.0, 50, 2.5))
+    self.assertEqual(group.GetProgress(), (80, 30.0, 40, 4))
+
+    # Finished segments count with their full size
+    group.parts[1].src_export = _FakeDiskExport((90, 20.0, 90, 0.5),
+                                                success=True)
+    self.assertEqual(group.GetProgress(), (130, 10.0, 65, 7))
+
+  def testProgressInterval(self):
+    msgs = []
+    group = self._MakeGroup([(0, 100), (100, 100)])
+    group.ReportProgress(msgs.append)
+    group.ReportProgress(msgs.append)
+    self.assertEqual(len(msgs), 1)
+    self.assertTrue(msgs[0].startswith("disk/0 sent "))
+
+  def testFinished(self):
+    msgs = []
+    finished = []
+    group = self._MakeGroup([(0, 100), (100, 100)],
+                            finished_fn=lambda: finished.append(True))
+
+    self._Finish(group.parts[0], True)
+    group.PartFinished(group.parts[0], msgs.append)
+    self.assertFalse(finished)
+
+    self._Finish(group.parts[1], True)
+    group.PartFinished(group.parts[1], msgs.append)
+    group.PartFinished(group.parts[1], msgs.append)
+    self.assertEqual(finished, [True])
+    self.assertTrue(group.success)
+    self.assertEqual(len(msgs), 1)
+
+  def testResume(self):
+    msgs = []
+    group = self._MakeGroup([(0, 1000), (1000, 1000)])
+
+    failed = group.parts[1]
+    failed.src_export.progress = (700, 10.0, 70, 30)
+    failed.dest_import.checkpoint = {
+      "offset": 512 * constants.DD_BLOCK_SIZE,
+      "digest": "abc123",
+      }
+    self._Finish(failed, False)
+    group.PartFinished(failed, msgs.append)
+
+    # The segment is restarted at its last checkpoint
+    self.assertEqual(self.started[-1], (1, (1512, 488), 1, "abc123"))
+    self.assertEqual(len(group.parts), 3)
+    self.assertTrue(failed.superseded)
+    self.assertEqual(group.retransmitted, 700 - 512)
+    self.assertFalse(group.parts[0].src_export.aborted)
+    self.assertEqual(group.GetProgress()[0], 512)
+
+    for dtp in [group.parts[0], group.parts[2]]:
+      self._Finish(dtp, True)
+      group.PartFinished(dtp, msgs.append)
+
+    self.assertTrue(group.success)
+    self.assertTrue("retransmitted" in msgs[-1])
+
+  def testResumeWithoutCheckpoint(self):
+    group = self._MakeGroup([(0, 1000)])
+
+    failed = group.parts[0]
+    self._Finish(failed, False)
+    group.PartFinished(failed, lambda _: None)
+
+    self.assertEqual(self.started[-1], (0, (0, 1000), 1, None))
+    self.assertEqual(group.retransmitted, 0)
+
+  def testRetriesExhausted(self):
+    group = self._MakeGroup([(0, 1000), (1000, 1000)])
+
+    for attempt in range(constants.DISK_TRANSFER_MAX_RETRIES + 1):
+      failed = group.parts[-1]
+      self.assertEqual(failed.attempt, attempt)
+      self._Finish(failed, False)
+      group.PartFinished(failed, lambda _: None)
+
+    self.assertEqual(len(group.parts),
+                     2 + constants.DISK_TRANSFER_MAX_RETRIES)
+    self.assertFalse(group.success)
+    self.assertTrue(group.parts[0].src_export.aborted)
+    self.assertTrue(group.parts[0].dest_import.aborted)
+
+  def testNoResumeWhileActive(self):
+    group = self._MakeGroup([(0, 1000)])
+
+    failed = group.parts[0]
+    failed.src_export.success = False
+    failed.RecordResult(False)
+    group.PartFinished(failed, lambda _: None)
+
+    # The import is still running
+    self.assertEqual(len(group.parts), 1)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
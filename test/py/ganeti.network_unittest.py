@@ -0,0 +1,138 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the network module"""
+
+
+import unittest
+
+from ganeti import errors
+from ganeti import network
+from ganeti import objects
+
+import testutils
+
+
+class TestAddressPool(unittest.TestCase):
+  def _MakePool(self, net="192.0.2.0/24", gateway="192.0.2.1"):
+    nobj = objects.Network(name="test", network=net, gateway=gateway)
+    return network.AddressPool.InitializeNetwork(nobj)
+
+  def testInitialize(self):
+    pool = self._MakePool()
+    self.assertEqual(pool.GetReservedCount(), 3)
+    self.assertEqual(pool.GetFreeCount(), 253)
+    self.assertEqual(pool.GetExternalReservations(),
+                     ["192.0.2.0", "192.0.2.1", "192.0.2.255"])
+    self.assertEqual(pool.GetFreeRanges(), [("192.0.2.2", "192.0.2.254")])
+    self.assertEqual(pool.net.ext_reservations,
+                     "11" + ("0" * 253) + "1")
+
+  def testReserveRelease(self):
+    pool = self._MakePool()
+    self.assertFalse(pool.IsReserved("192.0.2.10"))
+    pool.Reserve("192.0.2.10")
+    self.assertTrue(pool.IsReserved("192.0.2.10"))
+    self.assertFalse(pool.IsReserved("192.0.2.10", external=True))
+    self.assertEqual(pool.net.reservations[10], "1")
+    self.assertEqual(pool.GetFreeRanges(),
+                     [("192.0.2.2", "192.0.2.9"), ("192.0.2.11", "192.0.2.254")])
+    self.assertRaises(errors.AddressPoolError, pool.Reserve, "192.0.2.10")
+
+    pool.Release("192.0.2.10")
+    self.assertFalse(pool.IsReserved("192.0.2.10"))
+    self.assertEqual(pool.GetFreeRanges(), [("192.0.2.2", "192.0.2.254")])
+    self.assertRaises(errors.AddressPoolError, pool.Release, "192.0.2.10")
+
+  def testReleaseStillExternallyReserved(self):
+    pool = self._MakePool()
+    pool.Reserve("192.0.2.1")
+    pool.Release("192.0.2.1")
+    self.assertTrue(pool.IsReserved("192.0.2.1", external=True))
+    self.assertEqual(pool.GetFreeRanges(), [("192.0.2.2", "192.0.2.254")])
+
+  def testOutsideNetwork(self):
+    pool = self._MakePool()
+    self.assertFalse(pool.Contains("198.51.100.1"))
+    self.assertFalse(pool.Contains(None))
+    for fn in [pool.IsReserved, pool.Reserve, pool.Release]:
+      self.assertRaises(errors.AddressPoolError, fn, "198.51.100.1")
+    self.assertRaises(ValueError, pool.Reserve, "192.0.2.256")
+
+  def testGetFreeAddress(self):
+    pool = self._MakePool(net="192.0.2.0/30", gateway=None)
+    self.assertEqual(pool.GenerateFree(), "192.0.2.1")
+    self.assertEqual(pool.GetFreeAddress(), "192.0.2.1")
+    self.assertEqual(pool.GetFreeAddress(), "192.0.2.2")
+    self.assertTrue(pool.IsFull())
+    self.assertRaises(errors.AddressPoolError, pool.GetFreeAddress)
+    self.assertRaises(errors.AddressPoolError, pool.GenerateFree)
+    self.assertEqual(pool.GetMap(), "XXXX")
+
+  def testReserveRange(self):
+    pool = self._MakePool()
+    pool.ReserveRange("192.0.2.2", "192.0.2.99")
+    self.assertEqual(pool.GenerateFree(), "192.0.2.100")
+    self.assertEqual(pool.GetFreeCount(), 155)
+    self.assertRaises(errors.AddressPoolError, pool.ReserveRange,
+                      "192.0.2.99", "192.0.2.120")
+    self.assertFalse(pool.IsReserved("192.0.2.120"))
+    self.assertRaises(errors.AddressPoolError, pool.ReserveRange,
+                      "192.0.2.120", "192.0.2.110")
+
+    pool.ReleaseRange("192.0.2.50", "192.0.2.59")
+    self.assertEqual(pool.GetFreeRanges(),
+                     [("192.0.2.50", "192.0.2.59"),
+                      ("192.0.2.100", "192.0.2.254")])
+    self.assertRaises(errors.AddressPoolError, pool.ReleaseRange,
+                      "192.0.2.50", "192.0.2.60")
+    self.assertTrue(pool.IsReserved("192.0.2.60"))
+
+  def testFreeRangesMatchMap(self):
+    pool = self._MakePool(net="10.0.0.0/16", gateway="10.0.0.1")
+    pool.GenerateFree()
+    for i in range(0, 250, 3):
+      pool.Reserve("10.0.0.%d" % i if i else "10.0.1.0")
+      pool.ReserveRange("10.0.%d.10" % i, "10.0.%d.20" % i, external=True)
+    pool.ReleaseRange("10.0.3.10", "10.0.3.20", external=True)
+    pool.Release("10.0.0.3")
+
+    fresh = network.AddressPool(pool.net)
+    self.assertEqual(pool.GetFreeRanges(), fresh.GetFreeRanges())
+    self.assertEqual(pool.GetFreeCount(), pool.GetMap().count("."))
+    self.assertEqual(pool.GetReservedCount(), pool.GetMap().count("X"))
+
+  def testTooBig(self):
+    nobj = objects.Network(name="test", network="10.0.0.0/8")
+    self.assertRaises(errors.AddressPoolError, network.AddressPool, nobj)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
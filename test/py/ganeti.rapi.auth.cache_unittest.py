@@ -0,0 +1,199 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for testing ganeti.rapi.auth.cache"""
+
+import base64
+import os
+import unittest
+
+from ganeti import http
+from ganeti.rapi.auth import basic_auth
+from ganeti.rapi.auth import cache
+from ganeti.rapi.auth import users_file
+
+import testutils
+
+
+class _FakeTime(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class TestCredentialCache(unittest.TestCase):
+  def setUp(self):
+    self.time_fn = _FakeTime()
+    self.cache = cache.CredentialCache(ttl=30, slots=16,
+                                       _time_fn=self.time_fn)
+
+  def test(self):
+    self.assertTrue(self.cache.Get(("user", "pw")) is None)
+
+    self.cache.Set(("user", "pw"), "user")
+    self.assertEqual(self.cache.Get(("user", "pw")), "user")
+    self.assertEqual(self.cache.Get(["user", "pw"]), "user")
+
+    for credentials in [("user", "pw2"), ("user2", "pw"), ("user", None),
+                        ("user", "pw", None), ("user,pw", ), ("", "userpw")]:
+      self.assertTrue(self.cache.Get(credentials) is None)
+
+  def testExpiry(self):
+    self.cache.Set(("a", "b"), "a")
+    self.time_fn.now += 29
+    self.assertEqual(self.cache.Get(("a", "b")), "a")
+    self.time_fn.now += 2
+    self.assertTrue(self.cache.Get(("a", "b")) is None)
+
+    # Setting again renews the entry
+    self.cache.Set(("a", "b"), "a")
+    self.assertEqual(self.cache.Get(("a", "b")), "a")
+
+  def testClear(self):
+    for i in range(10):
+      self.cache.Set(("user%s" % i, "pw"), "user%s" % i)
+
+    self.cache.Clear()
+
+    for i in range(10):
+      self.assertTrue(self.cache.Get(("user%s" % i, "pw")) is None)
+
+  def testLongValue(self):
+    self.cache.Set(("x", "y"), "x" * 1000)
+    self.assertTrue(self.cache.Get(("x", "y")) is None)
+
+  def testCorruptSlot(self):
+    self.cache.Set(("user", "pw"), "user")
+
+    # Simulate a partially written slot
+    offset = self.cache._GetOffset(self.cache._GetKey(("user", "pw")))
+    self.cache._mem[offset + cache._SLOT.size - 1] = "x"
+
+    self.assertTrue(self.cache.Get(("user", "pw")) is None)
+
+  def testNoCredentialsStored(self):
+    self.cache.Set(("user", "secretpassword"), "user")
+    self.assertFalse("secretpassword" in self.cache._mem[:])
+
+  def testSharedWithChild(self):
+    (rfd, wfd) = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+      # Child process
+      try:
+        os.close(rfd)
+        self.cache.Set(("child", "pw"), "child")
+        os.write(wfd, "x")
+      finally:
+        os._exit(0)
+
+    os.close(wfd)
+    try:
+      self.assertEqual(os.read(rfd, 1), "x")
+    finally:
+      os.close(rfd)
+      os.waitpid(pid, 0)
+
+    self.assertEqual(self.cache.Get(("child", "pw")), "child")
+
+
+class _FakeRequest(object):
+  def __init__(self, username, password):
+    self.request_headers = {
+      http.HTTP_AUTHORIZATION:
+        "Basic %s" % base64.b64encode("%s:%s" % (username, password)),
+      }
+
+
+class TestBasicAuthenticatorCache(unittest.TestCase):
+  def setUp(self):
+    self.cache = cache.CredentialCache()
+    self.users = {
+      "user1": users_file.PasswordFileUser("user1", "pw1", []),
+      }
+    self.lookups = []
+    self.verified = []
+    self.auth = basic_auth.BasicAuthenticator(self._GetUser, cache=self.cache)
+
+    self._orig_verify = \
+      http.auth.HttpServerRequestAuthentication.VerifyBasicAuthPassword
+
+    def _Verify(*args):
+      self.verified.append(args)
+      return self._orig_verify(*args)
+
+    http.auth.HttpServerRequestAuthentication.VerifyBasicAuthPassword = \
+      staticmethod(_Verify)
+
+  def tearDown(self):
+    http.auth.HttpServerRequestAuthentication.VerifyBasicAuthPassword = \
+      staticmethod(self._orig_verify)
+
+  def _GetUser(self, name):
+    self.lookups.append(name)
+    return self.users.get(name, None)
+
+  def _Validate(self, username, password):
+    return self.auth.ValidateRequest(_FakeRequest(username, password), None,
+                                     "realm")
+
+  def test(self):
+    for _ in range(3):
+      self.assertEqual(self._Validate("user1", "pw1"), "user1")
+    self.assertEqual(len(self.verified), 1)
+
+    # Users are still looked up for every request
+    self.assertEqual(self.lookups, ["user1"] * 3)
+
+  def testWrongPassword(self):
+    for _ in range(3):
+      self.assertTrue(self._Validate("user1", "wrong") is None)
+    self.assertEqual(len(self.verified), 3)
+
+  def testChangedPassword(self):
+    self.assertEqual(self._Validate("user1", "pw1"), "user1")
+
+    self.users["user1"] = users_file.PasswordFileUser("user1", "new", [])
+    self.assertTrue(self._Validate("user1", "pw1") is None)
+    self.assertEqual(self._Validate("user1", "new"), "user1")
+    self.assertEqual(len(self.verified), 3)
+
+  def testAccess(self):
+    self.assertEqual(self._Validate("user1", "pw1"), "user1")
+    self.assertRaises(http.HttpForbidden, self.auth.ValidateRequest,
+                      _FakeRequest("user1", "pw1"), ["write"], "realm")
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
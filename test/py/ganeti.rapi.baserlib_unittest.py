@@ -169,5 +169,25 @@ class TestOpcodeResource(unittest.TestCase):
           self.assertFalse(hasattr(obj, attr))
 
 
+class TestMakeETag(unittest.TestCase):
+  def test(self):
+    etag = baserlib.MakeETag("R_2_groups", [], {"bulk": ["1"]}, 10)
+    self.assertTrue(etag.startswith("\"") and etag.endswith("\""))
+    self.assertEqual(etag,
+                     baserlib.MakeETag("R_2_groups", [], {"bulk": ["1"]}, 10))
+
+    # Query arguments are compared independently of their order
+    self.assertEqual(baserlib.MakeETag("R_2_nodes", [],
+                                       {"a": ["1"], "b": ["2"]}, 3),
+                     baserlib.MakeETag("R_2_nodes", [],
+                                       {"b": ["2"], "a": ["1"]}, 3))
+
+    for args in [("R_2_groups", [], {"bulk": ["1"]}, 11),
+                 ("R_2_groups", [], {}, 10),
+                 ("R_2_groups", ["default"], {"bulk": ["1"]}, 10),
+                 ("R_2_nodes", [], {"bulk": ["1"]}, 10)]:
+      self.assertNotEqual(etag, baserlib.MakeETag(*args))
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -37,6 +37,7 @@ import pycurl
 
 from ganeti import opcodes
 from ganeti import constants
+from ganeti import compat
 from ganeti import http
 from ganeti import serializer
 from ganeti import utils
@@ -57,6 +58,8 @@ import testutils
 _KNOWN_UNUSED = set([
   rlib2.R_root,
   rlib2.R_2,
+  # Server-sent events can't be consumed by the blocking client
+  rlib2.R_2_jobs_events,
   ])
 
 # Global variable for collecting used handlers
@@ -107,7 +110,7 @@ class RapiMock(object):
 
       (code, response) = self._responses.pop()
 
-    return (code, NotImplemented, response)
+    return (code, {}, response)
 
 
 class TestConstants(unittest.TestCase):
@@ -368,6 +371,122 @@ class TestExtendedConfig(unittest.TestCase):
         self.assertEqual(curl.getopt(pycurl.TIMEOUT), timeout)
 
 
+class TestConnectionReuse(unittest.TestCase):
+  def setUp(self):
+    self.rapi = RapiMock()
+    self.curls = []
+    self.multis = []
+
+  def _CreateCurl(self):
+    curl = rapi.testutils.FakeCurl(self.rapi)
+    self.curls.append(curl)
+    return curl
+
+  def _CreateCurlMulti(self):
+    multi = rapi.testutils.FakeCurlMulti()
+    self.multis.append(multi)
+    return multi
+
+  def _CreateClient(self, **kwargs):
+    return client.GanetiRapiClient("master.example.com",
+                                   curl_factory=self._CreateCurl,
+                                   curl_multi_factory=self._CreateCurlMulti,
+                                   **kwargs)
+
+  def testNoReuse(self):
+    cl = self._CreateClient()
+
+    for _ in range(3):
+      self.rapi.AddResponse("2")
+      self.assertEqual(cl.GetVersion(), 2)
+
+    self.assertEqual(len(self.curls), 3)
+
+  def testReuse(self):
+    cl = self._CreateClient(max_connections=2)
+
+    for _ in range(3):
+      self.rapi.AddResponse("2")
+      self.assertEqual(cl.GetVersion(), 2)
+
+    # Failed requests don't prevent reuse
+    self.rapi.AddResponse(None, code=404)
+    self.assertRaises(client.GanetiApiError, cl.GetInstance, "inst1")
+
+    self.rapi.AddResponse("2")
+    self.assertEqual(cl.GetVersion(), 2)
+
+    self.assertEqual(len(self.curls), 1)
+    self.assertEqual(self.rapi.CountPending(), 0)
+
+  def testBatch(self):
+    cl = self._CreateClient(max_connections=2)
+    batch = cl.CreateBatch()
+
+    names = ["inst%s" % i for i in range(5)]
+    futures = [batch.GetInstance(name) for name in names]
+    list_future = batch.GetInstances()
+    error_future = batch.GetInstance("missing")
+
+    for name in names:
+      self.rapi.AddResponse(serializer.DumpJson({"name": name}))
+    self.rapi.AddResponse(serializer.DumpJson([{"id": name, "uri": "x"}
+                                               for name in names]))
+    self.rapi.AddResponse(None, code=404)
+
+    self.assertFalse(compat.any(future.Done() for future in futures))
+
+    batch.Execute()
+
+    self.assertEqual([future.Result()["name"] for future in futures], names)
+    self.assertEqual(list_future.Result(), names)
+    self.assertTrue(error_future.Done())
+    try:
+      error_future.Result()
+    except client.GanetiApiError, err:
+      self.assertEqual(err.code, 404)
+    else:
+      self.fail("Error was not raised")
+
+    self.assertEqual(self.rapi.CountPending(), 0)
+
+    # Requests were sent using no more than two connections
+    self.assertEqual(len(self.curls), 2)
+    self.assertEqual(len(self.multis), 1)
+    self.assertFalse(self.multis[0].handles)
+
+    # The multi object is kept for later batches
+    future = cl.CreateBatch().GetVersion()
+    self.rapi.AddResponse("2")
+    self.assertEqual(future.Result(), 2)
+    self.assertEqual(len(self.multis), 1)
+    self.assertEqual(len(self.curls), 2)
+
+  def testBatchMultipleRequests(self):
+    cl = self._CreateClient()
+    batch = cl.CreateBatch(max_concurrent=3)
+
+    futures = [batch.CreateInstance("create", "inst%s.example.com" % i,
+                                    "plain", [], [])
+               for i in range(3)]
+
+    # Every call first queries the features and then creates the instance
+    for _ in futures:
+      self.rapi.AddResponse(serializer.DumpJson([rlib2._INST_CREATE_REQV1]))
+    for job_id in [100, 101, 102]:
+      self.rapi.AddResponse(str(job_id))
+
+    self.assertEqual([future.Result() for future in futures], [100, 101, 102])
+    self.assertEqual(self.rapi.CountPending(), 0)
+    self.assertEqual(len(self.curls), 6)
+    self.assertEqual(len(self.multis), 1)
+
+  def testBatchPrivate(self):
+    batch = self._CreateClient().CreateBatch()
+    self.assertRaises(AttributeError, getattr, batch, "_SendRequest")
+    self.assertRaises(AttributeError, getattr, batch, "NoSuchMethod")
+
+
 class GanetiRapiClientTests(testutils.GanetiTestCase):
   def setUp(self):
     testutils.GanetiTestCase.setUp(self)
@@ -435,6 +554,9 @@ class GanetiRapiClientTests(testutils.GanetiTestCase):
     headers = self.curl.getopt(pycurl.HTTPHEADER)
     self.assert_("Content-type: application/json" in headers)
 
+    # Compressed responses are accepted
+    self.assertEqual(self.curl.getopt(pycurl.ENCODING), "gzip, deflate")
+
   def testHttpError(self):
     self.rapi.AddResponse(None, code=404)
     try:
@@ -888,6 +1010,74 @@ class GanetiRapiClientTests(testutils.GanetiTestCase):
     self.assertHandler(rlib2.R_2_jobs_id_wait)
     self.assertItems(["123"])
 
+  def testWaitForJobsChange(self):
+    self.rapi.AddResponse(serializer.DumpJson({
+      "jobs": {
+        "123": {
+          "id": 123,
+          "status": constants.JOB_STATUS_RUNNING,
+          "log_entries": [],
+          },
+        },
+      }))
+    result = self.client.WaitForJobsChange({
+      123: (constants.JOB_STATUS_WAITING, None),
+      124: (None, 7),
+      })
+    self.assertEqual(result.keys(), [123])
+    self.assertEqual(result[123]["status"], constants.JOB_STATUS_RUNNING)
+    self.assertHandler(rlib2.R_2_jobs_wait)
+    self.assertEqual(serializer.LoadJson(self.rapi.GetLastRequestData()), {
+      "jobs": {
+        "123": {"status": constants.JOB_STATUS_WAITING, "log_serial": None},
+        "124": {"status": None, "log_serial": 7},
+        },
+      })
+
+    self.rapi.AddResponse(serializer.DumpJson(None))
+    self.assertTrue(self.client.WaitForJobsChange({1: (None, None)}) is None)
+    self.assertEqual(self.rapi.CountPending(), 0)
+
+  def testWaitForJobsCompletion(self):
+    def _Change(job_id, status, log_entries):
+      return {
+        "jobs": {
+          str(job_id): {
+            "id": job_id,
+            "status": status,
+            "log_entries": log_entries,
+            },
+          },
+        }
+
+    self.rapi.AddResponse(serializer.DumpJson(
+      _Change(5, constants.JOB_STATUS_RUNNING,
+              [[3, [0, 0], "message", "Step 1"]])))
+    self.rapi.AddResponse(serializer.DumpJson(None))
+    self.rapi.AddResponse(serializer.DumpJson(
+      _Change(6, constants.JOB_STATUS_ERROR, [])))
+    self.rapi.AddResponse(serializer.DumpJson(
+      _Change(5, constants.JOB_STATUS_SUCCESS,
+              [[4, [0, 0], "message", "Step 2"]])))
+
+    log = []
+
+    def _LogFn(job_id, entry):
+      log.append((job_id, entry[3]))
+
+    result = self.client.WaitForJobsCompletion([5, "6"], log_fn=_LogFn)
+    self.assertEqual(result, {5: True, 6: False})
+    self.assertEqual(log, [(5, "Step 1"), (5, "Step 2")])
+    self.assertHandler(rlib2.R_2_jobs_wait)
+    self.assertEqual(self.rapi.CountPending(), 0)
+
+    # The last request only contains the remaining job
+    self.assertEqual(serializer.LoadJson(self.rapi.GetLastRequestData()), {
+      "jobs": {
+        "5": {"status": constants.JOB_STATUS_RUNNING, "log_serial": 3},
+        },
+      })
+
   def testCancelJob(self):
     self.rapi.AddResponse("[true, \"Job 123 will be canceled\"]")
     self.assertEqual([True, "Job 123 will be canceled"],
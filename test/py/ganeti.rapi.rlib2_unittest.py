@@ -43,9 +43,12 @@ from ganeti import compat
 from ganeti import ht
 from ganeti import http
 from ganeti import query
+from ganeti import qlang
+from ganeti import objects
 import ganeti.rpc.errors as rpcerr
 from ganeti import errors
 from ganeti import rapi
+from ganeti import serializer
 
 from ganeti.rapi import rlib2
 from ganeti.rapi import baserlib
@@ -353,6 +356,311 @@ class TestInstanceInfo(RAPITestCase):
     self.assertTrue(op.static)
 
 
+class _FakeClientForListQuery(_FakeClient):
+  def __init__(self, rows, address=None):
+    _FakeClient.__init__(self, address=address)
+    self._rows = rows
+    self.queries = []
+
+  def Query(self, what, fields, qfilter):
+    self.queries.append((what, fields, qfilter))
+    idx = [self._rows[0].index(i) for i in fields]
+    return objects.QueryResponse(fields=[], data=[
+      [row[i] for i in idx] for row in self._rows[1:]
+      ])
+
+
+class TestListQuery(unittest.TestCase):
+  _GROUPS = [
+    ["name", "node_cnt", "alloc_policy"],
+    [(constants.RS_NORMAL, "group3"), (constants.RS_NORMAL, 1),
+     (constants.RS_NORMAL, "preferred")],
+    [(constants.RS_NORMAL, "group1"), (constants.RS_NORMAL, 4),
+     (constants.RS_NORMAL, "last_resort")],
+    [(constants.RS_NORMAL, "group2"), (constants.RS_UNAVAIL, None),
+     (constants.RS_NORMAL, "preferred")],
+    ]
+
+  def _Get(self, cls, queryargs, rows):
+    clfactory = _FakeClientFactory(compat.partial(_FakeClientForListQuery,
+                                                  rows))
+    handler = _CreateHandler(cls, [], queryargs, None, clfactory)
+    result = handler.GET()
+    cl = clfactory.GetNextClient()
+    self.assertRaises(IndexError, clfactory.GetNextClient)
+    return (result, cl.queries)
+
+  def testFieldsAndLimit(self):
+    (result, queries) = self._Get(rlib2.R_2_groups, {
+      "fields": ["node_cnt"],
+      "limit": ["2"],
+      }, self._GROUPS)
+
+    self.assertEqual(queries, [
+      (constants.QR_GROUP, ["node_cnt", "name"], None),
+      ])
+    self.assertEqual(result, {
+      "items": [{"node_cnt": 4}, {"node_cnt": None}],
+      "next_cursor": "group2",
+      })
+
+  def testCursorAndFilter(self):
+    (result, queries) = self._Get(rlib2.R_2_groups, {
+      "fields": ["name,alloc_policy"],
+      "filter": ["alloc_policy == \"preferred\""],
+      "cursor": ["group1"],
+      "limit": ["2"],
+      }, self._GROUPS)
+
+    self.assertEqual(queries, [
+      (constants.QR_GROUP, ["name", "alloc_policy"],
+       [qlang.OP_AND,
+        [qlang.OP_EQUAL, "alloc_policy", "preferred"],
+        [qlang.OP_GT, "name", "group1"]]),
+      ])
+    self.assertEqual(result, {
+      "items": [
+        {"name": "group1", "alloc_policy": "last_resort"},
+        {"name": "group2", "alloc_policy": "preferred"},
+        ],
+      "next_cursor": "group2",
+      })
+
+  def testNonBulk(self):
+    (result, queries) = self._Get(rlib2.R_2_instances, {
+      "cursor": ["inst1"],
+      }, [
+      ["name"],
+      [(constants.RS_NORMAL, "inst3")],
+      [(constants.RS_NORMAL, "inst2")],
+      ])
+
+    self.assertEqual(queries, [
+      (constants.QR_INSTANCE, ["name"], [qlang.OP_GT, "name", "inst1"]),
+      ])
+    self.assertEqual(result, [
+      {"id": "inst2", "uri": "/2/instances/inst2"},
+      {"id": "inst3", "uri": "/2/instances/inst3"},
+      ])
+
+  def testInstanceBeparams(self):
+    (result, _) = self._Get(rlib2.R_2_instances, {
+      "fields": ["beparams"],
+      }, [
+      ["name", "beparams"],
+      [(constants.RS_NORMAL, "inst1"),
+       (constants.RS_NORMAL, {constants.BE_MAXMEM: 128})],
+      ])
+
+    self.assertEqual(result, [{
+      "beparams": {
+        constants.BE_MAXMEM: 128,
+        constants.BE_MEMORY: 128,
+        },
+      }])
+
+  def testInvalidArguments(self):
+    for queryargs in [
+      {"fields": ["name,nonexistent"]},
+      {"filter": ["serial_no > 1 and"]},
+      {"filter": ["pinst_cnt > 0"]},
+      {"filter": ["name == \"default\" and not pinst_cnt > 0"]},
+      {"limit": ["0"]},
+      {"limit": ["many"]},
+      ]:
+      clfactory = _FakeClientFactory(compat.partial(_FakeClientForListQuery,
+                                                    self._GROUPS))
+      handler = _CreateHandler(rlib2.R_2_groups, [], queryargs, None,
+                               clfactory)
+      self.assertRaises(http.HttpBadRequest, handler.GET)
+
+  def testLegacy(self):
+    self.assertFalse(_CreateHandler(rlib2.R_2_nodes, [], {"bulk": ["1"]},
+                                    None, NotImplemented)._UseListQuery())
+
+
+class _FakeClientForJobs(_FakeClient):
+  def __init__(self, results, address=None):
+    _FakeClient.__init__(self, address=address)
+    self._results = results
+    self.queries = []
+
+  def QueryJobs(self, job_ids, fields):
+    self.queries.append(job_ids)
+    rows = self._results.pop(0)
+    return [rows.get(job_id, None) for job_id in job_ids]
+
+
+def _LogEntry(serial, message):
+  return (serial, (0, 0), constants.ELOG_MESSAGE, message)
+
+
+class TestJobChangeTracker(unittest.TestCase):
+  def test(self):
+    tracker = rlib2._JobChangeTracker({
+      1: (None, None),
+      2: (constants.JOB_STATUS_RUNNING, 3),
+      })
+    cl = _FakeClientForJobs([
+      {
+        1: [1, constants.JOB_STATUS_QUEUED, [[]]],
+        2: [2, constants.JOB_STATUS_RUNNING,
+            [[_LogEntry(3, "a")], [_LogEntry(4, "b")]]],
+      },
+      {
+        1: [1, constants.JOB_STATUS_QUEUED, [[]]],
+        2: [2, constants.JOB_STATUS_SUCCESS,
+            [[_LogEntry(3, "a")], [_LogEntry(4, "b")]]],
+      },
+      {
+        1: [1, constants.JOB_STATUS_QUEUED, [[]]],
+      },
+      ])
+
+    self.assertTrue(tracker.HasPending())
+    self.assertEqual(tracker.Update(cl), [
+      {"id": 1, "status": constants.JOB_STATUS_QUEUED, "log_entries": []},
+      {"id": 2, "status": constants.JOB_STATUS_RUNNING,
+       "log_entries": [_LogEntry(4, "b")]},
+      ])
+    self.assertEqual(tracker.Update(cl), [
+      {"id": 2, "status": constants.JOB_STATUS_SUCCESS, "log_entries": []},
+      ])
+
+    # Finalized jobs are no longer queried
+    self.assertEqual(tracker.Update(cl), [])
+    self.assertEqual(cl.queries, [[1, 2], [1, 2], [1]])
+    self.assertTrue(tracker.HasPending())
+
+  def testNotFound(self):
+    tracker = rlib2._JobChangeTracker({7: (None, None)})
+    cl = _FakeClientForJobs([{}])
+    self.assertRaises(http.HttpNotFound, tracker.Update, cl)
+
+
+class TestJobsWait(unittest.TestCase):
+  def _Get(self, body, results):
+    clfactory = _FakeClientFactory(compat.partial(_FakeClientForJobs,
+                                                  results))
+    handler = _CreateHandler(rlib2.R_2_jobs_wait, [], {}, body, clfactory)
+    return handler.GET()
+
+  def test(self):
+    result = self._Get({
+      "jobs": {
+        "10": {"status": constants.JOB_STATUS_RUNNING, "log_serial": 1},
+        "11": {"status": constants.JOB_STATUS_RUNNING, "log_serial": None},
+        },
+      }, [
+      {
+        10: [10, constants.JOB_STATUS_RUNNING, [[_LogEntry(1, "x")]]],
+        11: [11, constants.JOB_STATUS_RUNNING, [[]]],
+      },
+      {
+        10: [10, constants.JOB_STATUS_ERROR, [[_LogEntry(1, "x")]]],
+        11: [11, constants.JOB_STATUS_RUNNING, [[]]],
+      },
+      ])
+
+    self.assertEqual(result, {
+      "jobs": {
+        "10": {
+          "id": 10,
+          "status": constants.JOB_STATUS_ERROR,
+          "log_entries": [],
+          },
+        },
+      })
+
+  def testFinalized(self):
+    result = self._Get({
+      "jobs": {
+        "10": {"status": constants.JOB_STATUS_SUCCESS, "log_serial": None},
+        },
+      }, [
+      {10: [10, constants.JOB_STATUS_SUCCESS, [[]]]},
+      ])
+    self.assertTrue(result is None)
+
+  def testInvalid(self):
+    for body in [
+      {},
+      {"jobs": []},
+      {"jobs": {"1": None}},
+      {"jobs": {"1": {"status": 1}}},
+      {"jobs": {"1": {"log_serial": "x"}}},
+      {"jobs": {"x": {}}},
+      ]:
+      self.assertRaises(http.HttpBadRequest, self._Get, body, [])
+
+
+class TestJobsEvents(unittest.TestCase):
+  def _Get(self, queryargs, results):
+    clfactory = _FakeClientFactory(compat.partial(_FakeClientForJobs,
+                                                  results))
+    handler = _CreateHandler(rlib2.R_2_jobs_events, [], queryargs, None,
+                             clfactory)
+    return handler.GET()
+
+  def test(self):
+    result = self._Get({"jobs": ["3,4"]}, [
+      {
+        3: [3, constants.JOB_STATUS_SUCCESS, [[]]],
+        4: [4, constants.JOB_STATUS_RUNNING, [[]]],
+      },
+      {
+        4: [4, constants.JOB_STATUS_RUNNING, [[_LogEntry(1, "y")]]],
+      },
+      {
+        4: [4, constants.JOB_STATUS_CANCELED, [[_LogEntry(1, "y")]]],
+      },
+      ])
+
+    self.assertTrue(isinstance(result, baserlib.StreamedResponse))
+    self.assertEqual(result.content_type, http.HTTP_TEXT_EVENT_STREAM)
+
+    events = []
+    for chunk in result.chunks:
+      self.assertTrue(chunk.endswith("\n\n"))
+      lines = chunk[:-2].split("\n")
+      self.assertEqual(len(lines), 2)
+      self.assertTrue(lines[0].startswith("event: "))
+      self.assertTrue(lines[1].startswith("data: "))
+      events.append((lines[0][len("event: "):],
+                     serializer.LoadJson(lines[1][len("data: "):])))
+
+    self.assertEqual([(event, data and (data["id"], data["status"]))
+                      for (event, data) in events], [
+      ("job", (3, constants.JOB_STATUS_SUCCESS)),
+      ("job", (4, constants.JOB_STATUS_RUNNING)),
+      ("job", (4, constants.JOB_STATUS_RUNNING)),
+      ("job", (4, constants.JOB_STATUS_CANCELED)),
+      ("end", None),
+      ])
+
+  def testKeepalive(self):
+    tracker = rlib2._JobChangeTracker({5: (None, None)})
+    unchanged = {5: [5, constants.JOB_STATUS_WAITING, [[]]]}
+    cl = _FakeClientForJobs([unchanged] * 100 + [
+      {5: [5, constants.JOB_STATUS_SUCCESS, [[]]]},
+      ])
+    sleeps = []
+
+    chunks = list(rlib2.R_2_jobs_events._StreamEvents(tracker, cl, [],
+                                                      _sleep_fn=sleeps.append))
+    self.assertEqual(len(sleeps), 101)
+    self.assertTrue(max(sleeps) <= rlib2._JOBS_POLL_DELAY[2])
+    self.assertTrue(": keepalive\n\n" in chunks)
+    self.assertTrue(chunks[-2].startswith("event: job\n"))
+    self.assertEqual(chunks[-1], "event: end\ndata: null\n\n")
+
+  def testInvalid(self):
+    for queryargs in [{}, {"jobs": ["1,x"]}]:
+      self.assertRaises(http.HttpBadRequest, self._Get, queryargs, [])
+
+    self.assertRaises(http.HttpNotFound, self._Get, {"jobs": ["1"]}, [{}])
+
+
 class TestInstanceReboot(RAPITestCase):
   def test(self):
     query_args = {
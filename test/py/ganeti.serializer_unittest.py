@@ -82,6 +82,15 @@ class TestSerializer(testutils.GanetiTestCase):
   def testJson(self):
     self._TestSerializer(serializer.DumpJson, serializer.LoadJson)
 
+  def testJsonIter(self):
+    for data in self._TESTDATA:
+      parts = list(serializer.DumpJsonIter(
+        data, private_encoder=serializer.EncodeWithPrivateFields))
+      self.assertEqual("".join(parts), serializer.DumpJson(
+        data, private_encoder=serializer.EncodeWithPrivateFields))
+      if isinstance(data, list):
+        self.assertEqual(len(parts), 2 * len(data) + 1)
+
   def testSignedJson(self):
     self._TestSigned(serializer.DumpSignedJson, serializer.LoadSignedJson)
 
@@ -35,6 +35,7 @@ import unittest
 import random
 import mimetools
 import base64
+import zlib
 from cStringIO import StringIO
 
 from ganeti import constants
@@ -262,6 +263,84 @@ class TestRemoteApiHandler(unittest.TestCase):
         else:
           self.assertEqual(code, http.HttpNotImplemented.code)
 
+  def testConditionalGet(self):
+    _FakeLuxiClientForETag.serial = 1
+    _FakeLuxiClientForETag.queries = 0
+
+    (code, headers, data) = self._Test(http.HTTP_GET, "/2/groups", "", None,
+                                       luxi_client=_FakeLuxiClientForETag)
+    self.assertEqual(code, http.HTTP_OK)
+    self.assertEqual(data, [{"name": "default", "uri": "/2/groups/default"}])
+    self.assertEqual(_FakeLuxiClientForETag.queries, 1)
+    etag = headers[http.HTTP_ETAG]
+
+    # Unchanged configuration, no query is done
+    for value in [etag, "W/%s" % etag, "\"other\", %s" % etag, "*"]:
+      (code, headers, _) = \
+        self._Test(http.HTTP_GET, "/2/groups",
+                   "%s: %s\n\n" % (http.HTTP_IF_NONE_MATCH, value), None,
+                   luxi_client=_FakeLuxiClientForETag)
+      self.assertEqual(code, http.HTTP_NOT_MODIFIED)
+      self.assertEqual(headers[http.HTTP_ETAG], etag)
+      self.assertEqual(_FakeLuxiClientForETag.queries, 1)
+
+    # Different query arguments
+    (code, headers, _) = \
+      self._Test(http.HTTP_GET, "/2/groups?bulk=0",
+                 "%s: %s\n\n" % (http.HTTP_IF_NONE_MATCH, etag), None,
+                 luxi_client=_FakeLuxiClientForETag)
+    self.assertEqual(code, http.HTTP_OK)
+    self.assertNotEqual(headers[http.HTTP_ETAG], etag)
+    self.assertEqual(_FakeLuxiClientForETag.queries, 2)
+
+    # Modified configuration
+    _FakeLuxiClientForETag.serial += 1
+    (code, headers, _) = \
+      self._Test(http.HTTP_GET, "/2/groups",
+                 "%s: %s\n\n" % (http.HTTP_IF_NONE_MATCH, etag), None,
+                 luxi_client=_FakeLuxiClientForETag)
+    self.assertEqual(code, http.HTTP_OK)
+    self.assertNotEqual(headers[http.HTTP_ETAG], etag)
+    self.assertEqual(_FakeLuxiClientForETag.queries, 3)
+
+  def testCompressedListing(self):
+    rm = rapi.testutils._RapiMock(BasicAuthenticator(NotImplemented),
+                                  _FakeLuxiClientForETag)
+    headers = "%s: %s\n\n" % (http.HTTP_ACCEPT_ENCODING, http.HTTP_GZIP)
+
+    (code, resp_headers, resp_body) = \
+      rm.FetchResponse("/2/groups", http.HTTP_GET,
+                       http.ParseHeaders(StringIO(headers)), None)
+    self.assertEqual(code, http.HTTP_OK)
+    self.assertEqual(resp_headers[http.HTTP_CONTENT_ENCODING], http.HTTP_GZIP)
+    self.assertEqual(resp_headers[http.HTTP_VARY], http.HTTP_ACCEPT_ENCODING)
+    self.assertEqual(
+      serializer.LoadJson(zlib.decompress(resp_body, 16 + zlib.MAX_WBITS)),
+      [{"name": "default", "uri": "/2/groups/default"}])
+
+  def testNoETag(self):
+    (code, headers, _) = self._Test(http.HTTP_GET, "/2/features", "", None)
+    self.assertEqual(code, http.HTTP_OK)
+    self.assertFalse(http.HTTP_ETAG in headers)
+
+
+class _FakeLuxiClientForETag:
+  serial = None
+  queries = 0
+
+  def __init__(self, *args, **kwargs):
+    pass
+
+  def QueryConfigValues(self, fields):
+    assert fields == ["config_serial"]
+    return [self.serial]
+
+  def QueryGroups(self, names, fields, use_locking):
+    assert not names
+    assert fields == ["name"]
+    _FakeLuxiClientForETag.queries += 1
+    return [["default"]]
+
 
 class _FakeLuxiClientForQuery:
   def __init__(self, *args, **kwargs):
@@ -432,6 +432,45 @@ class TestPublicSshKeys(testutils.GanetiTestCase):
     ssh.ClearPubKeyFile(key_file=pub_key_file)
     self.assertFileContent(pub_key_file, "")
 
+  def testPubKeyStoreBatch(self):
+    pub_key_file = self._CreateTempFile()
+    name = "my.precious.node"
+    ssh.AddPublicKey(self.UUID_1, self.KEY_A, key_file=pub_key_file)
+    ssh.AddPublicKey(name, self.KEY_B, key_file=pub_key_file)
+
+    key_store = ssh.PubKeyStore(key_file=pub_key_file)
+    self.assertEqual(key_store.Query(None),
+                     {self.UUID_1: [self.KEY_A], name: [self.KEY_B]})
+
+    key_store.ReplaceNameByUuid(self.UUID_2, name)
+    key_store.Remove(self.UUID_1)
+    key_store.Add(self.UUID_1, self.KEY_B)
+    key_store.Add(self.UUID_1, self.KEY_B)
+    key_store.Remove("non-existing-UUID")
+
+    self.assertEqual(key_store.Query([self.UUID_1, self.UUID_2, name]),
+                     {self.UUID_1: [self.KEY_B], self.UUID_2: [self.KEY_B]})
+
+    # Nothing is written before saving
+    self.assertFileContent(pub_key_file,
+      "123-456 ssh-dss AAAAB3NzaC1w5256closdj32mZaQU root@key-a\n"
+      "my.precious.node ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n")
+
+    key_store.Save()
+    self.assertFileContent(pub_key_file,
+      "789-ABC ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n"
+      "123-456 ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n")
+
+  def testPubKeyStoreMissingFile(self):
+    pub_key_file = self._CreateTempFile()
+    os.remove(pub_key_file)
+
+    key_store = ssh.PubKeyStore(key_file=pub_key_file)
+    self.assertEqual(key_store.Query(None), {})
+
+    key_store.Save()
+    self.assertFileContent(pub_key_file, "")
+
   def testOverridePubKeyFile(self):
     pub_key_file = self._CreateTempFile()
     key_map = {self.UUID_1: [self.KEY_A, self.KEY_B],
@@ -443,6 +443,22 @@ class TestLogicalVolume(testutils.GanetiTestCase):
 
     self.assertEqual(inst.Export(), export_cmd)
 
+  def testGetWipeMethods(self):
+    """Test for bdev.LogicalVolume.GetWipeMethods()"""
+    dev_path = "/dev/%s/%s" % self.test_unique_id
+
+    for (status, methods) in [
+      ("-wi-ao", [constants.WIPE_ZERO_OUT, constants.WIPE_WRITE]),
+      ("Vwi-ao", [constants.WIPE_DISCARD, constants.WIPE_ZERO_OUT,
+                  constants.WIPE_WRITE]),
+      ]:
+      lvs_cache = {
+        dev_path: (status, 253, 3, 4096.00, 1, ["/dev/sda"]),
+        }
+      inst = bdev.LogicalVolume(self.test_unique_id, [], 1024, {}, {},
+                                lvs_cache=lvs_cache)
+      self.assertEqual(inst.GetWipeMethods(), methods)
+
   @testutils.patch_object(bdev.LogicalVolume, "GetPVInfo")
   @testutils.patch_object(utils, "RunCmd")
   @testutils.patch_object(bdev.LogicalVolume, "Attach")
@@ -48,5 +48,89 @@ class TestConstants(unittest.TestCase):
     self.assertEqual(burnin._SUPPORTED_DISK_TEMPLATES, supported)
 
 
+class TestPercentile(unittest.TestCase):
+  def testSingle(self):
+    for percent in [0, 50, 99, 100]:
+      self.assertEqual(burnin._Percentile([7.0], percent), 7.0)
+
+  def testNearestRank(self):
+    values = range(1, 101)
+    self.assertEqual(burnin._Percentile(values, 0), 1)
+    self.assertEqual(burnin._Percentile(values, 50), 50)
+    self.assertEqual(burnin._Percentile(values, 90), 90)
+    self.assertEqual(burnin._Percentile(values, 99), 99)
+    self.assertEqual(burnin._Percentile(values, 100), 100)
+
+  def testSummaryEmpty(self):
+    self.assertEqual(burnin._SummarizeLatencies([]), {
+      "count": 0,
+      })
+
+  def testSummary(self):
+    self.assertEqual(burnin._SummarizeLatencies([3.0, 1.0, 2.0, 6.0]), {
+      "count": 4,
+      "mean": 3.0,
+      "min": 1.0,
+      "p50": 2.0,
+      "p90": 6.0,
+      "p99": 6.0,
+      "max": 6.0,
+      })
+
+
+class TestLoadStatistics(unittest.TestCase):
+  def testEmpty(self):
+    stats = burnin.LoadStatistics()
+    result = stats.GetResults(0, 2.0)
+    self.assertEqual(result["jobs"], {
+      "submitted": 0,
+      "skipped": 0,
+      "succeeded": 0,
+      "failed": 0,
+      "throughput": 0.0,
+      })
+    self.assertEqual(result["phases"], {})
+    self.assertEqual(result["opcodes"], {})
+    self.assertEqual(result["job_latency"], {"count": 0})
+
+  def testJobs(self):
+    stats = burnin.LoadStatistics()
+    stats.submitted = 4
+    stats.skipped = 1
+
+    self.assertTrue(stats.AddJob("reboot", ["OP_A", "OP_B"], [
+      constants.JOB_STATUS_SUCCESS, (100, 0), (101, 0), (105, 500000),
+      [(101, 0), (103, 0)], [(103, 0), (105, 0)],
+      ]))
+    self.assertFalse(stats.AddJob("reboot", ["OP_A", "OP_B"], [
+      constants.JOB_STATUS_ERROR, (200, 0), (200, 0), (201, 0),
+      [(200, 0), None], [(201, 0), None],
+      ]))
+    self.assertFalse(stats.AddJob("failover", ["OP_C"], None))
+
+    result = stats.GetResults(10.0, 1.0)
+    self.assertEqual(result["duration"], 10.0)
+    self.assertEqual(result["target_rate"], 1.0)
+    self.assertEqual(result["jobs"], {
+      "submitted": 4,
+      "skipped": 1,
+      "succeeded": 1,
+      "failed": 2,
+      "throughput": 0.3,
+      })
+    self.assertEqual(result["phases"], {
+      "reboot": {"succeeded": 1, "failed": 1},
+      "failover": {"succeeded": 0, "failed": 1},
+      })
+    self.assertEqual(result["job_latency"]["count"], 2)
+    self.assertEqual(result["job_latency"]["max"], 5.5)
+    self.assertEqual(result["queue_wait"]["count"], 2)
+    self.assertEqual(result["queue_wait"]["min"], 0.0)
+    self.assertEqual(sorted(result["opcodes"].keys()), ["OP_A", "OP_B"])
+    self.assertEqual(result["opcodes"]["OP_A"]["count"], 2)
+    self.assertEqual(result["opcodes"]["OP_A"]["mean"], 1.5)
+    self.assertEqual(result["opcodes"]["OP_B"]["count"], 1)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -0,0 +1,336 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for testing ganeti.tools.sparse_copy"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+import mock
+
+from ganeti import utils
+from ganeti.tools import sparse_copy
+
+import testutils
+
+
+_MiB = 1024 * 1024
+
+
+class TestSparseCopy(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteSource(self, chunks, size):
+    """Writes a sparse source file.
+
+    """
+    path = os.path.join(self.tmpdir, "source")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0600)
+    for (offset, data) in chunks:
+      os.lseek(fd, offset, os.SEEK_SET)
+      os.write(fd, data)
+    os.ftruncate(fd, size)
+    return fd
+
+  def _Copy(self, src_fd, dest_path, offset, size, **kwargs):
+    stream = StringIO()
+    (data_bytes, hole_bytes) = sparse_copy.Export(src_fd, stream, offset, size)
+    self.assertEqual(data_bytes + hole_bytes, size)
+
+    dest_fd = os.open(dest_path, os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      stream.seek(0)
+      result = sparse_copy.Import(dest_fd, stream, offset, size, **kwargs)
+    finally:
+      os.close(dest_fd)
+
+    self.assertEqual(result, (data_bytes, hole_bytes))
+    return (stream.getvalue(), data_bytes, hole_bytes)
+
+  def testRoundTrip(self):
+    size = 8 * _MiB
+    src_fd = self._WriteSource([(0, "a" * 100),
+                                (3 * _MiB + 17, "b" * 70000),
+                                (5 * _MiB, "\0" * _MiB),
+                                (size - 10, "c" * 10)], size)
+    try:
+      dest_path = os.path.join(self.tmpdir, "dest")
+      (stream, data_bytes, hole_bytes) = self._Copy(src_fd, dest_path, 0, size)
+
+      os.lseek(src_fd, 0, os.SEEK_SET)
+      self.assertEqual(utils.ReadFile(dest_path), os.read(src_fd, size))
+    finally:
+      os.close(src_fd)
+
+    # Only blocks containing data are sent
+    self.assertTrue(data_bytes <= 4 * sparse_copy.ZERO_BLOCK_SIZE)
+    self.assertTrue(len(stream) < data_bytes + 4096)
+    self.assertTrue(hole_bytes > 7 * _MiB)
+
+  def testOverwriteExisting(self):
+    size = 2 * _MiB
+    src_fd = self._WriteSource([(_MiB, "x" * 10)], size)
+    try:
+      dest_path = os.path.join(self.tmpdir, "dest")
+      fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT, 0600)
+      os.write(fd, "y" * (size + 100))
+      os.close(fd)
+
+      self._Copy(src_fd, dest_path, 0, size)
+
+      # Old data in holes must be cleared, the tail is kept
+      data = utils.ReadFile(dest_path)
+      self.assertEqual(len(data), size + 100)
+      self.assertEqual(data[:_MiB], "\0" * _MiB)
+      self.assertEqual(data[_MiB:_MiB + 10], "x" * 10)
+      self.assertEqual(data[size:], "y" * 100)
+
+      self._Copy(src_fd, dest_path, 0, size, truncate=True)
+      self.assertEqual(len(utils.ReadFile(dest_path)), size)
+    finally:
+      os.close(src_fd)
+
+  def testSegment(self):
+    size = 4 * _MiB
+    src_fd = self._WriteSource([(_MiB + 5, "s" * 20), (3 * _MiB, "t")], size)
+    try:
+      dest_path = os.path.join(self.tmpdir, "dest")
+      self._Copy(src_fd, dest_path, _MiB, 2 * _MiB)
+
+      data = utils.ReadFile(dest_path)
+      self.assertEqual(len(data), 3 * _MiB)
+      self.assertEqual(data[_MiB + 5:_MiB + 25], "s" * 20)
+      self.assertEqual(data.count("\0"), len(data) - 20)
+    finally:
+      os.close(src_fd)
+
+  def testBlockDeviceHoles(self):
+    stream = StringIO()
+    src_fd = self._WriteSource([], _MiB)
+    try:
+      sparse_copy.Export(src_fd, stream, 0, _MiB)
+    finally:
+      os.close(src_fd)
+
+    zeroed = []
+    dest_fd = os.open(os.path.join(self.tmpdir, "dest"),
+                      os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      stream.seek(0)
+      # Pretend the destination is a block device
+      fake_stat = mock.Mock(st_mode=0060600, st_size=0)
+      with mock.patch("os.fstat", return_value=fake_stat):
+        sparse_copy.Import(dest_fd, stream, 0, _MiB,
+                           _zero_fn=lambda *args: zeroed.append(args[1:]))
+    finally:
+      os.close(dest_fd)
+
+    self.assertEqual(zeroed, [(0, _MiB)])
+
+  def testCheckpoints(self):
+    size = 4 * _MiB
+    src_fd = self._WriteSource([(100, "a" * (2 * _MiB)), (3 * _MiB, "b")],
+                               size)
+    try:
+      dest_path = os.path.join(self.tmpdir, "dest")
+      stream = StringIO()
+      sparse_copy.Export(src_fd, stream, 0, size, checkpoint_size=_MiB)
+
+      checkpoints = []
+      dest_fd = os.open(dest_path, os.O_RDWR | os.O_CREAT, 0600)
+      try:
+        stream.seek(0)
+        sparse_copy.Import(dest_fd, stream, 0, size,
+                           checkpoint_fn=lambda *args:
+                             checkpoints.append(args))
+      finally:
+        os.close(dest_fd)
+
+      self.assertEqual([offset for (offset, _) in checkpoints],
+                       [_MiB, 2 * _MiB, 3 * _MiB])
+
+      # Resume after the second checkpoint
+      (resume_offset, resume_digest) = checkpoints[1]
+      fd = os.open(dest_path, os.O_WRONLY)
+      try:
+        os.ftruncate(fd, resume_offset)
+      finally:
+        os.close(fd)
+
+      stream = StringIO()
+      sparse_copy.Export(src_fd, stream, resume_offset, size - resume_offset,
+                         checkpoint_size=_MiB, resume_digest=resume_digest)
+
+      resumed = []
+      dest_fd = os.open(dest_path, os.O_RDWR)
+      try:
+        stream.seek(0)
+        sparse_copy.Import(dest_fd, stream, resume_offset,
+                           size - resume_offset, resume_digest=resume_digest,
+                           checkpoint_fn=lambda *args: resumed.append(args))
+      finally:
+        os.close(dest_fd)
+
+      self.assertEqual([offset for (offset, _) in resumed], [_MiB])
+      # The digest chain continues from the resumed checkpoint
+      self.assertNotEqual(resumed[0][1], checkpoints[2][1])
+
+      os.lseek(src_fd, 0, os.SEEK_SET)
+      self.assertEqual(utils.ReadFile(dest_path), os.read(src_fd, size))
+
+      # A wrong digest is detected at the first checkpoint
+      stream.seek(0)
+      dest_fd = os.open(dest_path, os.O_RDWR)
+      try:
+        self.assertRaises(sparse_copy.SparseCopyError, sparse_copy.Import,
+                          dest_fd, stream, resume_offset, None,
+                          resume_digest=checkpoints[0][1])
+      finally:
+        os.close(dest_fd)
+    finally:
+      os.close(src_fd)
+
+  def _ImportImage(self, stream, path, size):
+    chunks = []
+    dest_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      stream.seek(0)
+      sparse_copy.Import(dest_fd, stream, 0, size, truncate=True,
+                         chunk_fn=lambda *args: chunks.append(args))
+    finally:
+      os.close(dest_fd)
+
+    cmap = sparse_copy._BuildChunkMap(size, chunks)
+    sparse_copy.WriteChunkMap(path, cmap)
+    return cmap
+
+  def testIncremental(self):
+    size = 4 * _MiB
+    chunk_size = 256 * 1024
+    src_fd = self._WriteSource([(0, "a" * 1000), (_MiB, "b" * _MiB)], size)
+    try:
+      # Full export
+      stream = StringIO()
+      sparse_copy.Export(src_fd, stream, 0, size, checkpoint_size=_MiB,
+                         chunk_size=chunk_size)
+      full_path = os.path.join(self.tmpdir, "full")
+      full_map = self._ImportImage(stream, full_path, size)
+
+      self.assertEqual(full_map["chunk_size"], chunk_size)
+      self.assertEqual(len(full_map["hashes"]), size // chunk_size)
+      self.assertEqual(full_map["unchanged"], [])
+
+      # Change a single chunk
+      os.lseek(src_fd, _MiB + 10, os.SEEK_SET)
+      os.write(src_fd, "c" * 10)
+
+      stream = StringIO()
+      (data_bytes, _) = \
+        sparse_copy.Export(src_fd, stream, 0, size, checkpoint_size=_MiB,
+                           chunk_size=chunk_size,
+                           base_hashes=full_map["hashes"])
+      self.assertEqual(data_bytes, chunk_size)
+
+      delta_path = os.path.join(self.tmpdir, "delta")
+      delta_map = self._ImportImage(stream, delta_path, size)
+
+      unchanged = range(size // chunk_size)
+      unchanged.remove(_MiB // chunk_size)
+      self.assertEqual(delta_map["unchanged"], unchanged)
+      self.assertNotEqual(delta_map["hashes"], full_map["hashes"])
+
+      os.lseek(src_fd, 0, os.SEEK_SET)
+      expected = os.read(src_fd, size)
+    finally:
+      os.close(src_fd)
+
+    # An incremental image can't be used without its base
+    self.assertRaises(sparse_copy.SparseCopyError, sparse_copy.ImageChain,
+                      delta_path)
+
+    delta_map["base"] = "full"
+    sparse_copy.WriteChunkMap(delta_path, delta_map)
+
+    chain = sparse_copy.ImageChain(delta_path)
+    try:
+      stream = StringIO()
+      sparse_copy.ExportRaw(chain.fd, stream, 0, size, chain=chain)
+      self.assertEqual(stream.getvalue(), expected)
+
+      stream = StringIO()
+      sparse_copy.Export(chain.fd, stream, 0, size, chain=chain)
+    finally:
+      chain.Close()
+
+    restored_path = os.path.join(self.tmpdir, "restored")
+    dest_fd = os.open(restored_path, os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      stream.seek(0)
+      sparse_copy.Import(dest_fd, stream, 0, size)
+    finally:
+      os.close(dest_fd)
+
+    self.assertEqual(utils.ReadFile(restored_path), expected)
+
+  def testInvalidStream(self):
+    dest_fd = os.open(os.path.join(self.tmpdir, "dest"),
+                      os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      self.assertRaises(sparse_copy.SparseCopyError, sparse_copy.Import,
+                        dest_fd, StringIO("garbage" * 10), 0, None)
+
+      src_fd = self._WriteSource([(0, "data")], 100)
+      try:
+        stream = StringIO()
+        sparse_copy.Export(src_fd, stream, 0, 100)
+      finally:
+        os.close(src_fd)
+
+      # Size mismatch
+      self.assertRaises(sparse_copy.SparseCopyError, sparse_copy.Import,
+                        dest_fd, StringIO(stream.getvalue()), 0, 200)
+
+      # Truncated stream
+      self.assertRaises(sparse_copy.SparseCopyError, sparse_copy.Import,
+                        dest_fd, StringIO(stream.getvalue()[:-5]), 0, None)
+    finally:
+      os.close(dest_fd)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
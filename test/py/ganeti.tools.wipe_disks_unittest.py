@@ -0,0 +1,225 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for testing ganeti.tools.wipe_disks"""
+
+import errno
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from ganeti import constants
+from ganeti.tools import wipe_disks
+
+import testutils
+
+
+_MiB = 1024 * 1024
+
+
+class TestDeviceWiper(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpdir, "disk")
+
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0600)
+    try:
+      os.write(fd, "x" * (10 * _MiB))
+    finally:
+      os.close(fd)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _Read(self):
+    fd = os.open(self.path, os.O_RDONLY)
+    try:
+      return os.read(fd, 20 * _MiB)
+    finally:
+      os.close(fd)
+
+  def testZeroOut(self):
+    calls = []
+
+    def _Ioctl(_, request, arg):
+      self.assertEqual(request, wipe_disks._BLKZEROOUT)
+      calls.append(struct.unpack("QQ", arg))
+
+    wiper = wipe_disks.DeviceWiper(self.path, 2 * _MiB,
+                                   wipe_disks.WIPE_STEP + _MiB)
+    wiper.Run(_ioctl=_Ioctl)
+
+    self.assertEqual(wiper.error, None)
+    self.assertEqual(wiper.method, constants.WIPE_ZERO_OUT)
+    self.assertEqual(wiper.done, wiper.size)
+    self.assertEqual(calls, [
+      (2 * _MiB, wipe_disks.WIPE_STEP),
+      (2 * _MiB + wipe_disks.WIPE_STEP, _MiB),
+      ])
+
+  def _UnsupportedIoctl(self, *_):
+    raise IOError(errno.ENOTTY, "Inappropriate ioctl for device")
+
+  def testWriteZeroes(self):
+    wiper = wipe_disks.DeviceWiper(self.path, 1 * _MiB, 8 * _MiB)
+    wiper.Run(_ioctl=self._UnsupportedIoctl)
+
+    self.assertEqual(wiper.error, None)
+    self.assertEqual(wiper.method, constants.WIPE_WRITE)
+    self.assertEqual(wiper.done, 8 * _MiB)
+    self.assertEqual(self._Read(),
+                     "x" * _MiB + "\0" * (8 * _MiB) + "x" * _MiB)
+
+  def testDiscard(self):
+    calls = []
+
+    def _Ioctl(_, request, arg):
+      calls.append((request, struct.unpack("QQ", arg)))
+
+    wiper = wipe_disks.DeviceWiper(self.path, 0, 4 * _MiB,
+                                   methods=[constants.WIPE_DISCARD,
+                                            constants.WIPE_ZERO_OUT])
+    wiper.Run(_ioctl=_Ioctl, _verify_fn=lambda *_: True)
+
+    self.assertEqual(wiper.error, None)
+    self.assertEqual(wiper.method, constants.WIPE_DISCARD)
+    self.assertEqual(calls, [(wipe_disks._BLKDISCARD, (0, 4 * _MiB))])
+
+  def testDiscardNotZeroed(self):
+    calls = []
+    verified = []
+
+    def _Ioctl(_, request, arg):
+      calls.append((request, struct.unpack("QQ", arg)))
+
+    def _Verify(path, offset, length):
+      verified.append((path, offset, length))
+      return False
+
+    wiper = wipe_disks.DeviceWiper(self.path, 0, 4 * _MiB,
+                                   methods=[constants.WIPE_DISCARD,
+                                            constants.WIPE_ZERO_OUT])
+    wiper.Run(_ioctl=_Ioctl, _verify_fn=_Verify)
+
+    self.assertEqual(wiper.error, None)
+    self.assertEqual(wiper.method, constants.WIPE_ZERO_OUT)
+    self.assertEqual(verified, [(self.path, 0, 4 * _MiB)])
+    self.assertEqual(calls, [
+      (wipe_disks._BLKDISCARD, (0, 4 * _MiB)),
+      (wipe_disks._BLKZEROOUT, (0, 4 * _MiB)),
+      ])
+
+  def testPunchHoleUnsupported(self):
+    def _Fallocate(*_):
+      raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    wiper = wipe_disks.DeviceWiper(self.path, 0, 2 * _MiB,
+                                   methods=[constants.WIPE_PUNCH_HOLE])
+    wiper.Run(_ioctl=self._UnsupportedIoctl, _fallocate=_Fallocate)
+
+    self.assertEqual(wiper.error, None)
+    self.assertEqual(wiper.method, constants.WIPE_WRITE)
+    self.assertEqual(self._Read(), "\0" * (2 * _MiB) + "x" * (8 * _MiB))
+
+  def testVerifyZeroes(self):
+    self.assertFalse(wipe_disks._VerifyZeroes(self.path, 0, 4 * _MiB))
+
+    wiper = wipe_disks.DeviceWiper(self.path, _MiB, 4 * _MiB)
+    wiper.Run(_ioctl=self._UnsupportedIoctl)
+
+    self.assertTrue(wipe_disks._VerifyZeroes(self.path, _MiB, 4 * _MiB))
+    self.assertFalse(wipe_disks._VerifyZeroes(self.path, _MiB, 5 * _MiB))
+
+  def testOpenError(self):
+    wiper = wipe_disks.DeviceWiper(os.path.join(self.tmpdir, "missing"),
+                                   0, _MiB)
+    wiper.Run(_ioctl=self._UnsupportedIoctl)
+
+    self.assertTrue(wiper.error)
+    self.assertEqual(wiper.done, 0)
+    self.assertEqual(wiper.ToDict()["error"], wiper.error)
+
+  def testUnexpectedError(self):
+    def _Verify(*_):
+      raise ValueError("Unexpected error")
+
+    wiper = wipe_disks.DeviceWiper(self.path, 0, 2 * _MiB,
+                                   methods=[constants.WIPE_DISCARD])
+    wiper.Run(_ioctl=lambda *_: None, _verify_fn=_Verify)
+
+    self.assertTrue("Unexpected error" in wiper.error)
+    self.assertEqual(wiper.done, 0)
+
+
+class TestWipeDevices(unittest.TestCase):
+  def testResult(self):
+    class _FakeWiper(object):
+      def __init__(self, error):
+        self.path = "/dev/fake"
+        self.error = None
+        self._error = error
+
+      def Run(self):
+        self.error = self._error
+
+    status = []
+
+    def _StatusFn(wipers, finished):
+      status.append(([wiper.error for wiper in wipers], finished))
+
+    self.assertTrue(wipe_disks.WipeDevices([_FakeWiper(None)], _StatusFn))
+    self.assertEqual(status[-1], ([None], True))
+
+    self.assertFalse(wipe_disks.WipeDevices([_FakeWiper(None),
+                                             _FakeWiper("failed")],
+                                            _StatusFn))
+    self.assertEqual(status[-1], ([None, "failed"], True))
+
+
+class TestParseDevice(unittest.TestCase):
+  def test(self):
+    self.assertEqual(wipe_disks._ParseDevice("/dev/xvda:0:1024"),
+                     ("/dev/xvda", 0, 1024, None))
+    self.assertEqual(wipe_disks._ParseDevice("/dev/disk/by-id/a:b:4096:512"),
+                     ("/dev/disk/by-id/a:b", 4096, 512, None))
+    self.assertEqual(wipe_disks._ParseDevice("/dev/xvda:0:1024:discard,write"),
+                     ("/dev/xvda", 0, 1024, [constants.WIPE_DISCARD,
+                                             constants.WIPE_WRITE]))
+
+    for value in ["/dev/xvda", "/dev/xvda:1", "/dev/xvda:-1:10",
+                  "/dev/xvda:x:10", "/dev/xvda:0:10:discard,unknown"]:
+      self.assertRaises(ValueError, wipe_disks._ParseDevice, value)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
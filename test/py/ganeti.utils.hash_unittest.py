@@ -33,6 +33,7 @@
 import unittest
 import random
 import tempfile
+import time
 
 from ganeti import constants
 from ganeti import utils
@@ -116,6 +117,60 @@ class TestFingerprintFiles(unittest.TestCase):
     all_files.append("/no/such/file")
     self.assertEqual(utils.FingerprintFiles(self.results.keys()), self.results)
 
+  def testCache(self):
+    all_files = self.results.keys()
+    all_files.append("/no/such/file")
+    now = time.time() + 60
+    cache = {"/no/such/file": [[0, 0, 0, 0, 0], "dummy"]}
+    self.assertEqual(utils.FingerprintFiles(all_files, cache=cache,
+                                            _time_fn=lambda: now),
+                     self.results)
+    self.assertEqual(sorted(cache.keys()), sorted(self.results.keys()))
+    for (filename, (_, cksum)) in cache.items():
+      self.assertEqual(cksum, self.results[filename])
+
+    # Unmodified files are not read again
+    cache[self.tmpfile.name][1] = "cached"
+    self.assertEqual(utils.FingerprintFiles(all_files, cache=cache,
+                                            _time_fn=lambda: now),
+                     dict(self.results, **{self.tmpfile.name: "cached"}))
+
+    # Modified files are
+    self.tmpfile.write("A" * 8192)
+    self.tmpfile.flush()
+    result = utils.FingerprintFiles(all_files, cache=cache,
+                                    _time_fn=lambda: time.time() + 60)
+    self.assertEqual(result[self.tmpfile.name],
+                     "35b6795ca20d6dc0aff8c7c110c96cd1070b8c38")
+    self.assertEqual(cache[self.tmpfile.name][1],
+                     "35b6795ca20d6dc0aff8c7c110c96cd1070b8c38")
+
+  def testCacheRecentlyModified(self):
+    cache = {}
+    self.assertEqual(utils.FingerprintFiles(self.results.keys(), cache=cache),
+                     self.results)
+    self.assertEqual(cache, {})
+
+
+class TestAggregateFingerprint(unittest.TestCase):
+  def test(self):
+    fps = {
+      "/etc/hosts": "da39a3ee5e6b4b0d3255bfef95601890afd80709",
+      "/etc/ganeti/file": "648a6a6ffffdaa0badb23b8baf90b6168dd16b3a",
+      }
+    digest = utils.AggregateFingerprint(fps)
+    self.assertEqual(len(digest), 40)
+    self.assertEqual(utils.AggregateFingerprint(dict(fps.items())), digest)
+    self.assertNotEqual(utils.AggregateFingerprint({}), digest)
+
+    other = fps.copy()
+    other["/etc/hosts"] = "648a6a6ffffdaa0badb23b8baf90b6168dd16b3a"
+    self.assertNotEqual(utils.AggregateFingerprint(other), digest)
+
+    other = fps.copy()
+    del other["/etc/hosts"]
+    self.assertNotEqual(utils.AggregateFingerprint(other), digest)
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for testing ganeti.utils.parallel"""
+
+import threading
+import unittest
+
+from ganeti import compat
+from ganeti import errors
+from ganeti import utils
+
+import testutils
+
+
+class TestRunParallel(unittest.TestCase):
+  def testEmpty(self):
+    self.assertEqual(utils.RunParallel([], 4), {})
+
+  def testResults(self):
+    tasks = [(i, lambda x: x * 2, [i]) for i in range(20)]
+    result = utils.RunParallel(tasks, 3)
+    self.assertEqual(sorted(result.keys()), range(20))
+    for (key, (status, value, duration)) in result.items():
+      self.assertEqual(status, utils.TASK_SUCCESS)
+      self.assertEqual(value, key * 2)
+      self.assertTrue(duration >= 0)
+
+  def testFailure(self):
+    def _Fail():
+      raise errors.GenericError("failed")
+
+    result = utils.RunParallel([("ok", lambda: 1, []), ("fail", _Fail, [])], 2)
+    self.assertEqual(result["ok"][:2], (utils.TASK_SUCCESS, 1))
+    (status, err, _) = result["fail"]
+    self.assertEqual(status, utils.TASK_FAILED)
+    self.assertTrue(isinstance(err, errors.GenericError))
+
+  def testConcurrency(self):
+    lock = threading.Lock()
+    state = {"current": 0, "max": 0}
+    barrier = threading.Event()
+
+    def _Task():
+      lock.acquire()
+      try:
+        state["current"] += 1
+        state["max"] = max(state["max"], state["current"])
+        if state["max"] == 3:
+          barrier.set()
+      finally:
+        lock.release()
+      barrier.wait(10)
+      lock.acquire()
+      try:
+        state["current"] -= 1
+      finally:
+        lock.release()
+
+    result = utils.RunParallel([(i, _Task, []) for i in range(10)], 3)
+    self.assertEqual(len(result), 10)
+    self.assertEqual(state["max"], 3)
+    self.assertTrue(compat.all(status == utils.TASK_SUCCESS
+                                for (status, _, _) in result.values()))
+
+  def testTimeout(self):
+    release = threading.Event()
+
+    result = utils.RunParallel([("hang", release.wait, [30]),
+                                ("other", lambda: "done", [])],
+                               1, timeout=0.1)
+    release.set()
+
+    self.assertEqual(result["hang"][:2], (utils.TASK_TIMEOUT, None))
+    self.assertEqual(result["other"][:2], (utils.TASK_SUCCESS, "done"))
+
+  def testInvalid(self):
+    self.assertRaises(errors.ProgrammerError, utils.RunParallel, [], 0)
+    self.assertRaises(errors.ProgrammerError, utils.RunParallel,
+                      [(1, id, [1]), (1, id, [2])], 1)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -587,6 +587,52 @@ class TestRunParts(testutils.GanetiTestCase):
     nosuchdir = utils.PathJoin(self.rundir, "no/such/directory")
     self.assertEqual(utils.RunParts(nosuchdir), [])
 
+  def testParallelMix(self):
+    files = [os.path.join(self.rundir, name)
+             for name in ["00test", "10a", "10b", "10c", "20test", "test"]]
+
+    for fname in files:
+      utils.WriteFile(fname, data="#!/bin/sh\n\necho -n ${0##*/}")
+      os.chmod(fname, stat.S_IREAD | stat.S_IEXEC)
+
+    # Not executable
+    os.chmod(files[2], stat.S_IREAD)
+
+    durations = {}
+    results = utils.RunParts(self.rundir, reset_env=True, max_workers=2,
+                             durations=durations)
+
+    self.assertEqual([relname for (relname, _, _) in results],
+                     map(os.path.basename, files))
+    for (relname, status, runresult) in results:
+      if relname == "10b":
+        self.assertEqual(status, constants.RUNPARTS_SKIP)
+        self.assertFalse(relname in durations)
+      else:
+        self.assertEqual(status, constants.RUNPARTS_RUN)
+        self.assertEqual(runresult.output, relname)
+        self.assertTrue(durations[relname] >= 0)
+
+  def testTimeout(self):
+    fname = os.path.join(self.rundir, "00test")
+    utils.WriteFile(fname, data="#!/bin/sh\n\nsleep 60")
+    os.chmod(fname, stat.S_IREAD | stat.S_IEXEC)
+    (relname, status, runresult) = \
+      utils.RunParts(self.rundir, reset_env=True, timeout=1)[0]
+    self.assertEqual(relname, os.path.basename(fname))
+    self.assertEqual(status, constants.RUNPARTS_RUN)
+    self.assertTrue(runresult.failed)
+    self.assertTrue(runresult.failed_by_timeout)
+
+
+class TestGroupRunPartsScripts(unittest.TestCase):
+  def test(self):
+    self.assertEqual(utils.process._GroupRunPartsScripts([]), [])
+    self.assertEqual(
+      utils.process._GroupRunPartsScripts(["00a", "10a", "10b", "100c",
+                                           "20-x", "20-y", "a", "b"]),
+      [["00a"], ["10a", "10b"], ["100c"], ["20-x", "20-y"], ["a"], ["b"]])
+
 
 class TestStartDaemon(testutils.GanetiTestCase):
   def setUp(self):
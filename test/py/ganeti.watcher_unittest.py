@@ -0,0 +1,139 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for testing ganeti.watcher"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ganeti import serializer
+from ganeti import utils
+from ganeti import watcher
+
+import testutils
+
+
+class TestMergeInstanceStatus(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.filename = utils.PathJoin(self.tmpdir, "instance-status")
+    self.pergroup = utils.PathJoin(self.tmpdir, "group.%s.instance-status")
+    self.cachefile = utils.PathJoin(self.tmpdir, "merge-cache")
+    self.reads = []
+    self._orig_read = watcher._ReadInstanceStatus
+    watcher._ReadInstanceStatus = self._ReadInstanceStatus
+
+  def tearDown(self):
+    watcher._ReadInstanceStatus = self._orig_read
+    shutil.rmtree(self.tmpdir)
+
+  def _ReadInstanceStatus(self, filename):
+    self.reads.append(os.path.basename(filename))
+    return self._orig_read(filename)
+
+  def _WriteGroup(self, group, data, mtime):
+    filename = self.pergroup % group
+    utils.WriteFile(filename, data=data)
+    os.utime(filename, (mtime, mtime))
+
+  def _Merge(self, groups):
+    watcher._MergeInstanceStatus(self.filename, self.pergroup, groups,
+                                 _cache_filename=self.cachefile)
+
+  def testWithoutCache(self):
+    self._WriteGroup("g1", "inst1 running\ninst2 ERROR_down\n", 1000)
+    self._WriteGroup("g2", "inst2 running\ninst3 ADMIN_down\n", 2000)
+
+    self._Merge(["g1", "g2", "g3"])
+
+    self.assertEqual(sorted(self.reads),
+                     ["group.g1.instance-status", "group.g2.instance-status"])
+    self.assertEqual(utils.ReadFile(self.filename).splitlines(), [
+      "inst1 running",
+      "inst2 running",
+      "inst3 ADMIN_down",
+      ])
+
+    cache = serializer.LoadJson(utils.ReadFile(self.cachefile))
+    self.assertEqual(sorted(cache.keys()), ["g1", "g2"])
+    self.assertEqual(cache["g1"]["mtime"], 1000)
+
+  def testCacheHit(self):
+    self._WriteGroup("g1", "inst1 running\n", 1000)
+    self._WriteGroup("g2", "inst2 running\n", 2000)
+    self._Merge(["g1", "g2"])
+    self.assertEqual(len(self.reads), 2)
+
+    # Unchanged files are not read again
+    self.reads = []
+    os.unlink(self.filename)
+    self._Merge(["g1", "g2"])
+    self.assertEqual(self.reads, [])
+    self.assertEqual(utils.ReadFile(self.filename).splitlines(), [
+      "inst1 running",
+      "inst2 running",
+      ])
+
+    # Only the modified file is read
+    self._WriteGroup("g2", "inst2 ERROR_down\n", 3000)
+    self._Merge(["g1", "g2"])
+    self.assertEqual(self.reads, ["group.g2.instance-status"])
+    self.assertEqual(utils.ReadFile(self.filename).splitlines(), [
+      "inst1 running",
+      "inst2 ERROR_down",
+      ])
+
+  def testCacheWrittenBeforeStatusFile(self):
+    self._WriteGroup("g1", "inst1 running\n", 1000)
+
+    def _Fail(filename, data):
+      raise EnvironmentError("Simulated failure")
+
+    orig_write = watcher._WriteInstanceStatus
+    watcher._WriteInstanceStatus = _Fail
+    try:
+      self.assertRaises(EnvironmentError, self._Merge, ["g1"])
+    finally:
+      watcher._WriteInstanceStatus = orig_write
+
+    self.assertEqual(utils.ReadFile(self.filename), "")
+    self.assertTrue(os.path.exists(self.cachefile))
+
+    # The next run uses the cache and writes the status file
+    self.reads = []
+    self._Merge(["g1"])
+    self.assertEqual(self.reads, [])
+    self.assertEqual(utils.ReadFile(self.filename), "inst1 running")
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
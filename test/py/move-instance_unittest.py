@@ -0,0 +1,197 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for testing tools/move-instance"""
+
+import imp
+import threading
+import unittest
+
+from ganeti import utils
+
+import testutils
+
+
+def _LoadMoveInstance():
+  """Loads the move-instance script as a module.
+
+  The script has no file name extension, so it can't be imported directly.
+
+  """
+  filename = utils.PathJoin(testutils.GetSourceDir(), "tools",
+                            "move-instance")
+  module = imp.new_module("move_instance")
+  module.__file__ = filename
+  code = compile(utils.ReadFile(filename), filename, "exec")
+  exec code in module.__dict__ # pylint: disable=W0122
+  return module
+
+
+move_instance = _LoadMoveInstance()
+
+
+class _FakeMove(object):
+  def __init__(self, name, src_pnode, size, dest_pnode=None):
+    self.src_instance_name = name
+    self.src_pnode = src_pnode
+    self.dest_pnode = dest_pnode
+    self.size = size
+
+
+class _FakeTime(object):
+  def __init__(self, now):
+    self.now = now
+
+  def __call__(self):
+    return self.now
+
+
+class TestMoveScheduler(unittest.TestCase):
+  def _GetAll(self, scheduler):
+    names = []
+    while True:
+      move = scheduler.GetNext()
+      if move is None:
+        break
+      names.append(move.src_instance_name)
+    return names
+
+  def testEmpty(self):
+    scheduler = move_instance.MoveScheduler([], None)
+    self.assertTrue(scheduler.GetNext() is None)
+
+  def testOrder(self):
+    moves = [
+      _FakeMove("inst1", "node1", 10),
+      _FakeMove("inst2", "node1", 300),
+      _FakeMove("inst3", None, None),
+      _FakeMove("inst4", "node2", 20),
+      _FakeMove("inst5", "node3", 300),
+      ]
+
+    scheduler = move_instance.MoveScheduler(moves, None)
+
+    # Largest first, moves of the same size keep their order
+    self.assertEqual(self._GetAll(scheduler),
+                     ["inst2", "inst5", "inst4", "inst1", "inst3"])
+
+  def testMaxPerNode(self):
+    moves = [
+      _FakeMove("inst1", "node1", 300),
+      _FakeMove("inst2", "node1", 200),
+      _FakeMove("inst3", "node2", 100, dest_pnode="node9"),
+      _FakeMove("inst4", "node3", 50, dest_pnode="node9"),
+      _FakeMove("inst5", "node4", 10, dest_pnode="node1"),
+      ]
+
+    scheduler = move_instance.MoveScheduler(moves, 1)
+
+    # "inst2" has to wait for "inst1" on the same source node, "inst4" for
+    # "inst3" on the same destination node; source and destination nodes are
+    # counted separately
+    first = scheduler.GetNext()
+    self.assertEqual(first.src_instance_name, "inst1")
+    third = scheduler.GetNext()
+    self.assertEqual(third.src_instance_name, "inst3")
+    self.assertEqual(scheduler.GetNext().src_instance_name, "inst5")
+
+    scheduler.Finish(third)
+    self.assertEqual(scheduler.GetNext().src_instance_name, "inst4")
+
+    scheduler.Finish(first)
+    self.assertEqual(scheduler.GetNext().src_instance_name, "inst2")
+
+    self.assertTrue(scheduler.GetNext() is None)
+
+  def testNoLimit(self):
+    moves = [_FakeMove("inst%s" % i, "node1", i) for i in range(5)]
+    scheduler = move_instance.MoveScheduler(moves, None)
+    self.assertEqual(self._GetAll(scheduler),
+                     ["inst4", "inst3", "inst2", "inst1", "inst0"])
+
+  def testWakeBlocked(self):
+    moves = [
+      _FakeMove("inst1", "node1", 200),
+      _FakeMove("inst2", "node1", 100),
+      ]
+
+    scheduler = move_instance.MoveScheduler(moves, 1)
+
+    first = scheduler.GetNext()
+    self.assertEqual(first.src_instance_name, "inst1")
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(scheduler.GetNext()))
+    thread.daemon = True
+    thread.start()
+
+    # The worker is blocked until the move on the same node is finished
+    thread.join(0.1)
+    self.assertTrue(thread.isAlive())
+    self.assertFalse(result)
+
+    scheduler.Finish(first)
+    thread.join(10)
+    self.assertFalse(thread.isAlive())
+    self.assertEqual([move.src_instance_name for move in result], ["inst2"])
+
+    self.assertTrue(scheduler.GetNext() is None)
+
+  def testFormatProgress(self):
+    moves = [
+      _FakeMove("inst1", "node1", 1024),
+      _FakeMove("inst2", "node2", 2048),
+      _FakeMove("inst3", "node3", 1024),
+      ]
+
+    time_fn = _FakeTime(100.0)
+    scheduler = move_instance.MoveScheduler(moves, None, _time_fn=time_fn)
+
+    started = [scheduler.GetNext() for _ in moves]
+    self.assertEqual(scheduler._FormatProgress(),
+                     "Finished 0 of 3 instance moves, 0M of 4.0G disk data")
+
+    time_fn.now = 110.0
+    scheduler.Finish(started[0])
+    self.assertEqual(scheduler._FormatProgress(),
+                     "Finished 1 of 3 instance moves, 2.0G of 4.0G disk"
+                     " data, 205M/s, about 10s remaining")
+
+    time_fn.now = 120.0
+    scheduler.Finish(started[1])
+    scheduler.Finish(started[2])
+    self.assertEqual(scheduler._FormatProgress(),
+                     "Finished 3 of 3 instance moves, 4.0G of 4.0G disk"
+                     " data, 205M/s")
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
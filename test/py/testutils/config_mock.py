@@ -31,6 +31,7 @@
 """Support for mocking the cluster configuration"""
 
 
+import copy
 import random
 import time
 import uuid as uuid_module
@@ -616,6 +617,10 @@ class ConfigMock(config.ConfigWriter):
   def AllocateDRBDMinor(self, node_uuids, disk_uuid):
     return [0] * len(node_uuids)
 
+  def AllocateDRBDMinors(self, requests):
+    return [self.AllocateDRBDMinor(node_uuids, disk_uuid)
+            for (node_uuids, disk_uuid) in requests]
+
   def ReleaseDRBDMinors(self, disk_uuid):
     pass
 
@@ -748,6 +753,12 @@ class ConfigMock(config.ConfigWriter):
     gen_mac = self._GenerateOneMAC(prefix)
     return self._temporary_macs.Generate(existing, gen_mac, ec_id)
 
+  def GenerateMACs(self, net_uuid, count, ec_id):
+    """Generate several MACs for instances at once.
+
+    """
+    return [self.GenerateMAC(net_uuid, ec_id) for _ in range(count)]
+
   def ReserveMAC(self, mac, ec_id):
     """Reserve a MAC for an instance.
 
@@ -771,6 +782,12 @@ class ConfigMock(config.ConfigWriter):
                                             utils.GenerateSecret,
                                             ec_id)
 
+  def GenerateDRBDSecrets(self, count, ec_id):
+    """Generate several DRBD secrets at once.
+
+    """
+    return [self.GenerateDRBDSecret(ec_id) for _ in range(count)]
+
   def ReserveLV(self, lv_name, ec_id):
     """Reserve an VG/LV pair for an instance.
 
@@ -784,6 +801,19 @@ class ConfigMock(config.ConfigWriter):
     else:
       self._temporary_lvs.Reserve(ec_id, lv_name)
 
+  def ReserveLVs(self, lv_names, ec_id):
+    """Reserve several VG/LV pairs at once.
+
+    Either all of the LVs are reserved, or none of them.
+
+    """
+    all_lvs = self._AllLVs()
+    for lv_name in lv_names:
+      if lv_name in all_lvs or self._temporary_lvs.Reserved(lv_name):
+        raise errors.ReservationError("LV already in use")
+    for lv_name in lv_names:
+      self._temporary_lvs.Reserve(ec_id, lv_name)
+
   def _UnlockedCommitTemporaryIps(self, ec_id):
     """Commit all reserved IP address to their respective pools
 
@@ -840,6 +870,28 @@ class ConfigMock(config.ConfigWriter):
     _, address, _ = self._temporary_ips.Generate([], gen_one, ec_id)
     return address
 
+  def GenerateIps(self, net_uuid, count, ec_id):
+    """Find several free IPv4 addresses for instances at once.
+
+    """
+    nobj = copy.deepcopy(self._UnlockedGetNetwork(net_uuid))
+    pool = AddressPool(nobj)
+    reserved = self._temporary_ips.GetReserved()
+
+    result = []
+    while len(result) < count:
+      try:
+        ip = pool.GetFreeAddress()
+      except errors.AddressPoolError:
+        raise errors.ReservationError("Cannot generate IP. Network is full")
+      if (RESERVE_ACTION, ip, net_uuid) not in reserved:
+        result.append(ip)
+
+    for ip in result:
+      self._temporary_ips.Reserve(ec_id, (RESERVE_ACTION, ip, net_uuid))
+
+    return result
+
   def _UnlockedReserveIp(self, net_uuid, address, ec_id, check=True):
     """Reserve a given IPv4 address for use by an instance.
 
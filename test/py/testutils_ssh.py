@@ -503,7 +503,7 @@ class FakeSshFileManager(object):
   def RunCommand(self, cluster_name, node, base_cmd, port, data,
                  debug=False, verbose=False, use_cluster_key=False,
                  ask_key=False, strict_host_check=False,
-                 ensure_version=False):
+                 ensure_version=False, timeout=None):
     """This emulates ssh.RunSshCmdWithStdin calling ssh_update.
 
     While in real SSH operations, ssh.RunSshCmdWithStdin is called
@@ -760,4 +760,38 @@ class FakeSshFileManager(object):
         self._public_keys[self._master_node_name][node_name][:]
       del self._public_keys[self._master_node_name][node_name]
     self._AssertTypePublicKeys()
+
+  def GetPubKeyStore(self, key_file=None, error_fn=None):
+    """Emulates ssh.PubKeyStore on the master node.
+
+    The returned object applies all changes to the state kept in this class
+    immediately.
+
+    @see: C{ssh.PubKeyStore}
+
+    """
+    return _FakePubKeyStore(self)
   # pylint: enable=W0613
+
+
+class _FakePubKeyStore(object):
+  """Key store operating on the master node of a L{FakeSshFileManager}.
+
+  """
+  def __init__(self, manager):
+    self._manager = manager
+
+  def Query(self, target_uuids):
+    return self._manager.QueryPubKeyFile(target_uuids)
+
+  def Add(self, new_uuid, new_key):
+    self._manager.AddPublicKey(new_uuid, new_key)
+
+  def Remove(self, target_uuid):
+    self._manager.RemovePublicKey(target_uuid)
+
+  def ReplaceNameByUuid(self, node_uuid, node_name):
+    self._manager.ReplaceNameByUuid(node_uuid, node_name)
+
+  def Save(self):
+    pass